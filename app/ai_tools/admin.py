@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AiConversationMessage
+from .models import AiConversationMessage, AiConversationSession
 
 
 @admin.register(AiConversationMessage)
@@ -22,6 +22,7 @@ class AiConversationMessageAdmin(admin.ModelAdmin):
         "session_id",
         "role",
         "content",
+        "compact_content",
         "model",
         "total_tokens",
         "cost_usd",
@@ -30,3 +31,10 @@ class AiConversationMessageAdmin(admin.ModelAdmin):
         "meta",
         "created_at",
     )
+
+
+@admin.register(AiConversationSession)
+class AiConversationSessionAdmin(admin.ModelAdmin):
+    list_display = ("user", "session_id", "turn_count", "updated_at")
+    search_fields = ("user__username", "user__email", "session_id")
+    readonly_fields = ("user", "session_id", "summary", "turn_count", "updated_at")
@@ -10,6 +10,7 @@ from django.utils.dateparse import parse_date
 from django.conf import settings
 
 import hydro_data_repository
+from ai_tools.data_sources.rainfall_stats import RainfallMatrix
 from thongsothuyvan.models import SongHinhRealtimeSnapshot, VinhSonRealtimeSnapshot
 
 
@@ -155,9 +156,14 @@ def _rainfall_stats(start_date=None, end_date=None, reservoir=None, stations=Non
         limit=limit,
     )
     selected = _station_list(reservoir, stations)
+    summary = RainfallMatrix.from_records(rows, selected).station_summary()
     result_rows = []
     for station in selected:
-        result_rows.append((station, _stats(row.get(station) for row in rows), "mm"))
+        stat = summary[station]
+        if not stat["count"]:
+            result_rows.append((station, _stats([]), "mm"))
+            continue
+        result_rows.append((station, {key: stat[key] for key in ("count", "total", "avg", "min", "max", "stdev")}, "mm"))
     return rows, result_rows, selected
 
 
@@ -182,7 +188,7 @@ def _realtime_queryset(reservoir=None, start_date=None, end_date=None, limit=300
     start, end = _date_bounds(start_date, end_date)
     factory = _factory_key(reservoir)
     model = VinhSonRealtimeSnapshot if factory == "vinhson" else SongHinhRealtimeSnapshot
-    qs = model.objects.all().order_by("-time_stamp")
+    qs = model.objects.defer("raw_data").order_by("-time_stamp")
     if start:
         qs = qs.filter(time_stamp__gte=_aware_start(start))
     if end:
@@ -3,6 +3,11 @@ from .db_stats import (
     DbBackedWorksheet,
     build_songhinh_stats_rows,
     build_vinhson_stats_rows,
+    group_values_by_month,
+)
+from .rainfall_stats import (
+    RAINY_DAY_THRESHOLD_MM,
+    RainfallMatrix,
 )
 
 __all__ = [
@@ -10,4 +15,7 @@ __all__ = [
     "DbBackedWorksheet",
     "build_songhinh_stats_rows",
     "build_vinhson_stats_rows",
+    "group_values_by_month",
+    "RAINY_DAY_THRESHOLD_MM",
+    "RainfallMatrix",
 ]
@@ -151,6 +151,24 @@ def build_vinhson_stats_rows() -> List[List[str]]:
     return rows
 
 
+def group_values_by_month(rows, parse_date, extract_value) -> Dict[tuple, List[float]]:
+    """Bucket the values of a stats column by ``(year, month)`` in one pass over ``rows``.
+
+    ``parse_date(row)`` returns the row date (or None) and ``extract_value(row)`` the
+    numeric value (or None). Monthly and yearly statistics then read their buckets
+    instead of rescanning every row once per month and year.
+    """
+    buckets: Dict[tuple, List[float]] = defaultdict(list)
+    for row in rows:
+        day = parse_date(row)
+        if not day:
+            continue
+        value = extract_value(row)
+        if value is not None:
+            buckets[(day.year, day.month)].append(value)
+    return buckets
+
+
 def make_songhinh_stats_spreadsheet() -> DbBackedSpreadsheet:
     return DbBackedSpreadsheet(
         title="DB Stats - Song Hinh",
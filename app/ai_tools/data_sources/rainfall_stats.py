@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Ngay co mua theo quy uoc khi tuong: luong mua ngay tu 0.1 mm tro len.
+RAINY_DAY_THRESHOLD_MM = 0.1
+SUMMARY_PERCENTILES = (50, 90, 95)
+DAY_UNIT = "datetime64[D]"
+PERIOD_UNITS = {
+    "day": DAY_UNIT,
+    "month": "datetime64[M]",
+    "year": "datetime64[Y]",
+}
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        try:
+            return float(str(value).replace(",", "."))
+        except ValueError:
+            return None
+
+
+def _python_key(period: str, value):
+    moment = value.astype(object)
+    if period == "month":
+        return moment.year, moment.month
+    if period == "year":
+        return moment.year
+    return moment
+
+
+def _end_exclusive(end):
+    end = np.datetime64(end)
+    return end + np.timedelta64(1, np.datetime_data(end.dtype)[0])
+
+
+class RainfallMatrix:
+    """Luong mua ngay dang mang (ngay x tram); NaN la khong co so lieu.
+
+    ``times`` tang dan va khong trung lap. Moi phep tong hop
+    (theo ky, tong/lon nhat/so ngay mua/phan vi) chay tren mang
+    NumPy, nen so sanh nhieu nam chi ton vai mili giay sau khi nap du lieu.
+    """
+
+    def __init__(self, times, stations: Sequence[str], values):
+        self.times = np.asarray(times)
+        self.stations = tuple(stations)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.times), len(self.stations))
+
+    @classmethod
+    def _combine(
+        cls,
+        times: List,
+        stations: Sequence[str],
+        rows: List[List[Optional[float]]],
+        keep_first: bool = False,
+    ) -> "RainfallMatrix":
+        dtype = DAY_UNIT
+        if not times:
+            return cls(np.array([], dtype=dtype), stations, np.empty((0, len(stations))))
+
+        values = np.array(
+            [[np.nan if value is None else value for value in row] for row in rows],
+            dtype=np.float64,
+        ).reshape(len(times), len(stations))
+        if keep_first:
+            # np.unique tra ve vi tri xuat hien dau tien cua moi moc thoi gian.
+            unique, first = np.unique(np.array(times, dtype=dtype), return_index=True)
+            return cls(unique, stations, values[first])
+        unique, inverse = np.unique(np.array(times, dtype=dtype), return_inverse=True)
+        sums = np.zeros((len(unique), len(stations)))
+        counts = np.zeros((len(unique), len(stations)), dtype=np.int64)
+        # Ban ghi trung moc thoi gian duoc cong don nhu cac bao cao cu.
+        np.add.at(sums, inverse, np.nan_to_num(values))
+        np.add.at(counts, inverse, ~np.isnan(values))
+        return cls(unique, stations, np.where(counts > 0, sums, np.nan))
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[dict],
+        stations: Sequence[str],
+        time_key: str = "Thoi_gian",
+        parse_value: Optional[Callable] = None,
+        keep_first: bool = False,
+    ) -> "RainfallMatrix":
+        """Dung tu cac dong dang ``query_rainfall_data`` (``Thoi_gian`` = "YYYY-MM-DD").
+
+        Ban ghi trung ngay duoc cong don; ``keep_first=True`` chi lay ban ghi dau tien.
+        """
+        parse_value = parse_value or _to_float
+        times, rows = [], []
+        for record in records:
+            raw = record.get(time_key)
+            if not raw:
+                continue
+            try:
+                moment = np.datetime64(raw, "D")
+            except (TypeError, ValueError):
+                continue
+            times.append(moment)
+            rows.append([parse_value(record.get(station)) for station in stations])
+        return cls._combine(times, stations, rows, keep_first=keep_first)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def window(self, start=None, end=None) -> "RainfallMatrix":
+        """Cat theo khoang ``start``..``end`` (bao gom ca hai dau, nhan date hoac datetime)."""
+        mask = np.ones(len(self.times), dtype=bool)
+        if start is not None:
+            mask &= self.times >= np.datetime64(start)
+        if end is not None:
+            mask &= self.times < _end_exclusive(end)
+        return RainfallMatrix(self.times[mask], self.stations, self.values[mask])
+
+    def _period_starts(self, period: str):
+        keys = self.times.astype(PERIOD_UNITS[period])
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        return keys[starts], starts
+
+    def sum_by(self, period: str):
+        """``(keys, sums, counts)``: tong va so moc co so lieu cua tung ky x tram."""
+        keys, starts = self._period_starts(period)
+        if not len(starts):
+            empty = np.empty((0, len(self.stations)))
+            return keys, empty, empty.astype(np.int64)
+        sums = np.add.reduceat(np.nan_to_num(self.values), starts, axis=0)
+        counts = np.add.reduceat((~np.isnan(self.values)).astype(np.int64), starts, axis=0)
+        return keys, sums, counts
+
+    def totals_by(self, period: str) -> Dict[object, Dict[str, Optional[float]]]:
+        """``{ky: {tram: tong hoac None}}``; ky la date (ngay), (nam, thang) hoac nam."""
+        keys, sums, counts = self.sum_by(period)
+        result = {}
+        for index, key in enumerate(keys):
+            result[_python_key(period, key)] = {
+                station: float(sums[index, column]) if counts[index, column] else None
+                for column, station in enumerate(self.stations)
+            }
+        return result
+
+    def grand_totals_by(self, period: str) -> Dict[object, Optional[float]]:
+        """Tong tat ca tram cua tung ky; None neu ky khong co so lieu nao."""
+        keys, sums, counts = self.sum_by(period)
+        totals = sums.sum(axis=1)
+        present = counts.sum(axis=1) > 0
+        return {
+            _python_key(period, key): float(totals[index]) if present[index] else None
+            for index, key in enumerate(keys)
+        }
+
+    def station_summary(
+        self,
+        threshold: float = RAINY_DAY_THRESHOLD_MM,
+        percentiles: Sequence[float] = SUMMARY_PERCENTILES,
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        """Dac trung mua ngay cua tung tram.
+
+        Gom so ngay co so lieu, tong, trung binh, nho/lon nhat, do lech chuan, so
+        ngay mua (>= ``threshold``) va cac phan vi ``pXX`` tinh tren ngay co mua.
+        """
+        values = self.values
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        rainy = np.where(present & (np.nan_to_num(values) >= threshold), values, np.nan)
+        rainy_days = (~np.isnan(rainy)).sum(axis=0)
+
+        with np.errstate(invalid="ignore"):
+            totals = np.nansum(values, axis=0)
+            means = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+            filled_min = np.where(present, values, np.inf).min(axis=0, initial=np.inf)
+            filled_max = np.where(present, values, -np.inf).max(axis=0, initial=-np.inf)
+            deviations = np.where(present, values - means, 0.0)
+            stdevs = np.sqrt(np.divide((deviations ** 2).sum(axis=0), counts, out=np.zeros_like(totals), where=counts > 0))
+            quantiles = {}
+            for q in percentiles:
+                quantiles[q] = np.full(len(self.stations), np.nan)
+                columns = rainy_days > 0
+                if columns.any():
+                    quantiles[q][columns] = np.nanpercentile(rainy[:, columns], q, axis=0)
+
+        summary = {}
+        for column, station in enumerate(self.stations):
+            has_data = bool(counts[column])
+            row = {
+                "count": int(counts[column]),
+                "total": float(totals[column]) if has_data else None,
+                "avg": float(means[column]) if has_data else None,
+                "min": float(filled_min[column]) if has_data else None,
+                "max": float(filled_max[column]) if has_data else None,
+                "stdev": float(stdevs[column]) if has_data else None,
+                "rainy_days": int(rainy_days[column]),
+            }
+            for q, values_q in quantiles.items():
+                row[f"p{q:g}"] = None if np.isnan(values_q[column]) else float(values_q[column])
+            summary[station] = row
+        return summary
+
@@ -1178,15 +1178,6 @@ def build_leadership_hydrology_report(report_date):
 """.strip()
 
 
-def _month_bounds(year, month):
-    start_date = datetime(year, month, 1).date()
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-    else:
-        end_date = datetime(year, month + 1, 1).date() - timedelta(days=1)
-    return start_date, end_date
-
-
 def _format_participation_pct(thuc_hien, qc):
     if thuc_hien is None or qc is None or qc <= 0:
         return "-"
@@ -1208,7 +1199,8 @@ def _format_monthly_production_plan_row(plant_name, qkh, qc_month, thuc_hien, pc
 
 
 def build_leadership_monthly_production_plan_report(year, month, plant_codes=None):
-    from thongsothuyvan.models import ThongSoThuyVanCaiDat, ThongsoSanxuat
+    from thongsothuyvan.aggregate_services import get_monthly_aggregates
+    from thongsothuyvan.models import ThongSoThuyVanCaiDat
 
     selected_plants = [
         (plant_code, plant_name)
@@ -1219,7 +1211,6 @@ def build_leadership_monthly_production_plan_report(year, month, plant_codes=Non
         selected_plants = list(LEADERSHIP_PRODUCTION_PLANTS)
 
     selected_codes = [plant_code for plant_code, _ in selected_plants]
-    start_date, end_date = _month_bounds(year, month)
 
     monthly_settings = {
         record.nha_may: record.sanluong_kehoach_thang
@@ -1232,17 +1223,11 @@ def build_leadership_monthly_production_plan_report(year, month, plant_codes=Non
         if record.sanluong_kehoach_thang is not None
     }
 
-    latest_records = {}
-    for plant_code in selected_codes:
-        latest_records[plant_code] = (
-            ThongsoSanxuat.objects.filter(
-                nha_may=plant_code,
-                thoi_gian__date__gte=start_date,
-                thoi_gian__date__lte=end_date,
-            )
-            .order_by("-thoi_gian", "-id")
-            .first()
-        )
+    aggregates = get_monthly_aggregates(selected_codes, [(year, month)])
+    latest_records = {
+        plant_code: getattr(aggregates.get((plant_code, year, month)), "ban_ghi_cuoi", None)
+        for plant_code in selected_codes
+    }
 
     rows = []
     total_qkh = None
@@ -1313,7 +1298,8 @@ def _production_plan_chart_block(chart_rows, title):
 
 
 def build_leadership_year_to_date_production_plan_report(year, end_month, plant_codes=None):
-    from thongsothuyvan.models import ThongSoThuyVanCaiDat, ThongsoSanxuat
+    from thongsothuyvan.aggregate_services import get_monthly_aggregates
+    from thongsothuyvan.models import ThongSoThuyVanCaiDat
 
     selected_plants = [
         (plant_code, plant_name)
@@ -1338,19 +1324,12 @@ def build_leadership_year_to_date_production_plan_report(year, end_month, plant_
         if record.sanluong_kehoach_thang is not None
     }
 
-    latest_records = {}
-    for plant_code in selected_codes:
-        for month in range(1, end_month + 1):
-            start_date, end_date = _month_bounds(year, month)
-            latest_records[(plant_code, month)] = (
-                ThongsoSanxuat.objects.filter(
-                    nha_may=plant_code,
-                    thoi_gian__date__gte=start_date,
-                    thoi_gian__date__lte=end_date,
-                )
-                .order_by("-thoi_gian", "-id")
-                .first()
-            )
+    aggregates = get_monthly_aggregates(selected_codes, [(year, month) for month in range(1, end_month + 1)])
+    latest_records = {
+        (plant_code, month): getattr(aggregates.get((plant_code, year, month)), "ban_ghi_cuoi", None)
+        for plant_code in selected_codes
+        for month in range(1, end_month + 1)
+    }
 
     rows = []
     total_qkh = None
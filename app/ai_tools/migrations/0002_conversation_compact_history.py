@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_tools', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiconversationmessage',
+            name='compact_content',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='AiConversationSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=100)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('turn_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ai_conversation_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Phien tro ly AI',
+                'verbose_name_plural': 'Phien tro ly AI',
+                'constraints': [models.UniqueConstraint(fields=('user', 'session_id'), name='ai_tools_unique_user_session')],
+            },
+        ),
+    ]
@@ -18,6 +18,7 @@ class AiConversationMessage(models.Model):
     session_id = models.CharField(max_length=100, db_index=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     content = models.TextField()
+    compact_content = models.TextField(blank=True, default="")
     model = models.CharField(max_length=100, blank=True, default="")
     total_tokens = models.PositiveIntegerField(default=0)
     cost_usd = models.DecimalField(max_digits=12, decimal_places=6, default=0)
@@ -36,3 +37,25 @@ class AiConversationMessage(models.Model):
 
     def __str__(self):
         return f"{self.user} {self.session_id} {self.role}"
+
+
+class AiConversationSession(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="ai_conversation_sessions",
+    )
+    session_id = models.CharField(max_length=100)
+    summary = models.TextField(blank=True, default="")
+    turn_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Phien tro ly AI"
+        verbose_name_plural = "Phien tro ly AI"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "session_id"], name="ai_tools_unique_user_session"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.session_id}"
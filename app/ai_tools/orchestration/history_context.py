@@ -1,6 +1,6 @@
 import re
 
-from ..storage import get_conversation
+from ..storage import get_conversation, get_session_summary
 from .text import normalize_text
 
 
@@ -10,6 +10,8 @@ MODEL_USER_HISTORY_MAX_CHARS = 1200
 MODEL_ASSISTANT_HISTORY_MAX_CHARS = 2600
 HISTORY_TABLE_MAX_LINES = 10
 HISTORY_TABLE_KEEP_ROWS = 4
+SESSION_SUMMARY_MAX_TURNS = 12
+SESSION_SUMMARY_LINE_CHARS = 160
 
 CONTEXT_DEPENDENT_KEYWORDS = (
     "tiep",
@@ -160,6 +162,38 @@ def truncate_text(value, max_chars):
     return text[:max_chars].rstrip() + "\n...[đã rút gọn nội dung cũ để tránh vượt giới hạn token]"
 
 
+def compact_message_content(role, content):
+    max_chars = MODEL_USER_HISTORY_MAX_CHARS if role == "user" else MODEL_ASSISTANT_HISTORY_MAX_CHARS
+    return truncate_text(content, max_chars)
+
+
+def _summary_line_text(text):
+    for line in str(text or "").splitlines():
+        line = line.strip().lstrip("#*-> ").strip()
+        if line and not is_markdown_table_line(line):
+            line = " ".join(line.split())
+            if len(line) > SESSION_SUMMARY_LINE_CHARS:
+                line = line[:SESSION_SUMMARY_LINE_CHARS].rstrip() + "..."
+            return line
+    return ""
+
+
+def roll_session_summary(summary, user_message, assistant_compact):
+    """Append one line per turn and keep only the latest SESSION_SUMMARY_MAX_TURNS lines."""
+    lines = [line for line in str(summary or "").splitlines() if line.strip()]
+    lines.append(f"- Hỏi: {_summary_line_text(user_message)} | Đáp: {_summary_line_text(assistant_compact)}")
+    return "\n".join(lines[-SESSION_SUMMARY_MAX_TURNS:])
+
+
+def earlier_turns_summary(summary):
+    """Summary lines for the turns that already fell out of the MODEL_HISTORY_LIMIT window."""
+    lines = [line for line in str(summary or "").splitlines() if line.strip()]
+    earlier = lines[:-(MODEL_HISTORY_LIMIT // 2)]
+    if not earlier:
+        return ""
+    return "Tóm tắt các lượt hỏi đáp trước đó trong phiên:\n" + "\n".join(earlier)
+
+
 def compact_history_for_model(history):
     compacted = []
     total_chars = 0
@@ -167,8 +201,7 @@ def compact_history_for_model(history):
         role = item.get("role")
         if role not in {"user", "assistant"}:
             continue
-        max_chars = MODEL_USER_HISTORY_MAX_CHARS if role == "user" else MODEL_ASSISTANT_HISTORY_MAX_CHARS
-        content = truncate_text(item.get("content", ""), max_chars)
+        content = item.get("compact_content") or compact_message_content(role, item.get("content", ""))
         if not content:
             continue
         if total_chars + len(content) > MODEL_HISTORY_CHAR_BUDGET and compacted:
@@ -220,11 +253,22 @@ def question_seems_context_dependent(message):
     return False
 
 
-def history_for_model(user, session_id, message):
-    history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT)
+def history_for_model(user, session_id, message, history=None):
+    """Build model context from compact contents stored at save time.
+
+    ``history`` is the turn's already-loaded ``get_conversation(..., include_compact=True)``
+    result, so callers that read history for menu handling do not query it again.
+    """
+    if not question_seems_context_dependent(message):
+        return []
+    if history is None:
+        history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT, include_compact=True)
     if not history:
         return []
 
-    if question_seems_context_dependent(message):
-        return compact_history_for_model(history)
-    return []
+    compacted = compact_history_for_model(history)
+    if len(history) >= MODEL_HISTORY_LIMIT:
+        summary = earlier_turns_summary(get_session_summary(user, session_id))
+        if summary:
+            compacted.insert(0, {"role": "system", "content": summary})
+    return compacted
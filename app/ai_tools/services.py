@@ -582,7 +582,7 @@ def run_ai_chat(*, user, content, session_id=None, provider=None, model=""):
     title = _clean_display_text(getattr(profile, "chuc_danh", "") if profile else "")
     is_leader = is_leadership_title(title)
 
-    menu_history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT)
+    menu_history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT, include_compact=True)
     actual_water_level_request = get_actual_water_level_request(content, menu_history)
     if actual_water_level_request and not is_leader:
         assistant_message = (
@@ -852,7 +852,7 @@ def run_ai_chat(*, user, content, session_id=None, provider=None, model=""):
 
     chat_content = {
         "text": content_for_model,
-        "history": _history_for_model(user, session_id, content_for_model),
+        "history": _history_for_model(user, session_id, content_for_model, history=menu_history),
     }
 
     assistant_message, tools_called, prompt_tokens, completion_tokens, total_tokens = _run_openai_chat(
@@ -1160,7 +1160,7 @@ def run_ai_chat_stream(*, user, content, session_id=None, provider=None, model="
     title = _clean_display_text(getattr(profile, "chuc_danh", "") if profile else "")
     is_leader = is_leadership_title(title)
 
-    menu_history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT)
+    menu_history = get_conversation(user, session_id, limit=MODEL_HISTORY_LIMIT, include_compact=True)
     actual_water_level_request = get_actual_water_level_request(content, menu_history)
     if actual_water_level_request and not is_leader:
         assistant_message = (
@@ -1420,7 +1420,7 @@ def run_ai_chat_stream(*, user, content, session_id=None, provider=None, model="
 
     chat_content = {
         "text": content_for_model,
-        "history": _history_for_model(user, session_id, content_for_model),
+        "history": _history_for_model(user, session_id, content_for_model, history=menu_history),
     }
 
     assistant_message = ""
@@ -84,91 +84,19 @@ def get_month_data(
 
 
 def get_output_month(manager, year: int, month: int) -> Optional[float]:
-    """Lấy sản lượng điện thương phẩm tháng từ Google Sheets sản lượng Sông Hinh.
-    Lấy ngày cuối cùng của tháng (dòng cuối cùng trong tháng)."""
-    try:
-        # Dùng spreadsheet_id (sheet Sản lượng) cho Sông Hinh
-        # ID: 1P_yKjS0FkAwWPjwgvEB0NosVu9ic-lAF0aseZh1o2EM
-        spreadsheet = manager.get_write_spreadsheet(GS_CONFIG.spreadsheet_id)
-        if not spreadsheet:
-            print(f"[DEBUG] get_output_month SH: no spreadsheet")
-            return None
-
-        worksheets = spreadsheet.worksheets()
-        print(f"[DEBUG] get_output_month SH: worksheets = {[ws.title for ws in worksheets]}")
-
-        op_ws = None
-        for ws in worksheets:
-            if "Sản lượng" in ws.title:
-                op_ws = ws
-                print(f"[DEBUG] get_output_month SH: found sheet 'Sản lượng'")
-                break
-
-        op_ws = op_ws or (worksheets[0] if worksheets else None)
-        if not op_ws:
-            print(f"[DEBUG] get_output_month SH: no worksheet found")
-            return None
-
-        all_data = op_ws.get_all_values()
-        print(f"[DEBUG] get_output_month SH: rows = {len(all_data)}, looking for {month}/{year}")
-
-        # Column indices for Sông Hinh production sheet (1P_yKjS0FkAwWPjwgvEB0NosVu9ic-lAF0aseZh1o2EM)
-        # Cột A (index 0): Ngày
-        # Cột N (index 13): Sản lượng điện thương phẩm tháng
-
-        print(
-            f"[DEBUG] get_output_month SH: COL_DATE={OP_COLS.COL_DATE}, "
-            f"COL_OUTPUT_MONTH={OP_COLS.COL_COMMERCIAL_MONTH}"
-        )
-
-        # Tìm dòng bắt đầu dữ liệu thực (bỏ qua header, quy ước, v.v.)
-        data_start_row = find_data_start_row(all_data)
-        data_rows = all_data[data_start_row:] if data_start_row < len(all_data) else []
-
-        # Tìm tất cả các dòng trong tháng, lấy dòng cuối cùng (ngày cuối tháng)
-        last_row_for_month = None
-        last_date = None
-
-        # Tìm dòng dữ liệu - check column A for date
-        for row in data_rows:
-            if len(row) <= OP_COLS.COL_DATE:
-                continue
-
-            # Check column A for date (index 0)
-            cell_str = (
-                str(row[OP_COLS.COL_DATE]).strip()
-                if len(row) > OP_COLS.COL_DATE
-                else ""
-            )
-            dt = normalize_date(cell_str)
-            if dt and dt.year == year and dt.month == month:
-                # Lấy dòng có ngày lớn nhất (ngày cuối tháng)
-                if last_date is None or dt.day > last_date.day:
-                    last_date = dt
-                    last_row_for_month = row
-
-        if last_row_for_month:
-            print(
-                f"[DEBUG] get_output_month SH: found row for {month}/{year} "
-                f"(last day {last_date.day})"
-            )
-            print(f"[DEBUG] get_output_month SH: row = {last_row_for_month[:20]}")
-
-            # Cột sản lượng thương phẩm tháng
-            if len(last_row_for_month) > OP_COLS.COL_COMMERCIAL_MONTH:
-                val = parse_number(last_row_for_month[OP_COLS.COL_COMMERCIAL_MONTH])
-                print(
-                    f"[DEBUG] get_output_month SH: "
-                    f"COL_OUTPUT_MONTH={OP_COLS.COL_COMMERCIAL_DAY}, "
-                    f"value = '{last_row_for_month[OP_COLS.COL_COMMERCIAL_MONTH]}', "
-                    f"parsed = {val}"
-                )
-                if val:
-                    return val
+    """Lấy sản lượng điện thương phẩm tháng (cột R) của dòng sản xuất cuối cùng trong tháng.
+    Đọc từ bảng tổng hợp tháng thay vì quét toàn bộ dòng ngày; ``manager`` giữ lại cho các nơi gọi cũ."""
+    from thongsothuyvan.aggregate_services import get_monthly_aggregates
 
+    try:
+        aggregate = get_monthly_aggregates(["songhinh"], [(year, month)]).get(("songhinh", year, month))
     except Exception as e:
         print(f"[WARN] Lỗi lấy sản lượng: {e}")
+        return None
 
+    latest_record = aggregate.ban_ghi_cuoi if aggregate else None
+    if latest_record and latest_record.cot_r:
+        return latest_record.cot_r
     return None
 
 
@@ -7,6 +7,7 @@ _NBSP = "\u00a0"
 from datetime import datetime, timedelta
 from typing import Optional, List, Any, Tuple
 import json
+from ai_tools.data_sources.db_stats import group_values_by_month
 from ..config.settings import GS_CONFIG
 from ..core.sheets_client import get_sheets_client_manager
 from ..utils.numbers import safe_cell, parse_float_loose, normalize_mnh_value
@@ -153,16 +154,16 @@ class HierarchicalStatisticsService:
                 excel_rows.append([])
                 excel_rows.append([h.replace("**", "") for h in header])
 
+                monthly_values = group_values_by_month(
+                    rows,
+                    lambda r: parse_stats_date(safe_cell(r, col_date)),
+                    lambda r: extract_col_value(r, col, param),
+                )
+
                 for m in range(1, 13):
                     row_cells = [f"**Tháng {m}**"]
                     for y in years:
-                        vals: List[float] = []
-                        for r in rows:
-                            dt = parse_stats_date(safe_cell(r, col_date))
-                            if dt and dt.year == y and dt.month == m:
-                                v = extract_col_value(r, col, param)
-                                if v is not None:
-                                    vals.append(v)
+                        vals = monthly_values.get((y, m), [])
                         if vals:
                             if param == "qve":
                                 min_val = min(vals)
@@ -183,13 +184,7 @@ class HierarchicalStatisticsService:
                 if compare and len(years) > 1:
                     year_avgs = {}
                     for y in years:
-                        year_vals = []
-                        for r in rows:
-                            dt = parse_stats_date(safe_cell(r, col_date))
-                            if dt and dt.year == y:
-                                v = extract_col_value(r, col, param)
-                                if v is not None:
-                                    year_vals.append(v)
+                        year_vals = [v for m in range(1, 13) for v in monthly_values.get((y, m), [])]
                         if year_vals:
                             year_avgs[y] = sum(year_vals) / len(year_vals)
 
@@ -213,13 +208,7 @@ class HierarchicalStatisticsService:
                 for m in range(1, 13):
                     item = {"Thang": f"Tháng {m}"}
                     for y in years:
-                        vals = []
-                        for r in rows:
-                            dt = parse_stats_date(safe_cell(r, col_date))
-                            if dt and dt.year == y and dt.month == m:
-                                v = extract_col_value(r, col, param)
-                                if v is not None:
-                                    vals.append(v)
+                        vals = monthly_values.get((y, m), [])
                         item[str(y)] = round(sum(vals) / len(vals), 2) if vals else 0.0
                     chart_data.append(item)
 
@@ -3,11 +3,12 @@ Rainfall service - Get rainfall statistics for Sông Hinh
 """
 
 import calendar
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict, Tuple
 
 from ..utils.numbers import parse_float_loose
 from ..utils.dates import parse_date
+from ai_tools.data_sources.rainfall_stats import RainfallMatrix
 
 
 # Station column mapping
@@ -117,58 +118,22 @@ class RainfallService:
                 if not all_records:
                     return "Không có dữ liệu đo mưa"
 
-                # Monthly totals (current year) + per-station totals
-                monthly_totals: Dict[int, Optional[float]] = {}
-                monthly_station: Dict[int, Dict[str, float]] = {}
+                matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
 
-                for m in range(1, 13):
-                    total = 0.0
-                    has_data = False
-                    station_totals: Dict[str, float] = {}
-
-                    for rec in all_records:
-                        ds = rec.get("Thoi_gian", "")
-                        if not ds:
-                            continue
-                        try:
-                            dt = datetime.strptime(ds, "%Y-%m-%d")
-                        except Exception:
-                            continue
-                        if dt.year != year or dt.month != m:
-                            continue
-
-                        for col in station_columns:
-                            v = parse_float_loose(rec.get(col))
-                            if v is None:
-                                continue
-                            total += v
-                            has_data = True
-                            station_totals[col] = station_totals.get(col, 0.0) + v
-
-                    monthly_totals[m] = total if has_data else None
-                    monthly_station[m] = station_totals if has_data else {}
-
-                # Bảng 2: Tổng lượng mưa các trạm hằng tháng của năm hỏi và 2 năm liền kề (cùng 1 bảng)
-                monthly_total_by_year: Dict[Tuple[int, int], float] = {}
-                for m in range(1, 13):
-                    for yr in years:
-                        total = 0.0
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year != yr or dt.month != m:
-                                continue
-                            for c in station_columns:
-                                v = parse_float_loose(rec.get(c))
-                                if v is None:
-                                    continue
-                                total += v
-                        monthly_total_by_year[(m, yr)] = total
+                # Tổng từng trạm theo tháng của năm được hỏi (chỉ giữ trạm có số liệu)
+                station_by_month = matrix.window(date(year, 1, 1), date(year, 12, 31)).totals_by("month")
+                monthly_station: Dict[int, Dict[str, float]] = {
+                    m: {c: v for c, v in station_by_month.get((year, m), {}).items() if v is not None}
+                    for m in range(1, 13)
+                }
+
+                # Bảng 2: Tổng lượng mưa các trạm hằng tháng của năm hỏi và các năm liền kề (cùng 1 bảng)
+                totals_by_month = matrix.grand_totals_by("month")
+                monthly_total_by_year: Dict[Tuple[int, int], float] = {
+                    (m, yr): totals_by_month.get((yr, m)) or 0.0
+                    for m in range(1, 13)
+                    for yr in years
+                }
 
                 # Chỉ hiển thị chi tiết theo tháng cho năm được hỏi (không có tháng năm khác)
                 station_headers = [STATION_COLUMN_MAP[c] for c in station_columns]
@@ -296,24 +261,13 @@ class RainfallService:
                     return "Không có dữ liệu đo mưa"
 
                 # Bảng 1: Thống kê các trạm từ ngày 1 đến last_day (tháng/năm được hỏi)
+                matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
                 daily_data_by_station: Dict[str, List[float]] = {col: [0.0] * 31 for col in station_columns}
-                for rec in all_records:
-                    ds = rec.get("Thoi_gian", "")
-                    if not ds:
-                        continue
-                    try:
-                        dt = datetime.strptime(ds, "%Y-%m-%d")
-                    except Exception:
-                        continue
-                    if dt.year != year or dt.month != month:
-                        continue
-                    day_idx = dt.day - 1
-                    if day_idx < 0 or day_idx > 30:
-                        continue
-                    for col in station_columns:
-                        v = parse_float_loose(rec.get(col))
+                month_days = matrix.window(date(year, month, 1), date(year, month, last_day)).totals_by("day")
+                for day_value, per_station in month_days.items():
+                    for col, v in per_station.items():
                         if v is not None:
-                            daily_data_by_station[col][day_idx] += v
+                            daily_data_by_station[col][day_value.day - 1] = v
 
                 station_headers = [STATION_COLUMN_MAP[c] for c in station_columns]
                 header_row = "| Ngày | " + " | ".join(station_headers) + " | Tổng (mm) |"
@@ -340,24 +294,10 @@ class RainfallService:
                     result += f"| {' | '.join(row)} |\n"
 
                 # Bảng 2: Tổng lượng mưa năm được hỏi và 3 năm liền kề (theo tháng đó)
-                monthly_total_by_year: Dict[Tuple[int, int], float] = {}
-                for y in years:
-                    total = 0.0
-                    for rec in all_records:
-                        ds = rec.get("Thoi_gian", "")
-                        if not ds:
-                            continue
-                        try:
-                            dt = datetime.strptime(ds, "%Y-%m-%d")
-                        except Exception:
-                            continue
-                        if dt.year != y or dt.month != month:
-                            continue
-                        for c in station_columns:
-                            v = parse_float_loose(rec.get(c))
-                            if v is not None:
-                                total += v
-                    monthly_total_by_year[(month, y)] = total
+                totals_by_month = matrix.grand_totals_by("month")
+                monthly_total_by_year: Dict[Tuple[int, int], float] = {
+                    (month, y): totals_by_month.get((y, month)) or 0.0 for y in years
+                }
 
                 year_cols = " | ".join([f"{y} (mm)" for y in years])
                 result += f"""
@@ -456,7 +396,16 @@ class RainfallService:
                 if not all_records:
                     return "Không có dữ liệu đo mưa"
 
-                periods = [(year, ), (year - 1, ), (year - 2, )]
+                # Mỗi ngày chỉ lấy bản ghi đầu tiên (như bảng tuần cũ), không cộng dồn bản ghi trùng ngày
+                day_totals = RainfallMatrix.from_records(
+                    all_records, station_columns, parse_value=parse_float_loose, keep_first=True
+                ).grand_totals_by("day")
+
+                def week_day_total(y: int, d: int) -> Optional[float]:
+                    try:
+                        return day_totals.get(date(y, month, d))
+                    except ValueError:
+                        return None
 
                 result = f"""
 # 🌧️ Thống kê Lượng Mưa theo Ngày - Sông Hinh
@@ -472,47 +421,16 @@ class RainfallService:
                 for d in range(sd, min(ed + 1, 32)):
                     row = [f"**{d}/{month}**"]
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        has = False
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is None:
-                                        continue
-                                    total += v
-                                    has = True
-                                break
-                        row.append(f"{total:.1f}" if has else "-")
+                        total = week_day_total(y, d)
+                        row.append(f"{total:.1f}" if total is not None else "-")
                     result += f"| {' | '.join(row)} |\n"
 
                 week_chart_data = []
                 for d in range(sd, min(ed + 1, 32)):
                     item = {"Ngay": f"{d}/{month}"}
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is not None:
-                                        total += v
-                                break
-                        item[str(y)] = round(total, 1)
+                        total = week_day_total(y, d)
+                        item[str(y)] = round(total or 0.0, 1)
                     week_chart_data.append(item)
 
                 week_chart_json = {
@@ -536,24 +454,8 @@ class RainfallService:
                 for d in range(sd, min(ed + 1, 32)):
                     row = [f"{d}/{month}"]
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        has = False
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is not None:
-                                        total += v
-                                        has = True
-                                break
-                        row.append(round(total, 1) if has else "-")
+                        total = week_day_total(y, d)
+                        row.append(round(total, 1) if total is not None else "-")
                     excel_rows.append(row)
                 
                 excel_sheets.append({
@@ -621,35 +523,16 @@ class RainfallService:
                     m = 1
                     y += 1
 
-            monthly_totals: Dict[Tuple[int, int], Optional[float]] = {}
-            monthly_station: Dict[Tuple[int, int], Dict[str, float]] = {}
-
-            for (m, y) in months:
-                total = 0.0
-                has = False
-                per_station: Dict[str, float] = {}
-
-                for rec in all_records:
-                    ds = rec.get("Thoi_gian", "")
-                    if not ds:
-                        continue
-                    try:
-                        dt = datetime.strptime(ds, "%Y-%m-%d")
-                    except Exception:
-                        continue
-                    if dt.year != y or dt.month != m:
-                        continue
-
-                    for c in station_columns:
-                        v = parse_float_loose(rec.get(c))
-                        if v is None:
-                            continue
-                        total += v
-                        has = True
-                        per_station[c] = per_station.get(c, 0.0) + v
-
-                monthly_totals[(m, y)] = total if has else None
-                monthly_station[(m, y)] = per_station if has else {}
+            matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
+            totals_by_month = matrix.grand_totals_by("month")
+            station_by_month = matrix.totals_by("month")
+            monthly_totals: Dict[Tuple[int, int], Optional[float]] = {
+                (m, y): totals_by_month.get((y, m)) for (m, y) in months
+            }
+            monthly_station: Dict[Tuple[int, int], Dict[str, float]] = {
+                (m, y): {c: v for c, v in station_by_month.get((y, m), {}).items() if v is not None}
+                for (m, y) in months
+            }
 
             result = f"""
 ### 🌧️ Thống kê Lượng Mưa theo Tháng - Sông Hinh
@@ -793,25 +676,11 @@ class RainfallService:
                 return f"Không có dữ liệu đo mưa từ {start_date} đến {end_date}"
 
             # Tổ chức dữ liệu theo ngày
-            daily_data: Dict[str, Dict[str, float]] = {}  # {date: {station: value}}
-
-            for rec in all_records:
-                date_str = rec.get("Thoi_gian", "")
-                if not date_str:
-                    continue
-                try:
-                    rec_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    if start_dt <= rec_date <= end_dt:
-                        date_key = rec_date.strftime("%d/%m/%Y")
-                        if date_key not in daily_data:
-                            daily_data[date_key] = {}
-
-                        for col in station_columns:
-                            v = parse_float_loose(rec.get(col))
-                            if v is not None:
-                                daily_data[date_key][col] = daily_data[date_key].get(col, 0.0) + v
-                except (ValueError, TypeError):
-                    continue
+            matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
+            daily_data: Dict[str, Dict[str, float]] = {  # {date: {station: value}}
+                day_value.strftime("%d/%m/%Y"): {col: v for col, v in per_station.items() if v is not None}
+                for day_value, per_station in matrix.window(start_dt, end_dt).totals_by("day").items()
+            }
 
             if not daily_data:
                 return f"Không có dữ liệu đo mưa từ {start_date} đến {end_date}"
@@ -1,15 +1,26 @@
+from django.db import transaction
 from django.db.models import Max, OuterRef, Subquery
 
-from .models import AiConversationMessage
+from .models import AiConversationMessage, AiConversationSession
 
 
-def get_conversation(user, session_id, limit=20):
+def get_conversation(user, session_id, limit=20, include_compact=False):
+    fields = ["role", "content", "compact_content"] if include_compact else ["role", "content"]
     queryset = (
         AiConversationMessage.objects.filter(user=user, session_id=session_id)
-        .order_by("-created_at", "-id")[:limit]
+        .order_by("-created_at", "-id")
+        .values(*fields)[:limit]
+    )
+    return list(reversed(list(queryset)))
+
+
+def get_session_summary(user, session_id):
+    return (
+        AiConversationSession.objects.filter(user=user, session_id=session_id)
+        .values_list("summary", flat=True)
+        .first()
+        or ""
     )
-    rows = reversed(list(queryset))
-    return [{"role": row.role, "content": row.content} for row in rows]
 
 
 def save_exchange(
@@ -25,26 +36,38 @@ def save_exchange(
     latency_ms=0,
     meta=None,
 ):
-    AiConversationMessage.objects.create(
-        user=user,
-        session_id=session_id,
-        role=AiConversationMessage.ROLE_USER,
-        content=user_message,
-        model=model,
-        meta=meta or {},
-    )
-    AiConversationMessage.objects.create(
-        user=user,
-        session_id=session_id,
-        role=AiConversationMessage.ROLE_ASSISTANT,
-        content=assistant_message,
-        model=model,
-        total_tokens=total_tokens or 0,
-        cost_usd=cost_usd or 0,
-        tools_called=tools_called or 0,
-        latency_ms=int(latency_ms or 0),
-        meta=meta or {},
-    )
+    from .orchestration.history_context import compact_message_content, roll_session_summary
+
+    user_compact = compact_message_content(AiConversationMessage.ROLE_USER, user_message)
+    assistant_compact = compact_message_content(AiConversationMessage.ROLE_ASSISTANT, assistant_message)
+    with transaction.atomic():
+        AiConversationMessage.objects.create(
+            user=user,
+            session_id=session_id,
+            role=AiConversationMessage.ROLE_USER,
+            content=user_message,
+            compact_content=user_compact,
+            model=model,
+            meta=meta or {},
+        )
+        AiConversationMessage.objects.create(
+            user=user,
+            session_id=session_id,
+            role=AiConversationMessage.ROLE_ASSISTANT,
+            content=assistant_message,
+            compact_content=assistant_compact,
+            model=model,
+            total_tokens=total_tokens or 0,
+            cost_usd=cost_usd or 0,
+            tools_called=tools_called or 0,
+            latency_ms=int(latency_ms or 0),
+            meta=meta or {},
+        )
+        # Khoa dong phien de hai luot ghi dong thoi khong de mat tom tat hay turn_count cua nhau.
+        session, _ = AiConversationSession.objects.select_for_update().get_or_create(user=user, session_id=session_id)
+        session.summary = roll_session_summary(session.summary, user_message, assistant_compact)
+        session.turn_count += 1
+        session.save(update_fields=["summary", "turn_count", "updated_at"])
 
 
 def get_sessions(user, limit=50):
@@ -93,4 +116,5 @@ def delete_session(user, session_id):
         user=user,
         session_id=session_id,
     ).delete()
+    AiConversationSession.objects.filter(user=user, session_id=session_id).delete()
     return deleted
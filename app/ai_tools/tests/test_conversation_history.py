@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ai_tools.models import AiConversationMessage, AiConversationSession
+from ai_tools.orchestration.history_context import MODEL_HISTORY_LIMIT, history_for_model
+from ai_tools.storage import delete_session, get_conversation, save_exchange
+
+
+def _long_table(rows):
+    lines = ["| Ngay | Gia tri |", "| --- | --- |"]
+    lines.extend(f"| {index:02d}/07 | {index * 10} |" for index in range(rows))
+    return "\n".join(lines)
+
+
+class ConversationHistoryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="history-user",
+            email="history-user@example.com",
+            password="testpass123",
+        )
+
+    def test_save_exchange_stores_compact_assistant_content(self):
+        answer = "Bang san luong Song Hinh\n" + _long_table(40)
+        save_exchange(user=self.user, session_id="s1", user_message="San luong thang 7", assistant_message=answer)
+
+        assistant = AiConversationMessage.objects.get(role=AiConversationMessage.ROLE_ASSISTANT)
+        self.assertEqual(assistant.content, answer)
+        self.assertIn("Đã lược bỏ", assistant.compact_content)
+        self.assertLess(len(assistant.compact_content), len(answer))
+        session = AiConversationSession.objects.get(user=self.user, session_id="s1")
+        self.assertEqual(session.turn_count, 1)
+        self.assertIn("San luong thang 7", session.summary)
+
+    def test_save_exchange_writes_messages_and_summary_together(self):
+        save_exchange(user=self.user, session_id="s1", user_message="Nhiet do T1", assistant_message="OK")
+
+        with patch("ai_tools.orchestration.history_context.roll_session_summary", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                save_exchange(user=self.user, session_id="s1", user_message="Nhiet do T2", assistant_message="OK")
+
+        self.assertEqual(AiConversationMessage.objects.filter(session_id="s1").count(), 2)
+        self.assertEqual(AiConversationSession.objects.get(session_id="s1").turn_count, 1)
+
+    def test_history_for_model_reuses_loaded_history_without_recompacting(self):
+        save_exchange(user=self.user, session_id="s1", user_message="Nhiet do T1", assistant_message=_long_table(30))
+        history = get_conversation(self.user, "s1", limit=MODEL_HISTORY_LIMIT, include_compact=True)
+
+        with patch("ai_tools.orchestration.history_context.truncate_text") as truncate:
+            with self.assertNumQueries(0):
+                context = history_for_model(self.user, "s1", "còn T2 thì sao?", history=history)
+
+        truncate.assert_not_called()
+        self.assertEqual([item["role"] for item in context], ["user", "assistant"])
+        self.assertEqual(context[1]["content"], history[1]["compact_content"])
+
+    def test_legacy_rows_without_compact_content_are_compacted_on_read(self):
+        AiConversationMessage.objects.create(user=self.user, session_id="old", role="user", content="Nhiet do T1")
+        AiConversationMessage.objects.create(user=self.user, session_id="old", role="assistant", content=_long_table(30))
+
+        context = history_for_model(self.user, "old", "còn T2 thì sao?")
+
+        self.assertIn("Đã lược bỏ", context[1]["content"])
+
+    def test_long_session_prepends_summary_of_turns_outside_window(self):
+        for index in range(MODEL_HISTORY_LIMIT // 2 + 2):
+            save_exchange(
+                user=self.user,
+                session_id="s1",
+                user_message=f"Cau hoi so {index}",
+                assistant_message=f"Tra loi so {index}",
+            )
+
+        context = history_for_model(self.user, "s1", "còn T2 thì sao?")
+
+        self.assertEqual(context[0]["role"], "system")
+        self.assertIn("Cau hoi so 0", context[0]["content"])
+        self.assertIn("Cau hoi so 1", context[0]["content"])
+        self.assertNotIn("Cau hoi so 2", context[0]["content"])
+        self.assertEqual(len(context), MODEL_HISTORY_LIMIT + 1)
+
+    def test_standalone_question_skips_history_read(self):
+        save_exchange(user=self.user, session_id="s1", user_message="Nhiet do T1", assistant_message="OK")
+
+        with self.assertNumQueries(0):
+            context = history_for_model(self.user, "s1", "Phân tích nhiệt độ MBA T2 Sông Hinh")
+
+        self.assertEqual(context, [])
+
+    def test_delete_session_removes_summary(self):
+        save_exchange(user=self.user, session_id="s1", user_message="Nhiet do T1", assistant_message="OK")
+
+        self.assertEqual(delete_session(self.user, "s1"), 2)
+        self.assertFalse(AiConversationSession.objects.exists())
@@ -1,8 +1,9 @@
-from datetime import date
+from datetime import date, datetime
 from types import SimpleNamespace
 from unittest.mock import MagicMock, Mock, patch
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
 
 from ai_tools.songhinh_tools.config.columns import OP_COLS
 from ai_tools.songhinh_tools.services.forecast_service import (
@@ -13,7 +14,10 @@ from ai_tools.songhinh_tools.services.forecast_service import (
     get_output_month,
 )
 from ai_tools.songhinh_tools.services.hierarchical_service import HierarchicalStatisticsService as SongHinhHierarchy
+from ai_tools.vinhson_tools.services.forecast_service import get_output_month as vinhson_output_month
+from ai_tools.vinhson_tools.services.forecast_service import get_output_year as vinhson_output_year
 from ai_tools.vinhson_tools.services.hierarchical_service import HierarchicalStatisticsService as VinhSonHierarchy
+from thongsothuyvan.models import ThongsoSanxuat
 
 
 class SongHinhForecastHelperTests(SimpleTestCase):
@@ -25,27 +29,6 @@ class SongHinhForecastHelperTests(SimpleTestCase):
         self.assertEqual(find_data_start_row([["header", "x"]] * 8), 7)
         self.assertEqual(find_data_start_row([["header", "x"]]), 1)
 
-    def test_output_month_selects_latest_day_and_handles_failures(self):
-        size = OP_COLS.COL_COMMERCIAL_MONTH + 1
-        early = [""] * size
-        early[OP_COLS.COL_DATE] = "01/05/2026"
-        early[OP_COLS.COL_COMMERCIAL_MONTH] = "100"
-        late = [""] * size
-        late[OP_COLS.COL_DATE] = "31/05/2026"
-        late[OP_COLS.COL_COMMERCIAL_MONTH] = "300"
-        worksheet = Mock(title="production")
-        worksheet.get_all_values.return_value = [["header", "x"], early, late]
-        spreadsheet = Mock()
-        spreadsheet.worksheets.return_value = [worksheet]
-        manager = Mock()
-        manager.get_write_spreadsheet.return_value = spreadsheet
-        self.assertEqual(get_output_month(manager, 2026, 5), 300)
-
-        manager.get_write_spreadsheet.return_value = None
-        self.assertIsNone(get_output_month(manager, 2026, 5))
-        manager.get_write_spreadsheet.side_effect = RuntimeError("offline")
-        self.assertIsNone(get_output_month(manager, 2026, 5))
-
     def test_daily_data_combines_stats_and_production_sheets(self):
         stats_row = ["01/05/2026", "", "", "", "", "12"]
         size = max(OP_COLS.COL_COMMERCIAL_DAY, OP_COLS.COL_DATE) + 1
@@ -69,6 +52,25 @@ class SongHinhForecastHelperTests(SimpleTestCase):
         self.assertEqual(output, [(1, 1200)])
 
 
+class ForecastOutputAggregateTests(TestCase):
+    def test_songhinh_output_month_reads_latest_record_of_month(self):
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=timezone.make_aware(datetime(2026, 5, 1, 7)), cot_r=100)
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=timezone.make_aware(datetime(2026, 5, 31, 7)), cot_r=300)
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=timezone.make_aware(datetime(2026, 6, 1, 7)), cot_r=5)
+
+        self.assertEqual(get_output_month(Mock(), 2026, 5), 300)
+        self.assertIsNone(get_output_month(Mock(), 2025, 5))
+
+    def test_vinhson_output_sums_daily_terminal_output_by_month_and_year(self):
+        for day, cot_m in ((1, 10.0), (2, 15.0)):
+            ThongsoSanxuat.objects.create(nha_may="vinhson", thoi_gian=timezone.make_aware(datetime(2026, 5, day, 7)), cot_m=cot_m)
+        ThongsoSanxuat.objects.create(nha_may="vinhson", thoi_gian=timezone.make_aware(datetime(2026, 8, 1, 7)), cot_m=5.0)
+
+        self.assertEqual(vinhson_output_month(2026, 5), 25.0)
+        self.assertEqual(vinhson_output_year(2026), 30.0)
+        self.assertIsNone(vinhson_output_year(2025))
+
+
 class SongHinhForecastServiceTests(SimpleTestCase):
     @patch("ai_tools.songhinh_tools.services.forecast_service.get_daily_data_for_month")
     @patch("ai_tools.songhinh_tools.services.forecast_service.get_output_month")
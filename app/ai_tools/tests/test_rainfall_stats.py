@@ -0,0 +1,100 @@
+import statistics
+from datetime import date, datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+import hydro_data_repository
+from ai_tools.data_sources import RainfallMatrix
+from ai_tools.songhinh_tools.services.rainfall_service import RainfallService as RainfallServiceSH
+from thongsothuyvan.models import TramDoMuaVrain
+
+RECORDS = [
+    {"Thoi_gian": "2026-04-01", "UBND_xa_Song_Hinh": 10.0, "Cu_Kroa": None, "Ho_A_TD_Vinh_Son": 20.0},
+    {"Thoi_gian": "2026-04-02", "UBND_xa_Song_Hinh": "12.5", "Cu_Kroa": 0.0, "Ho_A_TD_Vinh_Son": 0.05},
+    {"Thoi_gian": "2026-05-03", "UBND_xa_Song_Hinh": 0.0, "Cu_Kroa": 4.0, "Ho_A_TD_Vinh_Son": None},
+    {"Thoi_gian": "2026-04-01", "UBND_xa_Song_Hinh": 1.0},
+    {"Thoi_gian": "2025-04-01", "UBND_xa_Song_Hinh": 8.0, "Cu_Kroa": 2.0},
+    {"Thoi_gian": "", "UBND_xa_Song_Hinh": 99.0},
+    {"Thoi_gian": "01/04/2026", "UBND_xa_Song_Hinh": 99.0},
+]
+STATIONS = ["UBND_xa_Song_Hinh", "Cu_Kroa", "Ho_A_TD_Vinh_Son"]
+
+
+def _local(year, month, day, hour=0):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class RainfallMatrixTests(TestCase):
+    def setUp(self):
+        self.matrix = RainfallMatrix.from_records(RECORDS, STATIONS)
+
+    def test_records_merge_duplicate_days_and_group_by_period(self):
+        self.assertEqual(len(self.matrix), 4)
+        self.assertEqual(
+            self.matrix.totals_by("month"),
+            {
+                (2025, 4): {"UBND_xa_Song_Hinh": 8.0, "Cu_Kroa": 2.0, "Ho_A_TD_Vinh_Son": None},
+                (2026, 4): {"UBND_xa_Song_Hinh": 23.5, "Cu_Kroa": 0.0, "Ho_A_TD_Vinh_Son": 20.05},
+                (2026, 5): {"UBND_xa_Song_Hinh": 0.0, "Cu_Kroa": 4.0, "Ho_A_TD_Vinh_Son": None},
+            },
+        )
+        self.assertEqual(self.matrix.grand_totals_by("year"), {2025: 10.0, 2026: 47.55})
+
+        april = self.matrix.window(date(2026, 4, 1), datetime(2026, 4, 1)).totals_by("day")
+        self.assertEqual(list(april), [date(2026, 4, 1)])
+        self.assertEqual(april[date(2026, 4, 1)]["UBND_xa_Song_Hinh"], 11.0)
+
+        first = RainfallMatrix.from_records(RECORDS, STATIONS, keep_first=True)
+        self.assertEqual(len(first), 4)
+        self.assertEqual(
+            first.totals_by("day")[date(2026, 4, 1)],
+            {"UBND_xa_Song_Hinh": 10.0, "Cu_Kroa": None, "Ho_A_TD_Vinh_Son": 20.0},
+        )
+
+    def test_station_summary_counts_rainy_days_and_percentiles(self):
+        summary = self.matrix.window(date(2026, 1, 1), date(2026, 12, 31)).station_summary()
+
+        song_hinh = summary["UBND_xa_Song_Hinh"]
+        self.assertEqual((song_hinh["count"], song_hinh["total"], song_hinh["max"], song_hinh["min"]), (3, 23.5, 12.5, 0.0))
+        self.assertEqual(song_hinh["rainy_days"], 2)
+        self.assertAlmostEqual(song_hinh["stdev"], statistics.pstdev([11.0, 12.5, 0.0]))
+        self.assertAlmostEqual(song_hinh["p90"], 12.35)
+        # 0.05 mm khong tinh la ngay mua.
+        self.assertEqual(summary["Ho_A_TD_Vinh_Son"]["rainy_days"], 1)
+        self.assertEqual(summary["Cu_Kroa"]["p50"], 4.0)
+
+        empty = RainfallMatrix.from_records([], STATIONS).station_summary()["Cu_Kroa"]
+        self.assertEqual((empty["count"], empty["total"], empty["rainy_days"], empty["p90"]), (0, None, 0, None))
+
+    def test_query_rainfall_data_keys_rows_by_local_day(self):
+        TramDoMuaVrain.objects.create(Thoi_gian=_local(2026, 4, 1), UBND_xa_Song_Hinh=5.0, Cu_Kroa=1.0)
+        TramDoMuaVrain.objects.create(Thoi_gian=_local(2026, 4, 2), UBND_xa_Song_Hinh=2.0)
+
+        rows = hydro_data_repository.query_rainfall_data("2026-04-01", "2026-04-02")
+
+        self.assertEqual([row["Thoi_gian"] for row in rows], ["2026-04-01", "2026-04-02"])
+        self.assertEqual(RainfallMatrix.from_records(rows, STATIONS).grand_totals_by("day")[date(2026, 4, 1)], 6.0)
+
+    def test_multi_year_month_totals_cover_every_month(self):
+        records = [
+            {"Thoi_gian": f"{year}-{month:02d}-{day:02d}", "UBND_xa_Song_Hinh": 1.0, "Cu_Kroa": 2.0}
+            for year in range(2006, 2027)
+            for month in range(1, 13)
+            for day in range(1, 29)
+        ]
+        matrix = RainfallMatrix.from_records(records, STATIONS)
+
+        totals = matrix.grand_totals_by("month")
+        self.assertEqual(len(totals), 21 * 12)
+        self.assertTrue(all(value == 84.0 for value in totals.values()))
+
+
+class RainfallServiceWeekTests(TestCase):
+    @patch("thuyvan_data_client.query_rainfall_data", return_value=RECORDS)
+    def test_week_report_takes_first_record_of_duplicate_day(self, _mock_rain):
+        report = RainfallServiceSH().get_rainfall_statistics(period_type="week", period_value="1/4/2026")
+
+        self.assertIn("| **1/4** | 10.0 | 10.0 | - |", report)
+        self.assertIn("| **2/4** | 12.5 | - | - |", report)
@@ -1,13 +1,16 @@
+from datetime import datetime
 from unittest.mock import patch
 from types import SimpleNamespace
 
-from django.test import SimpleTestCase
+from django.test import TestCase
+from django.utils import timezone
 
 from ai_tools.data_sources.db_stats import DbBackedSpreadsheet, DbBackedWorksheet
 from ai_tools.vinhson_tools.services.forecast_service import (
     ForecastServiceVS,
     get_daily_data_for_month_vinhson,
 )
+from thongsothuyvan.models import ThongsoSanxuat
 
 
 def _stats_rows():
@@ -57,8 +60,7 @@ FAKE_CONFIG = SimpleNamespace(
 )
 
 
-class VinhsonForecastTests(SimpleTestCase):
-    databases = {"default"}
+class VinhsonForecastTests(TestCase):
 
     @patch("ai_tools.vinhson_tools.services.forecast_service.GS_CONFIG", FAKE_CONFIG)
     @patch("ai_tools.vinhson_tools.services.forecast_service.get_stats_export_client", side_effect=_fake_stats_client)
@@ -71,6 +73,16 @@ class VinhsonForecastTests(SimpleTestCase):
     @patch("ai_tools.vinhson_tools.services.forecast_service.GS_CONFIG", FAKE_CONFIG)
     @patch("ai_tools.vinhson_tools.services.forecast_service.get_stats_export_client", side_effect=_fake_stats_client)
     def test_year_forecast_includes_output(self, _mock_client):
+        # San luong nam doc tu bang tong hop thang, tao lai cac dong cua _output_rows trong CSDL.
+        for hour, row in enumerate(_output_rows()[2:]):
+            day, month, year = (int(part) for part in row[1].split("/"))
+            ThongsoSanxuat.objects.create(
+                nha_may="vinhson",
+                thoi_gian=timezone.make_aware(datetime(year, month, day, 7, hour)),
+                cot_c=row[2],
+                cot_m=float(row[12]),
+            )
+
         result = ForecastServiceVS().forecast_year(2026)
 
         self.assertIn("SanLuong", result)
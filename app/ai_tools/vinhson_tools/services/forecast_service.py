@@ -106,41 +106,20 @@ def get_year_data_all_reservoirs(rows: List[list], year: int) -> Dict[str, float
     return result
 
 
-def get_output_month(year: int, month: int) -> Optional[float]:
-    """Lấy sản lượng điện thương phẩm tháng từ sheet Sản lượng."""
-    try:
-        _, spreadsheet = get_stats_export_client(GS_CONFIG.spreadsheet_id)
-        if not spreadsheet:
-            return None
+def _sum_output_months(months) -> Optional[float]:
+    from thongsothuyvan.aggregate_services import get_monthly_aggregates
 
-        worksheets = spreadsheet.worksheets()
-        op_ws = None
-        for ws in worksheets:
-            if "Sản lượng" in ws.title:
-                op_ws = ws
-                break
-        op_ws = op_ws or (worksheets[0] if worksheets else None)
-        if not op_ws:
-            return None
-
-        all_data = op_ws.get_all_values()
-        data_start_row = find_data_start_row(all_data)
-        data_rows = all_data[data_start_row:] if data_start_row < len(all_data) else []
-
-        total_output = 0.0
-        for row in data_rows:
-            if len(row) <= COL_DATE:
-                continue
-            raw = str(row[COL_DATE]).strip()
-            dt = normalize_date(raw)
-            if dt and dt.year == year and dt.month == month:
-                if len(row) > COL_OUTPUT_DAY:
-                    val = parse_number(_cell(row, COL_OUTPUT_DAY))
-                    if val is not None:
-                        total_output += val
+    aggregates = get_monthly_aggregates(["vinhson"], months)
+    total_output = sum(row.dau_cuc or 0.0 for row in aggregates.values())
+    if total_output > 0:
+        return total_output
+    return None
 
-        if total_output > 0:
-            return total_output
+
+def get_output_month(year: int, month: int) -> Optional[float]:
+    """Lấy tổng sản lượng đầu cực ngày (cột M) của tháng từ bảng tổng hợp tháng."""
+    try:
+        return _sum_output_months([(year, month)])
     except Exception as e:
         print(f"[WARN] Lỗi lấy sản lượng: {e}")
     return None
@@ -148,36 +127,7 @@ def get_output_month(year: int, month: int) -> Optional[float]:
 
 def get_output_year(year: int) -> Optional[float]:
     try:
-        _, spreadsheet = get_stats_export_client(GS_CONFIG.spreadsheet_id)
-        if not spreadsheet:
-            return None
-
-        worksheets = spreadsheet.worksheets()
-        op_ws = None
-        for ws in worksheets:
-            if "Sản lượng" in ws.title:
-                op_ws = ws
-                break
-        op_ws = op_ws or (worksheets[0] if worksheets else None)
-        if not op_ws:
-            return None
-
-        all_data = op_ws.get_all_values()
-        data_start_row = find_data_start_row(all_data)
-        data_rows = all_data[data_start_row:] if data_start_row < len(all_data) else []
-
-        total_output = 0.0
-        for row in data_rows:
-            if len(row) <= COL_DATE:
-                continue
-            dt = normalize_date(str(row[COL_DATE]).strip())
-            if dt and dt.year == year and len(row) > COL_OUTPUT_DAY:
-                value = parse_number(_cell(row, COL_OUTPUT_DAY))
-                if value is not None:
-                    total_output += value
-
-        if total_output > 0:
-            return total_output
+        return _sum_output_months([(year, month) for month in range(1, 13)])
     except Exception as e:
         print(f"[WARN] Lỗi lấy sản lượng năm: {e}")
     return None
@@ -7,6 +7,7 @@ _NBSP = "\u00a0"
 from datetime import datetime, timedelta
 from typing import Optional, List, Any, Tuple
 import json
+from ai_tools.data_sources.db_stats import group_values_by_month
 from ..config.settings import GS_CONFIG
 from ..core.stats_export_client import get_stats_export_client
 from ..core.retry import retry_with_backoff
@@ -348,6 +349,15 @@ class HierarchicalStatisticsService:
 
                     excel_rows.append(header_cols)
 
+                    monthly_values = {
+                        col: group_values_by_month(
+                            data_rows,
+                            lambda row: normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None),
+                            lambda row, col=col: extract_value(row, col),
+                        )
+                        for col in {col_a, col_b, col_c}
+                    }
+
                     chart_data = []
 
                     for month in range(1, 13):
@@ -356,14 +366,7 @@ class HierarchicalStatisticsService:
                         if compare and len(years_to_compare) > 1:
                             for col_idx_show in cols_to_show:
                                 for yr in years_to_compare:
-                                    month_values = []
-                                    for row in data_rows:
-                                        if len(row) > col_idx_show:
-                                            date = normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None)
-                                            if date and date.year == yr and date.month == month:
-                                                val = extract_value(row, col_idx_show)
-                                                if val is not None:
-                                                    month_values.append(val)
+                                    month_values = monthly_values[col_idx_show].get((yr, month), [])
                                     if month_values:
                                         min_val = min(month_values)
                                         max_val = max(month_values)
@@ -375,14 +378,7 @@ class HierarchicalStatisticsService:
                                         chart_item[str(yr)] = 0.0
                         else:
                             for col_idx_show in [col_a, col_b, col_c]:
-                                month_values = []
-                                for row in data_rows:
-                                    if len(row) > col_idx_show:
-                                        date = normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None)
-                                        if date and date.year == year and date.month == month:
-                                            val = extract_value(row, col_idx_show)
-                                            if val is not None:
-                                                month_values.append(val)
+                                month_values = monthly_values[col_idx_show].get((year, month), [])
                                 if month_values:
                                     min_val = min(month_values)
                                     max_val = max(month_values)
@@ -400,15 +396,7 @@ class HierarchicalStatisticsService:
                     if compare and len(years_to_compare) > 1:
                         for col_idx_show in cols_to_show:
                             for yr in years_to_compare:
-                                year_values = []
-                                for m in range(1, 13):
-                                    for row in data_rows:
-                                        if len(row) > col_idx_show:
-                                            date = normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None)
-                                            if date and date.year == yr and date.month == m:
-                                                val = extract_value(row, col_idx_show)
-                                                if val is not None:
-                                                    year_values.append(val)
+                                year_values = [val for m in range(1, 13) for val in monthly_values[col_idx_show].get((yr, m), [])]
                                 if year_values:
                                     avg_val = sum(year_values) / len(year_values)
                                     avg_row.append(f"{avg_val:.2f}")
@@ -417,15 +405,7 @@ class HierarchicalStatisticsService:
                                     avg_row.append("-")
                     else:
                         for col_idx_show in [col_a, col_b, col_c]:
-                            year_values = []
-                            for m in range(1, 13):
-                                for row in data_rows:
-                                    if len(row) > col_idx_show:
-                                        date = normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None)
-                                        if date and date.year == year and date.month == m:
-                                            val = extract_value(row, col_idx_show)
-                                            if val is not None:
-                                                year_values.append(val)
+                            year_values = [val for m in range(1, 13) for val in monthly_values[col_idx_show].get((year, m), [])]
                             if year_values:
                                 avg_val = sum(year_values) / len(year_values)
                                 avg_row.append(f"{avg_val:.2f}")
@@ -1000,6 +980,14 @@ class HierarchicalStatisticsService:
                 excel_rows.append(header_row)
 
                 chart_data = []
+                monthly_values = {
+                    col: group_values_by_month(
+                        data_rows,
+                        lambda row: normalize_date(row[col_date] if len(row) > col_date else None),
+                        lambda row, col=col: extract_value(row, col),
+                    )
+                    for col in (col_a, col_b, col_c)
+                }
 
                 for month in range(1, 13):
                     row_data = [f"**Tháng {month}**"]
@@ -1007,14 +995,7 @@ class HierarchicalStatisticsService:
                     chart_item = {"Thang": f"Tháng {month}"}
 
                     for res_label, col_idx in [("Hồ A", col_a), ("Hồ B", col_b), ("Hồ C", col_c)]:
-                        month_values = []
-                        for row in data_rows:
-                            if len(row) > col_idx:
-                                date = normalize_date(row[col_date] if col_date is not None and len(row) > col_date else None)
-                                if date and date.year == year and date.month == month:
-                                    val = extract_value(row, col_idx)
-                                    if val is not None:
-                                        month_values.append(val)
+                        month_values = monthly_values[col_idx].get((year, month), [])
                         if month_values:
                             min_val = min(month_values)
                             max_val = max(month_values)
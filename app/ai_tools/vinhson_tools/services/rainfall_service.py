@@ -4,11 +4,12 @@ Rainfall service - Get rainfall statistics for Vĩnh Sơn
 
 import calendar
 import json
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict, Tuple
 
 from ..utils.dates import parse_date
 from ..utils.numbers import parse_float_loose
+from ai_tools.data_sources.rainfall_stats import RainfallMatrix
 
 
 class RainfallService:
@@ -105,52 +106,22 @@ class RainfallService:
                     return f"Không có dữ liệu đo mưa cho {reservoir}"
                 print(f"[INFO] Loaded {len(all_records)} rainfall records for comparison", flush=True)
 
-                monthly_totals_current = {}
-                monthly_station_data = {}
-                for month in range(1, 13):
-                    total_rainfall = 0.0
-                    has_data = False
-                    station_totals = {}
-                    for record in all_records:
-                        try:
-                            date_str = record.get('Thoi_gian', '')
-                            if not date_str:
-                                continue
-                            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                            if date_obj.year == year and date_obj.month == month:
-                                for col in station_columns:
-                                    value = record.get(col)
-                                    val = parse_float_loose(value)
-                                    if val is not None:
-                                        total_rainfall += val
-                                        has_data = True
-                                        station_totals[col] = station_totals.get(col, 0.0) + val
-                        except Exception:
-                            pass
-                    monthly_totals_current[month] = total_rainfall if has_data else None
-                    monthly_station_data[month] = station_totals if has_data else {}
+                matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
+
+                # Tổng từng trạm theo tháng của năm được hỏi (chỉ giữ trạm có số liệu)
+                station_by_month = matrix.window(date(year, 1, 1), date(year, 12, 31)).totals_by("month")
+                monthly_station_data = {
+                    month: {col: val for col, val in station_by_month.get((year, month), {}).items() if val is not None}
+                    for month in range(1, 13)
+                }
 
                 # Bảng 2: Tổng lượng mưa các trạm hằng tháng (năm hỏi và N năm cùng kỳ)
-                monthly_total_by_year = {}  # (month, yr) -> total (tổng tất cả trạm)
-                for m in range(1, 13):
-                    for yr in years:
-                        total = 0.0
-                        for record in all_records:
-                            try:
-                                date_str = record.get('Thoi_gian', '')
-                                if not date_str:
-                                    continue
-                                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                                if date_obj.year != yr or date_obj.month != m:
-                                    continue
-                                for col in station_columns:
-                                    value = record.get(col)
-                                    val = parse_float_loose(value)
-                                    if val is not None:
-                                        total += val
-                            except Exception:
-                                pass
-                        monthly_total_by_year[(m, yr)] = total
+                totals_by_month = matrix.grand_totals_by("month")
+                monthly_total_by_year = {  # (month, yr) -> total (tổng tất cả trạm)
+                    (m, yr): totals_by_month.get((yr, m)) or 0.0
+                    for m in range(1, 13)
+                    for yr in years
+                }
 
                 # Chỉ hiển thị chi tiết theo tháng cho năm được hỏi (không có tháng 2024/2023)
                 station_headers = [STATION_COLUMN_MAP[col] for col in station_columns]
@@ -278,25 +249,13 @@ class RainfallService:
                     return f"Không có dữ liệu đo mưa cho tháng {month}/{year}"
 
                 # Bảng 1: Thống kê các trạm từ ngày 1 đến last_day (tháng/năm được hỏi)
+                matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
                 daily_data_by_station: Dict[str, List[float]] = {col: [0.0] * 31 for col in station_columns}
-                for rec in all_records:
-                    try:
-                        ds = rec.get("Thoi_gian", "")
-                        if not ds:
-                            continue
-                        dt = datetime.strptime(ds, "%Y-%m-%d")
-                        if dt.year != year or dt.month != month:
-                            continue
-                        day_idx = dt.day - 1
-                        if day_idx < 0 or day_idx > 30:
-                            continue
-                        for col_key in station_columns:
-                            v = rec.get(col_key)
-                            val = parse_float_loose(v)
-                            if val is not None:
-                                daily_data_by_station[col_key][day_idx] += val
-                    except Exception:
-                        pass
+                month_days = matrix.window(date(year, month, 1), date(year, month, last_day)).totals_by("day")
+                for day_value, per_station in month_days.items():
+                    for col_key, val in per_station.items():
+                        if val is not None:
+                            daily_data_by_station[col_key][day_value.day - 1] = val
 
                 station_headers = [STATION_COLUMN_MAP[col] for col in station_columns]
                 header_row = "| Ngày | " + " | ".join(station_headers) + " | Tổng (mm) |"
@@ -321,24 +280,10 @@ class RainfallService:
                     result += f"| {' | '.join(row)} |\n"
 
                 # Bảng 2: Tổng lượng mưa năm được hỏi và 3 năm liền kề (theo tháng đó)
-                monthly_total_by_year: Dict[Tuple[int, int], float] = {}
-                for y in years:
-                    total = 0.0
-                    for rec in all_records:
-                        try:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            dt = datetime.strptime(ds, "%Y-%m-%d")
-                            if dt.year == y and dt.month == month:
-                                for col_key in station_columns:
-                                    v = rec.get(col_key)
-                                    val = parse_float_loose(v)
-                                    if val is not None:
-                                        total += val
-                        except Exception:
-                            pass
-                    monthly_total_by_year[(month, y)] = total
+                totals_by_month = matrix.grand_totals_by("month")
+                monthly_total_by_year: Dict[Tuple[int, int], float] = {
+                    (month, y): totals_by_month.get((y, month)) or 0.0 for y in years
+                }
 
                 year_cols = " | ".join([f"{y} (mm)" for y in years])
                 result += f"""
@@ -436,6 +381,17 @@ class RainfallService:
                 if not all_records:
                     return "Không có dữ liệu đo mưa"
 
+                # Mỗi ngày chỉ lấy bản ghi đầu tiên (như bảng tuần cũ), không cộng dồn bản ghi trùng ngày
+                day_totals = RainfallMatrix.from_records(
+                    all_records, station_columns, parse_value=parse_float_loose, keep_first=True
+                ).grand_totals_by("day")
+
+                def week_day_total(y: int, d: int) -> Optional[float]:
+                    try:
+                        return day_totals.get(date(y, month, d))
+                    except ValueError:
+                        return None
+
                 result = f"""# Thống kê Lượng Mưa - Vĩnh Sơn
 *So sánh tuần {week_num} tháng {month} qua 3 năm:* {year}, {year-1}, {year-2}
 *Số trạm:* {len(station_columns)} trạm
@@ -446,46 +402,16 @@ class RainfallService:
                 for d in range(sd, min(ed + 1, 32)):
                     row = [f"**{d}/{month}**"]
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        has = False
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is not None:
-                                        total += v
-                                        has = True
-                                break
-                        row.append(f"{total:.1f}" if has else "-")
+                        total = week_day_total(y, d)
+                        row.append(f"{total:.1f}" if total is not None else "-")
                     result += f"| {' | '.join(row)} |\n"
 
                 week_chart_data = []
                 for d in range(sd, min(ed + 1, 32)):
                     item = {"Ngay": f"{d}/{month}"}
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is not None:
-                                        total += v
-                                break
-                        item[str(y)] = round(total, 1)
+                        total = week_day_total(y, d)
+                        item[str(y)] = round(total or 0.0, 1)
                     week_chart_data.append(item)
 
                 week_chart_json = {
@@ -508,24 +434,8 @@ class RainfallService:
                 for d in range(sd, min(ed + 1, 32)):
                     row = [f"{d}/{month}"]
                     for y in [year, year - 1, year - 2]:
-                        total = 0.0
-                        has = False
-                        for rec in all_records:
-                            ds = rec.get("Thoi_gian", "")
-                            if not ds:
-                                continue
-                            try:
-                                dt = datetime.strptime(ds, "%Y-%m-%d")
-                            except Exception:
-                                continue
-                            if dt.year == y and dt.month == month and dt.day == d:
-                                for c in station_columns:
-                                    v = parse_float_loose(rec.get(c))
-                                    if v is not None:
-                                        total += v
-                                        has = True
-                                break
-                        row.append(round(total, 1) if has else "-")
+                        total = week_day_total(y, d)
+                        row.append(round(total, 1) if total is not None else "-")
                     excel_rows.append(row)
 
                 excel_sheets.append({
@@ -593,30 +503,14 @@ class RainfallService:
                 if current_month > 12:
                     current_month = 1
                     current_year += 1
-            monthly_totals = {}
-            monthly_station_data = {}
-            for month, year in months_in_range:
-                total_rainfall = 0.0
-                has_data = False
-                station_totals = {}
-                for record in all_records:
-                    try:
-                        date_str = record.get('Thoi_gian', '')
-                        if not date_str:
-                            continue
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                        if date_obj.year == year and date_obj.month == month:
-                            for col in station_columns:
-                                value = record.get(col)
-                                val = parse_float_loose(value)
-                                if val is not None:
-                                    total_rainfall += val
-                                    has_data = True
-                                    station_totals[col] = station_totals.get(col, 0.0) + val
-                    except Exception:
-                        pass
-                monthly_totals[(month, year)] = total_rainfall if has_data else None
-                monthly_station_data[(month, year)] = station_totals if has_data else {}
+            matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
+            totals_by_month = matrix.grand_totals_by("month")
+            station_by_month = matrix.totals_by("month")
+            monthly_totals = {(month, year): totals_by_month.get((year, month)) for month, year in months_in_range}
+            monthly_station_data = {
+                (month, year): {col: val for col, val in station_by_month.get((year, month), {}).items() if val is not None}
+                for month, year in months_in_range
+            }
             result = f"""## Thống kê Lượng Mưa theo Tháng - Vĩnh Sơn ({reservoir})
 *Khoảng thời gian:* Từ tháng {start_month}/{start_year} đến tháng {end_month}/{end_year}
 *Số trạm:* {len(station_columns)} trạm (Tất cả các hồ A, B, C)
@@ -764,26 +658,11 @@ class RainfallService:
             print(f"[INFO] Loaded {len(all_records)} rainfall records", flush=True)
 
             # Tổ chức dữ liệu theo ngày
-            daily_data = {}  # {date: {station: value}}
-
-            for rec in all_records:
-                date_str = rec.get("Thoi_gian", "")
-                if not date_str:
-                    continue
-                try:
-                    rec_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    if start_dt <= rec_date <= end_dt:
-                        date_key = rec_date.strftime("%d/%m/%Y")
-                        if date_key not in daily_data:
-                            daily_data[date_key] = {}
-
-                        for col in station_columns:
-                            value = rec.get(col)
-                            val = parse_float_loose(value)
-                            if val is not None:
-                                daily_data[date_key][col] = daily_data[date_key].get(col, 0.0) + val
-                except (ValueError, TypeError):
-                    continue
+            matrix = RainfallMatrix.from_records(all_records, station_columns, parse_value=parse_float_loose)
+            daily_data = {  # {date: {station: value}}
+                day_value.strftime("%d/%m/%Y"): {col: val for col, val in per_station.items() if val is not None}
+                for day_value, per_station in matrix.window(start_dt, end_dt).totals_by("day").items()
+            }
 
             if not daily_data:
                 return f"Không có dữ liệu đo mưa từ {start_date} đến {end_date} cho {reservoir}"
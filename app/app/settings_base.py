@@ -54,6 +54,30 @@ AI_TOOLS_ANTHROPIC_MODEL = os.environ.get("AI_TOOLS_ANTHROPIC_MODEL", "claude-so
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
 
 DOCUMENTS_USE_CELERY = env_bool("DOCUMENTS_USE_CELERY", False)
+# Tac vu nen cua quanlyvanhanh (import/export lon): Celery neu bat, nguoc lai chay bang thread trong tien trinh web.
+QUANLYVANHANH_JOBS_USE_CELERY = env_bool("QUANLYVANHANH_JOBS_USE_CELERY", False)
+THONG_SO_EXPORT_SYNC_MAX_DAYS = int(os.environ.get("THONG_SO_EXPORT_SYNC_MAX_DAYS", "31"))
+THONG_SO_EXPORT_MAX_DAYS = int(os.environ.get("THONG_SO_EXPORT_MAX_DAYS", "366"))
+# Workbook import thong so co nhieu sheet (moi sheet mot ngay) hon muc nay se chay thanh tac vu nen.
+THONG_SO_IMPORT_SYNC_MAX_SHEETS = int(os.environ.get("THONG_SO_IMPORT_SYNC_MAX_SHEETS", "1"))
+# Ma QR thiet bi: anh PNG cache theo (thiet bi, URL frontend); to nhan in hang loat ghi PDF tung trang.
+QUANLYVANHANH_QR_CACHE_TIMEOUT = int(os.environ.get("QUANLYVANHANH_QR_CACHE_TIMEOUT", str(30 * 24 * 3600)))
+QUANLYVANHANH_QR_SHEET_MAX_ITEMS = int(os.environ.get("QUANLYVANHANH_QR_SHEET_MAX_ITEMS", "2000"))
+# Bang thong so phan vung theo thang (PostgreSQL): so thang tao truoc, so thang giu lai (0 = giu mai).
+# Chuyen bang sang phan vung (tuy chon) bang "manage.py thong_so_partitions normalize/convert".
+THONG_SO_PARTITION_MONTHS_AHEAD = int(os.environ.get("THONG_SO_PARTITION_MONTHS_AHEAD", "3"))
+THONG_SO_PARTITION_RETENTION_MONTHS = int(os.environ.get("THONG_SO_PARTITION_RETENTION_MONTHS", "0"))
+DOCUMENTS_PDF_CONVERT_WORKERS = int(os.environ.get("DOCUMENTS_PDF_CONVERT_WORKERS", "2"))
+DOCUMENTS_PDF_PAGES_PER_TASK = int(os.environ.get("DOCUMENTS_PDF_PAGES_PER_TASK", "10"))
+DOCUMENTS_PDF_PAGE_CACHE_TIMEOUT = int(os.environ.get("DOCUMENTS_PDF_PAGE_CACHE_TIMEOUT", str(30 * 24 * 3600)))
+# auto | openai | local | hash. "auto" dung OpenAI neu co key, sau do model local neu da cau hinh.
+DOCUMENTS_EMBEDDING_BACKEND = os.environ.get("DOCUMENTS_EMBEDDING_BACKEND", "auto")
+DOCUMENTS_LOCAL_EMBEDDING_MODEL = os.environ.get("DOCUMENTS_LOCAL_EMBEDDING_MODEL", "")
+DOCUMENTS_LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get("DOCUMENTS_LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+DOCUMENTS_LOCAL_EMBEDDING_QUERY_PREFIX = os.environ.get("DOCUMENTS_LOCAL_EMBEDDING_QUERY_PREFIX", "")
+DOCUMENTS_LOCAL_EMBEDDING_PASSAGE_PREFIX = os.environ.get("DOCUMENTS_LOCAL_EMBEDDING_PASSAGE_PREFIX", "")
+DOCUMENTS_METRICS_ENABLED = env_bool("DOCUMENTS_METRICS_ENABLED", True)
+DOCUMENTS_METRICS_TOKEN = os.environ.get("DOCUMENTS_METRICS_TOKEN", "")
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
 CELERY_TIMEZONE = os.environ.get("CELERY_TIMEZONE", "Asia/Ho_Chi_Minh")
@@ -61,22 +85,64 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = int(os.environ.get("CELERY_TASK_TIME_LIMIT", "1800"))
 # Cài đặt thời gian lưu trữ log (theo ngày). Mặc định là 180 ngày. Các log cũ hơn sẽ bị xóa tự động.
 LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "180"))
+# Thoi gian giu chi muc thong so cai dat thuy van trong Redis (giay). Cache bi xoa ngay khi cai dat thay doi.
+HYDROLOGY_SETTINGS_CACHE_TIMEOUT = int(os.environ.get("HYDROLOGY_SETTINGS_CACHE_TIMEOUT", str(6 * 3600)))
+HYDROLOGY_DASHBOARD_CACHE_TIMEOUT = int(os.environ.get("HYDROLOGY_DASHBOARD_CACHE_TIMEOUT", str(24 * 3600)))
+# VRAIN: ket noi dung chung (pool + retry), so luong goi song song khi bu du lieu va thoi gian cache bang mua 24h.
+VRAIN_STATS_URL = os.environ.get("VRAIN_STATS_URL", "https://kttv-open.vrain.vn/v1/stations/stats")
+VRAIN_CONNECT_TIMEOUT = float(os.environ.get("VRAIN_CONNECT_TIMEOUT", "5"))
+VRAIN_READ_TIMEOUT = float(os.environ.get("VRAIN_READ_TIMEOUT", "30"))
+VRAIN_MAX_RETRIES = int(os.environ.get("VRAIN_MAX_RETRIES", "3"))
+VRAIN_BACKFILL_WORKERS = int(os.environ.get("VRAIN_BACKFILL_WORKERS", "4"))
+VRAIN_BACKFILL_MAX_DAYS = int(os.environ.get("VRAIN_BACKFILL_MAX_DAYS", "366"))
+VRAIN_REALTIME_CACHE_TIMEOUT = int(os.environ.get("VRAIN_REALTIME_CACHE_TIMEOUT", "600"))
+# Preview Google Sheet: giu ket qua da phan tich, chi tai lai khi modifiedTime cua file thay doi.
+GOOGLE_SHEET_PREVIEW_CACHE_TIMEOUT = int(os.environ.get("GOOGLE_SHEET_PREVIEW_CACHE_TIMEOUT", "3600"))
+# Cay thiet bi (cay_phan_cap) cache theo nha may; bi xoa khi thiet bi/vat tu/an toan/dinh kem thay doi.
+THIET_BI_TREE_CACHE_TIMEOUT = int(os.environ.get("THIET_BI_TREE_CACHE_TIMEOUT", str(6 * 3600)))
+
+# Bo lap lich realtime trong tien trinh web (khi khong dung Celery): chi mot tien trinh
+# giu quyen chay, bau chon bang khoa Redis ("cache"), ban ghi DB ("database") hoac tat ("none").
+REALTIME_SCHEDULER_LEADER_LOCK = os.environ.get("REALTIME_SCHEDULER_LEADER_LOCK", "cache")
+REALTIME_SCHEDULER_LEADER_TTL_SECONDS = int(os.environ.get("REALTIME_SCHEDULER_LEADER_TTL_SECONDS", "90"))
+# Chu ky chup snapshot realtime (phut, uoc cua 60); du lieu cu hon so ngay duoi day chi giu moi gio mot ban ghi.
+REALTIME_SNAPSHOT_INTERVAL_MINUTES = int(os.environ.get("REALTIME_SNAPSHOT_INTERVAL_MINUTES", "60"))
+REALTIME_SNAPSHOT_FULL_RESOLUTION_DAYS = int(os.environ.get("REALTIME_SNAPSHOT_FULL_RESOLUTION_DAYS", "7"))
 
 from celery.schedules import crontab
 
+from thongsothuyvan.snapshot_schedule import snapshot_crontab
+
 CELERY_BEAT_SCHEDULE = {
     "save-realtime-snapshots-hourly": {
         "task": "thongsothuyvan.tasks.save_all_realtime_snapshots_task",
-        "schedule": crontab(minute=5),
+        # Cung cach lam tron nhu get_snapshot_interval_minutes(): 7 phut chay moi 6 phut.
+        "schedule": snapshot_crontab(REALTIME_SNAPSHOT_INTERVAL_MINUTES),
+    },
+    "downsample-realtime-snapshots-daily": {
+        "task": "thongsothuyvan.tasks.downsample_realtime_snapshots_task",
+        "schedule": crontab(hour=0, minute=30),
     },
     "sync-vrain-rainfall-daily": {
         "task": "thongsothuyvan.tasks.sync_vrain_daily_rainfall_task",
         "schedule": crontab(hour=7, minute=0),
     },
+    "sync-vrain-rainfall-recent": {
+        "task": "thongsothuyvan.tasks.sync_vrain_recent_rainfall_task",
+        "schedule": crontab(minute="*/15"),
+    },
     "sync-missing-thuy-van-thuc-te-daily": {
         "task": "thongsothuyvan.tasks.sync_missing_thuy_van_thuc_te_daily_task",
         "schedule": crontab(hour=8, minute=0),
     },
+    "maintain-thong-so-partitions-daily": {
+        "task": "quanlyvanhanh.tasks.maintain_thong_so_partitions_task",
+        "schedule": crontab(hour=1, minute=15),
+    },
+    "reembed-stale-document-chunks-hourly": {
+        "task": "documents.tasks.reembed_stale_chunks_task",
+        "schedule": crontab(minute=40),
+    },
     "clear-old-logs-daily": {
         "task": "core.tasks.clear_old_logs_task",
         "schedule": crontab(hour=2, minute=0),
@@ -21,7 +21,13 @@ def clear_old_logs_task():
     deleted_audit_logs, _ = LogEntry.objects.filter(timestamp__lt=cutoff_date).delete()
     logger.info(f"Cleared {deleted_audit_logs} django-auditlog entries older than {retention_days} days (cutoff: {cutoff_date})")
     
+    # 3. Clear RAG stage timings
+    from documents.models import RagTiming
+    deleted_rag_timings, _ = RagTiming.objects.filter(created_at__lt=cutoff_date).delete()
+    logger.info(f"Cleared {deleted_rag_timings} RAG timing rows older than {retention_days} days (cutoff: {cutoff_date})")
+
     return {
         'deleted_user_activity_logs': deleted_user_logs,
-        'deleted_audit_logs': deleted_audit_logs
+        'deleted_audit_logs': deleted_audit_logs,
+        'deleted_rag_timings': deleted_rag_timings,
     }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from documents.models import Document, DocumentChunk
+from documents.models import Document, DocumentChunk, RagTiming
 
 
 class DocumentChunkInline(admin.TabularInline):
@@ -25,3 +25,11 @@ class DocumentChunkAdmin(admin.ModelAdmin):
     list_display = ("document", "chunk_index", "heading_path", "token_count", "created_at")
     list_filter = ("document__factory",)
     search_fields = ("document__title", "heading_path", "content")
+
+
+@admin.register(RagTiming)
+class RagTimingAdmin(admin.ModelAdmin):
+    list_display = ("kind", "query", "document", "total_ms", "succeeded", "created_at")
+    list_filter = ("kind", "succeeded")
+    search_fields = ("query", "document__title")
+    readonly_fields = ("kind", "query", "document", "user", "succeeded", "total_ms", "stages", "counters", "details", "created_at")
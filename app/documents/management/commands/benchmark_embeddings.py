@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.services.embedding_benchmark import evaluate_backend, load_dataset
+from documents.services.embeddings import EMBEDDING_BACKENDS
+
+
+class Command(BaseCommand):
+    help = "Compare embedding backends by recall@k and MRR on a labelled Vietnamese query set."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            action="append",
+            dest="backends",
+            choices=sorted(EMBEDDING_BACKENDS),
+            help="Backend to evaluate. Repeat to compare several. Defaults to every available backend.",
+        )
+        parser.add_argument("--dataset", default=None, help="Path to a JSON dataset with passages and queries.")
+        parser.add_argument("--k", type=int, default=5)
+
+    def handle(self, *args, **options):
+        dataset = load_dataset(options["dataset"])
+        names = options["backends"] or sorted(EMBEDDING_BACKENDS)
+        backends = [EMBEDDING_BACKENDS[name]() for name in names]
+        available = [backend for backend in backends if backend.is_available()]
+        for backend in backends:
+            if backend not in available:
+                self.stdout.write(self.style.WARNING(f"Skip {backend.name}: backend is not configured."))
+        if not available:
+            raise CommandError("No embedding backend is available.")
+
+        self.stdout.write(f"{'backend':<10} {'recall@' + str(options['k']):>10} {'mrr':>8} {'seconds':>9}")
+        for backend in available:
+            result = evaluate_backend(backend, dataset, k=options["k"])
+            self.stdout.write(
+                f"{result['backend']:<10} {result['recall_at_k']:>10.4f} {result['mrr']:>8.4f} {result['embed_seconds']:>9.3f}"
+            )
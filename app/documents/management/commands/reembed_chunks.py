@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from documents.services.embeddings import get_active_signature
+from documents.services.ingest import REEMBED_BATCH_SIZE, reembed_stale_chunks
+
+
+class Command(BaseCommand):
+    help = "Re-embed chunks whose vectors were produced by a backend other than the active one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many chunks.")
+
+    def handle(self, *args, **options):
+        updated = reembed_stale_chunks(batch_size=options["batch_size"], limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Re-embedded {updated} chunks with {get_active_signature()}."))
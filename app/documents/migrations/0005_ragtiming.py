@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_auto_20260618_1645'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RagTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('search', 'Search'), ('ingest', 'Ingest')], max_length=20)),
+                ('query', models.TextField(blank=True)),
+                ('succeeded', models.BooleanField(default=True)),
+                ('total_ms', models.FloatField(default=0)),
+                ('stages', models.JSONField(blank=True, default=dict)),
+                ('counters', models.JSONField(blank=True, default=dict)),
+                ('details', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rag_timings', to='documents.document')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rag_timings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created_at', '-id'),
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='documents_r_kind_6a219e_idx')],
+            },
+        ),
+    ]
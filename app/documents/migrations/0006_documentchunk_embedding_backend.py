@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_ragtiming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='embedding_backend',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=models.Index(fields=['embedding_backend'], name='documents_d_embeddi_d6493e_idx'),
+        ),
+    ]
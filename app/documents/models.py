@@ -97,6 +97,7 @@ class DocumentChunk(models.Model):
     page_to = models.PositiveIntegerField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
     embedding = VectorField(dimensions=1536, null=True, blank=True)
+    embedding_backend = models.CharField(max_length=200, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -105,7 +106,49 @@ class DocumentChunk(models.Model):
         indexes = [
             models.Index(fields=("document", "chunk_index")),
             models.Index(fields=("token_count",)),
+            models.Index(fields=("embedding_backend",)),
         ]
 
     def __str__(self):
         return f"{self.document_id}#{self.chunk_index}"
+
+
+class RagTiming(models.Model):
+    KIND_SEARCH = "search"
+    KIND_INGEST = "ingest"
+    KIND_CHOICES = (
+        (KIND_SEARCH, "Search"),
+        (KIND_INGEST, "Ingest"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    query = models.TextField(blank=True)
+    document = models.ForeignKey(
+        Document,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="rag_timings",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="rag_timings",
+    )
+    succeeded = models.BooleanField(default=True)
+    total_ms = models.FloatField(default=0)
+    stages = models.JSONField(default=dict, blank=True)
+    counters = models.JSONField(default=dict, blank=True)
+    details = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [
+            models.Index(fields=("kind", "created_at")),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.total_ms:.0f}ms"
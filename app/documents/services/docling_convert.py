@@ -1,13 +1,39 @@
+import hashlib
+import logging
+import multiprocessing
 import re
+import unicodedata
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
 
 TEXT_EXTENSIONS = {".md", ".markdown", ".txt", ".csv", ".log"}
 UNSUPPORTED_EXTENSIONS = {".doc"}
 PDF_EXTENSIONS = {".pdf"}
 MIN_EXTRACTED_TEXT_CHARS = 300
 MIN_PDF_TEXT_QUALITY_SCORE = 0.42
+# Nguong cho tung trang: mat do chu va do "lanh" cua glyph, khong dua vao tu danh dau tieng Viet.
+MIN_PDF_PAGE_TEXT_CHARS = 40
+MAX_PDF_PAGE_BAD_GLYPH_RATIO = 0.05
+MIN_PDF_PAGE_ALNUM_RATIO = 0.4
+MAX_PDF_PAGE_GARBLED_WORD_RATIO = 0.2
+PDF_CID_GLYPH_RE = re.compile(r"\(cid:\d+\)")
+PDF_GARBLED_GLYPH_RE = re.compile(r"[^\W\d_][\d$@#%&][^\W\d_]")
+PDF_PAGE_CACHE_VERSION = "1"
+PDF_PAGE_CACHE_PREFIX = "documents:pdf-page"
+DEFAULT_PDF_CONVERT_WORKERS = 2
+DEFAULT_PDF_PAGES_PER_TASK = 10
+DEFAULT_PDF_PAGE_CACHE_TIMEOUT = 30 * 24 * 3600
 VIETNAMESE_DIACRITIC_RE = re.compile(
     r"[ăâđêôơưáàảãạấầẩẫậắằẳẵặéèẻẽẹếềểễệíìỉĩịóòỏõọốồổỗộớờởỡợúùủũụứừửữựýỳỷỹỵ]",
     re.IGNORECASE,
@@ -22,33 +48,264 @@ def convert_file_to_markdown(file_path):
     if suffix in TEXT_EXTENSIONS:
         return path.read_text(encoding="utf-8", errors="replace")
 
+    if suffix in PDF_EXTENSIONS:
+        return _convert_pdf(path)
+
     try:
         from docling.document_converter import DocumentConverter
     except ImportError:
-        if suffix in PDF_EXTENSIONS:
-            return _extract_pdf_text_or_ocr(path)
         return _fallback_text(path)
 
     try:
         result = DocumentConverter().convert(str(path))
     except Exception as exc:
-        if suffix in PDF_EXTENSIONS:
-            try:
-                return _extract_pdf_text_or_ocr(path)
-            except Exception:
-                pass
+        raise ValueError(f"Khong the chuyen doi file bang Docling: {exc}") from exc
+    document = getattr(result, "document", None)
+    if document and hasattr(document, "export_to_markdown"):
+        return document.export_to_markdown()
+    return _fallback_text(path)
+
+
+def _convert_pdf(path):
+    try:
+        page_count = _pdf_page_count(path)
+    except Exception:
+        logger.warning("Cannot read page count of %s. Converting the whole PDF at once.", path.name)
+        return _convert_whole_pdf(path)
+    if not page_count:
+        raise ValueError("Khong trich xuat duoc text tu PDF. File co the la scan/anh hoac bi khoa.")
+    return _convert_pdf_by_pages(path, page_count)
+
+
+def _convert_whole_pdf(path):
+    try:
+        from docling.document_converter import DocumentConverter
+    except ImportError:
+        return _extract_pdf_text_or_ocr(path)
+
+    try:
+        result = DocumentConverter().convert(str(path))
+    except Exception as exc:
+        try:
+            return _extract_pdf_text_or_ocr(path)
+        except Exception:
+            pass
         raise ValueError(f"Khong the chuyen doi file bang Docling: {exc}") from exc
     document = getattr(result, "document", None)
     if document and hasattr(document, "export_to_markdown"):
         markdown = document.export_to_markdown()
-        if suffix in PDF_EXTENSIONS and (
-            _is_text_too_short(markdown) or _is_pdf_text_low_quality(markdown)
-        ):
+        if _is_text_too_short(markdown) or _is_pdf_text_low_quality(markdown):
             return _extract_pdf_text_or_ocr(path)
         return markdown
     return _fallback_text(path)
 
 
+def _convert_pdf_by_pages(path, page_count):
+    """Convert a PDF page range by page range, reusing cached pages of the same file."""
+    file_hash = _file_sha256(path)
+    pages = _load_cached_pages(file_hash, page_count)
+    missing_pages = [page for page in range(1, page_count + 1) if page not in pages]
+    page_ranges = _page_ranges(missing_pages, _setting_int("DOCUMENTS_PDF_PAGES_PER_TASK", DEFAULT_PDF_PAGES_PER_TASK))
+    workers = min(_setting_int("DOCUMENTS_PDF_CONVERT_WORKERS", DEFAULT_PDF_CONVERT_WORKERS), len(page_ranges))
+    metrics.set_counter("pdf_pages", page_count)
+    metrics.set_counter("pdf_pages_cached", len(pages))
+    logger.info(
+        "Converting %s: %s pages, %s cached, %s ranges on %s workers.",
+        path.name,
+        page_count,
+        len(pages),
+        len(page_ranges),
+        max(workers, 1) if page_ranges else 0,
+    )
+
+    def collect(converted):
+        _store_cached_pages(file_hash, {page: text for page, text, cacheable in converted if cacheable})
+        pages.update((page, text) for page, text, _ in converted)
+
+    if workers <= 1:
+        for page_range in page_ranges:
+            collect(_convert_pdf_page_range(str(path), page_range))
+    else:
+        with _page_executor(workers) as executor:
+            futures = [
+                executor.submit(_convert_pdf_page_range, str(path), page_range)
+                for page_range in page_ranges
+            ]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    sections = [
+        f"## Trang {page}\n\n{pages[page]}"
+        for page in range(1, page_count + 1)
+        if pages.get(page)
+    ]
+    if not sections:
+        raise ValueError("Khong trich xuat duoc text tu PDF. File co the la scan/anh hoac bi khoa.")
+    return f"# {path.name}\n\n" + "\n\n".join(sections)
+
+
+def _convert_pdf_page_range(file_path, pages):
+    """Worker entry point: convert contiguous pages, choosing OCR only for pages that score badly.
+
+    Returns ``(page, text, cacheable)``: empty pages, pages where a converter raised and
+    pages that needed OCR while OCR was unavailable are not cacheable, so the next run
+    retries them instead of reusing a degraded result.
+    """
+    path = Path(file_path)
+    docling_pages = _docling_pages(path, pages)
+    docling_failed = docling_pages is None
+    text_pages = None
+    results = []
+    for page in pages:
+        failed = docling_failed
+        text = ((docling_pages or {}).get(page) or "").strip()
+        if _is_pdf_page_low_quality(text):
+            if text_pages is None:
+                text_pages = _pypdf_pages(path, pages)
+            failed = failed or text_pages is None
+            extracted = ((text_pages or {}).get(page) or "").strip()
+            if not _is_pdf_page_low_quality(extracted):
+                text = extracted
+            else:
+                ocr_text = _ocr_pdf_page(path, page)
+                failed = failed or ocr_text is None
+                text = ocr_text or extracted or text
+        results.append((page, text, bool(text) and not failed))
+    return results
+
+
+def _docling_pages(path, pages):
+    try:
+        converter = _docling_converter()
+    except ImportError:
+        return {}
+    try:
+        result = converter.convert(str(path), page_range=(pages[0], pages[-1]))
+    except Exception:
+        logger.warning("Docling failed on %s pages %s-%s.", path.name, pages[0], pages[-1], exc_info=True)
+        return None
+    document = getattr(result, "document", None)
+    if not document or not hasattr(document, "export_to_markdown"):
+        return {}
+    return {page: document.export_to_markdown(page_no=page) for page in pages}
+
+
+def _pypdf_pages(path, pages):
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(str(path))
+        return {page: reader.pages[page - 1].extract_text() or "" for page in pages}
+    except Exception:
+        logger.warning("pypdf failed on %s pages %s-%s.", path.name, pages[0], pages[-1], exc_info=True)
+        return None
+
+
+def _ocr_pdf_page(path, page):
+    """OCR one page; ``None`` when OCR is unavailable or failed (the page must not be cached)."""
+    try:
+        import pytesseract
+        from pdf2image import convert_from_path
+    except ImportError:
+        logger.warning("pytesseract/pdf2image is not installed. Skipping OCR for %s page %s.", path.name, page)
+        metrics.incr("pdf_pages_ocr_unavailable")
+        return None
+
+    try:
+        images = convert_from_path(str(path), dpi=250, first_page=page, last_page=page)
+    except Exception:
+        logger.warning("Cannot rasterize %s page %s for OCR.", path.name, page, exc_info=True)
+        return None
+    texts = [
+        (pytesseract.image_to_string(image, lang="vie+eng", config="--psm 6") or "").strip()
+        for image in images
+    ]
+    return "\n\n".join(text for text in texts if text)
+
+
+@lru_cache(maxsize=1)
+def _docling_converter():
+    # One converter per worker process: Docling loads its layout models on construction.
+    from docling.document_converter import DocumentConverter
+
+    return DocumentConverter()
+
+
+def _pdf_page_count(path):
+    from pypdf import PdfReader
+
+    return len(PdfReader(str(path)).pages)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _page_ranges(pages, size):
+    size = max(1, size)
+    ranges = []
+    current = []
+    for page in pages:
+        if current and (page != current[-1] + 1 or len(current) >= size):
+            ranges.append(current)
+            current = []
+        current.append(page)
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def _page_executor(workers):
+    # Celery prefork children are daemonic and cannot fork a process pool.
+    if multiprocessing.current_process().daemon:
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+@lru_cache(maxsize=1)
+def _converter_version():
+    try:
+        from importlib.metadata import version
+
+        docling_version = version("docling")
+    except Exception:
+        docling_version = "none"
+    return f"{PDF_PAGE_CACHE_VERSION}-{docling_version}"
+
+
+def _page_cache_key(file_hash, page):
+    return f"{PDF_PAGE_CACHE_PREFIX}:{_converter_version()}:{file_hash}:{page}"
+
+
+def _load_cached_pages(file_hash, page_count):
+    keys = {_page_cache_key(file_hash, page): page for page in range(1, page_count + 1)}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception:
+        logger.warning("PDF page cache is unavailable.", exc_info=True)
+        return {}
+    return {keys[key]: value for key, value in cached.items()}
+
+
+def _store_cached_pages(file_hash, pages):
+    timeout = _setting_int("DOCUMENTS_PDF_PAGE_CACHE_TIMEOUT", DEFAULT_PDF_PAGE_CACHE_TIMEOUT)
+    try:
+        cache.set_many({_page_cache_key(file_hash, page): text for page, text in pages.items()}, timeout)
+    except Exception:
+        logger.warning("Cannot store converted PDF pages in cache.", exc_info=True)
+
+
+def _setting_int(name, default):
+    try:
+        return int(getattr(settings, name, default))
+    except (TypeError, ValueError):
+        return default
+
+
 def _extract_pdf_text_or_ocr(path):
     try:
         markdown = _extract_pdf_text(path)
@@ -151,6 +408,38 @@ def _is_pdf_text_low_quality(text):
     return quality_score < MIN_PDF_TEXT_QUALITY_SCORE
 
 
+def _is_pdf_page_low_quality(text):
+    """Per-page check: too little text (e.g. a scan with only a header layer) or broken glyphs.
+
+    ``_is_pdf_text_low_quality`` scores a whole document by Vietnamese markers and length,
+    which a single table, English or title page legitimately fails.
+    """
+    compact = "".join(ch for ch in _meaningful_text_for_length(text) if not ch.isspace())
+    if len(compact) < MIN_PDF_PAGE_TEXT_CHARS:
+        return True
+
+    bad_glyphs = sum(len(match) for match in PDF_CID_GLYPH_RE.findall(compact))
+    bad_glyphs += sum(1 for ch in PDF_CID_GLYPH_RE.sub("", compact) if ch == "\ufffd" or unicodedata.category(ch) in ("Cc", "Co", "Cn"))
+    if bad_glyphs / len(compact) > MAX_PDF_PAGE_BAD_GLYPH_RATIO:
+        return True
+    if sum(ch.isalnum() for ch in compact) / len(compact) < MIN_PDF_PAGE_ALNUM_RATIO:
+        return True
+
+    words = [word for word in text.split() if len(word) >= 3 and any(ch.isalpha() for ch in word)]
+    garbled = [word for word in words if _is_garbled_word(word)]
+    return len(words) >= 5 and len(garbled) / len(words) > MAX_PDF_PAGE_GARBLED_WORD_RATIO
+
+
+def _is_garbled_word(word):
+    # Font map hong / text layer loi: chu-so xen ke ("H4nh", "l$p"), hoa giua tu ("xAHqr"),
+    # hoac cum phu am khong co trong tieng Viet/Anh.
+    if PDF_GARBLED_GLYPH_RE.search(word):
+        return True
+    if any(left.islower() and right.isupper() for left, right in zip(word, word[1:])):
+        return True
+    return bool(re.search(r"[qwxz]{2,}|[bcdfghjklmnpqrstvwxz]{5,}", word.lower()))
+
+
 def _meaningful_text_for_length(text):
     lines = []
     for raw_line in (text or "").splitlines():
@@ -0,0 +1,55 @@
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .embeddings import KIND_PASSAGE, KIND_QUERY
+
+
+DEFAULT_DATASET_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "retrieval_vi.json"
+
+
+def load_dataset(path=None):
+    with open(path or DEFAULT_DATASET_PATH, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def evaluate_backend(backend, dataset, k=5):
+    """Rank every labelled passage for each query and report recall@k and MRR."""
+    passages = dataset["passages"]
+    queries = dataset["queries"]
+    passage_ids = [passage["id"] for passage in passages]
+
+    started = time.perf_counter()
+    passage_matrix = _normalized(backend.embed([passage["text"] for passage in passages], kind=KIND_PASSAGE))
+    query_matrix = _normalized(backend.embed([item["query"] for item in queries], kind=KIND_QUERY))
+    elapsed = time.perf_counter() - started
+
+    scores = query_matrix @ passage_matrix.T
+    recall_total = 0.0
+    reciprocal_total = 0.0
+    for row, item in zip(scores, queries):
+        relevant = set(item["relevant"])
+        ranking = [passage_ids[index] for index in np.argsort(-row, kind="stable")]
+        recall_total += len(relevant & set(ranking[:k])) / len(relevant)
+        first_hit = next((rank for rank, passage_id in enumerate(ranking, start=1) if passage_id in relevant), None)
+        reciprocal_total += 1.0 / first_hit if first_hit else 0.0
+
+    count = max(1, len(queries))
+    return {
+        "backend": backend.name,
+        "k": k,
+        "queries": len(queries),
+        "passages": len(passages),
+        "recall_at_k": round(recall_total / count, 4),
+        "mrr": round(reciprocal_total / count, 4),
+        "embed_seconds": round(elapsed, 3),
+    }
+
+
+def _normalized(vectors):
+    matrix = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
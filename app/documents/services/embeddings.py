@@ -2,29 +2,174 @@ import hashlib
 import logging
 import math
 import os
+from functools import lru_cache
 
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 EMBEDDING_MODEL = "text-embedding-3-small"
-FALLBACK_DIMENSIONS = 1536
+STORAGE_DIMENSIONS = 1536
+FALLBACK_DIMENSIONS = STORAGE_DIMENSIONS
+OPENAI_BATCH_SIZE = 256
+DEFAULT_LOCAL_BATCH_SIZE = 32
+KIND_QUERY = "query"
+KIND_PASSAGE = "passage"
 
 
-def get_embedding(text):
-    api_key = os.getenv("OPENAI_API_KEY") or getattr(settings, "OPENAI_API_KEY", "")
-    if api_key:
-        try:
-            from openai import OpenAI
+class EmbeddingBackend:
+    """Turns a batch of texts into vectors that fit ``DocumentChunk.embedding``."""
+
+    name = ""
+
+    @property
+    def signature(self):
+        """Backend and model that produced a vector; vectors are only comparable within one signature."""
+        return self.name
+
+    def is_available(self):
+        return True
+
+    def embed(self, texts, kind=KIND_PASSAGE):
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    name = "openai"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key if api_key is not None else _openai_api_key()
 
-            response = OpenAI(api_key=api_key).embeddings.create(
+    @property
+    def signature(self):
+        return f"{self.name}:{EMBEDDING_MODEL}"
+
+    def is_available(self):
+        return bool(self.api_key)
+
+    def embed(self, texts, kind=KIND_PASSAGE):
+        from openai import OpenAI
+
+        client = OpenAI(api_key=self.api_key)
+        embeddings = []
+        for i in range(0, len(texts), OPENAI_BATCH_SIZE):
+            batch = [t[:8000] if t else "" for t in texts[i : i + OPENAI_BATCH_SIZE]]
+            response = client.embeddings.create(
                 model=EMBEDDING_MODEL,
-                input=(text or "")[:8000],
+                input=batch,
             )
-            return list(response.data[0].embedding)
+            for item in response.data:
+                embeddings.append(list(item.embedding))
+        return embeddings
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """CPU-only sentence-transformers model, loaded once per worker process.
+
+    Model vectors are shorter than the pgvector column, so they are zero-padded;
+    padding does not change cosine distance between two padded vectors.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name=None, batch_size=None, query_prefix=None, passage_prefix=None):
+        self.model_name = model_name if model_name is not None else getattr(settings, "DOCUMENTS_LOCAL_EMBEDDING_MODEL", "")
+        self.batch_size = batch_size or getattr(settings, "DOCUMENTS_LOCAL_EMBEDDING_BATCH_SIZE", DEFAULT_LOCAL_BATCH_SIZE)
+        self.prefixes = {
+            KIND_QUERY: query_prefix if query_prefix is not None else getattr(settings, "DOCUMENTS_LOCAL_EMBEDDING_QUERY_PREFIX", ""),
+            KIND_PASSAGE: passage_prefix if passage_prefix is not None else getattr(settings, "DOCUMENTS_LOCAL_EMBEDDING_PASSAGE_PREFIX", ""),
+        }
+
+    @property
+    def signature(self):
+        return f"{self.name}:{self.model_name}"
+
+    def is_available(self):
+        if not self.model_name:
+            return False
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def embed(self, texts, kind=KIND_PASSAGE):
+        model = _load_local_model(self.model_name)
+        prefix = self.prefixes.get(kind, "")
+        vectors = model.encode(
+            [f"{prefix}{text or ''}" for text in texts],
+            batch_size=int(self.batch_size),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return [_fit_dimensions(vector.tolist()) for vector in vectors]
+
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    name = "hash"
+
+    def embed(self, texts, kind=KIND_PASSAGE):
+        return [_hash_embedding(text or "") for text in texts]
+
+
+EMBEDDING_BACKENDS = {
+    OpenAIEmbeddingBackend.name: OpenAIEmbeddingBackend,
+    LocalEmbeddingBackend.name: LocalEmbeddingBackend,
+    HashEmbeddingBackend.name: HashEmbeddingBackend,
+}
+
+
+def get_embedding_backends(name=None):
+    """Return the configured backend followed by its fallbacks, ending with hash."""
+    name = (name or getattr(settings, "DOCUMENTS_EMBEDDING_BACKEND", "auto") or "auto").strip().lower()
+    if name == "auto":
+        names = [OpenAIEmbeddingBackend.name, LocalEmbeddingBackend.name]
+    elif name in EMBEDDING_BACKENDS:
+        names = [name]
+    else:
+        logger.warning("Unknown embedding backend %r. Using local hash embedding.", name)
+        names = []
+
+    backends = [EMBEDDING_BACKENDS[item]() for item in names if item != HashEmbeddingBackend.name]
+    backends = [backend for backend in backends if backend.is_available()]
+    backends.append(HashEmbeddingBackend())
+    return backends
+
+
+def get_active_signature():
+    """Signature of the backend new chunks are embedded with when nothing fails."""
+    return get_embedding_backends()[0].signature
+
+
+def get_embedding(text, kind=KIND_QUERY):
+    return get_embeddings_batch([text], kind=kind)[0]
+
+
+def embed_query(text):
+    """Return ``(signature, vector)`` for a search query."""
+    signature, vectors = embed_texts([text], kind=KIND_QUERY)
+    return signature, vectors[0]
+
+
+def get_embeddings_batch(texts: list[str], kind=KIND_PASSAGE) -> list[list[float]]:
+    return embed_texts(texts, kind=kind)[1]
+
+
+def embed_texts(texts, kind=KIND_PASSAGE):
+    """Embed with the first backend that succeeds and return ``(signature, vectors)``.
+
+    A fallback backend produces vectors in a different space, so callers store
+    the signature next to each vector and only compare vectors that share it.
+    """
+    texts = [text or "" for text in texts]
+    backends = get_embedding_backends()
+    for backend in backends[:-1]:
+        try:
+            return backend.signature, backend.embed(texts, kind=kind)
         except Exception:
-            logger.exception("OpenAI embedding request failed. Falling back to local hash embedding.")
-    return _hash_embedding(text or "")
+            logger.exception("%s embedding request failed. Falling back to the next backend.", backend.name)
+    return backends[-1].signature, backends[-1].embed(texts, kind=kind)
 
 
 def cosine_similarity(left, right):
@@ -61,26 +206,19 @@ def _hash_embedding(text):
     return [value / norm for value in vector]
 
 
-def get_embeddings_batch(texts: list[str]) -> list[list[float]]:
-    api_key = os.getenv("OPENAI_API_KEY") or getattr(settings, "OPENAI_API_KEY", "")
-    if not api_key:
-        return [_hash_embedding(t or "") for t in texts]
+def _fit_dimensions(vector):
+    if len(vector) >= STORAGE_DIMENSIONS:
+        return [float(value) for value in vector[:STORAGE_DIMENSIONS]]
+    return [float(value) for value in vector] + [0.0] * (STORAGE_DIMENSIONS - len(vector))
 
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
 
-        batch_size = 256
-        embeddings = []
-        for i in range(0, len(texts), batch_size):
-            batch = [t[:8000] if t else "" for t in texts[i : i + batch_size]]
-            response = client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=batch,
-            )
-            for item in response.data:
-                embeddings.append(list(item.embedding))
-        return embeddings
-    except Exception:
-        logger.exception("OpenAI batch embedding request failed. Falling back to local hash embedding.")
-        return [_hash_embedding(t or "") for t in texts]
+def _openai_api_key():
+    return os.getenv("OPENAI_API_KEY") or getattr(settings, "OPENAI_API_KEY", "")
+
+
+@lru_cache(maxsize=2)
+def _load_local_model(model_name):
+    from sentence_transformers import SentenceTransformer
+
+    logger.info("Loading local embedding model %s.", model_name)
+    return SentenceTransformer(model_name, device="cpu")
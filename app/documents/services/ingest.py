@@ -4,13 +4,16 @@ from django.db import transaction
 from django.utils import timezone
 
 from documents.models import Document, DocumentChunk
+from documents.services import metrics
 from documents.services.chunking import chunk_markdown
 from documents.services.docling_convert import convert_file_to_markdown
-from documents.services.embeddings import get_embedding, get_embeddings_batch
+from documents.services.embeddings import embed_texts, get_active_signature
 
 
 logger = logging.getLogger(__name__)
 
+REEMBED_BATCH_SIZE = 256
+
 
 def process_document(document):
     document.status = Document.STATUS_PROCESSING
@@ -18,26 +21,45 @@ def process_document(document):
     document.save(update_fields=["status", "error_message", "updated_at"])
 
     try:
-        logger.info("Processing document %s started.", document.id)
+        with metrics.record("ingest", document=document):
+            _process_document(document)
+    except Exception as exc:
+        logger.exception("Processing document %s failed.", document.id)
+        document.status = Document.STATUS_FAILED
+        document.error_message = str(exc)
+        document.save(update_fields=["status", "error_message", "updated_at"])
+        raise
+
+    return document
+
+
+def _process_document(document):
+    logger.info("Processing document %s started.", document.id)
+    with metrics.stage("convert"):
         markdown = convert_file_to_markdown(document.original_file.path)
+    metrics.set_counter("markdown_chars", len(markdown))
+    with metrics.stage("chunk"):
         chunks = chunk_markdown(markdown)
-        contents = [chunk["content"] for chunk in chunks]
-        embeddings = get_embeddings_batch(contents)
-        prepared_chunks = []
-        for index, chunk in enumerate(chunks):
-            prepared_chunks.append(
-                {
-                    "chunk_index": index,
-                    "heading_path": chunk.get("heading_path", ""),
-                    "content": chunk["content"],
-                    "token_count": chunk.get("token_count", 0),
-                    "page_from": chunk.get("page_from"),
-                    "page_to": chunk.get("page_to"),
-                    "metadata": chunk.get("metadata", {}),
-                    "embedding": embeddings[index],
-                }
-            )
+    metrics.set_counter("chunks", len(chunks))
+    contents = [chunk["content"] for chunk in chunks]
+    with metrics.stage("embed"):
+        signature, embeddings = embed_texts(contents)
+    prepared_chunks = []
+    for index, chunk in enumerate(chunks):
+        prepared_chunks.append(
+            {
+                "chunk_index": index,
+                "heading_path": chunk.get("heading_path", ""),
+                "content": chunk["content"],
+                "token_count": chunk.get("token_count", 0),
+                "page_from": chunk.get("page_from"),
+                "page_to": chunk.get("page_to"),
+                "metadata": chunk.get("metadata", {}),
+                "embedding": embeddings[index],
+            }
+        )
 
+    with metrics.stage("write"):
         with transaction.atomic():
             DocumentChunk.objects.filter(document=document).delete()
             chunk_objects = [
@@ -51,6 +73,7 @@ def process_document(document):
                     page_to=chunk["page_to"],
                     metadata=chunk["metadata"],
                     embedding=chunk["embedding"],
+                    embedding_backend=signature,
                 )
                 for chunk in prepared_chunks
             ]
@@ -68,12 +91,37 @@ def process_document(document):
                     "updated_at",
                 ]
             )
-        logger.info("Processing document %s completed with %s chunks.", document.id, len(prepared_chunks))
-    except Exception as exc:
-        logger.exception("Processing document %s failed.", document.id)
-        document.status = Document.STATUS_FAILED
-        document.error_message = str(exc)
-        document.save(update_fields=["status", "error_message", "updated_at"])
-        raise
+    logger.info("Processing document %s completed with %s chunks.", document.id, len(prepared_chunks))
 
-    return document
+
+def reembed_stale_chunks(batch_size=REEMBED_BATCH_SIZE, limit=None):
+    """Re-embed chunks whose vectors came from a backend other than the active one.
+
+    Returns the number of chunks rewritten. Chunks embedded by a fallback during
+    an outage are picked up again once the configured backend is back.
+    """
+    active = get_active_signature()
+    stale = (
+        DocumentChunk.objects.filter(document__status=Document.STATUS_READY)
+        .exclude(embedding_backend=active)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if limit:
+        stale = stale[:limit]
+    chunk_ids = list(stale)
+    updated = 0
+    for start in range(0, len(chunk_ids), batch_size):
+        chunks = list(DocumentChunk.objects.filter(id__in=chunk_ids[start : start + batch_size]).only("id", "content"))
+        signature, embeddings = embed_texts([chunk.content for chunk in chunks])
+        if signature != active:
+            logger.warning("Re-embedding stopped: %s is unavailable, got %s vectors.", active, signature)
+            break
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+            chunk.embedding_backend = signature
+        DocumentChunk.objects.bulk_update(chunks, ["embedding", "embedding_backend"])
+        updated += len(chunks)
+    if updated:
+        logger.info("Re-embedded %s chunks with %s.", updated, active)
+    return updated
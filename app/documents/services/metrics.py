@@ -0,0 +1,185 @@
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_METRICS_WINDOW_SECONDS = 24 * 3600
+MAX_METRICS_ROWS = 5000
+
+_active_recorder = ContextVar("documents_rag_recorder", default=None)
+
+
+class StageRecorder:
+    """Collects per-stage wall time and counters for one search or ingest run."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.stages = {}
+        self.counters = {}
+        self.details = []
+        self.succeeded = True
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, **detail):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+            if detail:
+                self.details.append({"stage": name, "ms": round(elapsed_ms, 3), **detail})
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self._started) * 1000
+
+
+@contextmanager
+def record(kind, query="", document=None, user=None):
+    """Activate a recorder for the current context and persist it on exit."""
+    recorder = StageRecorder(kind)
+    token = _active_recorder.set(recorder)
+    try:
+        yield recorder
+    except Exception:
+        recorder.succeeded = False
+        raise
+    finally:
+        _active_recorder.reset(token)
+        _persist(recorder, query=query, document=document, user=user)
+
+
+def stage(name, **detail):
+    recorder = _active_recorder.get()
+    if recorder is None:
+        return nullcontext()
+    return recorder.stage(name, **detail)
+
+
+def incr(name, value=1):
+    recorder = _active_recorder.get()
+    if recorder is not None:
+        recorder.incr(name, value)
+
+
+def set_counter(name, value):
+    recorder = _active_recorder.get()
+    if recorder is not None:
+        recorder.set(name, value)
+
+
+def _persist(recorder, query="", document=None, user=None):
+    if not getattr(settings, "DOCUMENTS_METRICS_ENABLED", True):
+        return
+    from documents.models import RagTiming
+
+    try:
+        RagTiming.objects.create(
+            kind=recorder.kind,
+            query=(query or "")[:2000],
+            document_id=getattr(document, "pk", None),
+            user_id=getattr(user, "pk", None) if getattr(user, "is_authenticated", False) else None,
+            succeeded=recorder.succeeded,
+            total_ms=round(recorder.total_ms, 3),
+            stages={name: round(value, 3) for name, value in recorder.stages.items()},
+            counters=recorder.counters,
+            details=recorder.details,
+        )
+    except Exception:
+        logger.warning("Cannot persist %s timing.", recorder.kind, exc_info=True)
+
+
+def render_prometheus(window_seconds=DEFAULT_METRICS_WINDOW_SECONDS):
+    """Render stage latency summaries and counter totals in Prometheus text format.
+
+    Rows are read back from ``RagTiming`` so every gunicorn/Celery worker contributes
+    to the same series.
+    """
+    from documents.models import RagTiming
+
+    since = timezone.now() - timedelta(seconds=window_seconds)
+    stage_values = {}
+    counter_totals = {}
+    totals = {}
+    failures = {}
+    rows = (
+        RagTiming.objects.filter(created_at__gte=since)
+        .order_by("-created_at")
+        .values_list("kind", "total_ms", "stages", "counters", "succeeded")[:MAX_METRICS_ROWS]
+    )
+    for kind, total_ms, stages, counters, succeeded in rows:
+        totals.setdefault(kind, []).append(float(total_ms or 0))
+        failures[kind] = failures.get(kind, 0) + (0 if succeeded else 1)
+        for name, value in (stages or {}).items():
+            stage_values.setdefault((kind, name), []).append(float(value))
+        for name, value in (counters or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                counter_totals[(kind, name)] = counter_totals.get((kind, name), 0) + value
+
+    lines = [
+        "# HELP documents_rag_window_seconds Time window the summaries below are computed over.",
+        "# TYPE documents_rag_window_seconds gauge",
+        f"documents_rag_window_seconds {int(window_seconds)}",
+        "# HELP documents_rag_duration_seconds End-to-end duration of RAG searches and ingests.",
+        "# TYPE documents_rag_duration_seconds summary",
+    ]
+    for kind, values in sorted(totals.items()):
+        lines.extend(_summary_lines("documents_rag_duration_seconds", {"kind": kind}, values))
+    lines.extend(
+        [
+            "# HELP documents_rag_stage_seconds Duration of each RAG pipeline stage.",
+            "# TYPE documents_rag_stage_seconds summary",
+        ]
+    )
+    for (kind, name), values in sorted(stage_values.items()):
+        lines.extend(_summary_lines("documents_rag_stage_seconds", {"kind": kind, "stage": name}, values))
+    lines.extend(
+        [
+            "# HELP documents_rag_failures Failed RAG runs in the window.",
+            "# TYPE documents_rag_failures gauge",
+        ]
+    )
+    for kind, value in sorted(failures.items()):
+        lines.append(f'documents_rag_failures{{kind="{kind}"}} {value}')
+    lines.extend(
+        [
+            "# HELP documents_rag_counter Candidate counts and cache hits summed over the window.",
+            "# TYPE documents_rag_counter gauge",
+        ]
+    )
+    for (kind, name), value in sorted(counter_totals.items()):
+        lines.append(f'documents_rag_counter{{kind="{kind}",name="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _summary_lines(metric, labels, values_ms):
+    seconds = np.array(values_ms, dtype=np.float64) / 1000.0
+    label_text = ",".join(f'{key}="{_label(value)}"' for key, value in labels.items())
+    lines = [
+        f'{metric}{{{label_text},quantile="{quantile}"}} {float(np.quantile(seconds, quantile)):.6f}'
+        for quantile in PROMETHEUS_QUANTILES
+    ]
+    lines.append(f"{metric}_sum{{{label_text}}} {float(seconds.sum()):.6f}")
+    lines.append(f"{metric}_count{{{label_text}}} {len(seconds)}")
+    return lines
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
@@ -4,6 +4,7 @@ import re
 
 import numpy as np
 from django.conf import settings
+from django.db import connection
 
 try:
     permissions = importlib.import_module("ai_tools.permissions")
@@ -16,7 +17,8 @@ get_ai_tool_scopes_for_user = permissions.get_ai_tool_scopes_for_user
 
 from pgvector.django import CosineDistance
 from ..models import Document, DocumentChunk
-from .embeddings import get_embedding
+from . import metrics
+from .embeddings import embed_query
 from .normalization import normalize_doc_type, normalize_text
 from .query_parser import parse_query
 from .ranker import matches_document_type, score_chunk
@@ -49,10 +51,16 @@ def filter_documents_for_user(user, queryset=None):
 
 
 def search_documents(user, query, factory="", document_type="", folder_id=None, limit=5):
-    parsed_query = parse_query(query)
-    query = (query or "").strip()
-    if not query:
+    if not (query or "").strip():
         return []
+    with metrics.record("search", query=query, user=user):
+        return _search_documents(user, query, factory, document_type, folder_id, limit)
+
+
+def _search_documents(user, query, factory, document_type, folder_id, limit):
+    with metrics.stage("parse_query"):
+        parsed_query = parse_query(query)
+    query = (query or "").strip()
 
     allowed_factories = _resolve_allowed_factories(user, factory or parsed_query.get("factory", ""))
     if not allowed_factories:
@@ -69,27 +77,34 @@ def search_documents(user, query, factory="", document_type="", folder_id=None,
         base_queryset = base_queryset.filter(document__folders__id=folder_id)
 
     if document_type:
-        matching_doc_ids = [
-            document.id
-            for document in Document.objects.filter(
-                status=Document.STATUS_READY,
-                factory__in=allowed_factories,
-            ).only("id", "document_type")
-            if matches_document_type(document.document_type, document_type)
-        ]
+        with metrics.stage("document_type_filter"):
+            matching_doc_ids = [
+                document.id
+                for document in Document.objects.filter(
+                    status=Document.STATUS_READY,
+                    factory__in=allowed_factories,
+                ).only("id", "document_type")
+                if matches_document_type(document.document_type, document_type)
+            ]
         base_queryset = base_queryset.filter(document_id__in=matching_doc_ids)
 
     candidates = _collect_candidates(base_queryset, parsed_query, query)
+    metrics.set_counter("candidates", len(candidates))
     if not candidates:
         return []
 
-    ranked = _rank_candidates(candidates, parsed_query, query)
-    ranked = [item for item in ranked if item["scores"]["score"] >= MIN_FINAL_SCORE]
+    with metrics.stage("ranking"):
+        ranked = _rank_candidates(candidates, parsed_query, query)
+        ranked = [item for item in ranked if item["scores"]["score"] >= MIN_FINAL_SCORE]
+    metrics.set_counter("ranked", len(ranked))
     if not ranked:
         return []
 
     result_limit = max(1, min(int(limit or 3), 12))
-    return [_format_result(item, parsed_query) for item in ranked[:result_limit]]
+    with metrics.stage("formatting"):
+        results = [_format_result(item, parsed_query) for item in ranked[:result_limit]]
+    metrics.set_counter("results", len(results))
+    return results
 
 
 def _resolve_allowed_factories(user, requested_factory):
@@ -103,24 +118,33 @@ def _resolve_allowed_factories(user, requested_factory):
 
 def _collect_candidates(base_queryset, parsed_query, query):
     candidates = {}
-    query_embedding = get_embedding(query)
-
-    for chunk in _semantic_candidates(base_queryset, query_embedding):
+    with metrics.stage("embedding"):
+        signature, query_embedding = embed_query(query)
+
+    # Vectors from different backends live in different spaces: only compare like with like.
+    with metrics.stage("semantic_query"):
+        semantic_chunks = _semantic_candidates(base_queryset.filter(embedding_backend=signature), query_embedding)
+    metrics.set_counter("semantic_candidates", len(semantic_chunks))
+    for chunk in semantic_chunks:
         distance = getattr(chunk, "distance", None)
         semantic_score = max(0.0, 1.0 - float(distance)) if distance is not None else 0.0
         candidates[chunk.id] = {"chunk": chunk, "semantic_score": semantic_score}
 
-    for chunk in _keyword_candidates(base_queryset, parsed_query):
+    keyword_chunks = _keyword_candidates(base_queryset, parsed_query)
+    metrics.set_counter("keyword_candidates", len(keyword_chunks))
+    for chunk in keyword_chunks:
         candidates.setdefault(chunk.id, {"chunk": chunk, "semantic_score": 0.0})
 
     if query_embedding is not None and len(query_embedding) > 0:
         missing_chunks = [
             item["chunk"]
             for item in candidates.values()
-            if item["semantic_score"] == 0.0
+            if item["semantic_score"] == 0.0 and item["chunk"].embedding_backend == signature
         ]
+        metrics.set_counter("rescored_candidates", len(missing_chunks))
         if missing_chunks:
-            semantic_scores = _compute_semantic_scores(missing_chunks, query_embedding)
+            with metrics.stage("semantic_rescore"):
+                semantic_scores = _compute_semantic_scores(missing_chunks, query_embedding)
             for chunk_id, semantic_score in semantic_scores.items():
                 candidates[chunk_id]["semantic_score"] = semantic_score
 
@@ -131,6 +155,9 @@ def _semantic_candidates(base_queryset, query_embedding):
     if query_embedding is None or len(query_embedding) == 0:
         return []
 
+    if connection.vendor != "postgresql":
+        return _python_semantic_candidates(base_queryset, query_embedding)
+
     # Use pgvector CosineDistance query to sort directly in database
     chunks = list(
         base_queryset
@@ -140,6 +167,20 @@ def _semantic_candidates(base_queryset, query_embedding):
     return chunks
 
 
+def _python_semantic_candidates(base_queryset, query_embedding):
+    # SQLite (dev, tests, offline benchmarks) has no pgvector operator: rank in numpy instead.
+    chunks = list(base_queryset[:SEMANTIC_CANDIDATE_LIMIT])
+    scores = _compute_semantic_scores(chunks, query_embedding)
+    ranked = sorted(
+        (chunk for chunk in chunks if chunk.id in scores),
+        key=lambda chunk: scores[chunk.id],
+        reverse=True,
+    )[:KEYWORD_CANDIDATE_LIMIT]
+    for chunk in ranked:
+        chunk.distance = 1.0 - scores[chunk.id]
+    return ranked
+
+
 def _keyword_candidates(base_queryset, parsed_query):
     filters = []
 
@@ -165,15 +206,21 @@ def _keyword_candidates(base_queryset, parsed_query):
     for lookup, value in filters:
         if not value:
             continue
-        for chunk in base_queryset.filter(**{lookup: value})[:KEYWORD_CANDIDATE_LIMIT]:
+        with metrics.stage("keyword_query", lookup=lookup, value=value):
+            rows = list(base_queryset.filter(**{lookup: value})[:KEYWORD_CANDIDATE_LIMIT])
+        metrics.incr("keyword_queries")
+        for chunk in rows:
             candidates[chunk.id] = chunk
 
-    python_candidates = _python_keyword_candidates(base_queryset, parsed_query)
+    with metrics.stage("python_scan"):
+        python_candidates = _python_keyword_candidates(base_queryset, parsed_query)
+    metrics.set_counter("python_scan_candidates", len(python_candidates))
     for chunk in python_candidates:
         candidates[chunk.id] = chunk
 
     if not candidates:
-        return list(base_queryset[: min(KEYWORD_CANDIDATE_LIMIT, 200)])
+        with metrics.stage("keyword_fallback_query"):
+            return list(base_queryset[: min(KEYWORD_CANDIDATE_LIMIT, 200)])
     return list(candidates.values())
 
 
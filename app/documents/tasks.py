@@ -4,7 +4,7 @@ from celery import shared_task
 from django.db import close_old_connections
 
 from documents.models import Document
-from documents.services.ingest import process_document
+from documents.services.ingest import process_document, reembed_stale_chunks
 
 
 logger = logging.getLogger(__name__)
@@ -20,3 +20,12 @@ def process_document_task(self, document_id):
         logger.warning("Document %s no longer exists before queued processing started.", document_id)
     finally:
         close_old_connections()
+
+
+@shared_task
+def reembed_stale_chunks_task():
+    close_old_connections()
+    try:
+        return reembed_stale_chunks()
+    finally:
+        close_old_connections()
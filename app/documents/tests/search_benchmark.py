@@ -0,0 +1,142 @@
+"""Replay harness for ``search_documents``.
+
+Loads the synthetic procedure corpus in ``fixtures/search_corpus.json``, replays its
+labelled queries and reports latency percentiles, SQL queries per search and
+recall/MRR. It only uses the hash embedding backend, so it runs offline on SQLite
+or on a local PostgreSQL with pgvector.
+"""
+
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from documents.models import Document, DocumentChunk, RagTiming
+from documents.services.chunking import chunk_markdown
+from documents.services.embeddings import embed_texts
+from documents.services.retrieval import search_documents
+
+
+CORPUS_PATH = Path(__file__).resolve().parent / "fixtures" / "search_corpus.json"
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def load_corpus(path=None, copies=1):
+    """Create ready documents and chunks for the fixture corpus.
+
+    ``copies`` > 1 adds renamed duplicates of every document as distractors, to
+    measure how latency grows with corpus size.
+    """
+    with open(path or CORPUS_PATH, encoding="utf-8") as handle:
+        corpus = json.load(handle)
+
+    with override_settings(DOCUMENTS_EMBEDDING_BACKEND="hash"):
+        for copy_index in range(max(1, copies)):
+            for item in corpus["documents"]:
+                title = item["title"] if copy_index == 0 else f"{item['title']} (ban sao {copy_index})"
+                document = Document.objects.create(
+                    title=title,
+                    original_file=f"ai_documents/benchmark/{copy_index}-{len(title)}.md",
+                    markdown_text=item["markdown"],
+                    status=Document.STATUS_READY,
+                    factory=item.get("factory", Document.FACTORY_GENERAL),
+                    document_type=item.get("document_type", ""),
+                )
+                chunks = chunk_markdown(item["markdown"])
+                signature, embeddings = embed_texts([chunk["content"] for chunk in chunks])
+                DocumentChunk.objects.bulk_create(
+                    [
+                        DocumentChunk(
+                            document=document,
+                            chunk_index=index,
+                            heading_path=chunk.get("heading_path", ""),
+                            content=chunk["content"],
+                            token_count=chunk.get("token_count", 0),
+                            page_from=chunk.get("page_from"),
+                            page_to=chunk.get("page_to"),
+                            metadata=chunk.get("metadata", {}),
+                            embedding=embeddings[index],
+                            embedding_backend=signature,
+                        )
+                        for index, chunk in enumerate(chunks)
+                    ]
+                )
+    return corpus
+
+
+def replay(user, queries, k=5, rounds=1):
+    """Run every labelled query ``rounds`` times and collect per-search measurements."""
+    since = timezone.now()
+    runs = []
+    with override_settings(DOCUMENTS_EMBEDDING_BACKEND="hash", DOCUMENTS_METRICS_ENABLED=True):
+        for _ in range(max(1, rounds)):
+            for item in queries:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    results = search_documents(user, item["query"], limit=k)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                sql_count = sum(1 for query in captured.captured_queries if "documents_ragtiming" not in query["sql"])
+                runs.append(
+                    {
+                        "query": item["query"],
+                        "ms": elapsed_ms,
+                        "sql_queries": sql_count,
+                        "rank": _first_hit_rank(results, item),
+                    }
+                )
+    return build_report(runs, k, since)
+
+
+def build_report(runs, k, since):
+    latencies = np.array([run["ms"] for run in runs], dtype=np.float64)
+    sql_counts = np.array([run["sql_queries"] for run in runs], dtype=np.float64)
+    ranks = [run["rank"] for run in runs]
+    stage_values = {}
+    for stages in RagTiming.objects.filter(kind=RagTiming.KIND_SEARCH, created_at__gte=since).values_list("stages", flat=True):
+        for name, value in (stages or {}).items():
+            stage_values.setdefault(name, []).append(float(value))
+
+    return {
+        "searches": len(runs),
+        "k": k,
+        "latency_ms": _percentiles(latencies),
+        "sql_queries": {
+            "mean": round(float(sql_counts.mean()), 2) if len(sql_counts) else 0.0,
+            "max": int(sql_counts.max()) if len(sql_counts) else 0,
+        },
+        "recall_at_k": round(sum(1 for rank in ranks if rank and rank <= k) / max(1, len(ranks)), 4),
+        "mrr": round(sum(1.0 / rank for rank in ranks if rank) / max(1, len(ranks)), 4),
+        "stages_ms": {name: _percentiles(np.array(values)) for name, values in sorted(stage_values.items())},
+        "misses": sorted({run["query"] for run in runs if not run["rank"]}),
+    }
+
+
+def format_report(report):
+    latency = report["latency_ms"]
+    lines = [
+        f"searches={report['searches']} recall@{report['k']}={report['recall_at_k']:.4f} mrr={report['mrr']:.4f}",
+        "latency ms " + " ".join(f"p{p}={latency[f'p{p}']:.2f}" for p in LATENCY_PERCENTILES),
+        f"sql queries/search mean={report['sql_queries']['mean']} max={report['sql_queries']['max']}",
+    ]
+    for name, values in report["stages_ms"].items():
+        lines.append(f"  {name:<22} p50={values['p50']:.2f} p95={values['p95']:.2f}")
+    for query in report["misses"]:
+        lines.append(f"  miss: {query}")
+    return "\n".join(lines)
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f"p{p}": 0.0 for p in LATENCY_PERCENTILES}
+    return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in LATENCY_PERCENTILES}
+
+
+def _first_hit_rank(results, item):
+    for rank, result in enumerate(results, start=1):
+        if result["document_title"] == item["document"] and item["expected"] in result["content"]:
+            return rank
+    return None
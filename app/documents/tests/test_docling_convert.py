@@ -1,6 +1,6 @@
 from django.test import SimpleTestCase
 
-from documents.services.docling_convert import _is_pdf_text_low_quality, _is_text_too_short
+from documents.services.docling_convert import _is_pdf_page_low_quality, _is_pdf_text_low_quality, _is_text_too_short
 
 
 class DoclingConvertTests(SimpleTestCase):
@@ -62,3 +62,17 @@ thoph(Pham Hoang Tho) - 04/06/2026 16:44:22
         markdown = f"# quy-che.pdf\n\n## Trang 1\n\n{readable}"
 
         self.assertFalse(_is_pdf_text_low_quality(markdown))
+
+    def test_page_quality_checks_density_and_glyphs_not_vietnamese_markers(self):
+        table = "| Date | Level (m) | Inflow (m3/s) |\n|---|---|---|\n" + "| 2026-07-01 | 201.5 | 10.2 |\n" * 3
+        english = "Operating procedure for the Song Hinh reservoir during the flood season."
+        self.assertFalse(_is_pdf_page_low_quality(table))
+        self.assertFalse(_is_pdf_page_low_quality(english))
+        self.assertTrue(_is_pdf_text_low_quality(english))
+
+        self.assertTrue(_is_pdf_page_low_quality(""))
+        self.assertTrue(_is_pdf_page_low_quality("## Trang 3\n\nPhụ lục 1"))
+        self.assertTrue(_is_pdf_page_low_quality("(cid:12)(cid:34)(cid:56) " * 10 + "Quy dinh van hanh ho chua"))
+        self.assertTrue(_is_pdf_page_low_quality("\ufffd\ufffd Quy \ufffd\ufffdnh v\ufffdn h\ufffdnh h\ufffd ch\ufffda ng\ufffdy 01 th\ufffdng 9"))
+        self.assertTrue(_is_pdf_page_low_quality("ceNG noa xAHqr cHU xcniavrET NAM DQc l$p Tr; do H4nh phric PHOr HQ VAN HANH GrtrA"))
+        self.assertFalse(_is_pdf_page_low_quality("Mùa lũ được quy định từ ngày 01 tháng 9 đến ngày 15 tháng 12 hằng năm."))
@@ -12,13 +12,15 @@ except ImportError:
     sys.modules["docling"] = mock_docling
     sys.modules["docling.document_converter"] = mock_docling.document_converter
 
-from django.test import SimpleTestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
 
 from documents.services.docling_convert import (
     _extract_pdf_text,
     _extract_pdf_text_or_ocr,
     _fallback_text,
     _ocr_pdf,
+    _page_ranges,
     convert_file_to_markdown,
 )
 
@@ -95,3 +97,93 @@ class DoclingConversionEdgeTests(SimpleTestCase):
             self.assertIn("nội dung", _fallback_text(path))
             path.write_bytes(b"")
             self.assertIn("data.bin", _fallback_text(path))
+
+
+@override_settings(
+    DOCUMENTS_PDF_CONVERT_WORKERS=1,
+    DOCUMENTS_PDF_PAGES_PER_TASK=2,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class PdfPageConversionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_page_ranges_split_on_gaps_and_size(self):
+        self.assertEqual(_page_ranges([1, 2, 3, 5, 6, 9], 2), [[1, 2], [3], [5, 6], [9]])
+        self.assertEqual(_page_ranges([], 10), [])
+
+    def test_only_low_quality_pages_fall_back_to_ocr(self):
+        good = "Quy định vận hành hồ chứa ngày 01 tháng 9. " * 20
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "quy-trinh.pdf"
+            path.write_bytes(b"%PDF-1.4 scanned")
+            with patch("documents.services.docling_convert._pdf_page_count", return_value=3), patch(
+                "documents.services.docling_convert._docling_pages",
+                side_effect=lambda _path, pages: {page: good if page != 2 else "" for page in pages},
+            ) as docling_pages, patch(
+                "documents.services.docling_convert._pypdf_pages", return_value={}
+            ), patch(
+                "documents.services.docling_convert._ocr_pdf_page", return_value="OCR trang hai"
+            ) as ocr_page:
+                markdown = convert_file_to_markdown(path)
+
+                self.assertIn("## Trang 2\n\nOCR trang hai", markdown)
+                self.assertIn("## Trang 3", markdown)
+                ocr_page.assert_called_once_with(path, 2)
+                self.assertEqual(docling_pages.call_count, 2)
+
+                self.assertEqual(convert_file_to_markdown(path), markdown)
+                self.assertEqual(docling_pages.call_count, 2)
+                ocr_page.assert_called_once()
+
+    def test_pdf_without_any_text_raises(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "blank.pdf"
+            path.write_bytes(b"%PDF-1.4 blank")
+            with patch("documents.services.docling_convert._pdf_page_count", return_value=1), patch(
+                "documents.services.docling_convert._convert_pdf_page_range", return_value=[(1, "", False)]
+            ):
+                with self.assertRaisesRegex(ValueError, "PDF"):
+                    convert_file_to_markdown(path)
+
+    def test_empty_and_failed_pages_are_not_cached(self):
+        good = "Quy định vận hành hồ chứa ngày 01 tháng 9. " * 20
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "quy-trinh.pdf"
+            path.write_bytes(b"%PDF-1.4 flaky")
+            with patch("documents.services.docling_convert._pdf_page_count", return_value=4), patch(
+                "documents.services.docling_convert._docling_pages",
+                side_effect=[None, {3: good, 4: ""}, {1: good, 2: good}, {4: ""}],
+            ) as docling_pages, patch(
+                "documents.services.docling_convert._pypdf_pages",
+                side_effect=lambda _path, pages: {page: good for page in pages if page != 4},
+            ), patch("documents.services.docling_convert._ocr_pdf_page", return_value=""):
+                first = convert_file_to_markdown(path)
+                self.assertIn("## Trang 1", first)
+                self.assertNotIn("## Trang 4", first)
+
+                # Trang 1-2 lay tu pypdf vi Docling loi, trang 4 rong: ca ba duoc chuyen lai.
+                self.assertEqual(convert_file_to_markdown(path), first)
+                self.assertEqual(docling_pages.call_count, 4)
+                self.assertEqual(
+                    [call.args[1] for call in docling_pages.call_args_list],
+                    [[1, 2], [3, 4], [1, 2], [4]],
+                )
+
+    def test_page_needing_ocr_is_not_cached_while_ocr_is_unavailable(self):
+        good = "Quy định vận hành hồ chứa ngày 01 tháng 9. " * 20
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "scan.pdf"
+            path.write_bytes(b"%PDF-1.4 scan")
+            with patch("documents.services.docling_convert._pdf_page_count", return_value=2), patch(
+                "documents.services.docling_convert._docling_pages",
+                side_effect=lambda _path, pages: {page: good if page == 1 else "" for page in pages},
+            ) as docling_pages, patch(
+                "documents.services.docling_convert._pypdf_pages", return_value={2: "ab"}
+            ), patch.dict("sys.modules", {"pytesseract": None}):
+                self.assertIn("## Trang 2\n\nab", convert_file_to_markdown(path))
+                convert_file_to_markdown(path)
+
+        # Trang 1 lay tu cache, trang 2 (can OCR nhung khong co OCR) duoc chuyen lai.
+        self.assertEqual([call.args[1] for call in docling_pages.call_args_list], [[1, 2], [2]])
+
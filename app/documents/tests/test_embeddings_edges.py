@@ -1,13 +1,20 @@
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
+import numpy as np
 from django.test import SimpleTestCase, override_settings
 
+from documents.services.embedding_benchmark import evaluate_backend, load_dataset
 from documents.services.embeddings import (
     FALLBACK_DIMENSIONS,
+    STORAGE_DIMENSIONS,
+    HashEmbeddingBackend,
+    LocalEmbeddingBackend,
     _hash_embedding,
     cosine_similarity,
+    embed_texts,
     get_embedding,
+    get_embedding_backends,
     get_embeddings_batch,
 )
 
@@ -37,6 +44,18 @@ class EmbeddingTests(SimpleTestCase):
         result = get_embedding("text")
         self.assertEqual(len(result), FALLBACK_DIMENSIONS)
 
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "key"})
+    @patch("openai.OpenAI")
+    def test_embed_texts_reports_the_backend_that_answered(self, openai):
+        client = openai.return_value
+        client.embeddings.create.return_value = SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2])])
+        self.assertEqual(embed_texts(["text"]), ("openai:text-embedding-3-small", [[0.1, 0.2]]))
+
+        client.embeddings.create.side_effect = RuntimeError("offline")
+        signature, vectors = embed_texts(["text"])
+        self.assertEqual(signature, "hash")
+        self.assertEqual(len(vectors[0]), FALLBACK_DIMENSIONS)
+
     def test_cosine_similarity_handles_equal_orthogonal_zero_and_mismatch(self):
         self.assertEqual(cosine_similarity([1, 0], [1, 0]), 1.0)
         self.assertEqual(cosine_similarity([1, 0], [0, 1]), 0.0)
@@ -69,3 +88,62 @@ class EmbeddingTests(SimpleTestCase):
         result = get_embeddings_batch(["a", "", None])
         self.assertEqual(len(result), 3)
         self.assertTrue(all(len(item) == FALLBACK_DIMENSIONS for item in result))
+
+
+class EmbeddingBackendTests(SimpleTestCase):
+    @patch.dict("os.environ", {"OPENAI_API_KEY": ""})
+    @override_settings(OPENAI_API_KEY="", DOCUMENTS_EMBEDDING_BACKEND="auto", DOCUMENTS_LOCAL_EMBEDDING_MODEL="")
+    def test_auto_without_key_or_local_model_uses_hash_only(self):
+        self.assertEqual([backend.name for backend in get_embedding_backends()], ["hash"])
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": ""})
+    @override_settings(OPENAI_API_KEY="", DOCUMENTS_LOCAL_EMBEDDING_MODEL="local-model")
+    @patch.object(LocalEmbeddingBackend, "is_available", return_value=True)
+    @patch("documents.services.embeddings._load_local_model")
+    def test_local_backend_batches_with_prefix_and_pads_to_storage_dimensions(self, load_model, _available):
+        load_model.return_value.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 4))
+        with override_settings(DOCUMENTS_LOCAL_EMBEDDING_QUERY_PREFIX="query: "):
+            vector = get_embedding("muc nuoc ho")
+
+        self.assertEqual(len(vector), STORAGE_DIMENSIONS)
+        self.assertEqual(vector[:5], [1.0, 1.0, 1.0, 1.0, 0.0])
+        load_model.return_value.encode.assert_called_once()
+        self.assertEqual(load_model.return_value.encode.call_args.args[0], ["query: muc nuoc ho"])
+
+        load_model.return_value.encode.side_effect = RuntimeError("model missing")
+        self.assertEqual(len(get_embeddings_batch(["a", "b"])), 2)
+
+    def test_benchmark_reports_exact_recall_and_mrr_for_fixed_vectors(self):
+        vectors = {
+            "a": [1, 0, 0], "b": [0, 1, 0], "c": [0, 0, 1], "d": [1, 1, 0],
+            "qa": [1, 0, 0], "qb": [0, 1, 0], "qc": [0, 0, 1],
+        }
+        backend = Mock(embed=lambda texts, kind: [vectors[text] for text in texts])
+        backend.name = "fixed"
+        dataset = {
+            "passages": [{"id": f"p{index}", "text": text} for index, text in enumerate("abcd", start=1)],
+            "queries": [
+                # Ranking p1, p4, p2, p3: hit at rank 1.
+                {"query": "qa", "relevant": ["p1"]},
+                # Ranking p2, p4, p1, p3: half the relevant set in the top 2, first hit at rank 2.
+                {"query": "qb", "relevant": ["p4", "p3"]},
+                # Ranking p3, p1, p2, p4: misses the top 2, first hit at rank 3.
+                {"query": "qc", "relevant": ["p2"]},
+            ],
+        }
+
+        result = evaluate_backend(backend, dataset, k=2)
+
+        self.assertEqual((result["queries"], result["passages"]), (3, 4))
+        self.assertEqual(result["recall_at_k"], round((1 + 0.5 + 0) / 3, 4))
+        self.assertEqual(result["mrr"], round((1 + 1 / 2 + 1 / 3) / 3, 4))
+
+    def test_benchmark_scores_shipped_corpus_with_hash_backend(self):
+        dataset = load_dataset()
+
+        at_1 = evaluate_backend(HashEmbeddingBackend(), dataset, k=1)
+        at_5 = evaluate_backend(HashEmbeddingBackend(), dataset, k=5)
+
+        self.assertEqual((at_5["queries"], at_5["passages"]), (24, 16))
+        self.assertEqual((at_1["recall_at_k"], at_1["mrr"]), (0.6875, 0.8127))
+        self.assertEqual((at_5["recall_at_k"], at_5["mrr"]), (0.8958, 0.8127))
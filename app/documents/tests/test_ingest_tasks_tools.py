@@ -8,8 +8,8 @@ from django.core.files.base import ContentFile
 from django.test import TestCase, override_settings
 
 from documents.ai_tools import handle_document_tool_call
-from documents.models import Document, DocumentChunk
-from documents.services.ingest import process_document
+from documents.models import Document, DocumentChunk, RagTiming
+from documents.services.ingest import process_document, reembed_stale_chunks
 from documents.tasks import process_document_task
 
 
@@ -33,7 +33,7 @@ class DocumentIngestTests(TestCase):
         self.override.disable()
         shutil.rmtree(self.media_root, ignore_errors=True)
 
-    @patch("documents.services.ingest.get_embeddings_batch", return_value=[[0.1] * 1536, [0.2] * 1536])
+    @patch("documents.services.ingest.embed_texts", return_value=("hash", [[0.1] * 1536, [0.2] * 1536]))
     @patch("documents.services.ingest.chunk_markdown")
     @patch("documents.services.ingest.convert_file_to_markdown", return_value="# Heading\nBody")
     def test_process_document_replaces_chunks_and_marks_ready(self, _convert, chunk_markdown, _embeddings):
@@ -48,6 +48,12 @@ class DocumentIngestTests(TestCase):
         self.assertEqual(self.document.markdown_text, "# Heading\nBody")
         self.assertIsNotNone(self.document.processed_at)
         self.assertEqual(list(self.document.chunks.values_list("content", flat=True)), ["first", "second"])
+        self.assertEqual(set(self.document.chunks.values_list("embedding_backend", flat=True)), {"hash"})
+
+        timing = RagTiming.objects.get(kind=RagTiming.KIND_INGEST, document=self.document)
+        self.assertTrue(timing.succeeded)
+        self.assertEqual(set(timing.stages), {"convert", "chunk", "embed", "write"})
+        self.assertEqual(timing.counters["chunks"], 2)
 
     @patch("documents.services.ingest.convert_file_to_markdown", side_effect=RuntimeError("convert failed"))
     def test_process_document_marks_failed_and_preserves_existing_chunks(self, _convert):
@@ -57,8 +63,9 @@ class DocumentIngestTests(TestCase):
         self.assertEqual(self.document.status, Document.STATUS_FAILED)
         self.assertIn("convert failed", self.document.error_message)
         self.assertEqual(self.document.chunks.get().content, "old")
+        self.assertFalse(RagTiming.objects.get(document=self.document).succeeded)
 
-    @patch("documents.services.ingest.get_embeddings_batch", return_value=[])
+    @patch("documents.services.ingest.embed_texts", return_value=("hash", []))
     @patch("documents.services.ingest.chunk_markdown", return_value=[{"content": "new"}])
     @patch("documents.services.ingest.convert_file_to_markdown", return_value="new")
     def test_process_document_fails_when_embedding_count_is_inconsistent(self, _convert, _chunks, _embeddings):
@@ -68,6 +75,35 @@ class DocumentIngestTests(TestCase):
         self.assertEqual(self.document.status, Document.STATUS_FAILED)
         self.assertEqual(self.document.chunks.get().content, "old")
 
+    @patch("documents.services.ingest.get_active_signature", return_value="local:model")
+    @patch("documents.services.ingest.embed_texts")
+    def test_reembed_rewrites_only_chunks_from_another_backend(self, embed_texts, _active):
+        self.document.status = Document.STATUS_READY
+        self.document.save(update_fields=["status"])
+        DocumentChunk.objects.create(
+            document=self.document,
+            chunk_index=1,
+            content="current",
+            embedding=[0.3] * 1536,
+            embedding_backend="local:model",
+        )
+        embed_texts.return_value = ("local:model", [[0.5] * 1536])
+
+        self.assertEqual(reembed_stale_chunks(), 1)
+        embed_texts.assert_called_once_with(["old"])
+        chunk = self.document.chunks.get(chunk_index=0)
+        self.assertEqual(chunk.embedding_backend, "local:model")
+        self.assertAlmostEqual(float(chunk.embedding[0]), 0.5)
+        self.assertEqual(reembed_stale_chunks(), 0)
+
+    @patch("documents.services.ingest.get_active_signature", return_value="local:model")
+    @patch("documents.services.ingest.embed_texts", return_value=("hash", [[0.5] * 1536]))
+    def test_reembed_keeps_chunks_when_active_backend_falls_back(self, _embed_texts, _active):
+        self.document.status = Document.STATUS_READY
+        self.document.save(update_fields=["status"])
+        self.assertEqual(reembed_stale_chunks(), 0)
+        self.assertEqual(self.document.chunks.get().embedding_backend, "")
+
 
 class DocumentTaskAndToolTests(TestCase):
     databases = {"default"}
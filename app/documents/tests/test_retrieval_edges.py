@@ -8,7 +8,7 @@ from django.core.files.base import ContentFile
 from django.test import TestCase, override_settings
 
 from core.models import UserProfile
-from documents.models import Document, DocumentChunk, DocumentFolder
+from documents.models import Document, DocumentChunk, DocumentFolder, RagTiming
 from documents.services.query_parser import parse_query
 from documents.services.retrieval import (
     _build_context,
@@ -55,6 +55,7 @@ class DocumentSearchTests(TestCase):
             page_from=3,
             metadata={"section_id": "s1", "section_title": "Nhiem vu trong mua lu", "section_part": 0},
             embedding=[1.0] + [0.0] * 1535,
+            embedding_backend="hash",
         )
         DocumentChunk.objects.create(
             document=self.document,
@@ -63,13 +64,14 @@ class DocumentSearchTests(TestCase):
             content="Chi tiet danh sach nhiem vu tiep theo.",
             metadata={"section_id": "s1", "section_title": "Nhiem vu trong mua lu", "section_part": 1},
             embedding=[1.0] + [0.0] * 1535,
+            embedding_backend="hash",
         )
 
     def tearDown(self):
         self.override.disable()
         shutil.rmtree(self.media_root, ignore_errors=True)
 
-    @patch("documents.services.retrieval.get_embedding", return_value=[1.0] + [0.0] * 1535)
+    @patch("documents.services.retrieval.embed_query", return_value=("hash", [1.0] + [0.0] * 1535))
     def test_search_filters_and_returns_ranked_context_with_file_link(self, _embedding):
         results = search_documents(
             self.user,
@@ -86,13 +88,13 @@ class DocumentSearchTests(TestCase):
         self.assertEqual(result["file_url"], f"http://backend/api/documents/{self.document.id}/view/#page=3")
         self.assertIn("Chi tiet danh sach", result["content"])
 
-    @patch("documents.services.retrieval.get_embedding", return_value=[1.0] + [0.0] * 1535)
+    @patch("documents.services.retrieval.embed_query", return_value=("hash", [1.0] + [0.0] * 1535))
     def test_search_rejects_empty_unknown_factory_and_nonmatching_type(self, _embedding):
         self.assertEqual(search_documents(self.user, ""), [])
         self.assertEqual(search_documents(self.user, "query", factory="unknown"), [])
         self.assertEqual(search_documents(self.user, "query", document_type="cong_van"), [])
 
-    @patch("documents.services.retrieval.get_embedding", return_value=[1.0] + [0.0] * 1535)
+    @patch("documents.services.retrieval.embed_query", return_value=("hash", [1.0] + [0.0] * 1535))
     def test_search_excludes_non_ready_and_folder_mismatch(self, _embedding):
         self.document.status = Document.STATUS_FAILED
         self.document.save(update_fields=["status"])
@@ -102,6 +104,30 @@ class DocumentSearchTests(TestCase):
         other_folder = DocumentFolder.objects.create(name="Other")
         self.assertEqual(search_documents(self.user, "quy trinh", folder_id=other_folder.id), [])
 
+    @patch("documents.services.retrieval.embed_query", return_value=("openai:text-embedding-3-small", [1.0] + [0.0] * 1535))
+    def test_search_does_not_score_vectors_from_another_backend(self, _embedding):
+        results = search_documents(self.user, "quy trinh van hanh mua lu")
+        timing = RagTiming.objects.get(kind=RagTiming.KIND_SEARCH)
+        self.assertEqual(timing.counters["semantic_candidates"], 0)
+        self.assertEqual(timing.counters.get("rescored_candidates", 0), 0)
+        self.assertTrue(all(result["semantic_score"] == 0.0 for result in results))
+        self.assertGreater(timing.counters["candidates"], 0)
+
+    @patch("documents.services.retrieval._semantic_candidates", return_value=[])
+    @patch("documents.services.retrieval.embed_query", return_value=("hash", [1.0] + [0.0] * 1535))
+    def test_search_persists_stage_timings_and_candidate_counts(self, _embedding, _semantic):
+        results = search_documents(self.user, "quy trinh van hanh mua lu")
+        timing = RagTiming.objects.get(kind=RagTiming.KIND_SEARCH)
+        self.assertEqual(timing.query, "quy trinh van hanh mua lu")
+        self.assertEqual(timing.user, self.user)
+        for stage in ("parse_query", "embedding", "semantic_query", "keyword_query", "python_scan", "ranking"):
+            self.assertIn(stage, timing.stages)
+        self.assertEqual(timing.counters["semantic_candidates"], 0)
+        self.assertGreater(timing.counters["candidates"], 0)
+        self.assertGreater(timing.counters["keyword_queries"], 0)
+        self.assertTrue(all("lookup" in item for item in timing.details))
+        self.assertEqual(timing.counters.get("results", 0), len(results))
+
     def test_semantic_scores_skip_dimension_mismatch_and_zero_vectors(self):
         valid = SimpleNamespace(id=1, embedding=[1.0, 0.0])
         mismatch = SimpleNamespace(id=2, embedding=[1.0])
@@ -0,0 +1,36 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import UserProfile
+from documents.tests.search_benchmark import format_report, load_corpus, replay
+
+
+class SearchReplayBenchmarkTests(TestCase):
+    """Set DOCUMENTS_SEARCH_BENCHMARK_REPORT=1 to print the full report."""
+
+    databases = {"default"}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="search-benchmark",
+            email="search-benchmark@example.com",
+            password="testpass123",
+        )
+        UserProfile.objects.create(user=self.user, can_use_ai_documents=True, is_all_factories=True)
+        self.corpus = load_corpus()
+
+    def test_replay_reports_latency_query_counts_and_quality(self):
+        report = replay(self.user, self.corpus["queries"], k=5)
+
+        if os.environ.get("DOCUMENTS_SEARCH_BENCHMARK_REPORT"):
+            print("\n" + format_report(report))
+
+        self.assertEqual(report["searches"], len(self.corpus["queries"]))
+        self.assertGreater(report["latency_ms"]["p95"], 0.0)
+        self.assertGreaterEqual(report["latency_ms"]["p95"], report["latency_ms"]["p50"])
+        self.assertGreater(report["sql_queries"]["mean"], 0)
+        self.assertIn("semantic_query", report["stages_ms"])
+        self.assertGreaterEqual(report["recall_at_k"], 0.7)
+        self.assertGreaterEqual(report["mrr"], 0.5)
@@ -12,7 +12,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from core.models import UserProfile
-from documents.models import Document, DocumentFolder
+from documents.models import Document, DocumentFolder, RagTiming
 from documents.serializers import DocumentUploadSerializer
 from documents.views import _enqueue_process_document, _run_process_in_background
 
@@ -171,3 +171,39 @@ class DocumentBackgroundProcessingTests(TestCase):
         _run_process_in_background(999999)
         process.assert_not_called()
         self.assertEqual(close.call_count, 2)
+
+
+@override_settings(DOCUMENTS_METRICS_TOKEN="scrape-token")
+class DocumentMetricsApiTests(APITestCase):
+    def setUp(self):
+        RagTiming.objects.create(
+            kind=RagTiming.KIND_SEARCH,
+            query="muc nuoc",
+            total_ms=120,
+            stages={"embedding": 80, "semantic_query": 30},
+            counters={"candidates": 12},
+        )
+        RagTiming.objects.create(
+            kind=RagTiming.KIND_SEARCH,
+            query="xa lu",
+            total_ms=60,
+            stages={"embedding": 20},
+            counters={"candidates": 3},
+            succeeded=False,
+        )
+
+    def test_metrics_require_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse("documents-metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(self.client.get(reverse("documents-metrics")).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_render_stage_summaries_and_counters(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer scrape-token")
+        response = self.client.get(reverse("documents-metrics"), {"window": "3600"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('documents_rag_stage_seconds_count{kind="search",stage="embedding"} 2', body)
+        self.assertIn('documents_rag_stage_seconds{kind="search",stage="embedding",quantile="0.95"}', body)
+        self.assertIn('documents_rag_counter{kind="search",name="candidates"} 15', body)
+        self.assertIn('documents_rag_failures{kind="search"} 1', body)
+        self.assertIn("documents_rag_window_seconds 3600", body)
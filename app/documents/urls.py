@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from documents.views import (
     DocumentDetailAPIView,
     DocumentListCreateAPIView,
+    DocumentMetricsAPIView,
     DocumentReprocessAPIView,
     DocumentSearchAPIView,
     DocumentViewAPIView,
@@ -16,6 +17,7 @@ router.register("folders", DocumentFolderViewSet, basename="document-folders")
 urlpatterns = [
     path("", DocumentListCreateAPIView.as_view(), name="documents-list"),
     path("search/", DocumentSearchAPIView.as_view(), name="documents-search"),
+    path("metrics/", DocumentMetricsAPIView.as_view(), name="documents-metrics"),
     path("<int:pk>/", DocumentDetailAPIView.as_view(), name="documents-detail"),
     path("<int:pk>/reprocess/", DocumentReprocessAPIView.as_view(), name="documents-reprocess"),
     path("<int:pk>/view/", DocumentViewAPIView.as_view(), name="documents-view"),
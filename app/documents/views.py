@@ -1,3 +1,4 @@
+import hmac
 import logging
 import mimetypes
 import os
@@ -6,7 +7,7 @@ import threading
 from django.conf import settings
 from django.db import close_old_connections
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.clickjacking import xframe_options_exempt
 from rest_framework import generics, status, viewsets
@@ -27,6 +28,7 @@ from documents.serializers import (
     DocumentUpdateSerializer,
 )
 from documents.services.ingest import process_document
+from documents.services.metrics import DEFAULT_METRICS_WINDOW_SECONDS, render_prometheus
 from documents.services.retrieval import (
     filter_documents_for_user,
     get_allowed_factories_for_user,
@@ -151,6 +153,42 @@ class DocumentSearchAPIView(APIView):
         return Response({"results": results})
 
 
+class DocumentMetricsAPIView(APIView):
+    """Prometheus text exposition of RAG stage timings.
+
+    Scrapers authenticate with ``DOCUMENTS_METRICS_TOKEN``; staff users may use their JWT.
+    """
+
+    authentication_classes = []
+    permission_classes = []
+    MAX_WINDOW_SECONDS = 7 * 24 * 3600
+
+    def get(self, request):
+        if not self._is_allowed(request):
+            return HttpResponse("Forbidden", status=status.HTTP_403_FORBIDDEN, content_type="text/plain")
+        try:
+            window = int(request.query_params.get("window", DEFAULT_METRICS_WINDOW_SECONDS))
+        except (TypeError, ValueError):
+            window = DEFAULT_METRICS_WINDOW_SECONDS
+        window = max(60, min(window, self.MAX_WINDOW_SECONDS))
+        return HttpResponse(render_prometheus(window), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    def _is_allowed(self, request):
+        auth_header = request.headers.get("Authorization", "")
+        token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else ""
+        expected = getattr(settings, "DOCUMENTS_METRICS_TOKEN", "")
+        if expected and token and hmac.compare_digest(token, expected):
+            return True
+        if not token:
+            return False
+        try:
+            jwt_authenticator = JWTAuthentication()
+            user = jwt_authenticator.get_user(jwt_authenticator.get_validated_token(token))
+        except (InvalidToken, TokenError):
+            return False
+        return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
+
+
 @method_decorator(xframe_options_exempt, name="dispatch")
 class DocumentViewAPIView(APIView):
     authentication_classes = []
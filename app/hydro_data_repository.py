@@ -1,5 +1,6 @@
 import unicodedata
 
+from django.utils import timezone
 from django.utils.dateparse import parse_date
 
 from thongsothuyvan.models import (
@@ -149,6 +150,19 @@ def interpolate_water_volume(target_level, reservoir="Song Hinh"):
     return build_unified_response(target_level, volume, "interpolated", reservoir, h1, v1, h2, v2)
 
 
+RAINFALL_FIELDS = (
+    "Xa_Ea_M_doan",
+    "Thon_10_Xa_Ea_M_Doal",
+    "UBND_xa_Song_Hinh",
+    "Cu_Kroa",
+    "Xa_Ea_Trang",
+    "Dap_Tran",
+    "Ho_B_TD_Vinh_Son",
+    "Ho_A_TD_Vinh_Son",
+    "Ho_C_TD_Vinh_Son",
+)
+
+
 def query_rainfall_data(start_date=None, end_date=None, limit=1000):
     queryset = TramDoMuaVrain.objects.all().order_by("Thoi_gian")
     parsed_start = parse_date(start_date) if start_date else None
@@ -159,21 +173,10 @@ def query_rainfall_data(start_date=None, end_date=None, limit=1000):
         queryset = queryset.filter(Thoi_gian__date__lte=parsed_end)
 
     rows = []
-    for record in queryset[:limit]:
-        rows.append(
-            {
-                "Thoi_gian": record.Thoi_gian.date().isoformat(),
-                "Xa_Ea_M_doan": record.Xa_Ea_M_doan,
-                "Thon_10_Xa_Ea_M_Doal": record.Thon_10_Xa_Ea_M_Doal,
-                "UBND_xa_Song_Hinh": record.UBND_xa_Song_Hinh,
-                "Cu_Kroa": record.Cu_Kroa,
-                "Xa_Ea_Trang": record.Xa_Ea_Trang,
-                "Dap_Tran": record.Dap_Tran,
-                "Ho_B_TD_Vinh_Son": record.Ho_B_TD_Vinh_Son,
-                "Ho_A_TD_Vinh_Son": record.Ho_A_TD_Vinh_Son,
-                "Ho_C_TD_Vinh_Son": record.Ho_C_TD_Vinh_Son,
-            }
-        )
+    for thoi_gian, *values in queryset.values_list("Thoi_gian", *RAINFALL_FIELDS)[:limit]:
+        row = {"Thoi_gian": timezone.localtime(thoi_gian).date().isoformat()}
+        row.update(zip(RAINFALL_FIELDS, values))
+        rows.append(row)
     return rows
 
 
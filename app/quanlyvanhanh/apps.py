@@ -21,3 +21,20 @@ class QuanlyvanhanhConfig(AppConfig):
         auditlog.register(ThongSoTram110KV)
         auditlog.register(NguongThongSo)
 
+        # Cay thiet bi cache theo nha may: doi the he khi cay hoac so lieu dem thay doi.
+        from django.db.models.signals import post_delete, post_save
+        from .models import AnToanThietBi, DinhKem, ThietBiVatTu
+        from .services.thiet_bi_tree_service import invalidate_tree_cache
+
+        for model in (ThietBi, ThietBiVatTu, AnToanThietBi, DinhKem):
+            post_save.connect(
+                invalidate_tree_cache,
+                sender=model,
+                dispatch_uid=f"quanlyvanhanh.invalidate_tree_cache.{model.__name__}.save",
+            )
+            post_delete.connect(
+                invalidate_tree_cache,
+                sender=model,
+                dispatch_uid=f"quanlyvanhanh.invalidate_tree_cache.{model.__name__}.delete",
+            )
+
@@ -171,6 +171,58 @@ TRAM_CONFIGS = {
 }
 
 
+TOMAY_EXPORT_COLUMNS = [
+    {"ten": "Áp lực nước", "ma": "ap_luc_nuoc", "don_vi": "bar"},
+    {"ten": "Áp lực chèn trục", "ma": "ap_luc_chen_truc", "don_vi": "bar"},
+    {"ten": "Lưu lượng chèn trục", "ma": "luu_luong_chen_truc", "don_vi": "l/p"},
+    {"ten": "Lưu lượng ổ hướng tuabin", "ma": "luu_luong_o_huong_tuabin", "don_vi": "l/p"},
+    {"ten": "Nhiệt độ ổ hướng tuabin", "ma": "nhiet_do_o_huong_tuabin", "don_vi": "°C"},
+    {"ten": "Lưu lượng ổ hướng máy phát", "ma": "luu_luong_o_huong_may_phat", "don_vi": "l/p"},
+    {"ten": "Nhiệt độ ổ hướng máy phát", "ma": "nhiet_do_o_huong_may_phat", "don_vi": "°C"},
+    {"ten": "Lưu lượng ổ đỡ máy phát", "ma": "luu_luong_o_do_may_phat", "don_vi": "l/p"},
+    {"ten": "Nhiệt độ ổ đỡ", "ma": "nhiet_do_o_do", "don_vi": "°C"},
+    {"ten": "Nhiệt độ ổ hướng - ổ đỡ", "ma": "nhiet_do_o_huong_o_do", "don_vi": "°C"},
+    {"ten": "Nhiệt độ đầu ổ đỡ", "ma": "nhiet_do_dau_o_do", "don_vi": "°C"},
+    {"ten": "Lưu lượng làm mát máy phát", "ma": "luu_luong_lam_mat_may_phat", "don_vi": "l/p"},
+    {"ten": "Nhiệt độ nước làm mát máy phát", "ma": "nhiet_do_nuoc_lam_mat_may_phat", "don_vi": "°C"},
+    {"ten": "Nhiệt độ khí mát", "ma": "nhiet_do_khi_mat", "don_vi": "°C"},
+    {"ten": "Nhiệt độ khí nóng", "ma": "nhiet_do_khi_nong", "don_vi": "°C"},
+    {"ten": "Nhiệt độ cuộn dây stato", "ma": "nhiet_do_cuon_day_stato", "don_vi": "°C"},
+    {"ten": "Tốc độ", "ma": "toc_do", "don_vi": "v/ph"},
+    {"ten": "Giới hạn độ mở cánh hướng", "ma": "gioi_han_do_mo_canh_huong", "don_vi": "%"},
+    {"ten": "Độ mở cánh hướng", "ma": "do_mo_canh_huong", "don_vi": "%"},
+    {"ten": "Độ rơi tốc", "ma": "do_roi_toc", "don_vi": "%"},
+]
+
+
+# 23 thong so to may Vinh Son (cot B..X cua template, cot A la gio).
+TOMAY_VS_COLUMNS = [
+    {"ten": "Nhiệt độ dầu", "ma": "nhiet_do_dau_o_do", "don_vi": "°C", "nhom": "Ổ đỡ"},
+    {"ten": "Nhiệt độ ổ đỡ", "ma": "nhiet_do_o_do", "don_vi": "°C", "nhom": "Ổ đỡ"},
+    {"ten": "Nhiệt độ ổ hướng", "ma": "nhiet_do_o_huong_o_do", "don_vi": "°C", "nhom": "Ổ đỡ"},
+    {"ten": "Cuộn dây 1", "ma": "nhiet_do_cuon_day_stato_1", "don_vi": "°C", "nhom": "Stator"},
+    {"ten": "Cuộn dây 2", "ma": "nhiet_do_cuon_day_stato_2", "don_vi": "°C", "nhom": "Stator"},
+    {"ten": "Lõi sắt 1", "ma": "nhiet_do_loi_sat_stato_1", "don_vi": "°C", "nhom": "Stator"},
+    {"ten": "Lõi sắt 2", "ma": "nhiet_do_loi_sat_stato_2", "don_vi": "°C", "nhom": "Stator"},
+    {"ten": "Nước đầu vào", "ma": "nuoc_lam_mat_dau_vao", "don_vi": "°C", "nhom": "Nước làm mát"},
+    {"ten": "Nước đầu ra", "ma": "nuoc_lam_mat_dau_ra", "don_vi": "°C", "nhom": "Nước làm mát"},
+    {"ten": "Gió làm mát", "ma": "nhiet_do_khi_mat", "don_vi": "°C", "nhom": "Nước làm mát"},
+    {"ten": "Nhiệt độ dầu", "ma": "nhiet_do_dau_o_huong_tuabin", "don_vi": "°C", "nhom": "Ổ hướng tuabin"},
+    {"ten": "Áp suất dầu", "ma": "ap_suat_dau_o_huong_tuabin", "don_vi": "bar", "nhom": "Ổ hướng tuabin"},
+    {"ten": "Ổ hướng 1", "ma": "nhiet_do_o_huong_1_tuabin", "don_vi": "°C", "nhom": "Ổ hướng tuabin"},
+    {"ten": "Ổ hướng 2", "ma": "nhiet_do_o_huong_2_tuabin", "don_vi": "°C", "nhom": "Ổ hướng tuabin"},
+    {"ten": "Áp suất dầu", "ma": "ap_suat_dau_thuy_luc", "don_vi": "bar", "nhom": "Dầu thủy lực"},
+    {"ten": "Mức dầu", "ma": "muc_dau_thuy_luc", "don_vi": "DB", "nhom": "Dầu thủy lực"},
+    {"ten": "Nhiệt độ dầu", "ma": "nhiet_do_dau_thuy_luc", "don_vi": "°C", "nhom": "Dầu thủy lực"},
+    {"ten": "Tốc độ", "ma": "toc_do", "don_vi": "v/ph", "nhom": "Hệ thống điều tốc"},
+    {"ten": "Giới hạn độ mở", "ma": "gioi_han_do_mo", "don_vi": "%", "nhom": "Hệ thống điều tốc"},
+    {"ten": "Độ mở kim", "ma": "do_mo_kim", "don_vi": "%", "nhom": "Hệ thống điều tốc"},
+    {"ten": "Độ mở cánh hướng", "ma": "do_mo_canh_huong", "don_vi": "%", "nhom": "Hệ thống điều tốc"},
+    {"ten": "Độ giảm tốc", "ma": "do_giam_toc", "don_vi": "BPO", "nhom": "Hệ thống điều tốc"},
+    {"ten": "Độ gia tăng tần số", "ma": "do_gia_tang_tan_so", "don_vi": "CHF0", "nhom": "Hệ thống điều tốc"},
+]
+
+
 TOMAY_PARAM_DEVICE_SUFFIX = {
     "ap_luc_nuoc": ".GE",
     "ap_luc_chen_truc": ".TuB.SH",
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from quanlyvanhanh.services.thiet_bi_search_service import refresh_search_documents
+from quanlyvanhanh.services.thiet_bi_tree_service import invalidate_tree_cache, rebuild_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Tinh lai duong dan phan cap (duong_dan/cap) cua thiet bi tu quan he cha, "
+        "dung khi du lieu bi sua truc tiep trong DB hoac nhap ngoai ung dung."
+    )
+
+    def handle(self, *args, **options):
+        changed = rebuild_paths()
+        if changed:
+            # bulk_update khong phat tin hieu: tu lam moi van ban tim kiem va cache cay.
+            refresh_search_documents()
+            invalidate_tree_cache()
+        self.stdout.write(self.style.SUCCESS(f"Da sua duong dan cua {changed} thiet bi."))
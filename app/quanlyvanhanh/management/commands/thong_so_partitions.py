@@ -0,0 +1,90 @@
+import argparse
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from quanlyvanhanh.services import thongso_partition_service as partitions
+
+
+def _month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Thang khong hop le: {value} (dinh dang YYYY-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Quan ly phan vung theo thang cua bang thong so (PostgreSQL): xem, tao truoc, "
+        "luu tru/xoa phan vung cu, gan lai phan vung da luu tru, chuan hoa ngay_nhap (mac dinh chi "
+        "bao cao, --apply de sua) va chuyen bang thuong sang phan vung."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["list", "create", "archive", "attach", "normalize", "convert"])
+        parser.add_argument(
+            "--table", action="append", choices=partitions.PARTITIONED_TABLES,
+            help="Chi xu ly bang nay (lap lai de chon nhieu bang; mac dinh ca ba).",
+        )
+        parser.add_argument(
+            "--months-ahead", type=int,
+            help="create/convert: so thang tao truoc (mac dinh THONG_SO_PARTITION_MONTHS_AHEAD).",
+        )
+        parser.add_argument(
+            "--retention-months", type=int,
+            help="archive: giu lai bao nhieu thang gan nhat (mac dinh THONG_SO_PARTITION_RETENTION_MONTHS).",
+        )
+        parser.add_argument("--drop", action="store_true", help="archive: xoa han thay vi chuyen sang schema luu tru.")
+        parser.add_argument("--month", type=_month, help="attach: thang can gan lai, dang YYYY-MM.")
+        parser.add_argument(
+            "--apply", action="store_true",
+            help="normalize: xoa dong trung khoa va sua ngay_nhap lech (mac dinh chi bao cao).",
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.partitioning_supported():
+            self.stdout.write(self.style.WARNING("Phan vung thong so chi ho tro PostgreSQL, bo qua."))
+            return
+        tables = options["table"] or list(partitions.PARTITIONED_TABLES)
+        action = options["action"]
+
+        if action == "list":
+            with connection.cursor() as cursor:
+                for table in tables:
+                    names = [name for name, _ in partitions.list_partitions(cursor, table)]
+                    self.stdout.write(f"{table}: {len(names)} phan vung" + (f" ({names[0]} .. {names[-1]})" if names else ""))
+        elif action == "create":
+            for table, names in partitions.create_partitions(options["months_ahead"], tables=tables).items():
+                self.stdout.write(self.style.SUCCESS(f"{table}: tao {len(names)} phan vung {', '.join(names)}"))
+        elif action == "archive":
+            if options["retention_months"] is not None and options["retention_months"] <= 0:
+                raise CommandError("--retention-months phai lon hon 0.")
+            result = partitions.archive_partitions(options["retention_months"], drop=options["drop"], tables=tables)
+            if not result:
+                self.stdout.write("Chua cau hinh THONG_SO_PARTITION_RETENTION_MONTHS, khong luu tru.")
+            for table, names in result.items():
+                self.stdout.write(self.style.SUCCESS(f"{table}: {'xoa' if options['drop'] else 'luu tru'} {len(names)} phan vung {', '.join(names)}"))
+        elif action == "attach":
+            if not options["month"]:
+                raise CommandError("attach can --month YYYY-MM.")
+            for table in tables:
+                attached = partitions.attach_partition(table, options["month"])
+                self.stdout.write(f"{table}: {'da gan lai' if attached else 'khong co phan vung luu tru cho'} {options['month']:%Y-%m}")
+        elif action == "normalize":
+            for table in tables:
+                report = partitions.normalize_ngay_nhap(table, apply=options["apply"])
+                verb = "da" if options["apply"] else "se"
+                self.stdout.write(
+                    f"{table}: {report['lech']} dong ngay_nhap lech xa thoi_diem_nhap; "
+                    f"{verb} xoa {report['xoa']} dong trung khoa, {verb} sua {report['lech'] - report['xoa']} dong."
+                )
+            if not options["apply"]:
+                self.stdout.write("Chay lai voi --apply de ghi thay doi.")
+        else:
+            for table in tables:
+                try:
+                    converted = partitions.convert_to_partitioned(table, options["months_ahead"])
+                except partitions.NgayNhapLechError as exc:
+                    raise CommandError(f"{exc} Chay 'thong_so_partitions normalize --apply' truoc.")
+                self.stdout.write(self.style.SUCCESS(f"{table}: {'da chuyen sang phan vung' if converted else 'da phan vung san'}"))
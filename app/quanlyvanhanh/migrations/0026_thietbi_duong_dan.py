@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:44
+
+from django.db import migrations, models
+
+
+def backfill_duong_dan(apps, schema_editor):
+    ThietBi = apps.get_model('quanlyvanhanh', 'ThietBi')
+    children = {}
+    for pk, cha_id in ThietBi.objects.values_list('id', 'cha_id'):
+        children.setdefault(cha_id, []).append(pk)
+
+    rows = []
+    stack = [(pk, '/', 0) for pk in children.get(None, [])]
+    while stack:
+        pk, prefix, cap = stack.pop()
+        duong_dan = f'{prefix}{pk}/'
+        rows.append(ThietBi(pk=pk, duong_dan=duong_dan, cap=cap))
+        stack.extend((child, duong_dan, cap + 1) for child in children.get(pk, []))
+    ThietBi.objects.bulk_update(rows, ['duong_dan', 'cap'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quanlyvanhanh', '0025_auto_20260611_1511'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thietbi',
+            name='duong_dan',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=500, verbose_name='Đường dẫn phân cấp'),
+        ),
+        migrations.RunPython(backfill_duong_dan, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:02
+
+import unicodedata
+
+from django.db import migrations, models
+
+DOCUMENT_FIELDS = ('ten', 'ma', 'ma_day_du', 'ma_van_hanh', 'so_serial', 'mo_ta_ky_thuat')
+
+
+def _normalize(value):
+    text = unicodedata.normalize('NFD', str(value or '').replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    return ' '.join(text.lower().split())
+
+
+def backfill_van_ban_tim_kiem(apps, schema_editor):
+    ThietBi = apps.get_model('quanlyvanhanh', 'ThietBi')
+    rows = list(ThietBi.objects.values('pk', 'duong_dan', *DOCUMENT_FIELDS))
+    names = {row['pk']: row['ten'] for row in rows}
+
+    updates = []
+    for row in rows:
+        ancestor_ids = [int(part) for part in (row['duong_dan'] or '').split('/') if part and int(part) != row['pk']]
+        parts = [names.get(pk) for pk in ancestor_ids] + [row[field] for field in DOCUMENT_FIELDS]
+        document = _normalize(' '.join(str(part) for part in parts if part))
+        updates.append(ThietBi(pk=row['pk'], van_ban_tim_kiem=document))
+    ThietBi.objects.bulk_update(updates, ['van_ban_tim_kiem'], batch_size=500)
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS thiet_bi_tim_kiem_trgm '
+            'ON thiet_bi USING gin (van_ban_tim_kiem gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS thiet_bi_tim_kiem_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quanlyvanhanh', '0026_thietbi_duong_dan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thietbi',
+            name='van_ban_tim_kiem',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Văn bản tìm kiếm'),
+        ),
+        migrations.RunPython(backfill_van_ban_tim_kiem, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+SEGMENTS = {'ma_cap_0': 3, 'ma_cap_1': 4, 'ma_cap_2': 5}
+
+
+def backfill_ma_cap(apps, schema_editor):
+    ThietBi = apps.get_model('quanlyvanhanh', 'ThietBi')
+    rows = []
+    for pk, ma_day_du in ThietBi.objects.values_list('pk', 'ma_day_du'):
+        parts = (ma_day_du or '').split('.')
+        codes = {field: '.'.join(parts[:count]) if len(parts) >= count else '' for field, count in SEGMENTS.items()}
+        rows.append(ThietBi(pk=pk, **codes))
+    ThietBi.objects.bulk_update(rows, list(SEGMENTS), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quanlyvanhanh', '0027_thietbi_van_ban_tim_kiem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thietbi',
+            name='ma_cap_0',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Mã cấp 0'),
+        ),
+        migrations.AddField(
+            model_name='thietbi',
+            name='ma_cap_1',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Mã cấp 1'),
+        ),
+        migrations.AddField(
+            model_name='thietbi',
+            name='ma_cap_2',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='Mã cấp 2'),
+        ),
+        migrations.RunPython(backfill_ma_cap, migrations.RunPython.noop),
+    ]
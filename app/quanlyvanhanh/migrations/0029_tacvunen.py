@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quanlyvanhanh', '0028_thietbi_ma_cap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacVuNen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loai', models.CharField(choices=[('import_thiet_bi', 'Import thiết bị')], max_length=50, verbose_name='Loại tác vụ')),
+                ('trang_thai', models.CharField(choices=[('cho', 'Chờ chạy'), ('dang_chay', 'Đang chạy'), ('hoan_thanh', 'Hoàn thành'), ('that_bai', 'Thất bại')], default='cho', max_length=20, verbose_name='Trạng thái')),
+                ('tham_so', models.JSONField(blank=True, default=dict, verbose_name='Tham số')),
+                ('tep_dau_vao', models.FileField(blank=True, null=True, upload_to='tac_vu/dau_vao/', verbose_name='Tệp đầu vào')),
+                ('tep_ket_qua', models.FileField(blank=True, null=True, upload_to='tac_vu/ket_qua/', verbose_name='Tệp kết quả')),
+                ('giai_doan', models.CharField(blank=True, max_length=64, verbose_name='Giai đoạn')),
+                ('so_da_xu_ly', models.PositiveIntegerField(default=0, verbose_name='Số đã xử lý')),
+                ('tong_so', models.PositiveIntegerField(default=0, verbose_name='Tổng số')),
+                ('ket_qua', models.JSONField(blank=True, default=dict, verbose_name='Kết quả')),
+                ('loi', models.TextField(blank=True, verbose_name='Lỗi')),
+                ('thoi_gian_tao', models.DateTimeField(auto_now_add=True, verbose_name='Thời gian tạo')),
+                ('thoi_gian_bat_dau', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu')),
+                ('thoi_gian_ket_thuc', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc')),
+                ('nguoi_tao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tac_vu_nen', to=settings.AUTH_USER_MODEL, verbose_name='Người tạo')),
+            ],
+            options={
+                'verbose_name': 'Tác vụ nền',
+                'verbose_name_plural': 'Tác vụ nền',
+                'db_table': 'tac_vu_nen',
+                'ordering': ['-thoi_gian_tao'],
+                'indexes': [models.Index(fields=['nguoi_tao', 'thoi_gian_tao'], name='tac_vu_nen_nguoi_t_12907a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quanlyvanhanh', '0030_tacvunen_xuat_thong_so'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tacvunen',
+            name='loai',
+            field=models.CharField(choices=[('import_thiet_bi', 'Import thiết bị'), ('xuat_thong_so', 'Xuất thông số'), ('import_thong_so', 'Import thông số')], max_length=50, verbose_name='Loại tác vụ'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 from django.utils import timezone
 
@@ -40,6 +43,14 @@ class ThietBi(models.Model):
     cap = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Cấp")
     thu_tu = models.PositiveIntegerField(default=0, verbose_name="Thứ tự hiển thị")
     slug = models.SlugField(max_length=255, blank=True)
+    # Đường dẫn id từ gốc tới chính nó, VD: /1/5/9/ -> cây con = LIKE '/1/5/%'
+    duong_dan = models.CharField(max_length=500, blank=True, default="", db_index=True, editable=False, verbose_name="Đường dẫn phân cấp")
+    # Tên tổ tiên + tên/mã/serial/thông số, bỏ dấu, chữ thường; có chỉ mục GIN pg_trgm.
+    van_ban_tim_kiem = models.TextField(blank=True, default="", editable=False, verbose_name="Văn bản tìm kiếm")
+    # 3/4/5 đoạn đầu của mã đầy đủ, phục vụ danh sách mã cấp 0/1/2 (DISTINCT có chỉ mục).
+    ma_cap_0 = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False, verbose_name="Mã cấp 0")
+    ma_cap_1 = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False, verbose_name="Mã cấp 1")
+    ma_cap_2 = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False, verbose_name="Mã cấp 2")
 
     class Meta:
         db_table = "thiet_bi"
@@ -58,6 +69,12 @@ class ThietBi(models.Model):
         return f"{self.ma_day_du} - {self.ten}"
 
     def save(self, *args, **kwargs):
+        cu = None
+        if self.pk:
+            cu = ThietBi.objects.filter(pk=self.pk).values("ten", "ma_day_du", "duong_dan", "cap").first()
+        if self.cha_id and cu and f"/{self.pk}/" in (self.cha.duong_dan or f"/{self.cha_id}/"):
+            raise ValidationError("Không thể chuyển thiết bị vào chính nó hoặc nhánh con của nó.")
+
         # tính cấp
         self.cap = (self.cha.cap + 1) if self.cha_id else 0
         # tính mã đầy đủ
@@ -68,7 +85,47 @@ class ThietBi(models.Model):
         # slug
         if not self.slug:
             self.slug = slugify(self.ma_day_du)
-        super().save(*args, **kwargs)
+
+        from quanlyvanhanh.services.thiet_bi_search_service import device_search_document, refresh_search_documents
+        from quanlyvanhanh.services.thiet_bi_tree_service import hierarchy_codes, refresh_hierarchy_codes
+
+        codes = hierarchy_codes(self.ma_day_du)
+        for field, value in codes.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "cap", "ma_day_du", "duong_dan", "van_ban_tim_kiem", *codes}
+
+        with transaction.atomic():
+            if self.pk:
+                self.duong_dan = self._tinh_duong_dan()
+                self.van_ban_tim_kiem = device_search_document(self)
+            super().save(*args, **kwargs)
+            if not cu:
+                # Bản ghi mới: cần id trước khi có đường dẫn.
+                self.duong_dan = self._tinh_duong_dan()
+                self.van_ban_tim_kiem = device_search_document(self)
+                ThietBi.objects.filter(pk=self.pk).update(duong_dan=self.duong_dan, van_ban_tim_kiem=self.van_ban_tim_kiem)
+                return
+            if cu["duong_dan"] and (cu["duong_dan"], cu["ma_day_du"], cu["cap"]) != (self.duong_dan, self.ma_day_du, self.cap):
+                self._cap_nhat_nhanh_con(cu)
+            if cu["ma_day_du"] != self.ma_day_du:
+                refresh_hierarchy_codes(self)
+            if (cu["ten"], cu["duong_dan"], cu["ma_day_du"]) != (self.ten, self.duong_dan, self.ma_day_du):
+                # Văn bản tìm kiếm của nhánh con chứa tên/mã của thiết bị này.
+                refresh_search_documents(self)
+
+    def _tinh_duong_dan(self):
+        goc = (self.cha.duong_dan or f"/{self.cha_id}/") if self.cha_id else "/"
+        return f"{goc}{self.pk}/"
+
+    def _cap_nhat_nhanh_con(self, cu):
+        """Đổi mã/chuyển cha: cập nhật cả nhánh con bằng một câu UPDATE theo tiền tố đường dẫn."""
+        ThietBi.objects.filter(duong_dan__startswith=cu["duong_dan"]).exclude(pk=self.pk).update(
+            duong_dan=Concat(Value(self.duong_dan), Substr("duong_dan", len(cu["duong_dan"]) + 1)),
+            ma_day_du=Concat(Value(self.ma_day_du), Substr("ma_day_du", len(cu["ma_day_du"]) + 1)),
+            cap=F("cap") + (self.cap - cu["cap"]),
+        )
 
 
 # -------------------------
@@ -334,3 +391,66 @@ class NguongThongSo(models.Model):
         return f"{self.nha_may} - {device_str} - {self.ma_thong_so}"
 
 
+
+
+# -------------------------
+# TÁC VỤ NỀN (IMPORT/EXPORT LỚN)
+# -------------------------
+class TacVuNen(models.Model):
+    LOAI_IMPORT_THIET_BI = "import_thiet_bi"
+    LOAI_XUAT_THONG_SO = "xuat_thong_so"
+    LOAI_IMPORT_THONG_SO = "import_thong_so"
+    LOAI_CHOICES = (
+        (LOAI_IMPORT_THIET_BI, "Import thiết bị"),
+        (LOAI_XUAT_THONG_SO, "Xuất thông số"),
+        (LOAI_IMPORT_THONG_SO, "Import thông số"),
+    )
+
+    TRANG_THAI_CHO = "cho"
+    TRANG_THAI_DANG_CHAY = "dang_chay"
+    TRANG_THAI_HOAN_THANH = "hoan_thanh"
+    TRANG_THAI_THAT_BAI = "that_bai"
+    TRANG_THAI_CHOICES = (
+        (TRANG_THAI_CHO, "Chờ chạy"),
+        (TRANG_THAI_DANG_CHAY, "Đang chạy"),
+        (TRANG_THAI_HOAN_THANH, "Hoàn thành"),
+        (TRANG_THAI_THAT_BAI, "Thất bại"),
+    )
+
+    loai = models.CharField(max_length=50, choices=LOAI_CHOICES, verbose_name="Loại tác vụ")
+    trang_thai = models.CharField(max_length=20, choices=TRANG_THAI_CHOICES, default=TRANG_THAI_CHO, verbose_name="Trạng thái")
+    tham_so = models.JSONField(default=dict, blank=True, verbose_name="Tham số")
+    tep_dau_vao = models.FileField(upload_to="tac_vu/dau_vao/", blank=True, null=True, verbose_name="Tệp đầu vào")
+    tep_ket_qua = models.FileField(upload_to="tac_vu/ket_qua/", blank=True, null=True, verbose_name="Tệp kết quả")
+    giai_doan = models.CharField(max_length=64, blank=True, verbose_name="Giai đoạn")
+    so_da_xu_ly = models.PositiveIntegerField(default=0, verbose_name="Số đã xử lý")
+    tong_so = models.PositiveIntegerField(default=0, verbose_name="Tổng số")
+    ket_qua = models.JSONField(default=dict, blank=True, verbose_name="Kết quả")
+    loi = models.TextField(blank=True, verbose_name="Lỗi")
+    nguoi_tao = models.ForeignKey(
+        'core.User', on_delete=models.SET_NULL, null=True, blank=True,
+        verbose_name="Người tạo", related_name="tac_vu_nen"
+    )
+    thoi_gian_tao = models.DateTimeField(auto_now_add=True, verbose_name="Thời gian tạo")
+    thoi_gian_bat_dau = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu")
+    thoi_gian_ket_thuc = models.DateTimeField(null=True, blank=True, verbose_name="Kết thúc")
+
+    class Meta:
+        db_table = "tac_vu_nen"
+        verbose_name = "Tác vụ nền"
+        verbose_name_plural = "Tác vụ nền"
+        ordering = ["-thoi_gian_tao"]
+        indexes = [
+            models.Index(fields=["nguoi_tao", "thoi_gian_tao"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_loai_display()} #{self.pk} ({self.trang_thai})"
+
+    @property
+    def tien_do(self):
+        if self.trang_thai == self.TRANG_THAI_HOAN_THANH:
+            return 100
+        if not self.tong_so:
+            return 0
+        return min(99, int(self.so_da_xu_ly * 100 / self.tong_so))
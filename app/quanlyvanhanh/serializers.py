@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from datetime import time, datetime
-from .models import ThietBi, VatTu, ThietBiVatTu, ThongSoVanHanh, AnToanThietBi, DinhKem, ThongSoToMay, ThongSoTram110KV, NguongThongSo
+from .models import ThietBi, VatTu, ThietBiVatTu, ThongSoVanHanh, AnToanThietBi, DinhKem, ThongSoToMay, ThongSoTram110KV, NguongThongSo, TacVuNen
+from .services.thiet_bi_qr_service import qr_payload
+from .services.thongso_partition_service import NGAY_NHAP_MAX_LECH_DAYS, model_is_partitioned, ngay_nhap_matches
 
 
-def get_thiet_bi_qr_payload(obj, request=None):
+def get_thiet_bi_qr_frontend_base(request=None):
     from django.conf import settings
     frontend_base = None
     if request:
@@ -15,8 +17,26 @@ def get_thiet_bi_qr_payload(obj, request=None):
             
     if not frontend_base:
         frontend_base = getattr(settings, 'KHO_QR_FRONTEND_BASE', 'http://localhost:5173')
-        
-    return f"{frontend_base}/quanlyvanhanh/thietbi?detailId={obj.pk}"
+    return frontend_base
+
+
+def validate_ngay_nhap_khop_thoi_diem(serializer, data):
+    """Bang da phan vung: ngay_nhap chi duoc lech toi da NGAY_NHAP_MAX_LECH_DAYS ngay so voi thoi_diem_nhap."""
+    if not model_is_partitioned(serializer.Meta.model):
+        return data
+    instance = serializer.instance
+    thoi_diem_nhap = data.get('thoi_diem_nhap', getattr(instance, 'thoi_diem_nhap', None))
+    ngay_nhap = data.get('ngay_nhap', getattr(instance, 'ngay_nhap', None))
+    if thoi_diem_nhap and ngay_nhap and not ngay_nhap_matches(thoi_diem_nhap, ngay_nhap):
+        raise serializers.ValidationError({
+            'ngay_nhap': f'Ngày nhập phải cách ngày của thời điểm nhập không quá {NGAY_NHAP_MAX_LECH_DAYS} ngày.'
+        })
+    return data
+
+
+def get_thiet_bi_qr_payload(obj, request=None, frontend_base=None):
+    frontend_base = frontend_base or get_thiet_bi_qr_frontend_base(request)
+    return qr_payload(obj.pk, frontend_base)
 
 
 def get_thiet_bi_qr_url(obj, request=None):
@@ -47,6 +67,11 @@ class ThietBiSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['ma_day_du', 'cap', 'slug']
 
+    def validate_cha(self, value):
+        if value and self.instance and f"/{self.instance.pk}/" in (value.duong_dan or ""):
+            raise serializers.ValidationError("Không thể chuyển thiết bị vào chính nó hoặc nhánh con của nó.")
+        return value
+
     def get_con_count(self, obj):
         return obj.con.count()
 
@@ -186,7 +211,7 @@ class ThongSoVanHanhCreateSerializer(serializers.ModelSerializer):
             except (ValueError, TypeError):
                 pass  # Bỏ qua nếu không thể convert sang số
 
-        return data
+        return validate_ngay_nhap_khop_thoi_diem(self, data)
 
 
 class AnToanThietBiSerializer(serializers.ModelSerializer):
@@ -269,16 +294,13 @@ class ThietBiDetailSerializer(serializers.ModelSerializer):
 
     def _get_monthly_switch_detail_queryset(self, obj):
         try:
-            from django.db.models import Q
             from nhatkyvanhanh.models import ChiTietChuyenDoiTBThang
         except Exception:
             return None
 
-        device_query = Q(thiet_bi=obj)
-        if obj.ma_day_du:
-            device_query |= Q(thiet_bi__ma_day_du__startswith=f"{obj.ma_day_du}.")
+        from quanlyvanhanh.services.thiet_bi_tree_service import subtree_q
 
-        return ChiTietChuyenDoiTBThang.objects.select_related("so").filter(device_query)
+        return ChiTietChuyenDoiTBThang.objects.select_related("so").filter(subtree_q(obj))
 
     def _get_latest_monthly_switch_detail(self, obj):
         cached = getattr(obj, '_latest_monthly_switch_detail_cache', None)
@@ -414,7 +436,7 @@ class ThongSoToMayCreateSerializer(serializers.ModelSerializer):
             except (ValueError, TypeError):
                 pass
 
-        return data
+        return validate_ngay_nhap_khop_thoi_diem(self, data)
 
 
 # -------------------------
@@ -467,6 +489,9 @@ class ThongSoTram110KVCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(f'Định dạng thoi_diem_nhap không hợp lệ: {str(e)}')
         return value
 
+    def validate(self, data):
+        return validate_ngay_nhap_khop_thoi_diem(self, data)
+
 
 class NguongThongSoSerializer(serializers.ModelSerializer):
     """Serializer cho model NguongThongSo"""
@@ -490,3 +515,25 @@ class NguongThongSoSerializer(serializers.ModelSerializer):
             'thiet_bi': {'required': False, 'allow_null': True},
         }
         validators = []
+
+
+class TacVuNenSerializer(serializers.ModelSerializer):
+    """Trạng thái và tiến độ tác vụ nền"""
+    tien_do = serializers.IntegerField(read_only=True)
+    tep_ket_qua_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TacVuNen
+        fields = [
+            'id', 'loai', 'trang_thai', 'giai_doan', 'so_da_xu_ly', 'tong_so', 'tien_do',
+            'tham_so', 'ket_qua', 'loi', 'tep_ket_qua_url',
+            'thoi_gian_tao', 'thoi_gian_bat_dau', 'thoi_gian_ket_thuc',
+        ]
+        read_only_fields = fields
+
+    def get_tep_ket_qua_url(self, obj):
+        if not obj.tep_ket_qua:
+            return None
+        path = f"/api/quanlyvanhanh/tac-vu/{obj.pk}/tai_ve/"
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
@@ -0,0 +1,61 @@
+"""Vet audit (django-auditlog) cho cac thao tac ghi hang loat.
+
+``bulk_create``/``bulk_update`` khong phat tin hieu ``post_save`` nen auditlog khong tu ghi
+LogEntry. ``log_bulk_saves`` tao LogEntry giong receiver cua auditlog (cung diff, cid; actor
+va dia chi IP lay tu ngu canh ``AuditlogMiddleware`` qua tin hieu ``pre_save`` cua LogEntry)
+roi ghi bang mot lenh INSERT theo lo. Xoa qua ``QuerySet.delete()`` van phat tin hieu nen
+khong can ghi them.
+"""
+
+from auditlog.cid import get_cid
+from auditlog.context import auditlog_disabled
+from auditlog.diff import model_instance_diff
+from auditlog.models import LogEntry
+from auditlog.registry import auditlog
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import router
+from django.db.models.signals import pre_save
+from django.utils.encoding import smart_str
+
+AUDIT_BATCH_SIZE = 500
+
+
+def _entry(content_type, action, old, new, fields, cid, actor):
+    changes = model_instance_diff(
+        old,
+        new,
+        fields_to_check=fields,
+        use_json_for_changes=getattr(settings, "AUDITLOG_STORE_JSON_CHANGES", False),
+    )
+    if not changes:
+        return None
+    entry = LogEntry(
+        content_type=content_type,
+        object_pk=str(new.pk),
+        object_id=new.pk if isinstance(new.pk, int) else None,
+        object_repr=smart_str(new),
+        action=action,
+        changes=changes,
+        cid=cid,
+    )
+    pre_save.send(sender=LogEntry, instance=entry, raw=False, using=router.db_for_write(LogEntry), update_fields=None)
+    if entry.actor_id is None and actor is not None:
+        entry.actor = actor
+        entry.actor_email = getattr(actor, "email", None)
+    return entry
+
+
+def log_bulk_saves(model, created=(), updated=(), fields=None, actor=None):
+    """Ghi LogEntry CREATE cho ``created`` va UPDATE cho ``updated`` = ``[(ban cu, ban moi)]``.
+
+    ``fields`` gioi han cot so sanh khi cap nhat (nhu ``save(update_fields=...)``); ``actor``
+    dung khi khong co ngu canh request (vd. tac vu nen). Bo qua neu model khong dang ky auditlog.
+    """
+    if not auditlog.contains(model) or auditlog_disabled.get():
+        return []
+    content_type = ContentType.objects.get_for_model(model)
+    cid = get_cid()
+    entries = [_entry(content_type, LogEntry.Action.CREATE, None, obj, None, cid, actor) for obj in created]
+    entries += [_entry(content_type, LogEntry.Action.UPDATE, old, new, fields, cid, actor) for old, new in updated]
+    return LogEntry.objects.bulk_create([entry for entry in entries if entry], batch_size=AUDIT_BATCH_SIZE)
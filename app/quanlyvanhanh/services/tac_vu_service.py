@@ -0,0 +1,107 @@
+"""Chay tac vu nen (import/export lon) qua Celery hoac thread, kem tien do trong ``TacVuNen``."""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from quanlyvanhanh.models import TacVuNen
+
+logger = logging.getLogger(__name__)
+
+# Ham xu ly nhan (job, progress) va tra ve dict ket qua.
+JOB_HANDLERS = {
+    TacVuNen.LOAI_IMPORT_THIET_BI: "quanlyvanhanh.services.thiet_bi_import_service.run_import_job",
+    TacVuNen.LOAI_XUAT_THONG_SO: "quanlyvanhanh.services.thongso_export_service.run_export_job",
+    TacVuNen.LOAI_IMPORT_THONG_SO: "quanlyvanhanh.services.thongso_excel_import_service.run_import_job",
+}
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def create_job(loai, user, tep=None, tham_so=None):
+    job = TacVuNen(loai=loai, nguoi_tao=user if getattr(user, "is_authenticated", False) else None, tham_so=tham_so or {})
+    if tep is not None:
+        job.tep_dau_vao.save(getattr(tep, "name", "") or f"{loai}.bin", tep, save=False)
+    job.save()
+    return job
+
+
+def make_progress_callback(job_id):
+    """Ghi tien do toi da moi ``PROGRESS_INTERVAL_SECONDS`` giay (va luon ghi khi xong)."""
+    last_write = [0.0]
+
+    def progress(done, total, giai_doan=""):
+        now = time.monotonic()
+        if done < total and now - last_write[0] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_write[0] = now
+        TacVuNen.objects.filter(pk=job_id).update(so_da_xu_ly=done, tong_so=total, giai_doan=giai_doan)
+
+    return progress
+
+
+def run_job(job_id):
+    job = TacVuNen.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning("Tac vu nen %s khong ton tai.", job_id)
+        return None
+    # Nhan tac vu bang mot UPDATE co dieu kien: hai worker nhan trung (Celery giao lai, thread
+    # du phong) thi chi mot ben cap nhat duoc dong.
+    claimed = TacVuNen.objects.filter(pk=job_id, trang_thai=TacVuNen.TRANG_THAI_CHO).update(
+        trang_thai=TacVuNen.TRANG_THAI_DANG_CHAY,
+        thoi_gian_bat_dau=timezone.now(),
+    )
+    if not claimed:
+        job.refresh_from_db()
+        return job
+
+    try:
+        result = import_string(JOB_HANDLERS[job.loai])(job, make_progress_callback(job_id))
+    except Exception as exc:
+        logger.exception("Tac vu nen %s (%s) that bai.", job_id, job.loai)
+        TacVuNen.objects.filter(pk=job_id).update(
+            trang_thai=TacVuNen.TRANG_THAI_THAT_BAI,
+            loi=str(exc),
+            thoi_gian_ket_thuc=timezone.now(),
+        )
+    else:
+        TacVuNen.objects.filter(pk=job_id).update(
+            trang_thai=TacVuNen.TRANG_THAI_HOAN_THANH,
+            ket_qua=result or {},
+            thoi_gian_ket_thuc=timezone.now(),
+        )
+    job.refresh_from_db()
+    return job
+
+
+def _run_in_background(job_id):
+    def _bg_run():
+        close_old_connections()
+        try:
+            run_job(job_id)
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=_bg_run, daemon=True).start()
+
+
+def _dispatch(job_id):
+    if getattr(settings, "QUANLYVANHANH_JOBS_USE_CELERY", False):
+        try:
+            from quanlyvanhanh.tasks import run_tac_vu_task
+
+            run_tac_vu_task.delay(job_id)
+            return
+        except Exception:
+            logger.exception("Khong dua duoc tac vu nen %s vao Celery, chay bang thread.", job_id)
+    _run_in_background(job_id)
+
+
+def enqueue_job(job):
+    transaction.on_commit(lambda: _dispatch(job.pk))
+    return job
+
@@ -0,0 +1,392 @@
+"""Import danh muc thiet bi tu Excel: doc tung dong, doi chieu mot lan, ghi hang loat theo cap.
+
+Quy trinh: ``iter_excel_rows`` (openpyxl read_only) -> ``plan_import`` (tai thiet bi
+hien co bang mot truy van, sap cha truoc con, tinh diff tao/sua/giu nguyen/loi)
+-> ``apply_import`` (bulk_create tung cap, bulk_update cac dong sua).
+"""
+
+from datetime import date, datetime
+
+import openpyxl
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from django.utils.text import slugify
+
+from core.factory_scope import (
+    filter_queryset_by_factory,
+    get_user_factory_code,
+    has_all_factory_access,
+    has_profile_permission,
+)
+from quanlyvanhanh.models import ThietBi
+from quanlyvanhanh.services.audit_service import log_bulk_saves
+from quanlyvanhanh.services.thiet_bi_search_service import refresh_subtree_search_documents
+from quanlyvanhanh.services.thiet_bi_tree_service import (
+    BATCH_SIZE,
+    hierarchy_codes,
+    invalidate_tree_cache,
+)
+
+# Cot trong file -> cac tieu de chap nhan (tieu de dau tien co mat duoc dung).
+HEADER_ALIASES = {
+    "ma": ("Mã thiết bị (*)", "Mã thiết bị", "Mã cấp hiện tại", "Mã"),
+    "ma_day_du": ("Mã đầy đủ",),
+    "cha": ("Mã đầy đủ thiết bị chi tiết cha", "Mã đầy đủ thiết bị cha"),
+    "ten": ("Tên thiết bị (*)", "Tên thiết bị"),
+    "nha_may": ("Nhà máy (*)", "Nhà máy"),
+    "loai": ("Loại/Phân loại",),
+    "trang_thai": ("Trạng thái",),
+    "nha_che_tao": ("Nhà chế tạo",),
+    "nha_cung_cap": ("Nhà cung cấp",),
+    "nuoc_san_xuat": ("Nước sản xuất",),
+    "ma_van_hanh": ("Mã vận hành",),
+    "bo_phan_quan_ly": ("Bộ phận quản lý",),
+    "bang_ve": ("Bảng vẽ",),
+    "mo_ta_ky_thuat": ("Thông số kỹ thuật",),
+    "ngay_lap_dat": ("Ngày lắp đặt (YYYY-MM-DD)", "Ngày lắp đặt"),
+    "ngay_dua_vao_van_hanh": ("Ngày vận hành (YYYY-MM-DD)", "Ngày vận hành"),
+}
+TEXT_FIELDS = (
+    "ten", "nha_may", "loai", "trang_thai", "nha_che_tao", "nha_cung_cap", "nuoc_san_xuat",
+    "ma_van_hanh", "bo_phan_quan_ly", "bang_ve", "mo_ta_ky_thuat",
+)
+DATE_FIELDS = ("ngay_lap_dat", "ngay_dua_vao_van_hanh")
+UPDATE_FIELDS = TEXT_FIELDS + DATE_FIELDS
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+LOOKUP_CHUNK_SIZE = 2000
+PROGRESS_EVERY_ROWS = 500
+
+STATUS_CREATE = "tao_moi"
+STATUS_UPDATE = "cap_nhat"
+STATUS_UNCHANGED = "giu_nguyen"
+STATUS_ERROR = "loi"
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _date(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)[:10]
+    parsed = parse_date(text) if len(text) == 10 else None
+    if parsed:
+        return parsed
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def resolve_columns(header):
+    titles = {_text(title): index for index, title in enumerate(header or ()) if _text(title)}
+    columns = {}
+    for key, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in titles:
+                columns[key] = titles[alias]
+                break
+
+    missing = []
+    if "ma" not in columns and "ma_day_du" not in columns:
+        missing.append("Mã thiết bị (*)")
+    if "ten" not in columns:
+        missing.append("Tên thiết bị (*)")
+    if "nha_may" not in columns:
+        missing.append("Nhà máy (*)")
+    if missing:
+        raise ImportFileError(f"File Excel thiếu các cột bắt buộc: {', '.join(missing)}")
+    return columns
+
+
+def iter_excel_rows(file, progress=None):
+    """Sinh (so dong Excel, dict gia tri) tu sheet dau tien, khong nap ca file vao bo nho."""
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception as exc:
+        raise ImportFileError(f"Lỗi đọc file Excel: {exc}") from exc
+    try:
+        sheet = workbook.active
+        total = max((sheet.max_row or 1) - 1, 0)
+        rows = sheet.iter_rows(values_only=True)
+        columns = resolve_columns(next(rows, None))
+        for number, values in enumerate(rows, start=2):
+            if progress and number % PROGRESS_EVERY_ROWS == 0:
+                progress(number - 1, total, "doc_tep")
+            if not values or all(_text(value) == "" for value in values):
+                continue
+            yield number, {
+                key: values[index] if index < len(values) else None
+                for key, index in columns.items()
+            }
+    finally:
+        workbook.close()
+
+
+def _parse_record(number, raw):
+    values = {field: _text(raw.get(field)) for field in TEXT_FIELDS}
+    values.update({field: _date(raw.get(field)) for field in DATE_FIELDS})
+    return {
+        "dong": number,
+        "ma": _text(raw.get("ma")),
+        "ma_day_du_file": _text(raw.get("ma_day_du")),
+        "cha": _text(raw.get("cha")),
+        "values": values,
+        "trang_thai": None,
+        "loi": "",
+    }
+
+
+def _lookup_codes(records):
+    codes = set()
+    for record in records:
+        if record["cha"]:
+            codes.add(record["cha"])
+        full = record["ma_day_du_file"]
+        if full:
+            parts = full.split(".")
+            codes.update(".".join(parts[:index]) for index in range(1, len(parts) + 1))
+        if record["ma"]:
+            codes.add(f"{record['cha']}.{record['ma']}" if record["cha"] else record["ma"])
+    return codes
+
+
+def _load_existing(codes):
+    fields = ("id", "ma_day_du", "duong_dan", "cap", *UPDATE_FIELDS)
+    existing = {}
+    codes = sorted(codes)
+    for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+        chunk = codes[start:start + LOOKUP_CHUNK_SIZE]
+        for row in ThietBi.objects.filter(ma_day_du__in=chunk).values(*fields):
+            existing[row["ma_day_du"]] = row
+    return existing
+
+
+def _resolve_code(record, existing):
+    """Tinh (ma, ma cha, ma day du dich) nhu import cu, ke ca khi chi co cot 'Mã đầy đủ'."""
+    ma, cha, full = record["ma"], record["cha"], record["ma_day_du_file"]
+    if not ma and full:
+        if cha:
+            ma = full[len(cha) + 1:] if full.startswith(f"{cha}.") else full.split(".")[-1]
+        else:
+            parts = full.split(".")
+            ma = full
+            for index in range(len(parts) - 1, 0, -1):
+                prefix = ".".join(parts[:index])
+                if prefix in existing:
+                    cha, ma = prefix, ".".join(parts[index:])
+                    break
+    record["ma"], record["cha"] = ma, cha
+    record["ma_day_du"] = f"{cha}.{ma}" if cha and ma else ma
+
+
+def _error(record, message):
+    record["trang_thai"] = STATUS_ERROR
+    record["loi"] = message
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def plan_import(rows, user, progress=None):
+    """Doi chieu cac dong voi CSDL, tra ve ke hoach kem diff (chua ghi gi)."""
+    records = [_parse_record(number, raw) for number, raw in rows]
+    existing = _load_existing(_lookup_codes(records))
+
+    user_factory = get_user_factory_code(user)
+    all_access = has_all_factory_access(user)
+    can_create = has_profile_permission(user, "can_create_equipment")
+    can_edit = has_profile_permission(user, "can_edit_equipment")
+
+    planned = {}
+    for record in records:
+        _resolve_code(record, existing)
+        values = record["values"]
+        if not record["ma"]:
+            _error(record, "Thiếu mã thiết bị.")
+        elif not values["ten"]:
+            _error(record, "Thiếu tên thiết bị.")
+        elif not values["nha_may"]:
+            _error(record, "Thiếu nhà máy.")
+        elif record["ma_day_du"] in planned:
+            _error(record, f"Trùng mã đầy đủ '{record['ma_day_du']}' với dòng {planned[record['ma_day_du']]['dong']}.")
+        else:
+            planned[record["ma_day_du"]] = record
+        if not all_access and user_factory and values["nha_may"] != user_factory:
+            values["nha_may"] = user_factory
+
+    touched_ids = {existing[code]["id"] for record in planned.values() for code in (record["cha"], record["ma_day_du"]) if code in existing}
+    allowed_ids = set(
+        filter_queryset_by_factory(ThietBi.objects.filter(pk__in=touched_ids), user, "nha_may", "string")
+        .values_list("pk", flat=True)
+    ) if touched_ids else set()
+
+    # Sap cha truoc con: cap = 0 neu cha co san (hoac la goc), nguoc lai cap cua dong cha + 1.
+    def level_of(record):
+        if record.get("cap_import") is not None or record["trang_thai"] == STATUS_ERROR:
+            return record.get("cap_import")
+        cha = record["cha"]
+        if not cha or cha in existing:
+            record["cap_import"] = 0
+            return 0
+        parent = planned.get(cha)
+        parent_level = level_of(parent) if parent else None
+        if parent is None or parent["trang_thai"] == STATUS_ERROR or parent_level is None:
+            _error(record, f"Thiết bị cha '{cha}' không tồn tại.")
+            return None
+        record["cap_import"] = parent_level + 1
+        return record["cap_import"]
+
+    for done, record in enumerate(sorted(planned.values(), key=lambda item: item["ma_day_du"].count(".")), start=1):
+        if progress and done % PROGRESS_EVERY_ROWS == 0:
+            progress(done, len(planned), "doi_chieu")
+        if level_of(record) is None:
+            continue
+        cha, code = record["cha"], record["ma_day_du"]
+        if cha in existing and existing[cha]["id"] not in allowed_ids:
+            _error(record, f"Bạn không có quyền thao tác với thiết bị cha '{cha}'.")
+            continue
+
+        current = existing.get(code)
+        if current is None:
+            if not can_create:
+                _error(record, "Bạn không có quyền tạo mới thiết bị.")
+            else:
+                record["trang_thai"] = STATUS_CREATE
+            continue
+        if not can_edit:
+            _error(record, f"Bạn không có quyền sửa thiết bị '{code}'.")
+            continue
+        if current["id"] not in allowed_ids:
+            _error(record, f"Bạn không có quyền sửa thiết bị '{code}' của nhà máy này.")
+            continue
+        record["id"] = current["id"]
+        changes = {
+            field: [_jsonable(current[field] or ("" if field in TEXT_FIELDS else None)), _jsonable(value)]
+            for field, value in record["values"].items()
+            if (current[field] or ("" if field in TEXT_FIELDS else None)) != value
+        }
+        record["thay_doi"] = changes
+        record["trang_thai"] = STATUS_UPDATE if changes else STATUS_UNCHANGED
+
+    # Dong con cua dong cha bi loi phat hien sau (quyen) cung khong the tao.
+    for record in sorted(planned.values(), key=lambda item: item["ma_day_du"].count(".")):
+        parent = planned.get(record["cha"])
+        if record["trang_thai"] != STATUS_ERROR and parent and parent["trang_thai"] == STATUS_ERROR and record["cha"] not in existing:
+            _error(record, f"Thiết bị cha '{record['cha']}' không tồn tại.")
+
+    summary = {status: 0 for status in (STATUS_CREATE, STATUS_UPDATE, STATUS_UNCHANGED, STATUS_ERROR)}
+    for record in records:
+        summary[record["trang_thai"] or STATUS_ERROR] += 1
+    return {"tong_so_dong": len(records), "tong_hop": summary, "records": records, "existing": existing}
+
+
+def plan_rows(plan):
+    """Diff dang JSON cho dry-run: moi dong mot muc, theo thu tu trong file."""
+    return [
+        {
+            "dong": record["dong"],
+            "ma_day_du": record.get("ma_day_du") or "",
+            "trang_thai": record["trang_thai"],
+            "thay_doi": record.get("thay_doi", {}),
+            "loi": record["loi"],
+        }
+        for record in plan["records"]
+    ]
+
+
+def plan_errors(plan):
+    return [f"Dòng {record['dong']}: {record['loi']}" for record in plan["records"] if record["trang_thai"] == STATUS_ERROR]
+
+
+def apply_import(plan, progress=None, user=None):
+    """Ghi ke hoach: bulk_create tung cap (cha truoc con), bulk_update cac dong doi.
+
+    Ghi LogEntry auditlog cho thiet bi tao/sua (``user`` la actor khi khong co request) va chi
+    tinh lai van ban tim kiem cho cay con cua cac thiet bi do.
+    """
+    existing = plan["existing"]
+    creates = [record for record in plan["records"] if record["trang_thai"] == STATUS_CREATE]
+    updates = [record for record in plan["records"] if record["trang_thai"] == STATUS_UPDATE]
+    total = len(creates) + len(updates)
+    nodes = {code: (row["id"], row["duong_dan"], row["cap"]) for code, row in existing.items()}
+    created = []
+
+    with transaction.atomic():
+        done = 0
+        for level in sorted({record["cap_import"] for record in creates}):
+            batch = [record for record in creates if record["cap_import"] == level]
+            devices = []
+            for record in batch:
+                parent = nodes.get(record["cha"]) if record["cha"] else None
+                devices.append(ThietBi(
+                    ma=record["ma"],
+                    ma_day_du=record["ma_day_du"],
+                    cha_id=parent[0] if parent else None,
+                    cap=parent[2] + 1 if parent else 0,
+                    slug=slugify(record["ma_day_du"]),
+                    **hierarchy_codes(record["ma_day_du"]),
+                    **record["values"],
+                ))
+            ThietBi.objects.bulk_create(devices, batch_size=BATCH_SIZE)
+            for record, device in zip(batch, devices):
+                parent = nodes.get(record["cha"]) if record["cha"] else None
+                device.duong_dan = f"{parent[1] if parent else '/'}{device.pk}/"
+                nodes[record["ma_day_du"]] = (device.pk, device.duong_dan, device.cap)
+            ThietBi.objects.bulk_update(devices, ["duong_dan"], batch_size=BATCH_SIZE)
+            created.extend(devices)
+            done += len(batch)
+            if progress:
+                progress(done, total, "ghi")
+
+        changed = [ThietBi(pk=record["id"], ma_day_du=record["ma_day_du"], **record["values"]) for record in updates]
+        ThietBi.objects.bulk_update(changed, list(UPDATE_FIELDS), batch_size=BATCH_SIZE)
+        previous = [
+            ThietBi(**{field: existing[record["ma_day_du"]][field] for field in ("id", "ma_day_du", *UPDATE_FIELDS)})
+            for record in updates
+        ]
+        log_bulk_saves(ThietBi, created=created, updated=list(zip(previous, changed)), fields=UPDATE_FIELDS, actor=user)
+        refresh_subtree_search_documents(
+            [device.duong_dan for device in created] + [existing[record["ma_day_du"]]["duong_dan"] for record in updates]
+        )
+        if progress:
+            progress(total, total, "ghi")
+
+    if creates or updates:
+        invalidate_tree_cache()
+    return {"tao_moi": len(creates), "cap_nhat": len(updates)}
+
+
+def import_result(plan, applied=None):
+    result = {
+        "tong_so_dong": plan["tong_so_dong"],
+        "tong_hop": plan["tong_hop"],
+        "dong": plan_rows(plan),
+    }
+    if applied is not None:
+        result["da_ghi"] = applied
+    return result
+
+
+def run_import_job(job, progress):
+    """Ham xu ly tac vu nen ``TacVuNen.LOAI_IMPORT_THIET_BI``."""
+    with job.tep_dau_vao.open("rb") as file:
+        plan = plan_import(iter_excel_rows(file, progress), job.nguoi_tao, progress)
+    applied = None if job.tham_so.get("dry_run") else apply_import(plan, progress, job.nguoi_tao)
+    return import_result(plan, applied)
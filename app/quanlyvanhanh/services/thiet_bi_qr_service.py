@@ -0,0 +1,166 @@
+"""Ma QR thiet bi: cache anh PNG theo (thiet bi, URL frontend) va in to nhan hang loat.
+
+Noi dung QR chi phu thuoc ``pk`` va URL frontend nen anh da render duoc dung lai cho moi
+request. Ma con thieu duoc render ngay trong process (vai ms moi ma, khong dang tao pool cho
+moi request), roi ghep thanh to nhan A4: PDF ghi noi tung trang nen chi giu mot trang trong
+bo nho, hoac PNG cua mot trang.
+"""
+
+import hashlib
+import io
+import logging
+from functools import lru_cache
+
+import qrcode
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+QR_CACHE_PREFIX = "thiet_bi_qr"
+# Tang khi doi thong so render (kich thuoc o, vien, muc sua loi) de bo anh cu trong cache.
+QR_CACHE_VERSION = 1
+DEFAULT_QR_CACHE_TIMEOUT = 30 * 24 * 3600
+DEFAULT_QR_SHEET_MAX_ITEMS = 2000
+
+SHEET_FORMAT_PDF = "pdf"
+SHEET_FORMAT_PNG = "png"
+SHEET_FORMATS = (SHEET_FORMAT_PDF, SHEET_FORMAT_PNG)
+SHEET_DPI = 150
+SHEET_PAGE_SIZE = (1240, 1754)  # A4 o 150 dpi
+SHEET_MARGIN = 60
+SHEET_COLUMNS = 4
+SHEET_ROWS = 6
+SHEET_LABEL_LINES = 2
+SHEET_FONT_SIZE = 20
+DEFAULT_QR_FONT = "DejaVuSans.ttf"
+
+
+def qr_payload(device_id, frontend_base):
+    return f"{frontend_base}/quanlyvanhanh/thietbi?detailId={device_id}"
+
+
+def qr_cache_key(device_id, frontend_base):
+    base = hashlib.sha1(frontend_base.encode("utf-8")).hexdigest()[:16]
+    return f"{QR_CACHE_PREFIX}:{QR_CACHE_VERSION}:{base}:{device_id}"
+
+
+def render_qr_png(payload):
+    """Render mot ma QR thanh PNG."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=2,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _setting_int(name, default):
+    try:
+        return int(getattr(settings, name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_qr_pngs(device_ids, frontend_base):
+    """``{pk: PNG bytes}`` cho ``device_ids``: lay tu cache, render phan con thieu va luu lai."""
+    keys = {qr_cache_key(pk, frontend_base): pk for pk in device_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception:
+        logger.warning("Cache anh QR khong kha dung.", exc_info=True)
+        cached = {}
+    images = {keys[key]: value for key, value in cached.items()}
+
+    missing = [pk for pk in keys.values() if pk not in images]
+    if missing:
+        rendered = {pk: render_qr_png(qr_payload(pk, frontend_base)) for pk in missing}
+        images.update(rendered)
+        try:
+            cache.set_many(
+                {qr_cache_key(pk, frontend_base): png for pk, png in rendered.items()},
+                _setting_int("QUANLYVANHANH_QR_CACHE_TIMEOUT", DEFAULT_QR_CACHE_TIMEOUT),
+            )
+        except Exception:
+            logger.warning("Khong luu duoc anh QR vao cache.", exc_info=True)
+    return images
+
+
+def get_qr_png(device_id, frontend_base):
+    return get_qr_pngs([device_id], frontend_base)[device_id]
+
+
+@lru_cache(maxsize=4)
+def _label_font(size):
+    try:
+        return ImageFont.truetype(getattr(settings, "QUANLYVANHANH_QR_FONT", DEFAULT_QR_FONT), size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def _fit_text(draw, text, font, width):
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(f"{text}…", font=font) > width:
+        text = text[:-1]
+    return f"{text}…"
+
+
+def sheet_page_count(total, columns=SHEET_COLUMNS, rows=SHEET_ROWS):
+    per_page = columns * rows
+    return max((total + per_page - 1) // per_page, 1)
+
+
+def iter_qr_pages(devices, frontend_base, columns=SHEET_COLUMNS, rows=SHEET_ROWS, pages=None):
+    """Ve to nhan: moi o gom ma QR, ``ma_day_du`` va ``ten``; sinh lan luot tung anh trang.
+
+    ``devices`` la list ``(pk, ma_day_du, ten)`` da sap xep; ``pages`` (1-based) gioi han
+    cac trang can ve. QR duoc lay theo tung trang nen bo nho khong tang theo so trang.
+    """
+    per_page = columns * rows
+    page_numbers = pages or range(1, sheet_page_count(len(devices), columns, rows) + 1)
+
+    page_width, page_height = SHEET_PAGE_SIZE
+    cell_width = (page_width - 2 * SHEET_MARGIN) // columns
+    cell_height = (page_height - 2 * SHEET_MARGIN) // rows
+    font = _label_font(SHEET_FONT_SIZE)
+    line_height = SHEET_FONT_SIZE + 4
+    qr_size = min(cell_width, cell_height - SHEET_LABEL_LINES * line_height) - 16
+
+    for number in page_numbers:
+        chunk = devices[(number - 1) * per_page:number * per_page]
+        images = get_qr_pngs([pk for pk, _, _ in chunk], frontend_base)
+        page = Image.new("RGB", SHEET_PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for index, (pk, code, name) in enumerate(chunk):
+            left = SHEET_MARGIN + (index % columns) * cell_width
+            top = SHEET_MARGIN + (index // columns) * cell_height
+            draw.rectangle((left, top, left + cell_width - 1, top + cell_height - 1), outline="#bbbbbb")
+            with Image.open(io.BytesIO(images[pk])) as qr_image:
+                page.paste(qr_image.convert("RGB").resize((qr_size, qr_size), Image.NEAREST), (left + (cell_width - qr_size) // 2, top + 8))
+            text_top = top + qr_size + 12
+            for line, text in enumerate((code or "", name or "")[:SHEET_LABEL_LINES]):
+                text = _fit_text(draw, text, font, cell_width - 12)
+                draw.text((left + cell_width // 2, text_top + line * line_height), text, fill="black", font=font, anchor="ma")
+        yield page
+
+
+def render_qr_sheet(devices, frontend_base, fmt=SHEET_FORMAT_PDF, page=None):
+    """To nhan QR: PDF nhieu trang, hoac PNG cua trang ``page`` (mac dinh trang 1)."""
+    buffer = io.BytesIO()
+    if fmt == SHEET_FORMAT_PNG:
+        image = next(iter_qr_pages(devices, frontend_base, pages=[page or 1]))
+        image.save(buffer, format="PNG", dpi=(SHEET_DPI, SHEET_DPI))
+        return buffer.getvalue()
+
+    # ``append_images`` cua Pillow giu moi trang trong bo nho (~6.5MB/trang A4 RGB); ghi noi
+    # tung trang vao cung mot PDF de chi mot trang ton tai tai moi thoi diem.
+    for index, image in enumerate(iter_qr_pages(devices, frontend_base)):
+        image.save(buffer, format="PDF", append=index > 0, resolution=SHEET_DPI)
+    return buffer.getvalue()
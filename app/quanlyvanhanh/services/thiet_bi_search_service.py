@@ -0,0 +1,112 @@
+"""Tim kiem thiet bi tren van ban tim kiem dung san (``ThietBi.van_ban_tim_kiem``).
+
+Van ban gom ten cac to tien, ten, ma, ma day du, ma van hanh, so serial va thong so
+ky thuat, da bo dau + chu thuong; tren PostgreSQL duoc danh chi muc GIN pg_trgm
+nen ``LIKE '%token%'`` khong phai quet ca bang.
+"""
+
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from quanlyvanhanh.models import ThietBi
+from quanlyvanhanh.services.thiet_bi_tree_service import BATCH_SIZE, path_ids
+
+DOCUMENT_FIELDS = ("ten", "ma", "ma_day_du", "ma_van_hanh", "so_serial", "mo_ta_ky_thuat")
+SUBTREE_ROOTS_PER_QUERY = 200
+
+
+def normalize_search_text(value):
+    text = unicodedata.normalize("NFD", str(value or "").replace("đ", "d").replace("Đ", "D"))
+    text = "".join(char for char in text if unicodedata.category(char) != "Mn")
+    return " ".join(text.lower().split())
+
+
+def search_tokens(text):
+    return [token for token in normalize_search_text(str(text or "").replace(".", " ")).split() if token]
+
+
+def build_search_document(values, ancestor_names=()):
+    parts = [*ancestor_names, *(values.get(field) for field in DOCUMENT_FIELDS)]
+    return normalize_search_text(" ".join(str(part) for part in parts if part))
+
+
+def device_search_document(device):
+    """Van ban tim kiem cua mot thiet bi (mot truy van lay ten to tien)."""
+    ancestor_ids = [pk for pk in path_ids(device.duong_dan) if pk != device.pk]
+    names = dict(ThietBi.objects.filter(pk__in=ancestor_ids).values_list("pk", "ten")) if ancestor_ids else {}
+    values = {field: getattr(device, field) for field in DOCUMENT_FIELDS}
+    return build_search_document(values, [names[pk] for pk in ancestor_ids if pk in names])
+
+
+def _refresh_rows(queryset, ancestor_ids=()):
+    rows = list(queryset.values("pk", "duong_dan", "van_ban_tim_kiem", *DOCUMENT_FIELDS))
+    names = {row["pk"]: row["ten"] for row in rows}
+    missing = set(ancestor_ids) - set(names)
+    if missing:
+        names.update(ThietBi.objects.filter(pk__in=missing).values_list("pk", "ten"))
+
+    changed = []
+    for row in rows:
+        ancestors = [names[pk] for pk in path_ids(row["duong_dan"]) if pk != row["pk"] and pk in names]
+        document = build_search_document(row, ancestors)
+        if document != row["van_ban_tim_kiem"]:
+            changed.append(ThietBi(pk=row["pk"], van_ban_tim_kiem=document))
+    ThietBi.objects.bulk_update(changed, ["van_ban_tim_kiem"], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def refresh_subtree_search_documents(paths):
+    """Tinh lai van ban tim kiem cho cac cay con co ``duong_dan`` trong ``paths``.
+
+    Duong dan nam trong cay con cua duong dan khac bi bo (sap xep thi con dung ngay sau cha);
+    moi lo ``SUBTREE_ROOTS_PER_QUERY`` goc doc bang mot truy van ``LIKE 'goc%' OR ...``.
+    """
+    roots = []
+    for path in sorted({path for path in paths if path}):
+        if not roots or not path.startswith(roots[-1]):
+            roots.append(path)
+    changed = 0
+    for start in range(0, len(roots), SUBTREE_ROOTS_PER_QUERY):
+        chunk = roots[start:start + SUBTREE_ROOTS_PER_QUERY]
+        query = Q()
+        for path in chunk:
+            query |= Q(duong_dan__startswith=path)
+        ancestor_ids = {pk for path in chunk for pk in path_ids(path)}
+        changed += _refresh_rows(ThietBi.objects.filter(query), ancestor_ids)
+    return changed
+
+
+def refresh_search_documents(root=None):
+    """Tinh lai van ban tim kiem cho cay con cua ``root`` (hoac ca bang), tra ve so dong doi."""
+    if root is not None:
+        return refresh_subtree_search_documents([root.duong_dan])
+    return _refresh_rows(ThietBi.objects.all())
+
+
+def filter_device_search(queryset, text):
+    """Moi token phai xuat hien trong van ban tim kiem (AND giua cac token)."""
+    for token in search_tokens(text):
+        queryset = queryset.filter(van_ban_tim_kiem__contains=token)
+    return queryset
+
+
+def rank_device_search(queryset, text):
+    """Xep hang: khop tien to ``ma_day_du`` truoc, sau do do tuong dong trigram (PostgreSQL)."""
+    text = str(text or "").strip()
+    queryset = queryset.annotate(
+        khop_tien_to=Case(
+            When(ma_day_du__istartswith=text, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+    if connection.vendor != "postgresql":
+        return queryset.order_by("-khop_tien_to", "cap", "ma_day_du")
+
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    return queryset.annotate(
+        do_tuong_dong=TrigramWordSimilarity(Value(normalize_search_text(text)), "van_ban_tim_kiem"),
+    ).order_by("-khop_tien_to", "-do_tuong_dong", "cap", "ma_day_du")
@@ -0,0 +1,205 @@
+"""Truy van cay thiet bi theo duong dan phan cap ``ThietBi.duong_dan`` (/1/5/9/).
+
+Moi truy van cay con / to tien / con chau gioi han cap la mot cau SQL dung
+chi muc tren ``duong_dan`` thay vi join ``cha__cha__...`` nhieu cap.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+
+from quanlyvanhanh.models import AnToanThietBi, DinhKem, ThietBi, ThietBiVatTu, ThongSoVanHanh
+
+BATCH_SIZE = 500
+TREE_CACHE_PREFIX = "quanlyvanhanh:thiet_bi_tree"
+TREE_GENERATION_CACHE_KEY = f"{TREE_CACHE_PREFIX}:generation"
+DEFAULT_TREE_CACHE_TIMEOUT = 6 * 3600
+TREE_FIELDS = ("id", "ten", "ma", "ma_day_du", "cha_id", "cap", "thu_tu", "loai", "trang_thai", "nha_may", "hinh_anh")
+# Ma cap 0/1/2 = 3/4/5 doan dau cua ma_day_du (SH.TB.H1 / SH.TB.H1.GE / SH.TB.H1.GE.OD).
+HIERARCHY_CODE_SEGMENTS = {"ma_cap_0": 3, "ma_cap_1": 4, "ma_cap_2": 5}
+# Cot ma cap cha cua moi cap, de loc ``parent_code`` bang so sanh bang tren cot co chi muc.
+HIERARCHY_PARENT_FIELDS = {"ma_cap_1": "ma_cap_0", "ma_cap_2": "ma_cap_1"}
+# (khoa dem, model, bieu thuc dem) - moi loai mot cau GROUP BY thiet_bi.
+TREE_COUNTS = (
+    ("so_vat_tu", ThietBiVatTu, Count("id")),
+    ("so_thong_so", ThongSoVanHanh, Count("ten_thong_so", distinct=True)),
+    ("so_an_toan", AnToanThietBi, Count("id")),
+    ("so_dinh_kem", DinhKem, Count("id")),
+)
+
+
+def path_ids(duong_dan):
+    return [int(part) for part in (duong_dan or "").split("/") if part]
+
+
+def subtree_queryset(device, include_self=True, queryset=None):
+    """Thiet bi va toan bo nhanh con."""
+    queryset = ThietBi.objects.all() if queryset is None else queryset
+    queryset = queryset.filter(duong_dan__startswith=device.duong_dan)
+    if not include_self:
+        queryset = queryset.exclude(pk=device.pk)
+    return queryset
+
+
+def descendants_queryset(device, depth=1, queryset=None):
+    """Con chau toi da ``depth`` cap duoi thiet bi (depth=1: con truc tiep)."""
+    return subtree_queryset(device, include_self=False, queryset=queryset).filter(
+        cap__lte=device.cap + max(int(depth), 1),
+    )
+
+
+def ancestors_queryset(device, include_self=False, queryset=None):
+    """To tien tu goc xuong, lay theo danh sach id co san trong duong dan."""
+    ids = path_ids(device.duong_dan)
+    if not include_self:
+        ids = [pk for pk in ids if pk != device.pk]
+    queryset = ThietBi.objects.all() if queryset is None else queryset
+    return queryset.filter(pk__in=ids).order_by("cap")
+
+
+def subtree_q(device, field="thiet_bi"):
+    """Q loc ban ghi lien ket (FK ``field``) thuoc cay con cua thiet bi."""
+    if device.duong_dan:
+        return Q(**{f"{field}__duong_dan__startswith": device.duong_dan})
+    return Q(**{field: device})
+
+
+def factory_subtree_q(factory_code):
+    """Q cac thiet bi nam duoi goc co ma ``<factory_code>`` hoac ``<factory_code>.*``."""
+    code = str(factory_code or "").strip()
+    if not code:
+        return Q(pk__in=[])
+    roots = ThietBi.objects.filter(cha__isnull=True).filter(
+        Q(ma_day_du__iexact=code) | Q(ma_day_du__istartswith=f"{code}.")
+    ).exclude(duong_dan="").values_list("duong_dan", flat=True)
+    query = Q(pk__in=[])
+    for duong_dan in roots:
+        query |= Q(duong_dan__startswith=duong_dan)
+    return query
+
+
+def hierarchy_codes(ma_day_du):
+    parts = (ma_day_du or "").split(".")
+    return {
+        field: ".".join(parts[:segments]) if len(parts) >= segments else ""
+        for field, segments in HIERARCHY_CODE_SEGMENTS.items()
+    }
+
+
+def refresh_hierarchy_codes(root=None):
+    """Tinh lai ma cap 0/1/2 cho cay con cua ``root`` (hoac ca bang), tra ve so dong doi."""
+    queryset = ThietBi.objects.all()
+    if root is not None:
+        queryset = queryset.filter(duong_dan__startswith=root.duong_dan)
+    fields = list(HIERARCHY_CODE_SEGMENTS)
+    changed = []
+    for row in queryset.values("pk", "ma_day_du", *fields):
+        codes = hierarchy_codes(row["ma_day_du"])
+        if any(row[field] != codes[field] for field in fields):
+            changed.append(ThietBi(pk=row["pk"], **codes))
+    ThietBi.objects.bulk_update(changed, fields, batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def hierarchy_code_options(queryset, field, parent_code=""):
+    """Danh sach ma cap (DISTINCT tren cot co chi muc) kem ten thiet bi dung tai ma do."""
+    segments = HIERARCHY_CODE_SEGMENTS[field]
+    queryset = queryset.exclude(**{field: ""})
+    if parent_code:
+        queryset = queryset.filter(**{HIERARCHY_PARENT_FIELDS[field]: parent_code})
+    codes = list(queryset.order_by(field).values_list(field, flat=True).distinct())
+    names = dict(queryset.filter(ma_day_du__in=codes).values_list("ma_day_du", "ten")) if codes else {}
+
+    options = []
+    for code in codes:
+        ma = code.split(".")[segments - 1]
+        options.append({
+            "id": code,
+            "ma": ma,
+            "ten": names.get(code) or f"Thiet bi {ma}",
+            "ma_day_du": code,
+            "cap": segments - 3,
+        })
+    return options
+
+
+def rebuild_paths():
+    """Tinh lai ``duong_dan``/``cap`` toan bang tu quan he ``cha`` (sua du lieu cu)."""
+    rows = list(ThietBi.objects.values_list("id", "cha_id", "duong_dan", "cap"))
+    children = {}
+    for pk, cha_id, _duong_dan, _cap in rows:
+        children.setdefault(cha_id, []).append(pk)
+
+    expected = {}
+    stack = [(pk, "/", 0) for pk in children.get(None, [])]
+    while stack:
+        pk, prefix, cap = stack.pop()
+        duong_dan = f"{prefix}{pk}/"
+        expected[pk] = (duong_dan, cap)
+        stack.extend((child, duong_dan, cap + 1) for child in children.get(pk, []))
+
+    changed = [
+        ThietBi(pk=pk, duong_dan=expected[pk][0], cap=expected[pk][1])
+        for pk, _cha_id, duong_dan, cap in rows
+        if pk in expected and (duong_dan, cap) != expected[pk]
+    ]
+    ThietBi.objects.bulk_update(changed, ["duong_dan", "cap"], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def invalidate_tree_cache(*args, **kwargs):
+    cache.set(TREE_GENERATION_CACHE_KEY, time.time_ns(), None)
+
+
+def tree_cache_key(scope):
+    generation = cache.get_or_set(TREE_GENERATION_CACHE_KEY, 1, None)
+    digest = hashlib.md5(str(scope).lower().encode("utf-8")).hexdigest()
+    return f"{TREE_CACHE_PREFIX}:{generation}:{digest}"
+
+
+def build_device_tree(queryset):
+    """Dung cay tu mot truy van thiet bi va cac truy van dem gop (khong N+1).
+
+    Thiet bi co cha nam ngoai ``queryset`` (bi loc theo nha may) duoc dua len lam goc.
+    """
+    rows = list(queryset.order_by("cap", "thu_tu", "ten", "id").values(*TREE_FIELDS))
+    ids = queryset.values("pk")
+    counts = {
+        key: dict(
+            model.objects.filter(thiet_bi__in=ids)
+            .values("thiet_bi").annotate(total=expression).values_list("thiet_bi", "total")
+        )
+        for key, model, expression in TREE_COUNTS
+    }
+
+    nodes = {}
+    for row in rows:
+        hinh_anh = row.pop("hinh_anh")
+        row["cha"] = row.pop("cha_id")
+        row["hinh_anh_url"] = default_storage.url(hinh_anh) if hinh_anh else None
+        for key in counts:
+            row[key] = counts[key].get(row["id"], 0)
+        row["con"] = []
+        nodes[row["id"]] = row
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["cha"])
+        (parent["con"] if parent else roots).append(node)
+    for node in nodes.values():
+        node["so_con"] = len(node["con"])
+    return roots
+
+
+def get_cached_device_tree(scope, queryset):
+    """Cay thiet bi cho mot pham vi (nha may + bo loc), dung lai den khi thiet bi thay doi."""
+    key = tree_cache_key(scope)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_device_tree(queryset)
+        cache.set(key, tree, getattr(settings, "THIET_BI_TREE_CACHE_TIMEOUT", DEFAULT_TREE_CACHE_TIMEOUT))
+    return tree
@@ -0,0 +1,193 @@
+"""Upsert hang loat thong so to may / tram 110kV theo tap (khong truy van theo tung dong).
+
+Quy trinh: tai truoc thiet bi trong pham vi nha may (mot truy van cho id, mot cho ma),
+validate tung dong bang mot serializer dung chung, doc cac ban ghi da co bang mot truy
+van, roi ghi bang ``INSERT ... ON CONFLICT (unique_together) DO UPDATE`` theo lo va xoa
+cac o bi de trong. LogEntry auditlog cho ban ghi tao/sua duoc ghi bang ``audit_service``.
+
+Giu hop dong cu "tat ca hoac khong": neu co dong loi thi khong dong nao duoc ghi. Moi loi
+duoc bao cung luc trong ``errors`` = ``[{index, field, message}]``; ``detail`` la loi cua
+dong dung truoc nhat. Co dong bi tu choi quyen thi nem ``PermissionDenied`` (403), nguoc
+lai ``ValidationError`` (400).
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from core.factory_scope import filter_queryset_by_factory
+from quanlyvanhanh.models import ThietBi
+from quanlyvanhanh.services.audit_service import log_bulk_saves
+from quanlyvanhanh.services.thongso_partition_service import conflict_fields
+
+UNIQUE_FIELDS = ("thiet_bi", "ten_thong_so", "thoi_diem_nhap", "ngay_nhap")
+UPDATABLE_FIELDS = ("ma_thong_so", "don_vi", "gia_tri", "ghi_chu", "nha_may", "ky_hieu_van_hanh")
+UPSERT_BATCH_SIZE = 500
+
+NO_DEVICE_ACCESS_MESSAGE = "Bạn không có quyền nhập thông số cho thiết bị này."
+EDIT_FORBIDDEN_MESSAGE = "Bạn không có quyền sửa thông số này vì nó được nhập bởi người dùng khác."
+DELETE_FORBIDDEN_MESSAGE = "Bạn không có quyền xóa thông số này vì nó được nhập bởi người dùng khác."
+
+
+def row_errors(errors):
+    """``errors`` la list ``(chi so dong, exception)``: tra ve ``[{index, field, message}]`` theo thu tu dong."""
+    result = []
+    for index, exc in sorted(errors, key=lambda error: error[0]):
+        detail = exc.detail
+        for field, messages in detail.items() if isinstance(detail, dict) else [(None, detail)]:
+            for message in messages if isinstance(messages, list) else [messages]:
+                result.append({"index": index, "field": field, "message": str(message)})
+    return result
+
+
+def raise_row_errors(errors):
+    """Nem mot loi gom moi dong trong ``errors``; 403 neu co dong bi tu choi quyen, nguoc lai 400."""
+    if not errors:
+        return
+    denied = [error for error in errors if isinstance(error[1], PermissionDenied)]
+    exc_class = PermissionDenied if denied else ValidationError
+    details = row_errors(errors)
+    first = row_errors([min(denied or errors, key=lambda error: error[0])])[0]
+    exc = exc_class()
+    # Gan truc tiep: ham khoi tao cua DRF doi moi gia tri (ca ``index``) thanh chuoi.
+    exc.detail = {"detail": first["message"], "errors": details}
+    raise exc
+
+
+def _device_id(item):
+    value = item.get("thiet_bi") or item.get("thiet_bi_id")
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _device_code(item):
+    return item.get("thiet_bi_ma") or item.get("device_code")
+
+
+def load_scoped_devices(user, data_list):
+    """Tra ve ``(theo_id, theo_ma)`` cho cac thiet bi duoc tham chieu va nam trong pham vi ``user``."""
+    ids = {_device_id(item) for item in data_list if item.get("thiet_bi") or item.get("thiet_bi_id")} - {None}
+    codes = {_device_code(item) for item in data_list if not (item.get("thiet_bi") or item.get("thiet_bi_id"))} - {None, ""}
+    queryset = filter_queryset_by_factory(ThietBi.objects.all(), user, "nha_may", "string")
+    by_id = {device.pk: device for device in queryset.filter(pk__in=ids)} if ids else {}
+    by_code = {device.ma_day_du: device for device in queryset.filter(ma_day_du__in=codes)} if codes else {}
+    return by_id, by_code
+
+
+def resolve_device(item, by_id, by_code):
+    """Giong thu tu cu: co id thi chi tim theo id, khong co moi tim theo ma."""
+    if item.get("thiet_bi") or item.get("thiet_bi_id"):
+        return by_id.get(_device_id(item))
+    return by_code.get(_device_code(item))
+
+
+def batch_serializer(serializer_class):
+    """Mot instance serializer (bo truong ``thiet_bi``) dung validate moi dong, tranh query thiet bi tung dong."""
+
+    class BatchSerializer(serializer_class):
+        class Meta(serializer_class.Meta):
+            fields = [field for field in serializer_class.Meta.fields if field != "thiet_bi"]
+
+    return BatchSerializer()
+
+
+def validate_row(serializer, index, item, errors):
+    try:
+        return serializer.run_validation(item)
+    except ValidationError as exc:
+        errors.append((index, exc))
+        return None
+
+
+def _aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def upsert_thong_so(model, user, rows, errors=None, unique_fields=UNIQUE_FIELDS):
+    """Ghi ``rows`` = ``[(index, thiet_bi, validated_data, xoa)]`` vao ``model`` bang upsert theo lo.
+
+    Dong sau cung mot khoa ``unique_fields`` (mac dinh thiet bi, ten, thoi diem, ngay) ghi
+    de dong truoc, nhu khi xu ly tuan tu. Dong trung ban ghi da co giu ``ngay_nhap`` cu, nen
+    tren bang da phan vung (khoa ``ON CONFLICT`` phai co ``ngay_nhap``) van khong sinh ban
+    ghi trung ``unique_fields``. ``errors`` la loi da gap khi chuan bi ``rows``;
+    cung voi ban ghi do nguoi khac nhap, tat ca duoc nem ra (``raise_row_errors``) truoc khi ghi.
+    """
+    errors = [] if errors is None else errors
+    keyed = {}
+    for index, device, data, delete in rows:
+        data = {**data, "thiet_bi": device, "thoi_diem_nhap": _aware(data["thoi_diem_nhap"])}
+        key = tuple(device.pk if field == "thiet_bi" else data[field] for field in unique_fields)
+        keyed[key] = (index, data, delete)
+
+    existing = {}
+    if keyed:
+        columns = dict(zip(unique_fields, (set(values) for values in zip(*keyed))))
+        candidates = model.objects.filter(
+            thiet_bi_id__in=columns["thiet_bi"],
+            ten_thong_so__in=columns["ten_thong_so"],
+            thoi_diem_nhap__in=columns["thoi_diem_nhap"],
+        )
+        lookup = ["thiet_bi_id" if field == "thiet_bi" else field for field in unique_fields]
+        for obj in candidates:
+            existing[tuple(getattr(obj, field) for field in lookup)] = obj
+
+    to_delete = []
+    groups = defaultdict(list)
+    previous = {}
+    for key, (index, data, delete) in keyed.items():
+        old = existing.get(key)
+        if old and old.nguoi_nhap_id and old.nguoi_nhap_id != user.pk and not user.is_superuser:
+            errors.append((index, PermissionDenied(DELETE_FORBIDDEN_MESSAGE if delete else EDIT_FORBIDDEN_MESSAGE)))
+            continue
+        if delete:
+            if old:
+                to_delete.append(old.pk)
+            continue
+        fields = tuple(field for field in UPDATABLE_FIELDS if field in data)
+        if old:
+            data["ngay_nhap"] = old.ngay_nhap
+        obj = model(**data, nguoi_nhap=user)
+        if old:
+            previous[id(obj)] = old
+        groups[fields].append(obj)
+    raise_row_errors(errors)
+
+    audit_fields = ["nguoi_nhap", *(["updated_at"] if any(f.name == "updated_at" for f in model._meta.concrete_fields) else [])]
+    conflict = list(conflict_fields(model, unique_fields))
+    deleted = 0
+    with transaction.atomic():
+        if to_delete:
+            deleted = model.objects.filter(pk__in=to_delete).delete()[0]
+        for fields, objs in groups.items():
+            update_fields = [*fields, *audit_fields]
+            model.objects.bulk_create(
+                objs,
+                batch_size=UPSERT_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=conflict,
+                update_fields=update_fields,
+            )
+            updated_pairs = []
+            for obj in objs:
+                old = previous.get(id(obj))
+                if old:
+                    obj.pk = old.pk
+                    updated_pairs.append((old, obj))
+            log_bulk_saves(
+                model,
+                created=[obj for obj in objs if id(obj) not in previous],
+                updated=updated_pairs,
+                fields=update_fields,
+                actor=user,
+            )
+
+    updated = len(previous)
+    return {
+        "created": sum(len(objs) for objs in groups.values()) - updated,
+        "updated": updated,
+        "deleted": deleted,
+    }
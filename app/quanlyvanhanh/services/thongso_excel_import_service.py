@@ -0,0 +1,618 @@
+"""Import thong so (dien / to may H1-H2 / tram 110kV) tu Excel theo luong va ghi theo tap.
+
+File duoc doc bang openpyxl ``read_only`` (moi sheet chi doc toi dong cuoi cua template),
+tieu de cot duoc doi chieu qua bo giai tieu de co cache theo phien ban template, gia tri
+duoc chuan hoa theo cot bang pandas, roi ghi bang upsert theo lo
+(``thongso_bulk_service.upsert_thong_so``) - khong truy van theo tung o.
+
+Workbook nhieu sheet (moi sheet mot ngay, ten sheet la ngay, vd. ``2026-03-01``) duoc
+import trong mot lan; thuong chay thanh tac vu nen ``TacVuNen.LOAI_IMPORT_THONG_SO``.
+"""
+
+import logging
+from datetime import datetime, time
+from functools import lru_cache
+
+import pandas as pd
+import pytz
+from django.conf import settings
+from django.db import transaction
+from openpyxl import load_workbook
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from core.factory_scope import filter_queryset_by_factory, get_user_factory_code, get_user_factory_name, has_all_factory_access
+from quanlyvanhanh.configs.operation_configs import (
+    TOMAY_EXPORT_COLUMNS,
+    TOMAY_VS_COLUMNS,
+    get_dien_factory_config,
+    get_tram_factory_config,
+)
+from quanlyvanhanh.models import ThietBi, ThongSoToMay, ThongSoTram110KV, ThongSoVanHanh
+from quanlyvanhanh.services.thiet_bi_search_service import normalize_search_text
+from quanlyvanhanh.services.thongso_bulk_service import upsert_thong_so
+from quanlyvanhanh.services.thongso_tomay_service import specific_thiet_bi_code
+
+logger = logging.getLogger(__name__)
+
+# Cung gia tri voi thongso_export_service cho to may / tram.
+KIND_DIEN = "dien"
+KIND_TO_MAY = "to_may"
+KIND_TRAM = "tram"
+
+# Tang khi doi bo cuc/tieu de template de bo cache giai tieu de khong dung ket qua cu.
+TEMPLATE_VERSION = 1
+HEADER_ROWS = 3
+SHEET_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d%m%Y")
+VIETNAM_TZ = pytz.timezone("Asia/Ho_Chi_Minh")
+HEADER_MATCH_FUZZY = "fuzzy"
+HEADER_MATCH_EXACT = "exact"
+MAX_FUZZY_WORD_DISTANCE = 2
+MIN_FUZZY_WORD_RATIO = 0.8
+EMPTY_CELL_VALUES = ("", "-")
+DIEN_VS_MIN_COLUMNS = 35
+TOMAY_DATA_ROWS = 24
+
+
+class ThongSoImportError(ValueError):
+    """Loi nghiep vu khi import; ``payload`` duoc tra nguyen ven trong JSON loi."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message, **extra}
+
+
+def parse_sheet_date(title):
+    for fmt in SHEET_DATE_FORMATS:
+        try:
+            return datetime.strptime(title.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_date(value):
+    if not value:
+        raise ThongSoImportError("Vui lòng chọn ngày import")
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").date()
+    except ValueError:
+        raise ThongSoImportError("Định dạng ngày không hợp lệ, sử dụng YYYY-MM-DD")
+
+
+def import_targets(sheetnames, selected_date):
+    """``[(ten sheet, ngay)]`` can import.
+
+    Workbook mot sheet (template cu) luon dung ngay chon tren giao dien. Workbook nhieu
+    sheet import cac sheet co ten la ngay; neu khong sheet nao dat ten theo ngay thi quay
+    ve sheet dau voi ngay da chon.
+    """
+    return _dated_sheets(sheetnames) or [(sheetnames[0], _parse_date(selected_date))]
+
+
+def _dated_sheets(sheetnames):
+    if len(sheetnames) < 2:
+        return []
+    dated = [(name, parse_sheet_date(name)) for name in sheetnames]
+    return [(name, day) for name, day in dated if day]
+
+
+def count_import_sheets(file):
+    workbook = load_workbook(file, read_only=True)
+    try:
+        return len(_dated_sheets(workbook.sheetnames)) or 1
+    finally:
+        workbook.close()
+        file.seek(0)
+
+
+def should_run_in_background(file, params):
+    if str(params.get("background")) in ("1", "true", "True"):
+        return True
+    try:
+        sheets = count_import_sheets(file)
+    except Exception:
+        file.seek(0)
+        return False
+    return sheets > getattr(settings, "THONG_SO_IMPORT_SYNC_MAX_SHEETS", 1)
+
+
+def _sheet_frame(sheet, max_row):
+    rows = []
+    for values in sheet.iter_rows(max_row=max_row, values_only=True):
+        values = list(values)
+        while values and values[-1] in (None, ""):
+            values.pop()
+        rows.append(values)
+    while rows and not rows[-1]:
+        rows.pop()
+    return pd.DataFrame(rows, dtype=object) if rows else pd.DataFrame(dtype=object)
+
+
+def _block(frame, rows, columns):
+    return frame.reindex(index=rows, columns=columns).set_axis(range(len(columns)), axis=1)
+
+
+def normalize_cells(block, numeric=False):
+    """Chuan hoa gia tri o theo cot: bo khoang trang, o rong / ``-`` thanh None.
+
+    ``numeric=True`` dua so ve dang chuan (``12.0`` -> ``"12"``, ``"1,5"`` -> ``"1.5"``),
+    o chu (vd. ``BT``) giu nguyen. Tra ve list cac dong gia tri ``str | None``.
+    """
+    text = block.astype("string").apply(lambda column: column.str.strip())
+    text = text.mask(text.isin(EMPTY_CELL_VALUES))
+    if numeric:
+        numbers = text.apply(lambda column: pd.to_numeric(column.str.replace(",", ".", regex=False), errors="coerce")).astype("Float64")
+        integral = (numbers.notna() & (numbers % 1 == 0) & (numbers.abs() < 2 ** 53)).fillna(False).astype(bool)
+        text = text.mask(numbers.notna(), numbers.astype("string"))
+        text = text.mask(integral, numbers.where(integral).round().astype("Int64").astype("string"))
+    return text.astype(object).where(text.notna(), None).values.tolist()
+
+
+def _header_key(value):
+    return normalize_search_text(value)
+
+
+def _exact_header_key(value):
+    return "".join(str(value or "").lower().split())
+
+
+def _edit_distance(word1, word2):
+    # Giu nguyen cach so khop cua template cu: so ky tu khac vi tri + chenh lech do dai.
+    if abs(len(word1) - len(word2)) > MAX_FUZZY_WORD_DISTANCE:
+        return float("inf")
+    return sum(a != b for a, b in zip(word1, word2)) + abs(len(word1) - len(word2))
+
+
+def _fuzzy_match(expected, actual):
+    if expected == actual or expected in actual or actual in expected:
+        return True
+    expected_words, actual_words = expected.split(), actual.split()
+    if not expected_words:
+        return False
+    matched = sum(
+        1 for word in expected_words
+        if min((_edit_distance(word, other) for other in actual_words), default=float("inf")) <= MAX_FUZZY_WORD_DISTANCE
+    )
+    return matched / len(expected_words) >= MIN_FUZZY_WORD_RATIO
+
+
+@lru_cache(maxsize=256)
+def resolve_headers(expected, actual, mode=HEADER_MATCH_FUZZY, version=TEMPLATE_VERSION):
+    """Doi chieu tieu de ``actual`` voi ``expected`` (tuple), tra ve tuple ``(vi tri, loi)``.
+
+    Ket qua duoc cache theo (phien ban template, tieu de mong doi, tieu de doc duoc): cac
+    sheet cua cung mot template chi phai giai mot lan. ``loi`` la ``"missing"``, ``"empty"``
+    hoac ``"mismatch"``.
+    """
+    key = _exact_header_key if mode == HEADER_MATCH_EXACT else _header_key
+    problems = []
+    for index, name in enumerate(expected):
+        if index >= len(actual):
+            problems.append((index, "missing"))
+            continue
+        value = key(actual[index])
+        if mode == HEADER_MATCH_FUZZY and not value:
+            problems.append((index, "empty"))
+        elif not (value == key(name) if mode == HEADER_MATCH_EXACT else _fuzzy_match(key(name), value)):
+            problems.append((index, "mismatch"))
+    return tuple(problems)
+
+
+def _header_cells(frame, row, start, count):
+    if row >= len(frame):
+        return ()
+    values = frame.iloc[row, start:start + count].tolist()
+    return tuple("" if pd.isna(value) else str(value).strip() for value in values)
+
+
+def _head_text(frame, rows):
+    values = frame.head(rows).values.ravel().tolist()
+    return " ".join(str(value) for value in values if value is not None and not pd.isna(value)).upper()
+
+
+def _local_datetime(day, value):
+    return VIETNAM_TZ.localize(datetime.combine(day, value))
+
+
+def _upsert(model, user, rows, **kwargs):
+    try:
+        return upsert_thong_so(model, user, rows, **kwargs)
+    except PermissionDenied as exc:
+        raise ThongSoImportError(exc.detail["detail"], status=403, errors=exc.detail["errors"])
+    except ValidationError as exc:
+        raise ThongSoImportError(f"Dữ liệu không hợp lệ: {exc.detail['detail']}", errors=exc.detail["errors"])
+
+
+def _ensure_owned(queryset, user, day):
+    """Giu quy tac cu: ca ngay bi tu choi neu co ban ghi do nguoi khac nhap."""
+    if user.is_superuser:
+        return
+    other = queryset.exclude(nguoi_nhap=None).exclude(nguoi_nhap=user).select_related("nguoi_nhap").first()
+    if other:
+        raise ThongSoImportError(
+            f"Bạn không có quyền cập nhật thông số ngày {day} vì một số bản ghi đã được nhập bởi người dùng khác "
+            f"({other.nguoi_nhap.username or other.nguoi_nhap.email}).",
+            status=403,
+        )
+
+
+def _looks_like_index_or_time_column(values, expected_rows):
+    """
+    Detect the leading helper column used by the newer template.
+
+    Legacy Song Hinh templates put the first parameter directly in column A.
+    Newer templates add an STT/time column in A and start parameters in B.
+    """
+    values = [value for value in values[:expected_rows] if value is not None and not pd.isna(value)]
+    if not values:
+        return False
+
+    numeric_values = []
+    for value in values:
+        if isinstance(value, str) and ":" in value:
+            try:
+                datetime.strptime(value.strip(), "%H:%M")
+                continue
+            except ValueError:
+                return False
+
+        try:
+            numeric_values.append(int(float(value)))
+        except (TypeError, ValueError):
+            return False
+
+    if not numeric_values:
+        return True
+
+    expected_sequence = list(range(1, len(numeric_values) + 1))
+    zero_based_sequence = list(range(len(numeric_values)))
+    return numeric_values in (expected_sequence, zero_based_sequence)
+
+
+@lru_cache(maxsize=32)
+def dien_column_mapping(factory_code, version=TEMPLATE_VERSION):
+    """Cot template dien -> (ten, ma thiet bi, ma thong so, don vi), tinh mot lan moi nha may."""
+    mapping = []
+    for group in get_dien_factory_config(factory_code)["layout"]:
+        for column in group["columns"]:
+            device_code = group["device_code"]
+            if "sub_device" in column:
+                device_code = f"{device_code}.{column['sub_device']}"
+            if factory_code != "SH" and not device_code.startswith(f"{factory_code}.TB"):
+                device_code = device_code.replace("SH.TB", f"{factory_code}.TB").replace("VS.TB", f"{factory_code}.TB")
+            mapping.append((column["ten"], device_code, column["ma"], column["don_vi"]))
+    return tuple(mapping)
+
+
+def _dien_time_slots(factory_code, time_slots):
+    if time_slots and factory_code != "VS":
+        return [slot["time"] for slot in time_slots if slot.get("selected", True)]
+    if factory_code == "VS":
+        return [f"{hour:02d}:00" for hour in range(24)]
+    return [f"{hour:02d}:{minute}" for hour in range(24) for minute in ("00", "30")]
+
+
+def _dien_factory(frame, user, options):
+    factory_code = options.get("factory_code")
+    if not factory_code or not has_all_factory_access(user):
+        factory_code = get_user_factory_code(user)
+    if factory_code:
+        return factory_code
+    text = _head_text(frame, HEADER_ROWS)
+    if frame.shape[1] >= DIEN_VS_MIN_COLUMNS and "SÔNG HINH" not in text and "SONG HINH" not in text:
+        return "VS"
+    return "SH"
+
+
+def _dien_devices(user, codes):
+    """Thiet bi theo ma template; ma con cua TPP chua khai bao thi dung TPP cha."""
+    fallbacks = {code: code.split(".TPP.")[0] + ".TPP" for code in codes if ".TPP." in code}
+    scoped = filter_queryset_by_factory(ThietBi.objects.all(), user, "nha_may", "string")
+    found = {device.ma_day_du: device for device in scoped.filter(ma_day_du__in=set(codes) | set(fallbacks.values()))}
+    devices = {}
+    for code in codes:
+        device = found.get(code) or found.get(fallbacks.get(code))
+        if device:
+            devices[code] = device
+    return devices
+
+
+def import_dien_sheet(user, frame, day, options):
+    factory_code = _dien_factory(frame, user, options)
+    mapping = dien_column_mapping(factory_code)
+    slots = _dien_time_slots(factory_code, options.get("time_slots"))
+    num_cycles = 24 if factory_code == "VS" else 48
+
+    data = frame.iloc[HEADER_ROWS:HEADER_ROWS + num_cycles]
+    used = data.notna().any()
+    used_columns = int(used[used].index.max()) + 1 if used.any() else 0
+    first_column = data.iloc[:, 0].tolist() if used_columns else []
+    offset = 1 if used_columns > len(mapping) and _looks_like_index_or_time_column(first_column, num_cycles) else 0
+    values = normalize_cells(_block(frame, data.index, range(offset, offset + len(mapping))))
+
+    devices = _dien_devices(user, {device_code for _, device_code, _, _ in mapping})
+    if not devices:
+        raise ThongSoImportError("Không tìm thấy thiết bị trong phạm vi nhà máy được phân quyền", status=403)
+    _ensure_owned(ThongSoVanHanh.objects.filter(thiet_bi__in=devices.values(), ngay_nhap=day), user, day)
+
+    factory_name = get_user_factory_name(user)
+    rows = []
+    for position, row in enumerate(values):
+        label = slots[position] if position < len(slots) else f"{position:02d}:00"
+        moment = _local_datetime(day, datetime.strptime(label, "%H:%M").time())
+        for (name, device_code, code, unit), value in zip(mapping, row):
+            device = devices.get(device_code)
+            if device is None:
+                continue
+            rows.append((len(rows), device, {
+                "ten_thong_so": name,
+                "ma_thong_so": code,
+                "don_vi": unit,
+                "gia_tri": value,
+                "nha_may": factory_name or device.nha_may,
+                "thoi_diem_nhap": moment,
+                "ngay_nhap": day,
+            }, False))
+
+    _upsert(ThongSoVanHanh, user, rows, unique_fields=("thiet_bi", "ten_thong_so", "thoi_diem_nhap"))
+    return {"message": "Import thành công", "imported_count": len(rows)}
+
+
+def _tomay_is_vs(frame, user, options):
+    device_code = options.get("device_code") or ""
+    target = "VS" if device_code.startswith("VS") else "SH" if device_code.startswith("SH") else None
+    target = target or options.get("factory_code") or get_user_factory_code(user)
+    if target:
+        return target == "VS"
+    if frame.shape[1] < 24:
+        return False
+    text = _head_text(frame, HEADER_ROWS)
+    return "SÔNG HINH" not in text and "SONG HINH" not in text
+
+
+def _tomay_detect_type(frame, is_vs, device_type):
+    title = " ".join(str(value) for value in frame.iloc[0].tolist() if not pd.isna(value)).upper()
+    if "VẬN HÀNH" in title and not is_vs:
+        raise ThongSoImportError(
+            "File Excel không hợp lệ: Đây là file Thông số Vận hành, không phải file Thông số Tổ máy. "
+            "Vui lòng sử dụng file template Thông số Tổ máy.",
+            detected_type="thong_so_van_hanh",
+        )
+    detected = "H1" if "H1" in title else "H2" if "H2" in title else None
+    if not detected:
+        line1 = ", ".join(f"{chr(65 + index)}: {value}" for index, value in enumerate(frame.iloc[0].tolist()) if not pd.isna(value))
+        raise ThongSoImportError(
+            f'File Excel không hợp lệ: Tiêu đề dòng 1 phải chứa "H1" hoặc "H2" để xác định tổ máy. '
+            f"Các giá trị đọc được ở dòng 1: [{line1}].",
+        )
+    if device_type and detected != device_type:
+        raise ThongSoImportError(
+            f"File Excel tải lên ({detected}) không khớp với tổ máy được chọn trên giao diện ({device_type}).",
+        )
+    return detected
+
+
+def _tomay_base_code(user, options, is_vs, detected):
+    device_code = options.get("device_code")
+    factory_code = None
+    if device_code:
+        factory_code = "VS" if device_code.startswith("VS") else "SH" if device_code.startswith("SH") else None
+    factory_code = factory_code or options.get("factory_code")
+    user_factory = get_user_factory_code(user)
+    if user_factory and not has_all_factory_access(user):
+        factory_code = user_factory
+    factory_code = factory_code or ("VS" if is_vs else "SH")
+
+    if not device_code:
+        return f"{factory_code}.TB.{detected}.GE"
+    expected = "H1" if ".H1." in device_code else "H2" if ".H2." in device_code else None
+    if expected and detected != expected:
+        raise ThongSoImportError(
+            f"File Excel tải lên ({detected}) không khớp với tổ máy được chọn trên giao diện ({expected}).",
+        )
+    return device_code
+
+
+def _header_errors(problems, expected, actual, column_offset):
+    messages = []
+    for index, problem in problems:
+        column = f"Cột {chr(65 + index + column_offset)}"
+        if problem == "missing":
+            messages.append(f'{column}: Thiếu "{expected[index]}"')
+        elif problem == "empty":
+            messages.append(f'{column}: Trống, mong đợi "{expected[index]}"')
+        else:
+            messages.append(f'{column}: Mong đợi "{expected[index]}" nhưng có "{actual[index]}"')
+    return messages
+
+
+def import_tomay_sheet(user, frame, day, options):
+    if len(frame) < HEADER_ROWS:
+        raise ThongSoImportError(
+            f"File Excel không hợp lệ: File phải có ít nhất 3 hàng header. File hiện tại có {len(frame)} hàng.",
+            expected_rows=HEADER_ROWS,
+            actual_rows=len(frame),
+        )
+    is_vs = _tomay_is_vs(frame, user, options)
+    columns, start, header_row = (TOMAY_VS_COLUMNS, 1, 2) if is_vs else (TOMAY_EXPORT_COLUMNS, 0, 1)
+    expected_columns = start + len(columns)
+    if frame.shape[1] < expected_columns:
+        raise ThongSoImportError(
+            f"File Excel không hợp lệ: File phải có ít nhất {expected_columns} cột. File hiện tại có {frame.shape[1]} cột.",
+            expected_columns=expected_columns,
+            actual_columns=frame.shape[1],
+        )
+    detected = _tomay_detect_type(frame, is_vs, options.get("device_type"))
+    base_code = _tomay_base_code(user, options, is_vs, detected)
+
+    expected = tuple(column["ten"] for column in columns)
+    actual = _header_cells(frame, header_row, start, len(columns))
+    missing = _header_errors(resolve_headers(expected, actual), expected, actual, start)
+    if missing:
+        raise ThongSoImportError(
+            f"File Excel không hợp lệ: Các cột không khớp với template {detected}.\n"
+            + "\n".join(missing[:5])
+            + (f"\n... và {len(missing) - 5} cột khác" if len(missing) > 5 else ""),
+            missing_params=missing[:10],
+        )
+
+    base = filter_queryset_by_factory(ThietBi.objects.all(), user, "nha_may", "string").filter(ma_day_du=base_code).first()
+    if base is None:
+        raise ThongSoImportError(f"Không tìm thấy thiết bị gốc {base_code} trong quyền hạn")
+    codes = {column["ma"]: specific_thiet_bi_code(base, column["ma"]) for column in columns}
+    found = {device.ma_day_du: device for device in ThietBi.objects.filter(ma_day_du__in=set(codes.values()))}
+    targets = {code: found.get(full_code, base) for code, full_code in codes.items()}
+
+    values = normalize_cells(_block(frame, range(HEADER_ROWS, HEADER_ROWS + TOMAY_DATA_ROWS), range(start, expected_columns)), numeric=True)
+    moments = [_local_datetime(day, time(hour, 0)) for hour in range(TOMAY_DATA_ROWS)]
+    nha_may = get_user_factory_name(user) or base.nha_may
+    rows = []
+    for moment, row in zip(moments, values):
+        for column, value in zip(columns, row):
+            rows.append((len(rows), targets[column["ma"]], {
+                "ten_thong_so": column["ten"],
+                "ma_thong_so": column["ma"],
+                "don_vi": column["don_vi"],
+                "gia_tri": value,
+                "nha_may": nha_may,
+                "ky_hieu_van_hanh": f"{detected}_{column['ma']}",
+                "ghi_chu": f"Import từ Excel - {day}",
+                "thoi_diem_nhap": moment,
+                "ngay_nhap": day,
+            }, False))
+
+    # Ban ghi cu co the nam o thiet bi/ten khac (vd. truoc khi khai bao thiet bi con): xoa de
+    # khoa (ma thong so, thoi diem) chi con mot dong, nhu cach cap nhat tai cho truoc day.
+    prefix = ".".join(base.ma_day_du.split(".")[:3])
+    existing = ThongSoToMay.objects.filter(thiet_bi__ma_day_du__startswith=prefix, ngay_nhap=day)
+    _ensure_owned(existing, user, day)
+    wanted = {(data["ma_thong_so"], data["thoi_diem_nhap"]): (device.pk, data["ten_thong_so"]) for _, device, data, _ in rows}
+    stale = [
+        pk for pk, code, moment, device_id, name in existing.values_list("pk", "ma_thong_so", "thoi_diem_nhap", "thiet_bi_id", "ten_thong_so")
+        if wanted.get((code, moment), (device_id, name)) != (device_id, name)
+    ]
+    with transaction.atomic():
+        if stale:
+            ThongSoToMay.objects.filter(pk__in=stale).delete()
+        _upsert(ThongSoToMay, user, rows)
+    return {
+        "message": f"Import thành công {len(rows)} bản ghi thông số tổ máy {detected}",
+        "imported_count": len(rows),
+        "status": "success",
+    }
+
+
+def import_tram_sheet(user, frame, day, options):
+    factory_code = get_user_factory_code(user) or "SH"
+    columns = get_tram_factory_config(factory_code)["columns"]
+    if len(frame) < HEADER_ROWS:
+        raise ThongSoImportError(
+            f"File Excel không hợp lệ: Cần ít nhất 3 hàng header. Hiện tại có {len(frame)} hàng.",
+        )
+    if frame.shape[1] < len(columns):
+        raise ThongSoImportError(
+            f"File Excel thiếu cột: Cần có ít nhất {len(columns)} cột thông số. "
+            f"Hiện tại file của bạn chỉ có {frame.shape[1]} cột.",
+            expected_columns=len(columns),
+            actual_columns=frame.shape[1],
+            detected_headers=list(_header_cells(frame, 1, 0, frame.shape[1])),
+        )
+
+    expected = tuple(column["ten"] for column in columns)
+    actual = _header_cells(frame, 1, 0, len(columns))
+    problems = resolve_headers(expected, actual, HEADER_MATCH_EXACT)
+    if problems:
+        raise ThongSoImportError(
+            "File Excel có tiêu đề cột không khớp mẫu trạm 110kV. Vui lòng tải file mẫu mới nhất.",
+            missing_params=[f'Cột {chr(65 + index)}: Kỳ vọng "{expected[index]}" nhưng nhận "{actual[index]}"' for index, _ in problems],
+        )
+
+    codes = {column["ma_thiet_bi"] for column in columns}
+    scoped = filter_queryset_by_factory(ThietBi.objects.all(), user, "nha_may", "string")
+    devices = {device.ma_day_du: device for device in scoped.filter(ma_day_du__in=codes)}
+    for code in sorted(codes - set(devices)):
+        if ThietBi.objects.filter(ma_day_du=code).exists():
+            raise ThongSoImportError(f"Bạn không có quyền thao tác với thiết bị {code} của nhà máy này.", status=403)
+        raise ThongSoImportError(f"Thiết bị {code} chưa được khai báo trên hệ thống.")
+
+    # Nhu upsert tram qua API: tai khoan gan voi mot nha may ghi ten nha may cua tai khoan.
+    factory_name = None if has_all_factory_access(user) else get_user_factory_name(user)
+    nha_may = factory_name or factory_code
+    # 12 chu ky 2 gio (00:00 .. 22:00) o dong 4..15; o trong thi xoa ban ghi cu.
+    values = normalize_cells(_block(frame, range(HEADER_ROWS, min(HEADER_ROWS + 12, len(frame))), range(len(columns))))
+    rows = []
+    for hour, row in zip(range(0, 24, 2), values):
+        moment = _local_datetime(day, time(hour, 0))
+        for column, value in zip(columns, row):
+            rows.append((len(rows), devices[column["ma_thiet_bi"]], {
+                "ten_thong_so": column["ten"],
+                "ma_thong_so": column["ma"],
+                "don_vi": column["don_vi"],
+                "gia_tri": value,
+                "nha_may": nha_may,
+                "ky_hieu_van_hanh": "",
+                "thoi_diem_nhap": moment,
+                "ngay_nhap": day,
+            }, value is None))
+
+    result = _upsert(ThongSoTram110KV, user, rows)
+    return {
+        "message": f"Import thành công: tạo {result['created']} bản ghi, cập nhật {result['updated']} bản ghi.",
+        "status": "success",
+        "imported_count": result["created"] + result["updated"],
+    }
+
+
+# kind -> (ham import mot sheet, so dong toi da can doc)
+IMPORTERS = {
+    KIND_DIEN: (import_dien_sheet, HEADER_ROWS + 48),
+    KIND_TO_MAY: (import_tomay_sheet, HEADER_ROWS + TOMAY_DATA_ROWS),
+    KIND_TRAM: (import_tram_sheet, HEADER_ROWS + 12),
+}
+
+
+def import_workbook(kind, user, file, options, progress=None):
+    """Import ``file`` theo ``kind``; mot sheet tra ket qua cua sheet do, nhieu sheet tra tong hop.
+
+    Voi nhieu sheet, moi ngay ghi rieng: loi cua mot ngay nam trong ``loi``, cac ngay khac
+    van duoc import.
+    """
+    importer, max_row = IMPORTERS[kind]
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as exc:
+        raise ThongSoImportError(f"Lỗi đọc file Excel: {exc}")
+
+    results = []
+    errors = []
+    try:
+        targets = import_targets(workbook.sheetnames, options.get("selected_date"))
+        if len(targets) == 1:
+            name, day = targets[0]
+            return importer(user, _sheet_frame(workbook[name], max_row), day, options)
+        for position, (name, day) in enumerate(targets, start=1):
+            try:
+                result = importer(user, _sheet_frame(workbook[name], max_row), day, options)
+            except ThongSoImportError as exc:
+                errors.append({"sheet": name, "ngay": day.isoformat(), "error": str(exc)})
+            else:
+                results.append({"sheet": name, "ngay": day.isoformat(), "imported_count": result["imported_count"]})
+            if progress:
+                progress(position, len(targets), "nhap_du_lieu")
+    finally:
+        workbook.close()
+
+    imported = sum(result["imported_count"] for result in results)
+    return {
+        "message": f"Import thành công {imported} bản ghi cho {len(results)} ngày",
+        "imported_count": imported,
+        "ngay": results,
+        "loi": errors,
+    }
+
+
+def run_import_job(job, progress):
+    """Ham xu ly tac vu nen ``TacVuNen.LOAI_IMPORT_THONG_SO``."""
+    with job.tep_dau_vao.open("rb") as file:
+        return import_workbook(job.tham_so["kieu"], job.nguoi_tao, file, job.tham_so, progress)
@@ -0,0 +1,280 @@
+"""Xuat thong so van hanh / to may / tram 110kV ra Excel (hoac CSV) voi bo nho khong doi.
+
+Du lieu doc bang ``values_list(...).iterator()``, workbook ghi bang xlsxwriter
+``constant_memory`` (ghi tung dong xuong file tam); bang luoi to may/tram chi giu
+du lieu cua mot ngay trong bo nho. Khoang ngay dai duoc chay thanh ``TacVuNen``.
+"""
+
+import csv
+import io
+import itertools
+import tempfile
+from datetime import datetime, timedelta
+
+import xlsxwriter
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from core.factory_scope import filter_queryset_by_factory, get_user_factory_code
+from quanlyvanhanh.configs.operation_configs import TOMAY_EXPORT_COLUMNS, get_tram_factory_config
+from quanlyvanhanh.models import TacVuNen, ThietBi, ThongSoToMay, ThongSoTram110KV, ThongSoVanHanh
+
+EXCEL_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_CONTENT_TYPE = "text/csv; charset=utf-8"
+ITERATOR_CHUNK_SIZE = 2000
+DEFAULT_SYNC_MAX_DAYS = 31
+DEFAULT_MAX_DAYS = 366
+
+KIND_THONG_SO = "thong_so"
+KIND_TO_MAY = "to_may"
+KIND_TRAM = "tram"
+FORMATS = {KIND_THONG_SO: ("xlsx", "csv"), KIND_TO_MAY: ("xlsx",), KIND_TRAM: ("xlsx",)}
+
+# (tieu de cot, truong values_list) cho bang phang thong so van hanh.
+FLAT_COLUMNS = (
+    ("Ngày", "ngay_nhap"),
+    ("Thời điểm", "thoi_diem_nhap"),
+    ("Mã thiết bị", "thiet_bi__ma_day_du"),
+    ("Thiết bị", "thiet_bi__ten"),
+    ("Tên thông số", "ten_thong_so"),
+    ("Giá trị", "gia_tri"),
+    ("Đơn vị", "don_vi"),
+    ("Nhà máy", "nha_may"),
+    ("Ký hiệu vận hành", "ky_hieu_van_hanh"),
+    ("Ghi chú", "ghi_chu"),
+)
+GRID_FIELDS = ("ngay_nhap", "thoi_diem_nhap", "ten_thong_so", "gia_tri")
+
+# Kieu dinh dang dung chung; ``fill``/``unit_fill`` doi theo tung loai bang.
+STYLES = {
+    "title": {"bold": True, "font_size": 14, "align": "center", "valign": "vcenter", "border": 1},
+    "header": {"bold": True, "font_size": 12, "align": "center", "valign": "vcenter", "text_wrap": True, "border": 1},
+    "unit": {"font_size": 10, "align": "center", "valign": "vcenter", "border": 1},
+    "time": {"bold": True, "align": "center", "valign": "vcenter", "border": 1},
+    "cell": {"border": 1},
+    "date": {"num_format": "yyyy-mm-dd"},
+}
+GRID_LAYOUTS = {
+    KIND_TO_MAY: {"slots": [f"{hour:02d}:00" for hour in range(24)], "fill": "#90EE90", "unit_fill": "#E0E0E0", "width": 15},
+    KIND_TRAM: {"slots": [f"{hour:02d}:00" for hour in range(0, 24, 2)], "fill": "#B0C4DE", "unit_fill": "#E6F2FF", "width": 18},
+}
+
+
+class ExportError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_export_options(kind, params, to_may=""):
+    """Doc ``date`` hoac ``tu_ngay``/``den_ngay`` + ``format``; tra ve dict luu duoc vao ``TacVuNen.tham_so``."""
+    tu_ngay = params.get("tu_ngay") or params.get("date")
+    den_ngay = params.get("den_ngay") or tu_ngay
+    if not tu_ngay:
+        raise ExportError("Thiếu tham số date")
+    try:
+        start = datetime.strptime(tu_ngay, "%Y-%m-%d").date()
+        end = datetime.strptime(den_ngay, "%Y-%m-%d").date()
+    except ValueError:
+        raise ExportError("Định dạng ngày không hợp lệ, sử dụng YYYY-MM-DD")
+    if end < start:
+        raise ExportError("Ngày kết thúc phải sau hoặc bằng ngày bắt đầu")
+    max_days = getattr(settings, "THONG_SO_EXPORT_MAX_DAYS", DEFAULT_MAX_DAYS)
+    if (end - start).days + 1 > max_days:
+        raise ExportError(f"Chỉ xuất tối đa {max_days} ngày mỗi lần")
+
+    format_type = params.get("format", "xlsx")
+    if format_type not in FORMATS[kind]:
+        raise ExportError("Định dạng không được hỗ trợ")
+    return {
+        "kieu": kind,
+        "tu_ngay": start.isoformat(),
+        "den_ngay": end.isoformat(),
+        "thiet_bi": params.get("thiet_bi", "all"),
+        "to_may": to_may,
+        "format": format_type,
+    }
+
+
+def export_days(options):
+    start = datetime.strptime(options["tu_ngay"], "%Y-%m-%d").date()
+    end = datetime.strptime(options["den_ngay"], "%Y-%m-%d").date()
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def should_run_in_background(options, params):
+    if str(params.get("background", "")).lower() in ("1", "true", "yes"):
+        return True
+    return len(export_days(options)) > getattr(settings, "THONG_SO_EXPORT_SYNC_MAX_DAYS", DEFAULT_SYNC_MAX_DAYS)
+
+
+def export_filename(options):
+    days = options["tu_ngay"] if options["tu_ngay"] == options["den_ngay"] else f"{options['tu_ngay']}_{options['den_ngay']}"
+    if options["kieu"] == KIND_TO_MAY:
+        return f"thong_so_to_may_{options['to_may'].lower()}_{days}.xlsx"
+    if options["kieu"] == KIND_TRAM:
+        return f"ThongSoTram_110kV_{days}.xlsx"
+    return f"thong_so_van_hanh_{days}.{options['format']}"
+
+
+def export_content_type(options):
+    return CSV_CONTENT_TYPE if options["format"] == "csv" else EXCEL_CONTENT_TYPE
+
+
+def export_queryset(options, user):
+    """Queryset da loc theo nha may cua ``user``; nem ``ExportError`` (404) khi thieu thiet bi to may."""
+    date_range = (options["tu_ngay"], options["den_ngay"])
+    if options["kieu"] == KIND_THONG_SO:
+        queryset = ThongSoVanHanh.objects.filter(ngay_nhap__range=date_range)
+        if options["thiet_bi"] != "all":
+            queryset = queryset.filter(thiet_bi__ma_day_du__startswith=options["thiet_bi"])
+    elif options["kieu"] == KIND_TO_MAY:
+        to_may = options["to_may"]
+        factory_code = get_user_factory_code(user) or "SH"
+        devices = filter_queryset_by_factory(ThietBi.objects.all(), user, "nha_may", "string")
+        device = devices.filter(ma_day_du=f"{factory_code}.TB.{to_may}.GE").first()
+        if device is None:
+            raise ExportError(f"Không tìm thấy thiết bị {to_may}", status=404)
+        prefix = ".".join(device.ma_day_du.split(".")[:3])
+        queryset = ThongSoToMay.objects.filter(thiet_bi__ma_day_du__startswith=prefix, ngay_nhap__range=date_range)
+    else:
+        queryset = ThongSoTram110KV.objects.filter(ngay_nhap__range=date_range)
+    queryset = filter_queryset_by_factory(queryset, user, "nha_may", "string")
+    return queryset.order_by("ngay_nhap", "thoi_diem_nhap", "pk")
+
+
+def add_formats(workbook, fill=None, unit_fill=None):
+    formats = {}
+    for name, spec in STYLES.items():
+        spec = dict(spec)
+        if fill and name in ("title", "header"):
+            spec["bg_color"] = fill
+        if unit_fill and name == "unit":
+            spec["bg_color"] = unit_fill
+        formats[name] = workbook.add_format(spec)
+    return formats
+
+
+def _local_hour(value):
+    return timezone.localtime(value).strftime("%H:%M") if timezone.is_aware(value) else value.strftime("%H:%M")
+
+
+def iter_flat_rows(queryset):
+    fields = [field for _, field in FLAT_COLUMNS]
+    for row in queryset.values_list(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield (row[0], _local_hour(row[1]), *("" if value is None else value for value in row[2:]))
+
+
+def iter_grid_rows(queryset):
+    for ngay, thoi_diem, ten, gia_tri in queryset.values_list(*GRID_FIELDS).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield ngay, _local_hour(thoi_diem), ten, gia_tri
+
+
+def _report(progress, done, total):
+    if progress is not None:
+        progress(done, total, "ghi_tep")
+
+
+def write_flat_xlsx(workbook, rows, total=0, progress=None):
+    sheet = workbook.add_worksheet("Thông số vận hành")
+    formats = add_formats(workbook)
+    sheet.set_column(0, len(FLAT_COLUMNS) - 1, 16)
+    sheet.write_row(0, 0, [title for title, _ in FLAT_COLUMNS], formats["header"])
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        sheet.write_datetime(count, 0, row[0], formats["date"])
+        sheet.write_row(count, 1, row[1:])
+        if count % ITERATOR_CHUNK_SIZE == 0:
+            _report(progress, count, total)
+    return count
+
+
+def write_flat_csv(handle, rows, total=0, progress=None):
+    text = io.TextIOWrapper(handle, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow([title for title, _ in FLAT_COLUMNS])
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([row[0].isoformat(), *row[1:]])
+        if count % ITERATOR_CHUNK_SIZE == 0:
+            _report(progress, count, total)
+    text.flush()
+    text.detach()
+    return count
+
+
+def write_grid_xlsx(workbook, kind, sheet_name, title, columns, days, rows, total=0, progress=None):
+    """Bang luoi: dong 1 tieu de, dong 2 ten thong so, dong 3 don vi, moi ngay mot khoi gio.
+
+    Xuat mot ngay giu dung bo cuc file mau (thong so tu cot A, doc lai duoc bang import);
+    nhieu ngay them cot "Thời điểm" dau tien de phan biet cac ngay.
+    """
+    layout = GRID_LAYOUTS[kind]
+    formats = add_formats(workbook, layout["fill"], layout["unit_fill"])
+    sheet = workbook.add_worksheet(sheet_name)
+    with_time = len(days) > 1
+    offset = 1 if with_time else 0
+    last_col = len(columns) - 1 + offset
+    sheet.set_column(0, last_col, layout["width"])
+    sheet.merge_range(0, 0, 0, last_col, title, formats["title"])
+    # constant_memory chi ghi duoc tung dong theo thu tu, khong quay lai dong cu.
+    time_header = [("Thời điểm", "")] if with_time else []
+    sheet.write_row(1, 0, [ten for ten, _ in time_header] + [column["ten"] for column in columns], formats["header"])
+    sheet.write_row(2, 0, [don_vi for _, don_vi in time_header] + [column["don_vi"] for column in columns], formats["unit"])
+
+    groups = itertools.groupby(rows, key=lambda row: row[0])
+    pending = next(groups, None)
+    row_index = 3
+    count = 0
+    for day in days:
+        values = {}
+        while pending is not None and pending[0] <= day:
+            if pending[0] == day:
+                for _, slot, ten, gia_tri in pending[1]:
+                    values[(slot, ten)] = gia_tri
+                    count += 1
+            pending = next(groups, None)
+        for slot in layout["slots"]:
+            if with_time:
+                sheet.write(row_index, 0, f"{day:%d/%m/%Y} {slot}", formats["time"])
+            for index, column in enumerate(columns, start=offset):
+                sheet.write(row_index, index, values.get((slot, column["ten"])), formats["cell"])
+            row_index += 1
+        _report(progress, count, total)
+    return count
+
+
+def write_export(options, user, handle, progress=None):
+    """Ghi tep xuat vao ``handle`` (file nhi phan), tra ve so ban ghi thong so da ghi."""
+    queryset = export_queryset(options, user)
+    total = queryset.count() if progress is not None else 0
+    if options["format"] == "csv":
+        return write_flat_csv(handle, iter_flat_rows(queryset), total, progress)
+
+    workbook = xlsxwriter.Workbook(handle, {"constant_memory": True})
+    try:
+        if options["kieu"] == KIND_THONG_SO:
+            return write_flat_xlsx(workbook, iter_flat_rows(queryset), total, progress)
+        if options["kieu"] == KIND_TO_MAY:
+            sheet_name, title, columns = f"Thông số {options['to_may']}", f"THÔNG SỐ {options['to_may']}", TOMAY_EXPORT_COLUMNS
+        else:
+            config = get_tram_factory_config(get_user_factory_code(user) or "SH")
+            sheet_name, title, columns = "Thông số Trạm", config["title"], config["columns"]
+        rows = iter_grid_rows(queryset)
+        return write_grid_xlsx(workbook, options["kieu"], sheet_name, title, columns, export_days(options), rows, total, progress)
+    finally:
+        workbook.close()
+
+
+def run_export_job(job, progress):
+    """Ham xu ly tac vu nen ``TacVuNen.LOAI_XUAT_THONG_SO``: ghi tep ket qua vao ``tep_ket_qua``."""
+    if job.nguoi_tao is None:
+        raise ExportError("Tác vụ xuất không còn người tạo để xác định phạm vi nhà máy.")
+    filename = export_filename(job.tham_so)
+    with tempfile.TemporaryFile() as handle:
+        count = write_export(job.tham_so, job.nguoi_tao, handle, progress)
+        handle.seek(0)
+        job.tep_ket_qua.save(filename, File(handle), save=False)
+    TacVuNen.objects.filter(pk=job.pk).update(tep_ket_qua=job.tep_ket_qua.name)
+    return {"so_ban_ghi": count, "ten_tep": filename}
@@ -9,6 +9,8 @@ from django.utils.dateparse import parse_date, parse_datetime
 
 from core.factory_scope import filter_queryset_by_factory
 from quanlyvanhanh.models import ThietBi, ThongSoToMay, ThongSoTram110KV, ThongSoVanHanh, NguongThongSo
+from quanlyvanhanh.services.thiet_bi_tree_service import subtree_q
+from quanlyvanhanh.services.thongso_partition_service import pruning_window
 
 
 NUM_RE = re.compile(r"[-+]?\d+(?:[.,\s]\d+)*([.,]\d+)?")
@@ -180,11 +182,7 @@ def apply_device_filter(queryset, source, device):
         prefix = ".".join(device.ma_day_du.split(".")[:3])
         return queryset.filter(thiet_bi__ma_day_du__startswith=prefix)
 
-    if device.ma_day_du:
-        return queryset.filter(
-            Q(thiet_bi=device) | Q(thiet_bi__ma_day_du__startswith=f"{device.ma_day_du}.")
-        )
-    return queryset.filter(thiet_bi=device)
+    return queryset.filter(subtree_q(device))
 
 
 def base_queryset(user, source, start, end, device):
@@ -192,10 +190,11 @@ def base_queryset(user, source, start, end, device):
     if not config:
         raise HistoryQueryError("source khong hop le. Gia tri hop le: dien, tomay, tram.")
 
-    queryset = config["model"].objects.select_related("thiet_bi")
+    model = config["model"]
+    queryset = model.objects.select_related("thiet_bi")
     queryset = filter_queryset_by_factory(queryset, user, "nha_may", "string")
     queryset = apply_device_filter(queryset, source, device)
-    return queryset.filter(thoi_diem_nhap__gte=start, thoi_diem_nhap__lt=end)
+    return queryset.filter(pruning_window(model, start, end), thoi_diem_nhap__gte=start, thoi_diem_nhap__lt=end)
 
 
 def build_metrics(queryset):
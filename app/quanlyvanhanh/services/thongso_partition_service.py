@@ -0,0 +1,425 @@
+"""Phan vung theo thang (PostgreSQL declarative partitioning) cho cac bang thong so.
+
+``thong_so_van_hanh``, ``thong_so_to_may`` va ``thong_so_tram_110kv`` co the duoc phan vung
+``RANGE (ngay_nhap)``, moi thang mot bang con ``<bang>_pYYYYMM`` cong mot phan vung
+``<bang>_mac_dinh`` hung du lieu ngoai cac thang da tao. Truy van co dieu kien
+``ngay_nhap`` chi quet cac thang lien quan nen do tre xem ngay gan day khong tang theo
+so nam du lieu.
+
+Phan vung la tuy chon, lam trong cua so bao tri bang lenh ``thong_so_partitions``:
+``normalize`` bao cao (hoac ``--apply`` thi sua) cac dong co ``ngay_nhap`` lech xa
+``thoi_diem_nhap``; ``convert`` them CHECK ``NOT VALID`` roi ``VALIDATE`` rieng, sau do
+chuyen bang. Chi voi bang da phan vung, serializer moi kiem tra do lech ngay, truy van
+moi ghep dieu kien ``ngay_nhap`` de loai bo phan vung, va upsert moi dung khoa co ``ngay_nhap``.
+
+Quy trinh dinh ky (``maintain_partitions``, chay qua Celery beat hoac lenh
+``thong_so_partitions``): tao truoc phan vung cho ``THONG_SO_PARTITION_MONTHS_AHEAD``
+thang toi; neu dat ``THONG_SO_PARTITION_RETENTION_MONTHS`` thi tach (DETACH) cac thang cu
+hon va chuyen sang schema luu tru ``luu_tru_thong_so`` (co the ATTACH lai khi can).
+Bang chua phan vung va CSDL khac PostgreSQL deu duoc bo qua.
+"""
+
+import logging
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("thong_so_van_hanh", "thong_so_to_may", "thong_so_tram_110kv")
+PARTITION_KEY = "ngay_nhap"
+ARCHIVE_SCHEMA = "luu_tru_thong_so"
+DEFAULT_PARTITION_SUFFIX = "mac_dinh"
+LEGACY_TABLE_SUFFIX = "truoc_phan_vung"
+DEFAULT_MONTHS_AHEAD = 3
+# ngay_nhap lech toi da mot ngay so voi ngay (gio dia phuong) cua thoi_diem_nhap, vd. moc 24:00
+# cua ngay D luu la 00:00 ngay D+1. Chi ep buoc tren bang da phan vung (serializer + CHECK).
+NGAY_NHAP_MAX_LECH_DAYS = 1
+NGAY_NHAP_CHECK_SUFFIX = "ngay_nhap_lech_ck"
+# Trang thai phan vung cua bang duoc nho trong tien trinh bay nhieu giay (serializer hoi moi dong).
+PARTITION_STATE_TTL_SECONDS = 60
+PARTITION_BOUND_RE = re.compile(r"FROM \('(\d{4})-(\d{2})-01'\)")
+
+_partition_state = {}
+
+
+class NgayNhapLechError(Exception):
+    """Bang con dong co ``ngay_nhap`` lech xa ``thoi_diem_nhap``, chua the them CHECK / phan vung."""
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_{DEFAULT_PARTITION_SUFFIX}"
+
+
+def parse_partition_bound(bound):
+    """Thang bat dau cua phan vung tu ``pg_get_expr(relpartbound)``; ``None`` voi DEFAULT."""
+    match = PARTITION_BOUND_RE.search(bound or "")
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def ngay_nhap_matches(thoi_diem_nhap, ngay_nhap):
+    """``ngay_nhap`` co nam trong +-``NGAY_NHAP_MAX_LECH_DAYS`` ngay quanh ngay cua ``thoi_diem_nhap``."""
+    return abs((ngay_nhap - _local_date(thoi_diem_nhap)).days) <= NGAY_NHAP_MAX_LECH_DAYS
+
+
+def ngay_nhap_window(start, end, field=PARTITION_KEY):
+    """Dieu kien ``ngay_nhap`` bao tron moi dong co ``thoi_diem_nhap`` (hoac ngay nhap) trong [start, end].
+
+    Nho rang buoc ``ngay_nhap_matches`` day la tap cha cua dieu kien chinh xac: ghep them bang
+    AND khong doi ket qua, chi de PostgreSQL loai bo phan vung thua.
+    """
+    slack = timedelta(days=NGAY_NHAP_MAX_LECH_DAYS)
+    return Q(**{f"{field}__gte": _local_date(start) - slack, f"{field}__lte": _local_date(end) + slack})
+
+
+def partitioning_supported(conn=None):
+    return (conn or connection).vendor == "postgresql"
+
+
+def model_is_partitioned(model):
+    """Bang cua ``model`` da chuyen sang phan vung chua (nho ``PARTITION_STATE_TTL_SECONDS`` giay)."""
+    if not partitioning_supported():
+        return False
+    table = model._meta.db_table
+    now = time.monotonic()
+    cached = _partition_state.get(table)
+    if cached is None or now - cached[1] >= PARTITION_STATE_TTL_SECONDS:
+        with connection.cursor() as cursor:
+            cached = _partition_state[table] = (is_partitioned(cursor, table), now)
+    return cached[0]
+
+
+def forget_partition_state(table=None):
+    if table is None:
+        _partition_state.clear()
+    else:
+        _partition_state.pop(table, None)
+
+
+def pruning_window(model, start, end):
+    """``ngay_nhap_window`` neu bang cua ``model`` da phan vung, nguoc lai dieu kien rong.
+
+    Bang chua phan vung khong co rang buoc do lech ngay nen khong duoc ghep dieu kien nay.
+    """
+    return ngay_nhap_window(start, end) if model_is_partitioned(model) else Q()
+
+
+def conflict_fields(model, unique_fields):
+    """Khoa ``ON CONFLICT`` cho upsert: rang buoc duy nhat tren bang phan vung phai chua ``ngay_nhap``."""
+    if PARTITION_KEY in unique_fields or not model_is_partitioned(model):
+        return tuple(unique_fields)
+    return (*unique_fields, PARTITION_KEY)
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def create_partition_sql(table, month):
+    """Cau lenh tao phan vung thang ``month``.
+
+    Tao bang rieng, chuyen cac dong cua thang nay dang nam trong phan vung mac dinh sang,
+    roi ATTACH - PostgreSQL tu choi tao phan vung moi neu phan vung mac dinh con dong
+    thuoc khoang do.
+    """
+    child, default = _qn(partition_name(table, month)), _qn(default_partition_name(table))
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    return [
+        f"CREATE TABLE {child} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"WITH moved AS (DELETE FROM {default} WHERE {PARTITION_KEY} >= '{start}' AND {PARTITION_KEY} < '{end}' RETURNING *) "
+        f"INSERT INTO {child} SELECT * FROM moved",
+        f"ALTER TABLE {_qn(table)} ATTACH PARTITION {child} FOR VALUES FROM ('{start}') TO ('{end}')",
+    ]
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace",
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor, table):
+    """``[(ten bang con, thang bat dau | None neu DEFAULT)]`` dang gan vao ``table``."""
+    cursor.execute(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace "
+        "ORDER BY child.relname",
+        [table],
+    )
+    return [(name, parse_partition_bound(bound)) for name, bound in cursor.fetchall()]
+
+
+def _months_between(first, last):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def _table_definitions(cursor, table):
+    """Rang buoc (tru PRIMARY KEY) va chi muc rieng cua ``table`` de tao lai tren bang cha."""
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('u', 'f', 'c') ORDER BY conname",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes i WHERE schemaname = current_schema() AND tablename = %s "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname AND c.conrelid = %s::regclass) "
+        "ORDER BY indexname",
+        [table, table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    return constraints, indexes
+
+
+def _local_date_sql(alias=None):
+    column = f"{alias}.thoi_diem_nhap" if alias else "thoi_diem_nhap"
+    return f"({column} AT TIME ZONE '{settings.TIME_ZONE}')::date"
+
+
+def _outside_sql(alias):
+    local_date = _local_date_sql(alias)
+    return f"{alias}.{PARTITION_KEY} NOT BETWEEN {local_date} - {NGAY_NHAP_MAX_LECH_DAYS} AND {local_date} + {NGAY_NHAP_MAX_LECH_DAYS}"
+
+
+def _colliding_sql(table):
+    # Dong lech se trung khoa sau khi dua ve ngay cua thoi_diem_nhap: da co dong dung ngay,
+    # hoac mot dong lech khac cung khoa co id lon hon (giu dong moi nhat).
+    return (
+        f"{_outside_sql('o')} AND EXISTS (SELECT 1 FROM {_qn(table)} k WHERE k.id <> o.id "
+        f"AND k.thiet_bi_id = o.thiet_bi_id AND k.ten_thong_so = o.ten_thong_so AND k.thoi_diem_nhap = o.thoi_diem_nhap "
+        f"AND (k.{PARTITION_KEY} = {_local_date_sql('o')} OR (k.id > o.id AND {_outside_sql('k')})))"
+    )
+
+
+def normalize_ngay_nhap(table, apply=False):
+    """Dong co ``ngay_nhap`` lech qua ``NGAY_NHAP_MAX_LECH_DAYS`` ngay so voi ``thoi_diem_nhap``.
+
+    Tra ve ``{"lech": so dong lech, "xoa": so dong lech se trung khoa}``. Mac dinh chi dem;
+    ``apply=True`` thi trong mot giao dich xoa cac dong trung khoa va dua ``ngay_nhap`` cac
+    dong con lai ve ngay cua ``thoi_diem_nhap``.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {_qn(table)} o WHERE {_outside_sql('o')}")
+        outside = cursor.fetchone()[0]
+        cursor.execute(f"SELECT count(*) FROM {_qn(table)} o WHERE {_colliding_sql(table)}")
+        colliding = cursor.fetchone()[0]
+        if apply and outside:
+            cursor.execute(f"DELETE FROM {_qn(table)} o WHERE {_colliding_sql(table)}")
+            cursor.execute(f"UPDATE {_qn(table)} t SET {PARTITION_KEY} = {_local_date_sql('t')} WHERE {_outside_sql('t')}")
+            logger.info("Bang %s: xoa %s dong trung khoa, sua ngay_nhap %s dong.", table, colliding, outside - colliding)
+    return {"lech": outside, "xoa": colliding}
+
+
+def add_ngay_nhap_check(table):
+    """Them CHECK do lech ``ngay_nhap`` cho ``table``: ``NOT VALID`` (khoa ngan, khong quet bang),
+    roi ``VALIDATE CONSTRAINT`` o buoc rieng (chi khoa SHARE UPDATE EXCLUSIVE, van ghi duoc).
+
+    Nem ``NgayNhapLechError`` neu con dong lech (chay ``normalize_ngay_nhap`` truoc).
+    """
+    name = f"{table}_{NGAY_NHAP_CHECK_SUFFIX}"
+    remaining = normalize_ngay_nhap(table)["lech"]
+    if remaining:
+        raise NgayNhapLechError(f"Bang {table} con {remaining} dong co ngay_nhap lech xa thoi_diem_nhap.")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT convalidated FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s", [table, name])
+        row = cursor.fetchone()
+        if row is None:
+            with transaction.atomic():
+                cursor.execute(
+                    f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} CHECK ({PARTITION_KEY} BETWEEN "
+                    f"{_local_date_sql()} - {NGAY_NHAP_MAX_LECH_DAYS} AND {_local_date_sql()} + {NGAY_NHAP_MAX_LECH_DAYS}) NOT VALID"
+                )
+        if not (row and row[0]):
+            with transaction.atomic():
+                cursor.execute(f"ALTER TABLE {_qn(table)} VALIDATE CONSTRAINT {_qn(name)}")
+    return name
+
+
+def _partition_unique_definition(definition):
+    """PostgreSQL yeu cau rang buoc duy nhat tren bang phan vung chua cot phan vung."""
+    columns = definition[definition.index("(") + 1:definition.rindex(")")]
+    if PARTITION_KEY in (column.strip() for column in columns.split(",")):
+        return definition
+    return f"{definition[:definition.rindex(')')]}, {PARTITION_KEY})"
+
+
+def convert_to_partitioned(table, months_ahead=None, today=None):
+    """Chuyen bang thuong ``table`` thanh bang phan vung theo thang, giu du lieu, rang buoc,
+    chi muc va bo dem id. Khoa chinh tro thanh ``(id, ngay_nhap)`` va rang buoc duy nhat chua
+    co ``ngay_nhap`` duoc them cot nay, vi PostgreSQL yeu cau moi rang buoc duy nhat chua cot
+    phan vung. Truoc do them CHECK do lech ``ngay_nhap`` (``add_ngay_nhap_check``).
+    Tra ve ``False`` neu bang da phan vung.
+    """
+    months_ahead = _months_ahead(months_ahead)
+    legacy = f"{table}_{LEGACY_TABLE_SUFFIX}"
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return False
+    add_ngay_nhap_check(table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {_qn(table)} RENAME TO {_qn(legacy)}")
+        constraints, indexes = _table_definitions(cursor, legacy)
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [legacy])
+        legacy_sequence = cursor.fetchone()[0]
+
+        cursor.execute(
+            f"CREATE TABLE {_qn(table)} (LIKE {_qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+            f"INCLUDING GENERATED INCLUDING STORAGE) PARTITION BY RANGE ({PARTITION_KEY})"
+        )
+        cursor.execute(f"CREATE TABLE {_qn(default_partition_name(table))} PARTITION OF {_qn(table)} DEFAULT")
+        cursor.execute(f"SELECT min({PARTITION_KEY}) FROM {_qn(legacy)}")
+        first = cursor.fetchone()[0]
+        current = month_start(today or timezone.localdate())
+        first = min(first or current, current)
+        for month in _months_between(first, add_months(current, months_ahead)):
+            for statement in create_partition_sql(table, month):
+                cursor.execute(statement)
+
+        cursor.execute(f"INSERT INTO {_qn(table)} SELECT * FROM {_qn(legacy)}")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        if sequence and sequence != legacy_sequence:
+            # Cot IDENTITY: bang moi co bo dem rieng, dat tiep tu id lon nhat.
+            cursor.execute(f"SELECT setval(%s, coalesce((SELECT max(id) FROM {_qn(table)}), 0) + 1, false)", [sequence])
+        elif legacy_sequence:
+            # Cot serial: DEFAULT nextval(...) da duoc chep, chuyen quyen so huu bo dem sang bang moi.
+            cursor.execute(f"ALTER SEQUENCE {legacy_sequence} OWNED BY {_qn(table)}.id")
+        cursor.execute(f"DROP TABLE {_qn(legacy)}")
+
+        cursor.execute(f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(f'{table}_pkey')} PRIMARY KEY (id, {PARTITION_KEY})")
+        for name, definition in constraints:
+            if definition.startswith("UNIQUE"):
+                definition = _partition_unique_definition(definition)
+            cursor.execute(f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} {definition}")
+        for definition in indexes:
+            cursor.execute(re.sub(r" ON \S+ USING ", f" ON {_qn(table)} USING ", definition, count=1))
+    forget_partition_state(table)
+    logger.info("Da chuyen bang %s sang phan vung theo thang.", table)
+    return True
+
+
+def _months_ahead(value):
+    if value is None:
+        value = getattr(settings, "THONG_SO_PARTITION_MONTHS_AHEAD", DEFAULT_MONTHS_AHEAD)
+    return max(int(value), 0)
+
+
+def _partitioned_tables(cursor, tables):
+    result = []
+    for table in tables or PARTITIONED_TABLES:
+        if is_partitioned(cursor, table):
+            result.append(table)
+        else:
+            logger.warning("Bang %s chua phan vung, bo qua.", table)
+    return result
+
+
+def create_partitions(months_ahead=None, today=None, tables=None):
+    """Tao cac phan vung con thieu tu thang hien tai toi ``months_ahead`` thang sau."""
+    if not partitioning_supported():
+        logger.info("Phan vung thong so chi ho tro PostgreSQL, bo qua.")
+        return {}
+    current = month_start(today or timezone.localdate())
+    months = list(_months_between(current, add_months(current, _months_ahead(months_ahead))))
+    created = {}
+    with connection.cursor() as cursor:
+        for table in _partitioned_tables(cursor, tables):
+            existing = {month for _, month in list_partitions(cursor, table)}
+            created[table] = []
+            for month in months:
+                if month in existing:
+                    continue
+                with transaction.atomic():
+                    for statement in create_partition_sql(table, month):
+                        cursor.execute(statement)
+                created[table].append(partition_name(table, month))
+    return created
+
+
+def archive_partitions(retention_months=None, today=None, drop=False, tables=None):
+    """Tach cac phan vung cu hon ``retention_months`` thang; chuyen sang schema luu tru hoac xoa.
+
+    ``retention_months`` mac dinh ``THONG_SO_PARTITION_RETENTION_MONTHS``; 0/None la giu mai.
+    """
+    if retention_months is None:
+        retention_months = getattr(settings, "THONG_SO_PARTITION_RETENTION_MONTHS", 0)
+    if not retention_months or not partitioning_supported():
+        return {}
+    cutoff = add_months(month_start(today or timezone.localdate()), -int(retention_months))
+    archived = {}
+    with connection.cursor() as cursor:
+        for table in _partitioned_tables(cursor, tables):
+            archived[table] = []
+            for name, month in list_partitions(cursor, table):
+                if month is None or month >= cutoff:
+                    continue
+                with transaction.atomic():
+                    cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(name)}")
+                    if drop:
+                        cursor.execute(f"DROP TABLE {_qn(name)}")
+                    else:
+                        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_qn(ARCHIVE_SCHEMA)}")
+                        cursor.execute(f"ALTER TABLE {_qn(name)} SET SCHEMA {_qn(ARCHIVE_SCHEMA)}")
+                archived[table].append(name)
+                logger.info("Da %s phan vung %s.", "xoa" if drop else "luu tru", name)
+    return archived
+
+
+def attach_partition(table, month):
+    """Gan lai phan vung thang ``month`` da luu tru (schema ``luu_tru_thong_so``) vao ``table``."""
+    if not partitioning_supported():
+        return False
+    month = month_start(month)
+    name = partition_name(table, month)
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f"{ARCHIVE_SCHEMA}.{name}"])
+        if cursor.fetchone()[0] is None:
+            return False
+        cursor.execute("SELECT current_schema()")
+        schema = cursor.fetchone()[0]
+        cursor.execute(f"ALTER TABLE {_qn(ARCHIVE_SCHEMA)}.{_qn(name)} SET SCHEMA {_qn(schema)}")
+        cursor.execute(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(name)} FOR VALUES FROM ('{start}') TO ('{end}')")
+    logger.info("Da gan lai phan vung %s.", name)
+    return True
+
+
+def maintain_partitions(today=None):
+    """Viec dinh ky: tao truoc phan vung cac thang toi va luu tru phan vung qua han."""
+    return {
+        "created": create_partitions(today=today),
+        "archived": archive_partitions(today=today),
+    }
@@ -0,0 +1,32 @@
+import logging
+
+from celery import shared_task
+from django.db import close_old_connections
+
+from quanlyvanhanh.services.tac_vu_service import run_job
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def run_tac_vu_task(self, job_id):
+    close_old_connections()
+    try:
+        job = run_job(job_id)
+        return job.trang_thai if job else None
+    finally:
+        close_old_connections()
+
+
+@shared_task
+def maintain_thong_so_partitions_task():
+    """Tao truoc phan vung thang toi va luu tru phan vung qua han cua cac bang thong so."""
+    logger.info("Celery Task: maintain_thong_so_partitions_task started.")
+    try:
+        from quanlyvanhanh.services.thongso_partition_service import maintain_partitions
+        return maintain_partitions()
+    except Exception:
+        logger.exception("Celery Task: maintain_thong_so_partitions_task failed.")
+        raise
+    finally:
+        close_old_connections()
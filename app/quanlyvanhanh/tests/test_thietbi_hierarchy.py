@@ -0,0 +1,160 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from quanlyvanhanh.models import AnToanThietBi, ThietBi, ThietBiVatTu, VatTu
+from quanlyvanhanh.services.thiet_bi_tree_service import (
+    ancestors_queryset,
+    descendants_queryset,
+    factory_subtree_q,
+    hierarchy_code_options,
+    rebuild_paths,
+    subtree_queryset,
+)
+
+
+class ThietBiHierarchyTests(TestCase):
+    def setUp(self):
+        self.root = ThietBi.objects.create(ten="To may 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="May phat", ma="GE", cha=self.root, nha_may="SH")
+        self.od = ThietBi.objects.create(ten="He thong dau", ma="OD", cha=self.ge, nha_may="SH")
+        self.pd = ThietBi.objects.create(ten="Phan phoi dau", ma="PD.01", cha=self.od, nha_may="SH")
+        self.other = ThietBi.objects.create(ten="To may 2", ma="SH.TB.H2", nha_may="SH")
+
+    def _codes(self, queryset):
+        return sorted(queryset.values_list("ma_day_du", flat=True))
+
+    def test_paths_and_single_query_tree_lookups(self):
+        self.assertEqual(self.pd.duong_dan, f"/{self.root.pk}/{self.ge.pk}/{self.od.pk}/{self.pd.pk}/")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self._codes(subtree_queryset(self.ge)), ["SH.TB.H1.GE", "SH.TB.H1.GE.OD", "SH.TB.H1.GE.OD.PD.01"])
+        with self.assertNumQueries(1):
+            self.assertEqual(self._codes(descendants_queryset(self.root, depth=2)), ["SH.TB.H1.GE", "SH.TB.H1.GE.OD"])
+        with self.assertNumQueries(1):
+            self.assertEqual([item.ma for item in ancestors_queryset(self.pd)], ["SH.TB.H1", "GE", "OD"])
+
+        self.assertEqual(ThietBi.objects.filter(factory_subtree_q("sh")).count(), 5)
+
+    def test_rename_and_move_cascade_to_descendants(self):
+        self.ge.ma = "GEN"
+        self.ge.save()
+        self.pd.refresh_from_db()
+        self.assertEqual(self.pd.ma_day_du, "SH.TB.H1.GEN.OD.PD.01")
+
+        self.od.cha = self.other
+        self.od.save()
+        self.pd.refresh_from_db()
+        self.assertEqual((self.pd.ma_day_du, self.pd.cap), ("SH.TB.H2.OD.PD.01", 2))
+        self.assertEqual(self.pd.duong_dan, f"/{self.other.pk}/{self.od.pk}/{self.pd.pk}/")
+        self.assertEqual(self._codes(subtree_queryset(self.ge)), ["SH.TB.H1.GEN"])
+
+        self.other.cha = self.pd
+        with self.assertRaises(ValidationError):
+            self.other.save()
+
+    def test_rebuild_paths_repairs_stale_rows(self):
+        ThietBi.objects.filter(pk=self.pd.pk).update(duong_dan="", cap=0)
+
+        self.assertEqual(rebuild_paths(), 1)
+        self.pd.refresh_from_db()
+        self.assertEqual((self.pd.duong_dan, self.pd.cap), (f"/{self.root.pk}/{self.ge.pk}/{self.od.pk}/{self.pd.pk}/", 3))
+        self.assertEqual(rebuild_paths(), 0)
+
+    def test_rebuild_paths_command_refreshes_search_text(self):
+        ThietBi.objects.filter(pk=self.pd.pk).update(duong_dan="", cap=0, van_ban_tim_kiem="")
+        out = StringIO()
+
+        call_command("rebuild_thiet_bi_paths", stdout=out)
+
+        self.pd.refresh_from_db()
+        self.assertEqual(self.pd.cap, 3)
+        self.assertIn("phan phoi dau", self.pd.van_ban_tim_kiem)
+        self.assertIn("1 thiet bi", out.getvalue())
+
+    def test_api_rejects_moving_device_under_its_own_subtree(self):
+        user = get_user_model().objects.create_user(
+            username="tree-admin", email="tree-admin@example.com", password="testpass123", is_superuser=True,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.patch(f"/api/quanlyvanhanh/thiet-bi/{self.ge.pk}/", {"cha": self.pd.pk}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cha", response.json())
+
+
+class ThietBiTreeApiTests(TestCase):
+    url = "/api/quanlyvanhanh/thiet-bi/cay_phan_cap/"
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(
+            username="tree-viewer", email="tree-viewer@example.com", password="testpass123", is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.root = ThietBi.objects.create(ten="To may 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="May phat", ma="GE", cha=self.root, nha_may="SH")
+        vat_tu = VatTu.objects.create(ma_vat_tu="VT-01", ten_vat_tu="Vong bi")
+        ThietBiVatTu.objects.create(thiet_bi=self.ge, vat_tu=vat_tu)
+        AnToanThietBi.objects.create(thiet_bi=self.ge, moi_nguy="Dien ap cao")
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_tree_is_built_with_fixed_queries_and_cached_until_devices_change(self):
+        tree, cold_queries = self._get()
+
+        self.assertEqual([node["ma_day_du"] for node in tree], ["SH.TB.H1"])
+        ge = tree[0]["con"][0]
+        self.assertEqual((tree[0]["so_con"], ge["so_vat_tu"], ge["so_an_toan"], ge["so_dinh_kem"]), (1, 1, 1, 0))
+        self.assertTrue(ge["ma_qr"].endswith(f"detailId={self.ge.pk}"))
+        self.assertTrue(ge["qr_url"].endswith(f"/thiet-bi/{self.ge.pk}/qr/"))
+
+        _tree, warm_queries = self._get()
+        self.assertLess(warm_queries, cold_queries)
+
+        for index in range(5):
+            ThietBi.objects.create(ten=f"Cum {index}", ma=f"C{index}", cha=self.ge, nha_may="SH")
+        tree, queries = self._get()
+        self.assertEqual(queries, cold_queries)
+        self.assertEqual(tree[0]["con"][0]["so_con"], 5)
+
+    def test_code_pickers_list_distinct_level_codes_and_follow_renames(self):
+        ThietBi.objects.create(ten="Dau", ma="OD", cha=self.ge, nha_may="SH")
+        ThietBi.objects.create(ten="Kho du phong", ma="SH.TB.H2.GE", nha_may="SH")
+        codes_url = "/api/quanlyvanhanh/thiet-bi/cap_0_codes/"
+
+        self.assertEqual(
+            [(row["id"], row["ma"], row["ten"]) for row in self.client.get(codes_url).json()],
+            [("SH.TB.H1", "H1", "To may 1"), ("SH.TB.H2", "H2", "Thiet bi H2")],
+        )
+        level_1 = self.client.get("/api/quanlyvanhanh/thiet-bi/cap_1_by_parent/", {"parent_code": "SH.TB.H1"}).json()
+        self.assertEqual([(row["id"], row["ten"], row["cap"]) for row in level_1], [("SH.TB.H1.GE", "May phat", 1)])
+        level_2 = self.client.get("/api/quanlyvanhanh/thiet-bi/cap_2_by_parent/", {"parent_code": "SH.TB.H1.GE"}).json()
+        self.assertEqual([row["id"] for row in level_2], ["SH.TB.H1.GE.OD"])
+
+        self.ge.ma = "GEN"
+        self.ge.save()
+        level_2 = self.client.get("/api/quanlyvanhanh/thiet-bi/cap_2_by_parent/", {"parent_code": "SH.TB.H1.GEN"}).json()
+        self.assertEqual([row["id"] for row in level_2], ["SH.TB.H1.GEN.OD"])
+
+        # Loc cap cha bang so sanh bang tren cot ma_cap_1 co chi muc, khong LIKE tren ma_day_du.
+        with CaptureQueriesContext(connection) as queries:
+            options = hierarchy_code_options(ThietBi.objects.all(), "ma_cap_2", "SH.TB.H1.GEN")
+        self.assertEqual([row["id"] for row in options], ["SH.TB.H1.GEN.OD"])
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertIn('"ma_cap_1" =', sql)
+        self.assertNotIn("LIKE", sql.upper())
@@ -0,0 +1,133 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from quanlyvanhanh.models import TacVuNen, ThietBi
+from quanlyvanhanh.services.tac_vu_service import run_job
+
+HEADERS = ["Mã thiết bị (*)", "Mã đầy đủ thiết bị chi tiết cha", "Tên thiết bị (*)", "Nhà máy (*)", "Ngày lắp đặt (YYYY-MM-DD)"]
+URL = "/api/quanlyvanhanh/thiet-bi/import_excel/"
+
+
+def _excel(rows, headers=HEADERS):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    buffer.name = "thiet_bi.xlsx"
+    return buffer
+
+
+class ThietBiBulkImportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = get_user_model().objects.create_user(
+            username="import-admin", email="import-admin@example.com", password="testpass123", is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.root = ThietBi.objects.create(ten="To may 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="May phat", ma="GE", cha=self.root, nha_may="SH")
+
+    def test_dry_run_reports_diff_in_file_order_without_writing(self):
+        rows = [
+            ["PD.01", "SH.TB.H1.OD", "Phan phoi dau", "SH", "2026-01-15"],
+            ["OD", "SH.TB.H1", "He thong dau", "SH", None],
+            ["GE", "SH.TB.H1", "May phat dien", "SH", None],
+            ["SH.TB.H1", None, "To may 1", "SH", None],
+            ["X", "SH.TB.H9", "Mo coi", "SH", None],
+            ["OD", "SH.TB.H1", "Trung", "SH", None],
+        ]
+
+        response = self.client.post(URL, {"file": _excel(rows), "dry_run": "1"}, format="multipart")
+
+        payload = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(payload["tong_hop"], {"tao_moi": 2, "cap_nhat": 1, "giu_nguyen": 1, "loi": 2})
+        self.assertEqual([row["trang_thai"] for row in payload["dong"]], ["tao_moi", "tao_moi", "cap_nhat", "giu_nguyen", "loi", "loi"])
+        self.assertEqual(payload["dong"][2]["thay_doi"], {"ten": ["May phat", "May phat dien"]})
+        self.assertIn("SH.TB.H9", payload["dong"][4]["loi"])
+        self.assertIn("dòng 3", payload["dong"][5]["loi"])
+        self.assertEqual(ThietBi.objects.count(), 2)
+
+    def test_apply_creates_levels_in_bulk_with_paths_and_search_documents(self):
+        rows = [[f"C{index}", f"SH.TB.H1.GE.N{index % 10}", f"Chi tiet {index}", "SH", None] for index in range(200)]
+        rows += [[f"N{index}", "SH.TB.H1.GE", f"Nhom {index}", "SH", "15/01/2026"] for index in range(10)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(URL, {"file": _excel(rows)}, format="multipart")
+
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(response.json()["success_count"], 210)
+        self.assertLess(len(queries), 60)
+        leaf = ThietBi.objects.get(ma_day_du="SH.TB.H1.GE.N3.C13")
+        group = leaf.cha
+        self.assertEqual((leaf.cap, group.cap, str(group.ngay_lap_dat)), (3, 2, "2026-01-15"))
+        self.assertEqual(leaf.duong_dan, f"{group.duong_dan}{leaf.pk}/")
+        self.assertEqual(leaf.ma_cap_2, "SH.TB.H1.GE.N3")
+        self.assertIn("may phat", leaf.van_ban_tim_kiem)
+
+    @mock.patch("quanlyvanhanh.services.tac_vu_service._run_in_background", side_effect=run_job)
+    def test_background_import_reports_progress_through_job(self, _run):
+        with override_settings(MEDIA_ROOT=self.media_root), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(URL, {"file": _excel([["OD", "SH.TB.H1.GE", "He thong dau", "SH", None]]), "background": "1"}, format="multipart")
+
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(f"/api/quanlyvanhanh/tac-vu/{response.json()['id']}/").json()
+        self.assertEqual((job["trang_thai"], job["tien_do"]), (TacVuNen.TRANG_THAI_HOAN_THANH, 100))
+        self.assertEqual(job["ket_qua"]["da_ghi"], {"tao_moi": 1, "cap_nhat": 0})
+        self.assertTrue(ThietBi.objects.filter(ma_day_du="SH.TB.H1.GE.OD").exists())
+
+    def test_apply_writes_audit_log_and_refreshes_only_touched_subtrees(self):
+        from auditlog.models import LogEntry
+
+        other = ThietBi.objects.create(ten="To may 2", ma="SH.TB.H2", nha_may="SH")
+        ThietBi.objects.filter(pk=other.pk).update(van_ban_tim_kiem="cu")
+        child = ThietBi.objects.create(ten="Stator", ma="ST", cha=self.ge, nha_may="SH")
+        entries = LogEntry.objects.get_for_model(ThietBi)
+        before = entries.count()
+        rows = [
+            ["GE", "SH.TB.H1", "May phat dien", "SH", None],
+            ["OD", "SH.TB.H1.GE", "He thong dau", "SH", None],
+        ]
+
+        response = self.client.post(URL, {"file": _excel(rows)}, format="multipart")
+
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(entries.count(), before + 2)
+        update = entries.get(action=LogEntry.Action.UPDATE, object_pk=str(self.ge.pk))
+        self.assertEqual(update.changes_dict["ten"], ["May phat", "May phat dien"])
+        created = ThietBi.objects.get(ma_day_du="SH.TB.H1.GE.OD")
+        self.assertTrue(entries.filter(action=LogEntry.Action.CREATE, object_pk=str(created.pk)).exists())
+        self.assertEqual([entry.actor_id for entry in entries.order_by("-pk")[:2]], [self.user.pk] * 2)
+        child.refresh_from_db()
+        self.assertIn("may phat dien", child.van_ban_tim_kiem)
+        self.assertEqual(ThietBi.objects.get(pk=other.pk).van_ban_tim_kiem, "cu")
+
+    def test_job_is_claimed_once(self):
+        job = TacVuNen.objects.create(loai=TacVuNen.LOAI_IMPORT_THIET_BI)
+        calls = []
+
+        def handler(job, progress):
+            calls.append(job.pk)
+            # Worker thu hai nhan trung tac vu trong luc tac vu dang chay.
+            self.assertEqual(run_job(job.pk).trang_thai, TacVuNen.TRANG_THAI_DANG_CHAY)
+            return {}
+
+        with mock.patch("quanlyvanhanh.services.tac_vu_service.import_string", return_value=handler):
+            self.assertEqual(run_job(job.pk).trang_thai, TacVuNen.TRANG_THAI_HOAN_THANH)
+            run_job(job.pk)
+        self.assertEqual(calls, [job.pk])
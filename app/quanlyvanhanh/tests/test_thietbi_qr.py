@@ -1,17 +1,24 @@
+import io
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from unittest.mock import patch
 import qrcode
+from PIL import Image
+from pypdf import PdfReader
 
 from core.models import UserProfile
 from khovattu.models import Bang_nha_may
 from quanlyvanhanh.models import ThietBi
 from quanlyvanhanh.serializers import get_thiet_bi_qr_payload, ThietBiSerializer
+from quanlyvanhanh.services import thiet_bi_qr_service
 
 class ThietBiQRTests(APITestCase):
     def setUp(self):
+        cache.clear()
         # Create factory and user
         self.factory = Bang_nha_may.objects.create(ma_nha_may="VS", ten_nha_may="Vinh Son")
         self.user = get_user_model().objects.create_user(
@@ -75,3 +82,41 @@ class ThietBiQRTests(APITestCase):
         mock_add_data.assert_called_once()
         called_data = mock_add_data.call_args[0][0]
         self.assertEqual(called_data, f"https://custom-domain.com/quanlyvanhanh/thietbi?detailId={self.device.pk}")
+
+    def test_qr_image_is_cached_per_device_and_frontend_base(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse('quanlyvanhanh:thietbi-qr', kwargs={'pk': self.device.pk})
+
+        with patch.object(thiet_bi_qr_service, "render_qr_png", wraps=thiet_bi_qr_service.render_qr_png) as render:
+            first = self.client.get(url, HTTP_REFERER="https://a.example/thietbi")
+            second = self.client.get(url, HTTP_REFERER="https://a.example/khac")
+            self.client.get(url, HTTP_REFERER="https://b.example/thietbi")
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(render.call_count, 2)
+
+    def test_missing_codes_are_rendered_and_cached_in_one_pass(self):
+        images = thiet_bi_qr_service.get_qr_pngs(range(1, 41), "https://a.example")
+
+        self.assertEqual(len(images), 40)
+        self.assertTrue(all(png.startswith(b"\x89PNG") for png in images.values()))
+        self.assertEqual(cache.get(thiet_bi_qr_service.qr_cache_key(40, "https://a.example")), images[40])
+
+    def test_qr_sheet_prints_a_whole_subtree_in_one_request(self):
+        self.client.force_authenticate(user=self.user)
+        for index in range(30):
+            ThietBi.objects.create(ten=f"Chi tiết {index}", ma=f"CT{index:02d}", cha=self.device, nha_may="Vinh Son")
+        ThietBi.objects.create(ten="Ngoài nhánh", ma="VS.TB.KHAC", ma_day_du="VS.TB.KHAC", nha_may="Vinh Son")
+        url = reverse('quanlyvanhanh:thietbi-qr-sheet')
+
+        with patch.object(thiet_bi_qr_service, "get_qr_pngs", wraps=thiet_bi_qr_service.get_qr_pngs) as fetch:
+            pdf = self.client.get(url, {"goc": self.device.pk})
+        self.assertEqual((pdf.status_code, pdf["Content-Type"], pdf["X-Total-Pages"]), (200, "application/pdf", "2"))
+        self.assertEqual(len(PdfReader(io.BytesIO(pdf.content)).pages), 2)
+        # QR lay theo tung trang khi ghi: khong giu ca to nhan trong bo nho.
+        self.assertEqual([len(call.args[0]) for call in fetch.call_args_list], [24, 7])
+
+        png = self.client.get(url, {"goc": self.device.pk, "format": "png", "page": 2})
+        self.assertEqual(png.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(png.content)).size, thiet_bi_qr_service.SHEET_PAGE_SIZE)
+        self.assertEqual(self.client.get(url, {"goc": self.device.pk, "format": "png", "page": 3}).status_code, 400)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from quanlyvanhanh.models import ThietBi
+from quanlyvanhanh.services.thiet_bi_search_service import normalize_search_text, refresh_search_documents
+
+
+class ThietBiSearchTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username="search-admin", email="search-admin@example.com", password="testpass123", is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.root = ThietBi.objects.create(ten="Tổ máy 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="Máy phát điện", ma="GE", cha=self.root, nha_may="SH", so_serial="SN-4471")
+        self.od = ThietBi.objects.create(ten="Hệ thống dầu", ma="OD", cha=self.ge, nha_may="SH")
+        self.spare = ThietBi.objects.create(ten="Giàn đỡ", ma="GE.KHO", nha_may="SH")
+
+    def _search(self, q, action=""):
+        response = self.client.get(f"/api/quanlyvanhanh/thiet-bi/{action}", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        rows = payload["results"] if isinstance(payload, dict) else payload
+        return [row["ma_day_du"] for row in rows]
+
+    def test_document_holds_unaccented_ancestor_names_and_follows_renames(self):
+        self.od.refresh_from_db()
+        self.assertEqual(self.od.van_ban_tim_kiem, "to may 1 may phat dien he thong dau od sh.tb.h1.ge.od")
+        self.assertEqual(normalize_search_text("  Đập  TRÀN "), "dap tran")
+
+        self.ge.ten = "Máy phát chính"
+        self.ge.save()
+        self.od.refresh_from_db()
+        self.assertIn("may phat chinh", self.od.van_ban_tim_kiem)
+
+        ThietBi.objects.filter(pk=self.od.pk).update(van_ban_tim_kiem="")
+        self.assertEqual(refresh_search_documents(), 1)
+
+    def test_q_and_tim_kiem_match_accent_insensitively_and_rank_code_prefix_first(self):
+        self.assertEqual(self._search("may phat dau"), ["SH.TB.H1.GE.OD"])
+        self.assertEqual(self._search("sn-4471"), ["SH.TB.H1.GE"])
+        self.assertEqual(self._search("Tổ MÁY", "tim_kiem/"), ["SH.TB.H1", "SH.TB.H1.GE", "SH.TB.H1.GE.OD"])
+        self.assertEqual(self._search("ge")[:1], ["GE.KHO"])
+        self.assertEqual(self._search("ge", "tim_kiem/")[:1], ["GE.KHO"])
@@ -0,0 +1,93 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from quanlyvanhanh.configs.operation_configs import TOMAY_EXPORT_COLUMNS
+from quanlyvanhanh.models import TacVuNen, ThietBi, ThongSoToMay
+from quanlyvanhanh.services.tac_vu_service import run_job
+from quanlyvanhanh.services.thongso_excel_import_service import normalize_cells, resolve_headers
+
+URL = "/api/quanlyvanhanh/thong-so-to-may/excel_import/"
+HEADERS = [column["ten"] for column in TOMAY_EXPORT_COLUMNS]
+
+
+def _h1_rows(value, headers=HEADERS):
+    return [["THÔNG SỐ H1"] + [""] * 19, headers, ["bar"] * 20] + [[value] * 20 for _ in range(24)]
+
+
+def _workbook(sheets):
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    buffer.name = "thong_so_h1.xlsx"
+    return buffer
+
+
+class ThongSoExcelImportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        user = get_user_model().objects.create_user(
+            username="import-ts-admin", email="import-ts-admin@example.com", password="testpass123", is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        root = ThietBi.objects.create(ten="To may 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="May phat", ma="GE", cha=root, nha_may="SH")
+
+    def test_cells_are_normalised_per_column_and_headers_resolved_once(self):
+        block = pd.DataFrame([[12.0, "1,5", " BT ", "-"], [None, 7, "", 0.25]], dtype=object)
+        self.assertEqual(normalize_cells(block, numeric=True), [["12", "1.5", "BT", None], [None, "7", None, "0.25"]])
+        self.assertEqual(normalize_cells(block)[0], ["12.0", "1,5", "BT", None])
+
+        resolve_headers.cache_clear()
+        actual = ("Ap luc nuoc", "Áp  lực chèn trục", "Lưu lượng")
+        expected = ("Áp lực nước", "Áp lực chèn trục", "Tốc độ")
+        for _ in range(3):
+            self.assertEqual(resolve_headers(expected, actual), ((2, "mismatch"),))
+        self.assertEqual(resolve_headers.cache_info().misses, 1)
+
+    @mock.patch("quanlyvanhanh.services.tac_vu_service._run_in_background", side_effect=run_job)
+    def test_month_workbook_imports_each_dated_sheet_as_background_job(self, _run):
+        sheets = [(f"2026-03-{day:02d}", _h1_rows(day + 0.5)) for day in range(1, 4)]
+        sheets.append(("2026-03-04", _h1_rows(1, headers=["Sai"] * 20)))
+        sheets.append(("Ghi chu", [["khong phai du lieu"]]))
+
+        with override_settings(MEDIA_ROOT=self.media_root), self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(URL, {"file": _workbook(sheets), "device_code": "SH.TB.H1.GE"}, format="multipart")
+
+        self.assertEqual(response.status_code, 202)
+        job = TacVuNen.objects.get(pk=response.json()["id"])
+        self.assertEqual((job.loai, job.trang_thai), (TacVuNen.LOAI_IMPORT_THONG_SO, TacVuNen.TRANG_THAI_HOAN_THANH))
+        self.assertEqual(job.ket_qua["imported_count"], 3 * 480)
+        self.assertEqual([day["ngay"] for day in job.ket_qua["ngay"]], ["2026-03-01", "2026-03-02", "2026-03-03"])
+        self.assertEqual([error["sheet"] for error in job.ket_qua["loi"]], ["2026-03-04"])
+        self.assertLess(len(queries), 60)
+
+        record = ThongSoToMay.objects.get(thiet_bi=self.ge, ten_thong_so="Áp lực nước", ngay_nhap="2026-03-02", thoi_diem_nhap__hour=22)
+        self.assertEqual(record.gia_tri, "2.5")
+        self.assertFalse(ThongSoToMay.objects.filter(ngay_nhap="2026-03-04").exists())
+
+    def test_reimport_single_sheet_updates_in_place(self):
+        for value in (1, 2):
+            response = self.client.post(URL, {"file": _workbook([("Sheet", _h1_rows(value))]), "selected_date": "2026-03-05", "device_code": "SH.TB.H1.GE"}, format="multipart")
+            self.assertEqual((response.status_code, response.json()["imported_count"]), (200, 480))
+
+        self.assertEqual(ThongSoToMay.objects.filter(ngay_nhap="2026-03-05").count(), 480)
+        self.assertEqual(set(ThongSoToMay.objects.values_list("gia_tri", flat=True)), {"2"})
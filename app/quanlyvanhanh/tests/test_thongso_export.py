@@ -0,0 +1,85 @@
+import io
+import shutil
+import tempfile
+from datetime import date, datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from quanlyvanhanh.models import TacVuNen, ThietBi, ThongSoToMay, ThongSoTram110KV, ThongSoVanHanh
+from quanlyvanhanh.services.tac_vu_service import run_job
+
+
+def _local(day, hour):
+    return timezone.make_aware(datetime(day.year, day.month, day.day, hour, 0))
+
+
+def _workbook(response):
+    return load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+
+
+class ThongSoExportTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        user = get_user_model().objects.create_user(
+            username="export-admin", email="export-admin@example.com", password="testpass123", is_superuser=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        root = ThietBi.objects.create(ten="To may 1", ma="SH.TB.H1", nha_may="SH")
+        self.ge = ThietBi.objects.create(ten="May phat", ma="GE", cha=root, nha_may="SH")
+        self.days = [date(2026, 3, 1), date(2026, 3, 2)]
+        for offset, day in enumerate(self.days):
+            common = {"thiet_bi": self.ge, "nha_may": "SH", "ngay_nhap": day, "thoi_diem_nhap": _local(day, 1)}
+            ThongSoToMay.objects.create(ten_thong_so="Áp lực nước", ma_thong_so="ap_luc_nuoc", don_vi="bar", gia_tri=f"1.{offset}", **common)
+            ThongSoTram110KV.objects.create(ten_thong_so="Nhiệt độ MBA T1", ma_thong_so="nhiet_do_mba_t1", don_vi="°C", gia_tri="40", **{**common, "thoi_diem_nhap": _local(day, 2)})
+            ThongSoVanHanh.objects.create(ten_thong_so="Nhiệt độ dầu", don_vi="°C", gia_tri=str(50 + offset), **common)
+
+    def test_single_day_grid_keeps_template_layout_in_local_time(self):
+        response = self.client.get("/api/quanlyvanhanh/thong-so-to-may-h1/export/", {"date": "2026-03-01"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="thong_so_to_may_h1_2026-03-01.xlsx"', response["Content-Disposition"])
+        sheet = _workbook(response)
+        self.assertEqual((sheet["A1"].value, sheet["A2"].value, sheet["A3"].value), ("THÔNG SỐ H1", "Áp lực nước", "bar"))
+        self.assertEqual((sheet["A5"].value, sheet.max_row), ("1.0", 27))
+
+        tram = _workbook(self.client.get("/api/quanlyvanhanh/thong-so-tram-110kv/export/", {"date": "2026-03-01"}))
+        self.assertEqual((tram["A2"].value, tram["A5"].value, tram.max_row), ("Nhiệt độ MBA T1", "40", 15))
+
+    def test_date_range_streams_flat_rows_and_time_labelled_grid(self):
+        flat = _workbook(self.client.get("/api/quanlyvanhanh/export-thong-so/", {"tu_ngay": "2026-03-01", "den_ngay": "2026-03-02"}))
+        self.assertEqual([row[1:6] for row in flat.iter_rows(min_row=2, values_only=True)], [
+            ("01:00", "SH.TB.H1.GE", "May phat", "Nhiệt độ dầu", "50"),
+            ("01:00", "SH.TB.H1.GE", "May phat", "Nhiệt độ dầu", "51"),
+        ])
+
+        csv_response = self.client.get("/api/quanlyvanhanh/export-thong-so/", {"date": "2026-03-02", "format": "csv"})
+        self.assertEqual(b"".join(csv_response.streaming_content).decode("utf-8-sig").splitlines()[1].split(",")[:2], ["2026-03-02", "01:00"])
+
+        grid = _workbook(self.client.get("/api/quanlyvanhanh/thong-so-to-may-h1/export/", {"tu_ngay": "2026-03-01", "den_ngay": "2026-03-02"}))
+        self.assertEqual((grid["A2"].value, grid["B2"].value, grid.max_row), ("Thời điểm", "Áp lực nước", 51))
+        self.assertEqual((grid["A29"].value, grid["B29"].value), ("02/03/2026 01:00", "1.1"))
+
+    def test_empty_day_and_bad_range_keep_text_responses(self):
+        empty = self.client.get("/api/quanlyvanhanh/export-thong-so/", {"date": "2026-04-01"})
+        self.assertEqual((empty.status_code, empty.content.decode()), (200, "Không có dữ liệu để xuất cho ngày đã chọn"))
+        self.assertEqual(self.client.get("/api/quanlyvanhanh/export-thong-so/", {"tu_ngay": "2026-03-02", "den_ngay": "2026-03-01"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/quanlyvanhanh/thong-so-to-may-h2/export/", {"date": "2026-03-01"}).status_code, 404)
+
+    @mock.patch("quanlyvanhanh.services.tac_vu_service._run_in_background", side_effect=run_job)
+    def test_long_range_runs_as_background_job_with_downloadable_file(self, _run):
+        with override_settings(MEDIA_ROOT=self.media_root, THONG_SO_EXPORT_SYNC_MAX_DAYS=1), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get("/api/quanlyvanhanh/thong-so-tram-110kv/export/", {"tu_ngay": "2026-03-01", "den_ngay": "2026-03-02"})
+
+        self.assertEqual(response.status_code, 202)
+        job = TacVuNen.objects.get(pk=response.json()["id"])
+        self.assertEqual((job.loai, job.trang_thai, job.ket_qua["so_ban_ghi"]), (TacVuNen.LOAI_XUAT_THONG_SO, TacVuNen.TRANG_THAI_HOAN_THANH, 2))
+        with override_settings(MEDIA_ROOT=self.media_root):
+            sheet = _workbook(self.client.get(f"/api/quanlyvanhanh/tac-vu/{job.pk}/tai_ve/"))
+        self.assertEqual((sheet["A17"].value, sheet["B17"].value, sheet.max_row), ("02/03/2026 02:00", "40", 27))
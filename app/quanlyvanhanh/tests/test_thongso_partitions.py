@@ -0,0 +1,205 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from quanlyvanhanh.models import ThietBi, ThongSoToMay, ThongSoVanHanh
+from quanlyvanhanh.serializers import ThongSoVanHanhCreateSerializer
+from quanlyvanhanh.services.thongso_bulk_service import upsert_thong_so
+from quanlyvanhanh.services import thongso_partition_service as partitions
+
+TABLE = "thong_so_to_may"
+
+
+def _moment(day, hour=8, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class PartitionHelperTests(SimpleTestCase):
+    def test_month_arithmetic_names_and_bounds(self):
+        self.assertEqual(partitions.add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(partitions.add_months(date(2026, 1, 1), -13), date(2024, 12, 1))
+        self.assertEqual(partitions.partition_name(TABLE, date(2026, 3, 1)), "thong_so_to_may_p202603")
+        self.assertEqual(partitions.parse_partition_bound("FOR VALUES FROM ('2026-03-01') TO ('2026-04-01')"), date(2026, 3, 1))
+        self.assertIsNone(partitions.parse_partition_bound("DEFAULT"))
+
+    def test_new_partition_takes_rows_out_of_default_before_attach(self):
+        create, move, attach = partitions.create_partition_sql(TABLE, date(2026, 12, 1))
+        self.assertIn('CREATE TABLE "thong_so_to_may_p202612" (LIKE "thong_so_to_may"', create)
+        self.assertIn('DELETE FROM "thong_so_to_may_mac_dinh"', move)
+        self.assertIn("ngay_nhap >= '2026-12-01' AND ngay_nhap < '2027-01-01'", move)
+        self.assertTrue(attach.endswith("FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"))
+
+
+class NgayNhapWindowTests(TestCase):
+    def setUp(self):
+        self.device = ThietBi.objects.create(ten="MBA T1", ma="T1", nha_may="SH")
+
+    def test_window_does_not_change_day_and_range_results(self):
+        day = date(2026, 3, 2)
+        readings = [
+            (_moment(day - timedelta(days=1), 23, 30), day - timedelta(days=1)),
+            (_moment(day, 0, 0), day - timedelta(days=1)),  # moc 24:00 cua ngay truoc
+            (_moment(day, 12), day),
+            (_moment(day, 12), day + timedelta(days=1)),
+            (_moment(day + timedelta(days=1), 0, 0), day),
+        ]
+        for index, (moment, ngay) in enumerate(readings):
+            ThongSoVanHanh.objects.create(thiet_bi=self.device, ten_thong_so=f"P{index}", gia_tri="1", thoi_diem_nhap=moment, ngay_nhap=ngay)
+
+        queryset = ThongSoVanHanh.objects.all()
+        for target in (day - timedelta(days=1), day, day + timedelta(days=1)):
+            exact = queryset.filter(Q(thoi_diem_nhap__date=target) | Q(ngay_nhap=target))
+            pruned = exact.filter(partitions.ngay_nhap_window(target, target))
+            self.assertEqual(set(pruned.values_list("pk", flat=True)), set(exact.values_list("pk", flat=True)))
+
+        start, end = _moment(day, 0, 0), _moment(day + timedelta(days=1), 0, 0)
+        exact = queryset.filter(thoi_diem_nhap__gte=start, thoi_diem_nhap__lt=end)
+        self.assertEqual(exact.filter(partitions.ngay_nhap_window(start, end)).count(), exact.count())
+
+    def test_ngay_nhap_far_from_thoi_diem_is_only_rejected_on_partitioned_tables(self):
+        data = {
+            "thiet_bi": self.device.pk, "ten_thong_so": "P", "gia_tri": "1",
+            "thoi_diem_nhap": "2026-03-02T08:00:00+07:00", "ngay_nhap": "2026-01-01",
+        }
+        self.assertTrue(ThongSoVanHanhCreateSerializer(data=data).is_valid())
+        self.assertEqual(partitions.pruning_window(ThongSoVanHanh, date(2026, 3, 2), date(2026, 3, 2)), Q())
+
+        with mock.patch("quanlyvanhanh.serializers.model_is_partitioned", return_value=True):
+            serializer = ThongSoVanHanhCreateSerializer(data=data)
+            self.assertFalse(serializer.is_valid())
+        self.assertIn("ngay_nhap", serializer.errors)
+
+
+@skipIf(connection.vendor == "postgresql", "tren PostgreSQL xem PostgresPartitionTests")
+class PartitionNoopTests(TestCase):
+    def test_maintenance_is_noop_outside_postgresql(self):
+        self.assertEqual(partitions.maintain_partitions(), {"created": {}, "archived": {}})
+        out = StringIO()
+        call_command("thong_so_partitions", "create", stdout=out)
+        self.assertIn("chi ho tro PostgreSQL", out.getvalue())
+
+
+@skipUnless(connection.vendor == "postgresql", "phan vung chi ho tro PostgreSQL")
+class PostgresPartitionTests(TestCase):
+    today = date(2026, 3, 15)
+
+    def setUp(self):
+        self.device = ThietBi.objects.create(ten="May phat", ma="GE", nha_may="SH")
+        for day in (date(2026, 1, 10), date(2026, 3, 1), date(2026, 3, 31), date(2026, 6, 5)):
+            self._reading(day)
+        self._flush_deferred_checks()
+        self.assertTrue(partitions.convert_to_partitioned(TABLE, months_ahead=1, today=self.today))
+        self.addCleanup(partitions.forget_partition_state)
+
+    def _reading(self, day, name="Áp lực nước"):
+        return ThongSoToMay.objects.create(thiet_bi=self.device, ten_thong_so=name, gia_tri="1", thoi_diem_nhap=_moment(day), ngay_nhap=day)
+
+    def _flush_deferred_checks(self):
+        # FK cua Django la DEFERRABLE: con su kien cho xu ly thi PostgreSQL khong cho ALTER TABLE.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def _partitions(self):
+        with connection.cursor() as cursor:
+            return {name: month for name, month in partitions.list_partitions(cursor, TABLE)}
+
+    def test_convert_keeps_rows_ids_and_constraints_and_prunes_by_month(self):
+        self.assertFalse(partitions.convert_to_partitioned(TABLE, today=self.today))
+        self.assertEqual(
+            sorted(self._partitions()),
+            ["thong_so_to_may_mac_dinh", "thong_so_to_may_p202601", "thong_so_to_may_p202602", "thong_so_to_may_p202603", "thong_so_to_may_p202604"],
+        )
+        self.assertEqual(ThongSoToMay.objects.count(), 4)
+
+        previous_max = max(ThongSoToMay.objects.values_list("pk", flat=True))
+        self.assertGreater(self._reading(date(2026, 3, 20)).pk, previous_max)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._reading(date(2026, 3, 20))
+
+        plan = ThongSoToMay.objects.filter(ngay_nhap__gte=date(2026, 3, 1), ngay_nhap__lte=date(2026, 3, 31)).explain()
+        self.assertIn("thong_so_to_may_p202603", plan)
+        self.assertNotIn("thong_so_to_may_p202601", plan)
+        self.assertNotIn("thong_so_to_may_mac_dinh", plan)
+
+    def test_create_moves_rows_out_of_default_and_archive_attach_round_trip(self):
+        created = partitions.create_partitions(months_ahead=4, today=self.today, tables=[TABLE])
+        self.assertEqual(created, {TABLE: ["thong_so_to_may_p202605", "thong_so_to_may_p202606", "thong_so_to_may_p202607"]})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM "thong_so_to_may_mac_dinh"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute('SELECT count(*) FROM "thong_so_to_may_p202606"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        archived = partitions.archive_partitions(retention_months=1, today=self.today, tables=[TABLE])
+        self.assertEqual(archived, {TABLE: ["thong_so_to_may_p202601"]})
+        self.assertNotIn("thong_so_to_may_p202601", self._partitions())
+        self.assertEqual(ThongSoToMay.objects.count(), 3)
+
+        self.assertTrue(partitions.attach_partition(TABLE, date(2026, 1, 20)))
+        self.assertEqual(ThongSoToMay.objects.filter(ngay_nhap=date(2026, 1, 10)).count(), 1)
+        self.assertFalse(partitions.attach_partition(TABLE, date(2025, 12, 1)))
+
+        self.assertEqual(partitions.archive_partitions(retention_months=1, today=self.today, drop=True, tables=[TABLE]), {TABLE: ["thong_so_to_may_p202601"]})
+        self.assertFalse(partitions.attach_partition(TABLE, date(2026, 1, 1)))
+        self.assertEqual(ThongSoToMay.objects.count(), 3)
+
+    def test_partitioned_table_enforces_ngay_nhap_window_and_widened_unique_keys(self):
+        self.assertTrue(partitions.model_is_partitioned(ThongSoToMay))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ThongSoToMay.objects.create(thiet_bi=self.device, ten_thong_so="P", gia_tri="1", thoi_diem_nhap=_moment(date(2026, 3, 2)), ngay_nhap=date(2026, 1, 1))
+
+        self.assertEqual(partitions._partition_unique_definition("UNIQUE (thiet_bi_id, ten_thong_so, thoi_diem_nhap)"), "UNIQUE (thiet_bi_id, ten_thong_so, thoi_diem_nhap, ngay_nhap)")
+        self.assertEqual(partitions.conflict_fields(ThongSoToMay, ("thiet_bi", "ten_thong_so")), ("thiet_bi", "ten_thong_so", "ngay_nhap"))
+
+
+@skipUnless(connection.vendor == "postgresql", "phan vung chi ho tro PostgreSQL")
+class PostgresNormalizeTests(TestCase):
+    table = "thong_so_van_hanh"
+
+    def setUp(self):
+        self.device = ThietBi.objects.create(ten="MBA T1", ma="T1", nha_may="SH")
+        day = date(2026, 3, 2)
+        self.ok = ThongSoVanHanh.objects.create(thiet_bi=self.device, ten_thong_so="P", gia_tri="1", thoi_diem_nhap=_moment(day), ngay_nhap=day)
+        self.lech = ThongSoVanHanh.objects.create(thiet_bi=self.device, ten_thong_so="Q", gia_tri="1", thoi_diem_nhap=_moment(day), ngay_nhap=date(2026, 1, 1))
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        self.addCleanup(partitions.forget_partition_state)
+
+    def test_convert_refuses_until_normalize_is_applied(self):
+        out = StringIO()
+        call_command("thong_so_partitions", "normalize", "--table", self.table, stdout=out)
+        self.assertIn("1 dong ngay_nhap lech", out.getvalue())
+        self.lech.refresh_from_db()
+        self.assertEqual(self.lech.ngay_nhap, date(2026, 1, 1))
+        with self.assertRaisesMessage(CommandError, "normalize --apply"):
+            call_command("thong_so_partitions", "convert", "--table", self.table, stdout=StringIO())
+
+        call_command("thong_so_partitions", "normalize", "--table", self.table, "--apply", stdout=StringIO())
+        self.lech.refresh_from_db()
+        self.assertEqual(self.lech.ngay_nhap, date(2026, 3, 2))
+        self.assertEqual(partitions.normalize_ngay_nhap(self.table), {"lech": 0, "xoa": 0})
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        call_command("thong_so_partitions", "convert", "--table", self.table, stdout=StringIO())
+        self.assertTrue(partitions.model_is_partitioned(ThongSoVanHanh))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT convalidated FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s",
+                [self.table, f"{self.table}_ngay_nhap_lech_ck"],
+            )
+            self.assertEqual(cursor.fetchone(), (True,))
+
+        # Khoa duy nhat tren bang phan vung co them ngay_nhap: upsert theo khoa cu van cap nhat dong da co.
+        user = get_user_model().objects.create_superuser(username="pv", email="pv@example.com", password="testpass123")
+        row = {"ten_thong_so": "P", "gia_tri": "2", "thoi_diem_nhap": self.ok.thoi_diem_nhap, "ngay_nhap": date(2026, 3, 3)}
+        result = upsert_thong_so(ThongSoVanHanh, user, [(0, self.device, row, False)], unique_fields=("thiet_bi", "ten_thong_so", "thoi_diem_nhap"))
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(list(ThongSoVanHanh.objects.filter(ten_thong_so="P").values_list("gia_tri", "ngay_nhap")), [("2", date(2026, 3, 2))])
@@ -1,4 +1,6 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -296,6 +298,102 @@ class OptimizedViewsTests(APITestCase):
         self.assertEqual(record.nha_may, 'Song Hinh')
         self.assertEqual(record.gia_tri, '45')
 
+    def test_thong_so_to_may_bulk_upsert_rejects_whole_batch_on_first_bad_row(self):
+        other_user = get_user_model().objects.create_user(email="other@example.com", password="testpass123", username="other")
+        ThongSoToMay.objects.filter(id=self.ts_tm.id).update(nguoi_nhap=other_user)
+        row = {
+            'thiet_bi_ma': 'SH.TB.H1',
+            'ma_thong_so': 'ap_luc_nuoc',
+            'ten_thong_so': 'Áp lực nước',
+            'don_vi': 'bar',
+            'ngay_nhap': '2026-05-31',
+            'nha_may': 'Song Hinh',
+        }
+        valid = {**row, 'gia_tri': '6.0', 'thoi_diem_nhap': '2026-05-31T10:00:00+07:00'}
+        url = reverse('quanlyvanhanh:thongsotomay-bulk-upsert')
+        self.client.force_authenticate(user=self.user)
+
+        cases = [
+            ({**row, 'gia_tri': '7.0', 'thoi_diem_nhap': '2026-05-31T09:00:00+07:00'}, status.HTTP_403_FORBIDDEN),
+            ({**row, 'thiet_bi_ma': 'SH.TB.H9', 'gia_tri': '1', 'thoi_diem_nhap': '2026-05-31T11:00:00+07:00'}, status.HTTP_403_FORBIDDEN),
+            ({**row, 'gia_tri': '1', 'ngay_nhap': '31/05', 'thoi_diem_nhap': '2026-05-31T11:00:00+07:00'}, status.HTTP_400_BAD_REQUEST),
+        ]
+        for bad_row, expected_status in cases:
+            with self.subTest(bad_row=bad_row):
+                response = self.client.post(url, [valid, bad_row], format='json')
+                self.assertEqual(response.status_code, expected_status)
+                self.assertEqual(
+                    list(ThongSoToMay.objects.filter(thiet_bi=self.device).values_list('gia_tri', 'nguoi_nhap')),
+                    [('5.4', other_user.id)],
+                )
+
+        # Moi dong loi deu duoc bao; co dong bi tu choi quyen thi tra 403.
+        bad_rows = [bad_row for bad_row, _ in cases]
+        response = self.client.post(url, [valid, *bad_rows], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        errors = response.json()['errors']
+        self.assertEqual([(error['index'], error['field']) for error in errors], [(1, None), (2, None), (3, 'ngay_nhap')])
+        self.assertEqual(response.json()['detail'], errors[0]['message'])
+
+    def test_thong_so_to_may_bulk_upsert_writes_audit_log(self):
+        from auditlog.models import LogEntry
+
+        row = {
+            'thiet_bi_ma': 'SH.TB.H1',
+            'ma_thong_so': 'ap_luc_nuoc',
+            'ten_thong_so': 'Áp lực nước',
+            'don_vi': 'bar',
+            'gia_tri': '6.0',
+            'thoi_diem_nhap': '2026-05-31T10:00:00+07:00',
+            'ngay_nhap': '2026-05-31',
+            'nha_may': 'Song Hinh',
+        }
+        url = reverse('quanlyvanhanh:thongsotomay-bulk-upsert')
+        self.client.force_authenticate(user=self.user)
+        entries = LogEntry.objects.get_for_model(ThongSoToMay)
+        before = entries.count()
+
+        self.client.post(url, [row], format='json')
+        record = ThongSoToMay.objects.get(thiet_bi=self.device, thoi_diem_nhap=row['thoi_diem_nhap'])
+        created = entries.get(object_pk=str(record.pk), action=LogEntry.Action.CREATE)
+        self.assertEqual(created.actor, self.user)
+
+        self.client.post(url, [{**row, 'gia_tri': '6.5'}], format='json')
+        updated = entries.get(object_pk=str(record.pk), action=LogEntry.Action.UPDATE)
+        self.assertEqual(updated.actor, self.user)
+        self.assertEqual(updated.changes_dict['gia_tri'], ['6.0', '6.5'])
+        self.assertEqual(entries.count(), before + 2)
+
+    def test_thong_so_to_may_bulk_upsert_full_day_uses_constant_queries(self):
+        payload = [
+            {
+                'thiet_bi_ma': 'SH.TB.H1',
+                'ma_thong_so': f'thong_so_{param}',
+                'ten_thong_so': f'Thông số {param}',
+                'don_vi': 'bar',
+                'gia_tri': str(hour + param),
+                'thoi_diem_nhap': f'2026-05-31T{hour:02d}:00:00+07:00',
+                'ngay_nhap': '2026-05-31',
+                'nha_may': 'Song Hinh',
+            }
+            for hour in range(24)
+            for param in range(20)
+        ]
+        self.client.force_authenticate(user=self.user)
+        url = reverse('quanlyvanhanh:thongsotomay-bulk-upsert')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.data['created'], 480)
+        # 2 truy van thiet bi + 1 doc ban ghi cu + cac lo INSERT ... ON CONFLICT + cac lo LogEntry
+        # (SQLite chia lo nho hon PostgreSQL vi gioi han so tham so)
+        self.assertLess(len(queries), 25)
+
+        payload[0]['gia_tri'] = '99'
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual((response.status_code, response.data['updated']), (status.HTTP_200_OK, 480))
+        self.assertEqual(ThongSoToMay.objects.get(ma_thong_so='thong_so_0', thoi_diem_nhap=payload[0]['thoi_diem_nhap']).gia_tri, '99')
+
     def test_thong_so_to_may_by_day_resolves_fallback_thresholds_for_subdevices(self):
         # Create a sub-device that belongs to TuB under H1 (e.g. TuB.SH)
         sub_device = ThietBi.objects.create(
@@ -4,6 +4,7 @@ from . import (
     views_excel,
     views_export,
     views_history,
+    views_tac_vu,
     views_thietbi,
     views_thietbi_meta,
     views_thongso_dien,
@@ -28,6 +29,7 @@ router.register(r'thong-so-tram-110kv', views_tram.ThongSoTram110KVViewSet, base
 router.register(r'an-toan-thiet-bi', views_thietbi_meta.AnToanThietBiViewSet, basename='antoanthietbi')
 router.register(r'dinh-kem', views_thietbi_meta.DinhKemViewSet, basename='dinhkem')
 router.register(r'nguong-thong-so', views_nguongthongso.NguongThongSoViewSet, basename='nguongthongso')
+router.register(r'tac-vu', views_tac_vu.TacVuNenViewSet, basename='tacvu')
 
 urlpatterns = [
     # Excel import endpoints (phải đặt trước router để tránh conflict)
@@ -11,6 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from core.factory_scope import filter_queryset_by_factory, has_profile_permission, get_user_factory_code
 from .models import ThietBi, ThongSoVanHanh, ThongSoToMay
+from .services.thongso_partition_service import pruning_window
 
 
 def day_slots(ngay, tz=None):
@@ -209,7 +210,7 @@ class ThongSoByDayView(APIView):
                 "nha_may",
                 "string",
               )
-              .filter(Q(thoi_diem_nhap__date=ngay) | Q(ngay_nhap=ngay))
+              .filter(Q(thoi_diem_nhap__date=ngay) | Q(ngay_nhap=ngay), pruning_window(ThongSoVanHanh, ngay, ngay))
               .values_list("ma_thong_so", "thoi_diem_nhap", "gia_tri", "ten_thong_so", "don_vi"))
 
         # Chuẩn bị map {ma_thong_so: [None]*num_cycles}
@@ -406,7 +407,7 @@ class ThongSoToMayByDayView(APIView):
                 "nha_may",
                 "string",
               )
-              .filter(Q(thoi_diem_nhap__date=ngay) | Q(ngay_nhap=ngay))
+              .filter(Q(thoi_diem_nhap__date=ngay) | Q(ngay_nhap=ngay), pruning_window(ThongSoToMay, ngay, ngay))
               .values_list("ma_thong_so", "thoi_diem_nhap", "gia_tri", "ten_thong_so", "don_vi"))
 
         # Chuẩn bị map {ma_thong_so: [None]*24}
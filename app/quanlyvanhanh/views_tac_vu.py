@@ -0,0 +1,35 @@
+import os
+
+from django.http import FileResponse, Http404
+from rest_framework import viewsets
+from rest_framework.decorators import action
+
+from quanlyvanhanh.models import TacVuNen
+from quanlyvanhanh.serializers import TacVuNenSerializer
+
+
+class TacVuNenViewSet(viewsets.ReadOnlyModelViewSet):
+    """Theo doi tac vu nen (import/export lon) va tai tep ket qua."""
+
+    queryset = TacVuNen.objects.all()
+    serializer_class = TacVuNenSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(nguoi_tao=self.request.user)
+        loai = self.request.query_params.get("loai")
+        if loai:
+            queryset = queryset.filter(loai=loai)
+        return queryset
+
+    @action(detail=True, methods=["get"])
+    def tai_ve(self, request, pk=None):
+        job = self.get_object()
+        if job.trang_thai != TacVuNen.TRANG_THAI_HOAN_THANH or not job.tep_ket_qua:
+            raise Http404("Tac vu chua co tep ket qua.")
+        return FileResponse(
+            job.tep_ket_qua.open("rb"),
+            as_attachment=True,
+            filename=os.path.basename(job.tep_ket_qua.name),
+        )
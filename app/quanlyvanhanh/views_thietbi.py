@@ -1,9 +1,9 @@
 import io
-from datetime import datetime
 
-import qrcode
+from django.conf import settings
 from django.db.models import Q
 from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
@@ -18,11 +18,45 @@ from core.factory_scope import (
     has_profile_permission,
     get_user_factory_code,
 )
-from quanlyvanhanh.models import ThietBi
+from quanlyvanhanh.models import TacVuNen, ThietBi
 from quanlyvanhanh.serializers import (
+    TacVuNenSerializer,
     ThietBiDetailSerializer,
     ThietBiListSerializer,
     ThietBiSerializer,
+    get_thiet_bi_qr_frontend_base,
+    get_thiet_bi_qr_payload,
+    get_thiet_bi_qr_url,
+)
+from quanlyvanhanh.services.tac_vu_service import create_job, enqueue_job
+from quanlyvanhanh.services.thiet_bi_qr_service import (
+    DEFAULT_QR_SHEET_MAX_ITEMS,
+    SHEET_FORMAT_PDF,
+    SHEET_FORMAT_PNG,
+    SHEET_FORMATS,
+    get_qr_png,
+    render_qr_sheet,
+    sheet_page_count,
+)
+from quanlyvanhanh.services.thiet_bi_import_service import (
+    STATUS_UNCHANGED,
+    ImportFileError,
+    apply_import,
+    import_result,
+    iter_excel_rows,
+    plan_errors,
+    plan_import,
+)
+from quanlyvanhanh.services.thiet_bi_search_service import (
+    filter_device_search,
+    rank_device_search,
+)
+from quanlyvanhanh.services.thiet_bi_tree_service import (
+    build_device_tree,
+    factory_subtree_q,
+    get_cached_device_tree,
+    hierarchy_code_options,
+    subtree_queryset,
 )
 
 
@@ -47,6 +81,21 @@ def _ensure_thiet_bi_access(user, thiet_bi):
         )
 
 
+def _attach_tree_urls(nodes, request):
+    """Gan URL phu thuoc request (QR, anh) vao cay lay tu cache."""
+    frontend_base = get_thiet_bi_qr_frontend_base(request)
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        device = ThietBi(pk=node["id"])
+        node["ma_qr"] = get_thiet_bi_qr_payload(device, frontend_base=frontend_base)
+        node["qr_url"] = get_thiet_bi_qr_url(device, request)
+        if node["hinh_anh_url"]:
+            node["hinh_anh_url"] = request.build_absolute_uri(node["hinh_anh_url"])
+        stack.extend(node["con"])
+    return nodes
+
+
 class ThietBiViewSet(viewsets.ModelViewSet):
     """ViewSet quan ly thiet bi."""
 
@@ -79,6 +128,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
             "con",
             "qr",
             "qr_export_items",
+            "qr_sheet",
             "cay_phan_cap",
             "tim_kiem",
             "cap_0_codes",
@@ -133,10 +183,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
         )
         if factory_param and str(factory_param).lower() != "all":
             factory_value = str(factory_param).strip()
-            factory_query = (
-                Q(nha_may__iexact=factory_value)
-                | Q(ma_day_du__istartswith=f"{factory_value}.")
-            )
+            factory_query = Q(nha_may__iexact=factory_value) | factory_subtree_q(factory_value)
 
             try:
                 from khovattu.models import Bang_nha_may
@@ -149,7 +196,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
                     factory_query |= Q(nha_may__iexact=factory.ma_nha_may)
                     factory_query |= Q(nha_may__iexact=factory.ten_nha_may)
                     factory_query |= Q(nha_may__icontains=factory.ten_nha_may)
-                    factory_query |= Q(ma_day_du__istartswith=f"{factory.ma_nha_may}.")
+                    factory_query |= factory_subtree_q(factory.ma_nha_may)
             except Exception:
                 pass
 
@@ -166,22 +213,16 @@ class ThietBiViewSet(viewsets.ModelViewSet):
                     | Q(ma_day_du__iexact=search_param)
                 )
             else:
-                tokens = [token for token in search_param.replace(".", " ").split() if token]
-                for token in tokens:
-                    token_query = (
-                        Q(ten__unaccent__icontains=token)
-                        | Q(cha__ten__unaccent__icontains=token)
-                        | Q(cha__cha__ten__unaccent__icontains=token)
-                        | Q(cha__cha__cha__ten__unaccent__icontains=token)
-                        | Q(cha__cha__cha__cha__ten__unaccent__icontains=token)
-                        | Q(ma__unaccent__icontains=token)
-                        | Q(ma_day_du__icontains=token)
-                        | Q(ma_van_hanh__unaccent__icontains=token)
-                        | Q(so_serial__unaccent__icontains=token)
-                        | Q(mo_ta_ky_thuat__unaccent__icontains=token)
-                    )
-                    queryset = queryset.filter(token_query)
+                # Van ban tim kiem da gom ten to tien, bo dau san; chi muc trigram.
+                queryset = filter_device_search(queryset, search_param)
+
+        return queryset
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        search_param = self.request.query_params.get("q")
+        if search_param and not self.request.query_params.get("ordering"):
+            queryset = rank_device_search(queryset, search_param)
         return queryset
 
     def perform_create(self, serializer):
@@ -219,61 +260,84 @@ class ThietBiViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"])
     def qr(self, request, pk=None):
         thiet_bi = self.get_object()
-        from django.conf import settings
-        frontend_base = None
-        referer = request.META.get('HTTP_REFERER')
-        if referer:
-            from urllib.parse import urlparse
-            parsed_uri = urlparse(referer)
-            frontend_base = f"{parsed_uri.scheme}://{parsed_uri.netloc}"
-            
-        if not frontend_base:
-            frontend_base = getattr(settings, 'KHO_QR_FRONTEND_BASE', 'http://localhost:5173')
-            
-        qr_data = f"{frontend_base}/quanlyvanhanh/thietbi?detailId={thiet_bi.pk}"
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=2,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = io.BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type="image/png")
+        png = get_qr_png(thiet_bi.pk, get_thiet_bi_qr_frontend_base(request))
+        response = HttpResponse(png, content_type="image/png")
         response["Content-Disposition"] = (
             f'inline; filename="QR_{thiet_bi.ma_day_du.replace(".", "_")}.png"'
         )
         return response
 
+    def _qr_queryset(self, request):
+        """Thiet bi can in QR: bo loc hien tai, gioi han trong nhanh ``goc`` neu co."""
+        queryset = self.filter_queryset(self.get_queryset())
+        root_id = request.query_params.get("goc")
+        if root_id:
+            root = get_object_or_404(self.get_queryset(), pk=root_id)
+            queryset = subtree_queryset(root, queryset=queryset)
+        return queryset.order_by("ma_day_du")
+
     @action(detail=False, methods=["get"])
     def qr_export_items(self, request):
-        queryset = self.filter_queryset(self.get_queryset()).order_by("ma_day_du")
+        queryset = self._qr_queryset(request)
         serializer = ThietBiListSerializer(queryset, many=True, context={"request": request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def qr_sheet(self, request):
+        """To nhan QR in san cho ca nhanh thiet bi trong mot request.
+
+        ``goc=<id>`` chon nhanh (kem bo loc nhu danh sach), ``format=pdf`` (mac dinh, nhieu
+        trang) hoac ``format=png&page=<n>``; tong so trang tra ve trong header ``X-Total-Pages``.
+        """
+        fmt = (request.query_params.get("format") or SHEET_FORMAT_PDF).lower()
+        if fmt not in SHEET_FORMATS:
+            return Response({"error": "Định dạng không hợp lệ (pdf hoặc png)."}, status=status.HTTP_400_BAD_REQUEST)
+        devices = list(self._qr_queryset(request).values_list("pk", "ma_day_du", "ten"))
+        if not devices:
+            return Response({"error": "Không có thiết bị để in mã QR."}, status=status.HTTP_404_NOT_FOUND)
+        max_items = getattr(settings, "QUANLYVANHANH_QR_SHEET_MAX_ITEMS", DEFAULT_QR_SHEET_MAX_ITEMS)
+        if len(devices) > max_items:
+            return Response(
+                {"error": f"Quá nhiều thiết bị ({len(devices)}); chỉ in tối đa {max_items} mã QR mỗi lần."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        total_pages = sheet_page_count(len(devices))
+        try:
+            page = int(request.query_params.get("page") or 1)
+        except ValueError:
+            page = 0
+        if not 1 <= page <= total_pages:
+            return Response({"error": f"Trang không hợp lệ (1..{total_pages})."}, status=status.HTTP_400_BAD_REQUEST)
+
+        content = render_qr_sheet(devices, get_thiet_bi_qr_frontend_base(request), fmt, page)
+        suffix = f"_trang_{page}" if fmt == SHEET_FORMAT_PNG else ""
+        response = HttpResponse(content, content_type="application/pdf" if fmt == SHEET_FORMAT_PDF else "image/png")
+        response["Content-Disposition"] = f'attachment; filename="QR_thiet_bi{suffix}.{fmt}"'
+        response["X-Total-Pages"] = str(total_pages)
+        return response
+
     @action(detail=False, methods=["get"])
     def cay_phan_cap(self, request):
-        goc = self.get_queryset().filter(cha__isnull=True).order_by("thu_tu", "ten")
-        serializer = ThietBiDetailSerializer(goc, many=True, context={"request": request})
-        return Response(serializer.data)
+        """Toan bo cay thiet bi trong pham vi nha may: mot truy van + cac truy van dem, cache theo nha may."""
+        queryset = self.get_queryset()
+        if request.query_params.get("q"):
+            tree = build_device_tree(queryset)
+        else:
+            scope = (
+                "all" if has_all_factory_access(request.user) else get_user_factory_code(request.user),
+                request.query_params.get("nha_may") or request.query_params.get("ma_nha_may") or "",
+            )
+            tree = get_cached_device_tree(scope, queryset)
+        return Response(_attach_tree_urls(tree, request))
 
     @action(detail=False, methods=["get"])
     def tim_kiem(self, request):
+        # get_queryset da loc theo q tren van ban tim kiem; o day chi xep hang.
+        queryset = self.get_queryset().select_related("cha")
         query = request.query_params.get("q", "")
         if query:
-            queryset = self.get_queryset().filter(
-                Q(ten__icontains=query)
-                | Q(ma__icontains=query)
-                | Q(ma_day_du__icontains=query)
-                | Q(so_serial__icontains=query)
-            )
-        else:
-            queryset = self.get_queryset()
+            queryset = rank_device_search(queryset, query)
 
         serializer = ThietBiListSerializer(queryset, many=True)
         return Response(serializer.data)
@@ -281,41 +345,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def cap_0_codes(self, request):
         try:
-            all_thiet_bi = self.get_queryset().filter(
-                ma_day_du__isnull=False
-            ).values("ma_day_du", "ten")
-            cap_0_info = {}
-
-            for tb in all_thiet_bi:
-                ma_day_du = tb["ma_day_du"]
-                if ma_day_du:
-                    parts = ma_day_du.split(".")
-                    if len(parts) >= 3:
-                        cap_0_code = ".".join(parts[:3])
-
-                        if ma_day_du == cap_0_code:
-                            cap_0_info[cap_0_code] = {
-                                "ten": tb["ten"],
-                                "ma": parts[-1],
-                            }
-                        elif cap_0_code not in cap_0_info:
-                            cap_0_info[cap_0_code] = {
-                                "ten": f"Thiet bi {parts[-1]}",
-                                "ma": parts[-1],
-                            }
-
-            cap_0_devices = []
-            for code in sorted(cap_0_info.keys()):
-                info = cap_0_info[code]
-                cap_0_devices.append({
-                    "id": code,
-                    "ma": info["ma"],
-                    "ten": info["ten"],
-                    "ma_day_du": code,
-                    "cap": 0,
-                })
-
-            return Response(cap_0_devices)
+            return Response(hierarchy_code_options(self.get_queryset(), "ma_cap_0"))
         except Exception as exc:
             return Response(
                 {"error": str(exc)},
@@ -328,42 +358,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
             parent_code = request.query_params.get("parent_code", "")
             if not parent_code:
                 return Response([])
-
-            all_thiet_bi = self.get_queryset().filter(
-                ma_day_du__startswith=parent_code + "."
-            ).values("ma_day_du", "ten", "cap")
-            cap_1_info = {}
-
-            for tb in all_thiet_bi:
-                ma_day_du = tb["ma_day_du"]
-                if ma_day_du and ma_day_du.startswith(parent_code + "."):
-                    parts = ma_day_du.split(".")
-                    if len(parts) >= 4:
-                        cap_1_code = ".".join(parts[:4])
-
-                        if ma_day_du == cap_1_code:
-                            cap_1_info[cap_1_code] = {
-                                "ten": tb["ten"],
-                                "ma": parts[3],
-                            }
-                        elif cap_1_code not in cap_1_info:
-                            cap_1_info[cap_1_code] = {
-                                "ten": f"Thiet bi {parts[3]}",
-                                "ma": parts[3],
-                            }
-
-            cap_1_devices = []
-            for code in sorted(cap_1_info.keys()):
-                info = cap_1_info[code]
-                cap_1_devices.append({
-                    "id": code,
-                    "ma": info["ma"],
-                    "ten": info["ten"],
-                    "ma_day_du": code,
-                    "cap": 1,
-                })
-
-            return Response(cap_1_devices)
+            return Response(hierarchy_code_options(self.get_queryset(), "ma_cap_1", parent_code))
         except Exception as exc:
             return Response(
                 {"error": str(exc)},
@@ -376,42 +371,7 @@ class ThietBiViewSet(viewsets.ModelViewSet):
             parent_code = request.query_params.get("parent_code", "")
             if not parent_code:
                 return Response([])
-
-            all_thiet_bi = self.get_queryset().filter(
-                ma_day_du__startswith=parent_code + "."
-            ).values("ma_day_du", "ten", "cap")
-            cap_2_info = {}
-
-            for tb in all_thiet_bi:
-                ma_day_du = tb["ma_day_du"]
-                if ma_day_du and ma_day_du.startswith(parent_code + "."):
-                    parts = ma_day_du.split(".")
-                    if len(parts) >= 5:
-                        cap_2_code = ".".join(parts[:5])
-
-                        if ma_day_du == cap_2_code:
-                            cap_2_info[cap_2_code] = {
-                                "ten": tb["ten"],
-                                "ma": parts[4],
-                            }
-                        elif cap_2_code not in cap_2_info:
-                            cap_2_info[cap_2_code] = {
-                                "ten": f"Thiet bi {parts[4]}",
-                                "ma": parts[4],
-                            }
-
-            cap_2_devices = []
-            for code in sorted(cap_2_info.keys()):
-                info = cap_2_info[code]
-                cap_2_devices.append({
-                    "id": code,
-                    "ma": info["ma"],
-                    "ten": info["ten"],
-                    "ma_day_du": code,
-                    "cap": 2,
-                })
-
-            return Response(cap_2_devices)
+            return Response(hierarchy_code_options(self.get_queryset(), "ma_cap_2", parent_code))
         except Exception as exc:
             return Response(
                 {"error": str(exc)},
@@ -598,198 +558,51 @@ class ThietBiViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["post"])
     def import_excel(self, request):
-        """Import danh sách thiết bị từ file Excel"""
-        import pandas as pd
-        from django.db import transaction
+        """Import danh sách thiết bị từ Excel.
 
+        ``dry_run=1`` chỉ trả về diff (tạo/sửa/giữ nguyên/lỗi); ``background=1`` chạy
+        thành tác vụ nền và trả về mã tác vụ để theo dõi tiến độ tại ``/tac-vu/<id>/``.
+        """
         if 'file' not in request.FILES:
             return Response({'error': 'Không tìm thấy file upload.'}, status=status.HTTP_400_BAD_REQUEST)
 
         file = request.FILES['file']
-        try:
-            df = pd.read_excel(file, engine="openpyxl")
-        except Exception as e:
-            return Response({'error': f'Lỗi đọc file Excel: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Chuẩn hóa tên cột
-        df.columns = [str(col).strip() for col in df.columns]
-
-        # Ánh xạ tên cột từ cũ/legacy/custom sang template chuẩn
-        col_mappings = {
-            "Mã thiết bị (*)": ["Mã thiết bị", "Mã cấp hiện tại", "Mã"],
-            "Mã đầy đủ thiết bị chi tiết cha": ["Mã đầy đủ thiết bị cha"],
-            "Tên thiết bị (*)": ["Tên thiết bị"],
-            "Nhà máy (*)": ["Nhà máy"],
-            "Ngày lắp đặt (YYYY-MM-DD)": ["Ngày lắp đặt"],
-            "Ngày vận hành (YYYY-MM-DD)": ["Ngày vận hành"],
-        }
-
-        for target_col, source_cols in col_mappings.items():
-            if target_col not in df.columns:
-                for src in source_cols:
-                    if src in df.columns:
-                        df = df.rename(columns={src: target_col})
-                        break
-
-        # Kiểm tra các cột bắt buộc (phải có Mã thiết bị (*) hoặc Mã đầy đủ, Tên thiết bị (*), Nhà máy (*))
-        required_cols = []
-        if "Mã thiết bị (*)" not in df.columns and "Mã đầy đủ" not in df.columns:
-            required_cols.append("Mã thiết bị (*)")
-        if "Tên thiết bị (*)" not in df.columns:
-            required_cols.append("Tên thiết bị (*)")
-        if "Nhà máy (*)" not in df.columns:
-            required_cols.append("Nhà máy (*)")
-
-        if required_cols:
+        dry_run = str(request.data.get("dry_run") or request.query_params.get("dry_run")) in ("1", "true", "True")
+        background = str(request.data.get("background") or request.query_params.get("background")) in ("1", "true", "True")
+
+        if background:
+            job = create_job(TacVuNen.LOAI_IMPORT_THIET_BI, request.user, tep=file, tham_so={"dry_run": dry_run})
+            enqueue_job(job)
             return Response(
-                {'error': f'File Excel thiếu các cột bắt buộc: {", ".join(required_cols)}'},
-                status=status.HTTP_400_BAD_REQUEST
+                TacVuNenSerializer(job, context={"request": request}).data,
+                status=status.HTTP_202_ACCEPTED,
             )
 
-        user_factory = get_user_factory_code(request.user)
-        has_all_access = has_all_factory_access(request.user)
-
-        success_count = 0
-        errors = []
-
-        with transaction.atomic():
-            for index, row in df.iterrows():
-                try:
-                    # Lấy mã thiết bị, nếu trống thử lấy từ Mã đầy đủ
-                    ma = str(row.get("Mã thiết bị (*)")).strip() if pd.notna(row.get("Mã thiết bị (*)")) else ""
-                    if not ma:
-                        ma_day_du_col = row.get("Mã đầy đủ")
-                        if pd.notna(ma_day_du_col) and str(ma_day_du_col).strip():
-                            ma_day_du_str = str(ma_day_du_col).strip()
-                            cha_ma_day_du = row.get("Mã đầy đủ thiết bị chi tiết cha")
-                            if pd.notna(cha_ma_day_du) and str(cha_ma_day_du).strip():
-                                parent_str = str(cha_ma_day_du).strip()
-                                if ma_day_du_str.startswith(parent_str + "."):
-                                    ma = ma_day_du_str[len(parent_str) + 1:]
-                                else:
-                                    parts = ma_day_du_str.split(".")
-                                    ma = parts[-1]
-                            else:
-                                # Tự động phân tách cha và con từ Mã đầy đủ
-                                parts = ma_day_du_str.split(".")
-                                if len(parts) > 1:
-                                    found_parent = None
-                                    for i in range(len(parts) - 1, 0, -1):
-                                        prefix = ".".join(parts[:i])
-                                        if ThietBi.objects.filter(ma_day_du=prefix).exists():
-                                            found_parent = prefix
-                                            ma = ".".join(parts[i:])
-                                            break
-                                    if found_parent:
-                                        row["Mã đầy đủ thiết bị chi tiết cha"] = found_parent
-                                    else:
-                                        ma = ma_day_du_str
-                                else:
-                                    ma = ma_day_du_str
-
-                    ten = str(row.get("Tên thiết bị (*)")).strip() if pd.notna(row.get("Tên thiết bị (*)")) else ""
-                    nha_may = str(row.get("Nhà máy (*)")).strip() if pd.notna(row.get("Nhà máy (*)")) else ""
-
-                    if not ma:
-                        errors.append(f"Dòng {index + 2}: Thiếu mã thiết bị.")
-                        continue
-                    if not ten:
-                        errors.append(f"Dòng {index + 2}: Thiếu tên thiết bị.")
-                        continue
-                    if not nha_may:
-                        errors.append(f"Dòng {index + 2}: Thiếu nhà máy.")
-                        continue
-
-                    # Kiểm tra phân quyền nhà máy của người dùng
-                    if not has_all_access and user_factory and nha_may != user_factory:
-                        nha_may = user_factory
-
-                    # Tìm thiết bị cha nếu có
-                    cha_id = None
-                    cha_ma_day_du = row.get("Mã đầy đủ thiết bị chi tiết cha")
-                    if pd.notna(cha_ma_day_du) and str(cha_ma_day_du).strip():
-                        cha_ma_day_du = str(cha_ma_day_du).strip()
-                        try:
-                            parent = ThietBi.objects.get(ma_day_du=cha_ma_day_du)
-                            # Kiểm tra xem cha có thuộc nhà máy được phân quyền không
-                            _ensure_thiet_bi_access(request.user, parent)
-                            cha_id = parent.id
-                        except ThietBi.DoesNotExist:
-                            errors.append(f"Dòng {index + 2}: Thiết bị cha '{cha_ma_day_du}' không tồn tại.")
-                            continue
-                        except PermissionDenied:
-                            errors.append(f"Dòng {index + 2}: Bạn không có quyền thao tác với thiết bị cha '{cha_ma_day_du}'.")
-                            continue
-
-                    # Tính mã đầy đủ để check trùng hoặc update
-                    if cha_id:
-                        parent = ThietBi.objects.get(id=cha_id)
-                        ma_day_du = f"{parent.ma_day_du}.{ma}"
-                    else:
-                        ma_day_du = ma
-
-                    # Check quyền tương ứng (create vs update)
-                    thiet_bi = ThietBi.objects.filter(ma_day_du=ma_day_du).first()
-                    is_new = thiet_bi is None
-
-                    if is_new:
-                        if not has_profile_permission(request.user, "can_create_equipment"):
-                            errors.append(f"Dòng {index + 2}: Bạn không có quyền tạo mới thiết bị.")
-                            continue
-                        thiet_bi = ThietBi(ma_day_du=ma_day_du)
-                    else:
-                        if not has_profile_permission(request.user, "can_edit_equipment"):
-                            errors.append(f"Dòng {index + 2}: Bạn không có quyền sửa thiết bị '{ma_day_du}'.")
-                            continue
-                        _ensure_thiet_bi_access(request.user, thiet_bi)
-
-                    # Điền các giá trị
-                    thiet_bi.ma = ma
-                    thiet_bi.ten = ten
-                    thiet_bi.cha_id = cha_id
-                    thiet_bi.nha_may = nha_may
-
-                    thiet_bi.loai = str(row.get("Loại/Phân loại")).strip() if pd.notna(row.get("Loại/Phân loại")) else ""
-                    thiet_bi.trang_thai = str(row.get("Trạng thái")).strip() if pd.notna(row.get("Trạng thái")) else ""
-                    thiet_bi.nha_che_tao = str(row.get("Nhà chế tạo")).strip() if pd.notna(row.get("Nhà chế tạo")) else ""
-                    thiet_bi.nha_cung_cap = str(row.get("Nhà cung cấp")).strip() if pd.notna(row.get("Nhà cung cấp")) else ""
-                    thiet_bi.nuoc_san_xuat = str(row.get("Nước sản xuất")).strip() if pd.notna(row.get("Nước sản xuất")) else ""
-                    thiet_bi.ma_van_hanh = str(row.get("Mã vận hành")).strip() if pd.notna(row.get("Mã vận hành")) else ""
-                    thiet_bi.bo_phan_quan_ly = str(row.get("Bộ phận quản lý")).strip() if pd.notna(row.get("Bộ phận quản lý")) else ""
-                    thiet_bi.bang_ve = str(row.get("Bảng vẽ")).strip() if pd.notna(row.get("Bảng vẽ")) else ""
-                    thiet_bi.mo_ta_ky_thuat = str(row.get("Thông số kỹ thuật")).strip() if pd.notna(row.get("Thông số kỹ thuật")) else ""
-
-                    # Xử lý ngày
-                    def parse_date(val):
-                        if pd.isna(val) or not str(val).strip():
-                            return None
-                        try:
-                            if isinstance(val, datetime):
-                                return val.date()
-                            if isinstance(val, pd.Timestamp):
-                                return val.date()
-                            return pd.to_datetime(str(val).strip()).date()
-                        except Exception:
-                            return None
-
-                    thiet_bi.ngay_lap_dat = parse_date(row.get("Ngày lắp đặt (YYYY-MM-DD)"))
-                    thiet_bi.ngay_dua_vao_van_hanh = parse_date(row.get("Ngày vận hành (YYYY-MM-DD)"))
-
-                    thiet_bi.save()
-                    success_count += 1
-                except Exception as e:
-                    errors.append(f"Dòng {index + 2}: Lỗi hệ thống: {str(e)}")
-                    continue
+        try:
+            plan = plan_import(iter_excel_rows(file), request.user)
+        except ImportFileError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            return Response(import_result(plan))
+
+        applied = apply_import(plan, user=request.user)
+        summary = plan["tong_hop"]
+        success_count = applied["tao_moi"] + applied["cap_nhat"] + summary[STATUS_UNCHANGED]
+        total = plan["tong_so_dong"]
+        errors = plan_errors(plan)
 
         if errors:
             return Response({
-                'message': f'Import hoàn tất nhưng có một số lỗi. Thành công: {success_count}/{len(df)} dòng.',
+                'message': f'Import hoàn tất nhưng có một số lỗi. Thành công: {success_count}/{total} dòng.',
                 'success_count': success_count,
+                'tong_hop': summary,
                 'errors': errors
             }, status=status.HTTP_207_MULTI_STATUS)
-            
+
         return Response({
-            'message': f'Import thành công {success_count}/{len(df)} thiết bị.',
+            'message': f'Import thành công {success_count}/{total} thiết bị.',
             'success_count': success_count,
+            'tong_hop': summary,
             'errors': []
         }, status=status.HTTP_200_OK)
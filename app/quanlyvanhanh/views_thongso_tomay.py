@@ -1,7 +1,7 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
 from core.factory_scope import (
@@ -180,7 +180,7 @@ class ThongSoToMayViewSet(viewsets.ModelViewSet):
 
         try:
             result = bulk_upsert_thong_so_to_may(request.user, data_list)
-        except PermissionDenied:
+        except (PermissionDenied, ValidationError):
             raise
         except Exception as exc:
             return Response(
@@ -15,12 +15,14 @@ from import_export.admin import ImportExportModelAdmin
 from import_export.formats import base_formats
 
 from .models import (
+    LuongMuaGioVrain,
     SongHinhRealtimeSnapshot,
     SonghinhMnh, ThuongKonTumMnh,
     VinhSonRealtimeSnapshot,
     Vinhson_HoA, Vinhson_HoB, Vinhson_Hoc,
     MucnuocQuytrinh,
     ThongSoThuyVanCaiDat,
+    ThongSoThangTongHop,
     ThongSoThuyVanThucTe,
     ThongsoSanxuat, ThongsoGioPhat,
     TramDoMuaVrain
@@ -659,7 +661,8 @@ class ThongSoThuyVanThucTeAdmin(XLSXOnlyMixin, ImportExportModelAdmin):
 
         message = (
             f"Đã đồng bộ {plant_label} từ {GOOGLE_SHEET_SYNC_START_DATE:%d/%m/%Y} đến {end_date:%d/%m/%Y}. "
-            f"Đọc {result.parsed_count} dòng, tạo mới {result.saved_count}, cập nhật {result.updated_count}, "
+            f"Đọc {result.parsed_count} dòng, tạo mới {result.saved_count}, cập nhật {result.updated_count} "
+            f"(không đổi {result.unchanged_count}), "
             f"bỏ qua {result.skipped_count} dòng."
         )
         if reset_existing:
@@ -703,6 +706,39 @@ class ThongSoThuyVanThucTeAdmin(XLSXOnlyMixin, ImportExportModelAdmin):
             self._sync_plant_data_from_admin(request, nhamay, plant_label, reset_existing=True)
 
 
+@admin.register(ThongSoThangTongHop)
+class ThongSoThangTongHopAdmin(admin.ModelAdmin):
+    list_display = (
+        "nha_may",
+        "ho_chua",
+        "nam",
+        "thang",
+        "so_ban_ghi",
+        "qve_tb",
+        "muc_nuoc_min",
+        "muc_nuoc_max",
+        "dau_cuc",
+        "so_ngay_thuc_te",
+        "updated_at",
+    )
+    list_filter = ("nha_may", "ho_chua", "nam")
+    readonly_fields = [field.name for field in ThongSoThangTongHop._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(LuongMuaGioVrain)
+class LuongMuaGioVrainAdmin(admin.ModelAdmin):
+    list_display = ("thoi_gian", "tram", "luong_mua", "updated_at")
+    list_filter = ("tram",)
+    date_hierarchy = "thoi_gian"
+    readonly_fields = [field.name for field in LuongMuaGioVrain._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(SongHinhRealtimeSnapshot)
 class SongHinhRealtimeSnapshotAdmin(admin.ModelAdmin):
     list_display = (
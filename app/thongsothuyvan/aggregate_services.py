@@ -0,0 +1,298 @@
+import calendar
+import logging
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import ThongSoThangTongHop, ThongSoThuyVanThucTe, ThongsoSanxuat
+
+logger = logging.getLogger(__name__)
+
+PLANT_AGGREGATE_SOURCE = {
+    "ho_chua": ThongSoThangTongHop.HO_CHUA_NHA_MAY,
+    "qve": F("cot_i"),
+    "muc_nuoc": "cot_g",
+    "thuc_te_qve": "qve",
+    "thuc_te_muc_nuoc": "muc_nuoc_ho",
+}
+
+# Cung cach tach ho nhu ACTUAL_WATER_LEVEL_RESERVOIRS cua bao cao lanh dao:
+# Qve ho A bao cao = Qve tong - Qve ho B - Qve ho C.
+RESERVOIR_AGGREGATE_SOURCES = {
+    "vinhson": (
+        {
+            "ho_chua": "a",
+            "qve": F("cot_i") - Coalesce(F("luuluong_ve_ho_b"), Value(0.0)) - Coalesce(F("luuluong_ve_ho_c"), Value(0.0)),
+            "muc_nuoc": "cot_g",
+            "thuc_te_qve": "qve_ho_a",
+            "thuc_te_muc_nuoc": "muc_nuoc_ho_a",
+        },
+        {
+            "ho_chua": "b",
+            "qve": F("luuluong_ve_ho_b"),
+            "muc_nuoc": "mucnuoc_thuongluu_ho_b",
+            "thuc_te_qve": "qve_ho_b",
+            "thuc_te_muc_nuoc": "muc_nuoc_ho_b",
+        },
+        {
+            "ho_chua": "c",
+            "qve": F("luuluong_ve_ho_c"),
+            "muc_nuoc": "mucnuoc_thuongluu_ho_c",
+            "thuc_te_qve": "qve_ho_c",
+            "thuc_te_muc_nuoc": "muc_nuoc_ho_c",
+        },
+    ),
+}
+
+PLANT_TOTAL_AGGREGATES = {
+    "qcm_tb": Avg("cot_j"),
+    "qxl_tb": Avg("cot_k"),
+    "san_luong_qc": Sum("cot_l"),
+    "dau_cuc": Sum("cot_m"),
+    "thuong_pham": Sum("cot_n"),
+    "tu_dung": Sum("cot_x"),
+}
+
+AGGREGATE_VALUE_FIELDS = [
+    "so_ban_ghi",
+    "qve_tb",
+    "qcm_tb",
+    "qxl_tb",
+    "muc_nuoc_min",
+    "muc_nuoc_max",
+    "san_luong_qc",
+    "dau_cuc",
+    "thuong_pham",
+    "tu_dung",
+    "ban_ghi_cuoi",
+    "so_ngay_thuc_te",
+    "qve_thuc_te_tb",
+    "muc_nuoc_thuc_te_min",
+    "muc_nuoc_thuc_te_max",
+    "updated_at",
+]
+
+
+def month_key(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.year, value.month
+
+
+def month_bounds(nam, thang):
+    return date(nam, thang, 1), date(nam, thang, calendar.monthrange(nam, thang)[1])
+
+
+def _aggregate_sources(nha_may):
+    return (PLANT_AGGREGATE_SOURCE, *RESERVOIR_AGGREGATE_SOURCES.get(nha_may, ()))
+
+
+def _month_filter(field, months):
+    condition = Q()
+    for nam, thang in months:
+        start_date, end_date = month_bounds(nam, thang)
+        condition |= Q(**{f"{field}__gte": start_date, f"{field}__lte": end_date})
+    return condition
+
+
+def _build_rows(nha_may, now, months=None, nam=None):
+    """Aggregate rows of ``nha_may`` for ``months``, or for every month with data when ``months`` is None.
+
+    Production and actual hydrology are each grouped by month in one query
+    (``TruncMonth``), plus one query for the latest record of every month.
+    """
+    sources = _aggregate_sources(nha_may)
+    production = ThongsoSanxuat.objects.filter(nha_may=nha_may)
+    actual = ThongSoThuyVanThucTe.objects.filter(nha_may=nha_may)
+    if months is not None:
+        production = production.filter(_month_filter("thoi_gian__date", months))
+        actual = actual.filter(_month_filter("ngay", months))
+    if nam:
+        production = production.filter(thoi_gian__year=nam)
+        actual = actual.filter(ngay__year=nam)
+
+    production_aggregates = {"so_ban_ghi": Count("id"), "thoi_gian_cuoi": Max("thoi_gian"), **PLANT_TOTAL_AGGREGATES}
+    actual_aggregates = {"so_ngay_thuc_te": Count("id")}
+    for source in sources:
+        prefix = f"ho{source['ho_chua']}_"
+        production_aggregates[f"{prefix}qve_tb"] = Avg(source["qve"])
+        production_aggregates[f"{prefix}muc_nuoc_min"] = Min(source["muc_nuoc"])
+        production_aggregates[f"{prefix}muc_nuoc_max"] = Max(source["muc_nuoc"])
+        actual_aggregates[f"{prefix}qve_thuc_te_tb"] = Avg(source["thuc_te_qve"])
+        actual_aggregates[f"{prefix}muc_nuoc_thuc_te_min"] = Min(source["thuc_te_muc_nuoc"])
+        actual_aggregates[f"{prefix}muc_nuoc_thuc_te_max"] = Max(source["thuc_te_muc_nuoc"])
+
+    production_by_month = {
+        month_key(item["thang_bat_dau"]): item
+        for item in production.annotate(thang_bat_dau=TruncMonth("thoi_gian"))
+        .order_by()
+        .values("thang_bat_dau")
+        .annotate(**production_aggregates)
+    }
+    actual_by_month = {
+        month_key(item["thang_bat_dau"]): item
+        for item in actual.annotate(thang_bat_dau=TruncMonth("ngay"))
+        .order_by()
+        .values("thang_bat_dau")
+        .annotate(**actual_aggregates)
+    }
+
+    latest_ids = {}
+    latest_times = [item["thoi_gian_cuoi"] for item in production_by_month.values()]
+    if latest_times:
+        # Cung thoi diem thi lay id lon nhat, nhu order_by("-thoi_gian", "-id").
+        for record_id, thoi_gian in (
+            production.filter(thoi_gian__in=latest_times).order_by("thoi_gian", "id").values_list("id", "thoi_gian")
+        ):
+            latest_ids[month_key(thoi_gian)] = record_id
+
+    if months is None:
+        months = set(production_by_month) | set(actual_by_month)
+
+    rows = []
+    for key in sorted(months):
+        production_row = production_by_month.get(key, {"so_ban_ghi": 0})
+        actual_row = actual_by_month.get(key, {"so_ngay_thuc_te": 0})
+        for source in sources:
+            prefix = f"ho{source['ho_chua']}_"
+            row = ThongSoThangTongHop(
+                nha_may=nha_may,
+                ho_chua=source["ho_chua"],
+                nam=key[0],
+                thang=key[1],
+                so_ban_ghi=production_row["so_ban_ghi"],
+                qve_tb=production_row.get(f"{prefix}qve_tb"),
+                muc_nuoc_min=production_row.get(f"{prefix}muc_nuoc_min"),
+                muc_nuoc_max=production_row.get(f"{prefix}muc_nuoc_max"),
+                ban_ghi_cuoi_id=latest_ids.get(key),
+                so_ngay_thuc_te=actual_row["so_ngay_thuc_te"],
+                qve_thuc_te_tb=actual_row.get(f"{prefix}qve_thuc_te_tb"),
+                muc_nuoc_thuc_te_min=actual_row.get(f"{prefix}muc_nuoc_thuc_te_min"),
+                muc_nuoc_thuc_te_max=actual_row.get(f"{prefix}muc_nuoc_thuc_te_max"),
+                updated_at=now,
+            )
+            if source["ho_chua"] == ThongSoThangTongHop.HO_CHUA_NHA_MAY:
+                for field_name in PLANT_TOTAL_AGGREGATES:
+                    setattr(row, field_name, production_row.get(field_name))
+            rows.append(row)
+    return rows
+
+
+def _save_rows(rows):
+    ThongSoThangTongHop.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["nha_may", "ho_chua", "nam", "thang"],
+        update_fields=AGGREGATE_VALUE_FIELDS,
+    )
+
+
+def refresh_monthly_aggregates(nha_may, months):
+    """Recompute the aggregate rows of ``nha_may`` for the given ``(nam, thang)`` months.
+
+    All months are read with three grouped queries and written with one upsert, so a
+    write only ever touches the months it changed. Months without data keep a zero row
+    so readers can tell "built, empty" from "not built yet".
+    """
+    months = set(months)
+    if not nha_may or not months:
+        return []
+
+    rows = _build_rows(nha_may, timezone.now(), months=months)
+    _save_rows(rows)
+    return rows
+
+
+def schedule_monthly_refresh(nha_may, values):
+    """Refresh the months containing ``values`` (dates or datetimes) once the transaction commits."""
+    months = {month_key(value) for value in values if value}
+    if not nha_may or not months:
+        return
+
+    def refresh_after_commit():
+        try:
+            refresh_monthly_aggregates(nha_may, months)
+        except Exception:
+            logger.exception("Khong cap nhat duoc tong hop thang %s %s", nha_may, sorted(months))
+
+    transaction.on_commit(refresh_after_commit)
+
+
+def get_monthly_aggregates(plants, months, ho_chua=ThongSoThangTongHop.HO_CHUA_NHA_MAY):
+    """Aggregate rows keyed by ``(nha_may, nam, thang)``.
+
+    The latest production record of each month is joined in, so readers that need the
+    month-to-date columns (``cot_o``, ``cot_r``...) do not go back to the daily table.
+    Reads never write: rows are built by the save signals and ``rebuild_monthly_aggregates``,
+    and a month that was never built is computed in memory from the daily rows instead.
+    """
+    plants = list(dict.fromkeys(plants))
+    months = set(months)
+    if not plants or not months:
+        return {}
+
+    queryset = ThongSoThangTongHop.objects.filter(
+        nha_may__in=plants,
+        ho_chua=ho_chua,
+        nam__in={nam for nam, _ in months},
+    ).select_related("ban_ghi_cuoi")
+    rows = {
+        (row.nha_may, row.nam, row.thang): row
+        for row in queryset
+        if (row.nam, row.thang) in months
+    }
+
+    now = timezone.now()
+    unsaved = []
+    for plant in plants:
+        missing = {(nam, thang) for nam, thang in months if (plant, nam, thang) not in rows}
+        if not missing:
+            continue
+        for row in _build_rows(plant, now, months=missing):
+            if row.ho_chua == ho_chua:
+                rows[(plant, row.nam, row.thang)] = row
+                unsaved.append(row)
+
+    latest_ids = {row.ban_ghi_cuoi_id for row in unsaved if row.ban_ghi_cuoi_id}
+    if latest_ids:
+        latest = ThongsoSanxuat.objects.in_bulk(latest_ids)
+        for row in unsaved:
+            if row.ban_ghi_cuoi_id:
+                row.ban_ghi_cuoi = latest.get(row.ban_ghi_cuoi_id)
+    return rows
+
+
+def rebuild_monthly_aggregates(nha_may=None, nam=None):
+    """Rebuild every month that has production or actual hydrology data.
+
+    The delete and the rebuild share one transaction, so readers never see the
+    table emptied half way and a failure leaves the previous rows in place.
+    """
+    production = ThongsoSanxuat.objects.order_by()
+    actual = ThongSoThuyVanThucTe.objects.order_by()
+    stale = ThongSoThangTongHop.objects.all()
+    if nha_may:
+        production = production.filter(nha_may=nha_may)
+        actual = actual.filter(nha_may=nha_may)
+        stale = stale.filter(nha_may=nha_may)
+    if nam:
+        production = production.filter(thoi_gian__year=nam)
+        actual = actual.filter(ngay__year=nam)
+        stale = stale.filter(nam=nam)
+    plants = set(production.values_list("nha_may", flat=True).distinct())
+    plants |= set(actual.values_list("nha_may", flat=True).distinct())
+
+    now = timezone.now()
+    written = 0
+    with transaction.atomic():
+        stale.delete()
+        for plant in sorted(plant for plant in plants if plant):
+            rows = _build_rows(plant, now, nam=nam)
+            _save_rows(rows)
+            written += len(rows)
+    return written
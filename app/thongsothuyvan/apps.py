@@ -11,36 +11,65 @@ class ThongsothuyvanConfig(AppConfig):
 
         start_realtime_scheduler()
 
-        # Connect signals to clear hydrology services caches on setting save or delete
-        from django.db.models.signals import post_save, post_delete
+        # Connect signals to invalidate the shared settings cache and capacity caches on save or delete
+        from django.db.models.signals import post_save, post_delete, pre_save
         from .models import (
             SonghinhMnh,
             ThuongKonTumMnh,
             ThongSoThuyVanCaiDat,
+            ThongSoThuyVanThucTe,
+            ThongsoGioPhat,
+            ThongsoSanxuat,
             Vinhson_HoA,
             Vinhson_HoB,
             Vinhson_Hoc,
         )
+        from .aggregate_services import month_key, schedule_monthly_refresh
+        from .dashboard_services import invalidate_dashboard_cache
         from .hydrology_services import (
-            get_all_weekly_settings_cached,
             get_capacity_bounds_for_reservoir,
             get_capacity_levels_for_reservoir,
             get_capacity_points_for_reservoir,
             get_operating_capacity_range_for_reservoir,
-            get_settings_week_number,
-            get_setting_value,
+            invalidate_settings_cache,
         )
 
         def clear_hydrology_caches(sender, **kwargs):
-            get_all_weekly_settings_cached.cache_clear()
-            get_settings_week_number.cache_clear()
-            get_setting_value.cache_clear()
+            invalidate_settings_cache()
+            invalidate_dashboard_cache()
 
         def clear_capacity_caches(sender, **kwargs):
             get_capacity_points_for_reservoir.cache_clear()
             get_capacity_levels_for_reservoir.cache_clear()
             get_capacity_bounds_for_reservoir.cache_clear()
             get_operating_capacity_range_for_reservoir.cache_clear()
+            invalidate_dashboard_cache()
+
+        def clear_dashboard_cache(sender, **kwargs):
+            invalidate_dashboard_cache()
+
+        def monthly_aggregate_date_field(sender):
+            return "thoi_gian" if sender is ThongsoSanxuat else "ngay"
+
+        def remember_monthly_aggregate_month(sender, instance, raw=False, **kwargs):
+            # An edit may move the record to another month or plant: keep the old one so it is refreshed too.
+            instance._monthly_aggregate_previous = None
+            if instance.pk is not None and not raw:
+                instance._monthly_aggregate_previous = (
+                    sender.objects.filter(pk=instance.pk)
+                    .values_list("nha_may", monthly_aggregate_date_field(sender))
+                    .first()
+                )
+
+        def refresh_monthly_aggregate(sender, instance, **kwargs):
+            value = getattr(instance, monthly_aggregate_date_field(sender))
+            schedule_monthly_refresh(instance.nha_may, [value])
+            previous = getattr(instance, "_monthly_aggregate_previous", None)
+            instance._monthly_aggregate_previous = None
+            if not previous or not previous[1]:
+                return
+            if not value or (previous[0], month_key(previous[1])) != (instance.nha_may, month_key(value)):
+                schedule_monthly_refresh(previous[0], [previous[1]])
 
         post_save.connect(
             clear_hydrology_caches,
@@ -64,3 +93,32 @@ class ThongsothuyvanConfig(AppConfig):
                 sender=model,
                 dispatch_uid=f"thongsothuyvan.clear_capacity_caches.{model.__name__}.delete",
             )
+
+        for model in (ThongsoSanxuat, ThongsoGioPhat):
+            post_save.connect(
+                clear_dashboard_cache,
+                sender=model,
+                dispatch_uid=f"thongsothuyvan.clear_dashboard_cache.{model.__name__}.save",
+            )
+            post_delete.connect(
+                clear_dashboard_cache,
+                sender=model,
+                dispatch_uid=f"thongsothuyvan.clear_dashboard_cache.{model.__name__}.delete",
+            )
+
+        for model in (ThongsoSanxuat, ThongSoThuyVanThucTe):
+            pre_save.connect(
+                remember_monthly_aggregate_month,
+                sender=model,
+                dispatch_uid=f"thongsothuyvan.remember_monthly_aggregate_month.{model.__name__}",
+            )
+            post_save.connect(
+                refresh_monthly_aggregate,
+                sender=model,
+                dispatch_uid=f"thongsothuyvan.refresh_monthly_aggregate.{model.__name__}.save",
+            )
+            post_delete.connect(
+                refresh_monthly_aggregate,
+                sender=model,
+                dispatch_uid=f"thongsothuyvan.refresh_monthly_aggregate.{model.__name__}.delete",
+            )
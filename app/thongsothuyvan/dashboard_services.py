@@ -0,0 +1,166 @@
+import time
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import ThongsoGioPhat, ThongsoSanxuat
+
+DASHBOARD_PLANTS = ("songhinh", "vinhson", "thuongkontum")
+DASHBOARD_RECENT_DAYS = 14
+DASHBOARD_CACHE_PREFIX = "thongsothuyvan:dashboard"
+DASHBOARD_GENERATION_CACHE_KEY = f"{DASHBOARD_CACHE_PREFIX}:generation"
+DEFAULT_DASHBOARD_CACHE_TIMEOUT = 24 * 3600
+
+
+def get_year_offset_date(value, offset):
+    if not value:
+        return None
+
+    try:
+        return value.replace(year=value.year - offset)
+    except ValueError:
+        return value.replace(year=value.year - offset, day=28)
+
+
+def get_quarter_bounds(value):
+    if not value:
+        return None, None
+
+    start_month = ((value.month - 1) // 3) * 3 + 1
+    return date(value.year, start_month, 1), value
+
+
+def invalidate_dashboard_cache():
+    cache.set(DASHBOARD_GENERATION_CACHE_KEY, time.time_ns(), None)
+
+
+def dashboard_cache_key(target_date=None):
+    generation = cache.get_or_set(DASHBOARD_GENERATION_CACHE_KEY, 1, None)
+    report_key = target_date.isoformat() if target_date else f"latest-{timezone.localdate().isoformat()}"
+    return f"{DASHBOARD_CACHE_PREFIX}:{generation}:{report_key}"
+
+
+def get_cached_dashboard(target_date, builder):
+    """Return the dashboard payload for one report date, building it once per data generation."""
+    key = dashboard_cache_key(target_date)
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder(target_date)
+        cache.set(key, payload, getattr(settings, "HYDROLOGY_DASHBOARD_CACHE_TIMEOUT", DEFAULT_DASHBOARD_CACHE_TIMEOUT))
+    return payload
+
+
+def _dashboard_windows(latest_time, target_date):
+    latest_date = latest_time.date() if latest_time else None
+    report_date = target_date or latest_date
+    if not report_date:
+        return None
+
+    recent_end = latest_date or report_date
+    quarter_start, quarter_end = get_quarter_bounds(report_date)
+    return {
+        "latest_time": latest_time,
+        "recent": (recent_end - timedelta(days=DASHBOARD_RECENT_DAYS - 1), recent_end),
+        "previous_year_date": get_year_offset_date(report_date, 1),
+        "quarter": (quarter_start, quarter_end) if quarter_start and quarter_end else None,
+    }
+
+
+def _window_filter(plant, windows):
+    recent_start, recent_end = windows["recent"]
+    condition = Q(thoi_gian__date__gte=recent_start, thoi_gian__date__lte=recent_end)
+    if windows["latest_time"]:
+        condition |= Q(thoi_gian=windows["latest_time"])
+    if windows["previous_year_date"]:
+        condition |= Q(thoi_gian__date=windows["previous_year_date"])
+    if windows["quarter"]:
+        quarter_start, quarter_end = windows["quarter"]
+        condition |= Q(thoi_gian__date__gte=quarter_start, thoi_gian__date__lte=quarter_end)
+    return Q(nha_may=plant) & condition
+
+
+def _select_window_records(records, windows):
+    recent_start, recent_end = windows["recent"]
+    quarter = windows["quarter"]
+    selected = {}
+    previous_year_record = None
+    for record in records:
+        local_day = timezone.localtime(record.thoi_gian).date()
+        if (
+            record.thoi_gian == windows["latest_time"]
+            or recent_start <= local_day <= recent_end
+            or (quarter and quarter[0] <= local_day <= quarter[1])
+        ):
+            selected[record.id] = record
+        if local_day == windows["previous_year_date"] and (
+            previous_year_record is None or record.thoi_gian > previous_year_record.thoi_gian
+        ):
+            previous_year_record = record
+    if previous_year_record:
+        selected[previous_year_record.id] = previous_year_record
+    return sorted(selected.values(), key=lambda record: record.thoi_gian, reverse=True)
+
+
+def fetch_dashboard_records(plants, target_date=None):
+    """Dashboard windows of every plant in two queries.
+
+    For each plant the result holds the latest record on or before ``target_date``,
+    the 14 days up to that record, the same day one year earlier and the quarter to
+    date, newest first.
+    """
+    latest_queryset = ThongsoSanxuat.objects.filter(nha_may__in=plants)
+    if target_date:
+        latest_queryset = latest_queryset.filter(thoi_gian__date__lte=target_date)
+    latest_by_plant = dict(
+        latest_queryset.order_by().values("nha_may").annotate(latest=Max("thoi_gian")).values_list("nha_may", "latest")
+    )
+
+    windows_by_plant = {}
+    for plant in plants:
+        windows = _dashboard_windows(latest_by_plant.get(plant), target_date)
+        if windows:
+            windows_by_plant[plant] = windows
+
+    records_by_plant = {plant: [] for plant in plants}
+    if not windows_by_plant:
+        return records_by_plant
+
+    condition = reduce(or_, (_window_filter(plant, windows) for plant, windows in windows_by_plant.items()))
+    for record in ThongsoSanxuat.objects.filter(condition).order_by("-thoi_gian"):
+        records_by_plant[record.nha_may].append(record)
+    for plant, windows in windows_by_plant.items():
+        records_by_plant[plant] = _select_window_records(records_by_plant[plant], windows)
+    return records_by_plant
+
+
+def fetch_operation_hours(records_by_plant):
+    """Year-to-date generation hours of units 1 and 2 for every plant in one query."""
+    hours_by_plant = {plant: {"h1Year": None, "h2Year": None} for plant in records_by_plant}
+    conditions = []
+    for plant, records in records_by_plant.items():
+        latest_record = records[0] if records else None
+        if not latest_record or not latest_record.thoi_gian:
+            continue
+        report_date = latest_record.thoi_gian.date()
+        conditions.append(Q(nha_may=plant, ngay__gte=date(report_date.year, 1, 1), ngay__lte=report_date))
+    if not conditions:
+        return hours_by_plant
+
+    rows = (
+        ThongsoGioPhat.objects.filter(reduce(or_, conditions))
+        .values("nha_may", "to_may")
+        .annotate(year=Sum("gio_phat_dien"))
+        .order_by()
+    )
+    totals = {(row["nha_may"], str(row["to_may"])): row["year"] or 0 for row in rows}
+    for plant in hours_by_plant:
+        hours_by_plant[plant] = {
+            "h1Year": totals.get((plant, "1")),
+            "h2Year": totals.get((plant, "2")),
+        }
+    return hours_by_plant
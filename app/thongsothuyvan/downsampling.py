@@ -0,0 +1,60 @@
+"""Chon diem dai dien cho bieu do chuoi thoi gian (LTTB, min/max theo khoang).
+
+Cac ham tra ve chi so cac diem duoc giu (tang dan), de noi goi lay nguyen ban
+ghi tuong ung thay vi gia tri noi suy.
+"""
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: giu ``threshold`` diem giu dang duong cong ``y(x)``."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    # threshold - 2 khoang cho cac diem giua; diem dau va cuoi luon duoc giu.
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    selected[-1] = size - 1
+    return selected
+
+
+def minmax_indices(y, buckets):
+    """Moi khoang giu diem nho nhat va lon nhat (toi da ``2 * buckets`` diem)."""
+    y = np.asarray(y, dtype=np.float64)
+    size = len(y)
+    if buckets <= 0 or 2 * buckets >= size:
+        return np.arange(size)
+
+    edges = np.linspace(0, size, buckets + 1).astype(np.int64)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        window = y[start:end]
+        selected.extend((start + int(np.argmin(window)), start + int(np.argmax(window))))
+    return np.unique(np.asarray(selected, dtype=np.int64))
+
+
+def downsample_indices(x, y, points, method="lttb"):
+    if method == "minmax":
+        return minmax_indices(y, points // 2)
+    return lttb_indices(x, y, points)
@@ -5,10 +5,13 @@ from datetime import datetime, timedelta
 
 import gspread
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 from google.oauth2.service_account import Credentials
 
+from .aggregate_services import schedule_monthly_refresh
+from .dashboard_services import invalidate_dashboard_cache
 from .models import ThongSoThuyVanThucTe, ThongsoGioPhat, ThongsoSanxuat
 from .plants import normalize_plant_code
 
@@ -44,6 +47,10 @@ INSUFFICIENT_SAN_LUONG_MESSAGE = (
 INVALID_SYNC_DATE_MESSAGE = "Không được đồng bộ dữ liệu vượt quá ngày D-1."
 GOOGLE_SHEET_SYNC_START_DATE = datetime(2023, 1, 1).date()
 GOOGLE_SHEETS_READONLY_SCOPE = "https://www.googleapis.com/auth/spreadsheets.readonly"
+# Doc modifiedTime cua file (Drive) de biet sheet co thay doi truoc khi tai lai vung du lieu.
+GOOGLE_DRIVE_METADATA_READONLY_SCOPE = "https://www.googleapis.com/auth/drive.metadata.readonly"
+PREVIEW_CACHE_PREFIX = "thongsothuyvan:sheet_preview"
+DEFAULT_PREVIEW_CACHE_TIMEOUT = 3600
 THUC_TE_SYNC_FIELDS = (
     "muc_nuoc_ho",
     "qve",
@@ -55,6 +62,17 @@ THUC_TE_SYNC_FIELDS = (
     "qve_ho_c",
     "qve_tong",
 )
+GIO_PHAT_SYNC_FIELDS = ("gio_phat_dien", "gio_ngung")
+SHEET_SAVE_BATCH_SIZE = 500
+SHEET_SAN_LUONG = "san_luong"
+SHEET_GIO_PHAT = "gio_phat"
+SHEET_THUC_TE = "thuc_te"
+# Tab -> (model, khoa dong, cot dong bo)
+SHEET_MODELS = {
+    SHEET_SAN_LUONG: (ThongsoSanxuat, ("thoi_gian",), SAN_LUONG_SYNC_FIELDS),
+    SHEET_GIO_PHAT: (ThongsoGioPhat, ("ngay", "to_may"), GIO_PHAT_SYNC_FIELDS),
+    SHEET_THUC_TE: (ThongSoThuyVanThucTe, ("ngay",), THUC_TE_SYNC_FIELDS),
+}
 THUC_TE_SHEET_CONFIG = {
     "songhinh": {
         "spreadsheet_env": "SONGHINH_STATS_EXPORT_SPREADSHEET_ID",
@@ -86,18 +104,22 @@ class ParsedSheetResult:
     skipped_rows: list[dict] = field(default_factory=list)
     warnings: list[str] = field(default_factory=list)
     source_range: str = ""
+    unchanged_count: int = 0
 
 
 @dataclass
 class SaveResult:
     saved_count: int = 0
+    # Moi dong da ton tai trong DB, nhu truoc; unchanged_count la phan trong so do khong can ghi.
     updated_count: int = 0
+    unchanged_count: int = 0
 
 
 @dataclass
 class SyncRangeResult:
     saved_count: int = 0
     updated_count: int = 0
+    unchanged_count: int = 0
     parsed_count: int = 0
     skipped_count: int = 0
     source_range: str = ""
@@ -140,7 +162,10 @@ def get_gspread_client(nhamay="songhinh"):
     if not os.path.exists(creds_path):
         raise GoogleSheetSyncError("Chưa cấu hình Google Sheet credentials.")
 
-    creds = Credentials.from_service_account_file(creds_path, scopes=[GOOGLE_SHEETS_READONLY_SCOPE])
+    creds = Credentials.from_service_account_file(
+        creds_path,
+        scopes=[GOOGLE_SHEETS_READONLY_SCOPE, GOOGLE_DRIVE_METADATA_READONLY_SCOPE],
+    )
     return gspread.authorize(creds)
 
 
@@ -208,6 +233,22 @@ def parse_item_date(value):
         return parsed_datetime.date() if parsed_datetime else None
 
 
+def parse_item_datetime(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            parsed = parse_date(text)
+    if parsed and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 def is_date_after_allowed(value, allowed_date):
     parsed_date = parse_item_date(value)
     return parsed_date is not None and parsed_date > allowed_date
@@ -673,6 +714,171 @@ def parse_thuc_te_records(rows, nhamay, filter_date=None):
     return parse_thuc_te_records_with_metadata(rows, nhamay, filter_date).data
 
 
+def sheet_row_key(sheet, item):
+    if sheet == SHEET_SAN_LUONG:
+        thoi_gian = parse_item_datetime(item.get("thoi_gian"))
+        return (thoi_gian,) if thoi_gian else None
+    ngay = parse_item_date(item.get("ngay"))
+    if not ngay:
+        return None
+    if sheet == SHEET_GIO_PHAT:
+        to_may = item.get("to_may")
+        return (ngay, int(to_may)) if to_may is not None else None
+    return (ngay,)
+
+
+def sheet_rows(sheet, data_list):
+    fields = SHEET_MODELS[sheet][2]
+    rows = []
+    for item in data_list:
+        key = sheet_row_key(sheet, item)
+        if key:
+            rows.append((key, {field: item.get(field) for field in fields}))
+    return rows
+
+
+def existing_sheet_rows(sheet, nhamay, rows):
+    """Mot truy van lay cac ban ghi DB nam trong khoang khoa cua ``rows``."""
+    model, key_fields, _ = SHEET_MODELS[sheet]
+    values = [key[0] for key, _ in rows]
+    return model.objects.filter(nha_may=nhamay, **{f"{key_fields[0]}__range": (min(values), max(values))})
+
+
+def _field_value_changed(field, current, value):
+    try:
+        return field.to_python(value) != current
+    except Exception:
+        return True
+
+
+def _row_unchanged(model_fields, existing, values):
+    return not any(
+        _field_value_changed(model_fields[name], getattr(existing, name), value)
+        for name, value in values.items()
+    )
+
+
+def mark_unchanged_rows(result, nhamay, sheet):
+    """Flag preview rows whose values already match the stored record (one prefetch query)."""
+    rows = sheet_rows(sheet, result.data)
+    model, key_fields, value_fields = SHEET_MODELS[sheet]
+    existing_by_key = {
+        tuple(getattr(obj, name) for name in key_fields): obj
+        for obj in (existing_sheet_rows(sheet, nhamay, rows) if rows else ())
+    }
+    model_fields = {name: model._meta.get_field(name) for name in value_fields}
+    unchanged_count = 0
+    for item in result.data:
+        key = sheet_row_key(sheet, item)
+        if not key:
+            continue
+        existing = existing_by_key.get(key)
+        values = {field: item.get(field) for field in value_fields}
+        item["unchanged"] = existing is not None and _row_unchanged(model_fields, existing, values)
+        unchanged_count += item["unchanged"]
+    result.unchanged_count = unchanged_count
+    return result
+
+
+def bulk_upsert_sheet_rows(
+    model,
+    *,
+    nhamay,
+    rows,
+    existing_queryset,
+    key_fields,
+    value_fields,
+    user,
+    can_modify,
+    permission_message,
+):
+    """Upsert parsed sheet rows with one prefetch query and batched writes.
+
+    ``rows`` is a list of ``(key, values)`` where ``key`` follows ``key_fields``.
+    Ownership is checked for every existing row before anything is written, and a
+    repeated key counts as one create followed by updates, like the former
+    per-row ``update_or_create`` loop. Existing rows whose values already match
+    still count in ``updated_count`` and are also counted in ``unchanged_count``,
+    but they are not written.
+    """
+    existing_by_key = {
+        tuple(getattr(obj, name) for name in key_fields): obj
+        for obj in existing_queryset
+    }
+    for key, _ in rows:
+        existing = existing_by_key.get(key)
+        if existing and not can_modify(user, existing):
+            raise PermissionError(permission_message)
+
+    has_updated_at = any(field.name == "updated_at" for field in model._meta.concrete_fields)
+    model_fields = {name: model._meta.get_field(name) for name in value_fields}
+    to_create = {}
+    to_update = {}
+    saved_count = 0
+    updated_count = 0
+    unchanged_count = 0
+    for key, values in rows:
+        existing = existing_by_key.get(key)
+        if existing is not None and key not in to_update and _row_unchanged(model_fields, existing, values):
+            updated_count += 1
+            unchanged_count += 1
+            continue
+        if existing is None and key not in to_create:
+            to_create[key] = model(
+                nha_may=nhamay,
+                **dict(zip(key_fields, key)),
+                **values,
+                created_by=user,
+                updated_by=user,
+            )
+            saved_count += 1
+            continue
+
+        obj = existing if existing is not None else to_create[key]
+        for name, value in values.items():
+            setattr(obj, name, value)
+        obj.updated_by = user
+        if existing is not None:
+            if not obj.created_by_id:
+                obj.created_by = user
+            to_update[key] = obj
+        updated_count += 1
+
+    write_fields = [*value_fields, "updated_by"]
+    if has_updated_at:
+        write_fields.append("updated_at")
+        now = timezone.now()
+        for obj in to_update.values():
+            obj.updated_at = now
+
+    with transaction.atomic():
+        if to_create:
+            model.objects.bulk_create(
+                list(to_create.values()),
+                batch_size=SHEET_SAVE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["nha_may", *key_fields],
+                update_fields=write_fields,
+            )
+        if to_update:
+            model.objects.bulk_update(
+                list(to_update.values()),
+                [*write_fields, "created_by"],
+                batch_size=SHEET_SAVE_BATCH_SIZE,
+            )
+    # bulk_create/bulk_update khong phat post_save nen cap nhat cache va tong hop thang tai day.
+    if (to_create or to_update) and model in (ThongsoSanxuat, ThongsoGioPhat):
+        invalidate_dashboard_cache()
+    if (to_create or to_update) and model in (ThongsoSanxuat, ThongSoThuyVanThucTe):
+        date_field = "thoi_gian" if model is ThongsoSanxuat else "ngay"
+        schedule_monthly_refresh(
+            nhamay,
+            [getattr(obj, date_field) for obj in [*to_create.values(), *to_update.values()]],
+        )
+
+    return SaveResult(saved_count=saved_count, updated_count=updated_count, unchanged_count=unchanged_count)
+
+
 class GoogleSheetHydrologyService:
     def __init__(self, client_factory=get_gspread_client, spreadsheet_id_getter=get_spreadsheet_id):
         self.client_factory = client_factory
@@ -693,8 +899,34 @@ class GoogleSheetHydrologyService:
         client = self.client_factory(nhamay)
         return client.open_by_key(sheet_id)
 
+    def _cached_preview(self, nhamay, sheet_id, kind, args, build):
+        """Ket qua phan tich lan truoc neu file chua doi ``modifiedTime`` (mot goi Drive nhe),
+        nguoc lai goi ``build()`` doc lai vung du lieu tu Google Sheets."""
+        try:
+            modified = self.client_factory(nhamay).get_file_drive_metadata(sheet_id)["modifiedTime"]
+        except Exception as exc:
+            logger.debug("Khong doc duoc modifiedTime cua sheet %s, doc lai du lieu: %s", sheet_id, exc)
+            return build()
+        key = ":".join([PREVIEW_CACHE_PREFIX, kind, sheet_id, *(str(arg) for arg in args)])
+        cached = cache.get(key)
+        if cached and cached[0] == modified:
+            return cached[1]
+        result = build()
+        cache.set(key, (modified, result), getattr(settings, "GOOGLE_SHEET_PREVIEW_CACHE_TIMEOUT", DEFAULT_PREVIEW_CACHE_TIMEOUT))
+        return result
+
     def preview_san_luong(self, nhamay, filter_date=None):
         nhamay = normalize_plant_code(nhamay)
+        result = self._cached_preview(
+            nhamay,
+            self.spreadsheet_id_getter(nhamay),
+            SHEET_SAN_LUONG,
+            (filter_date,),
+            lambda: self._preview_san_luong(nhamay, filter_date),
+        )
+        return mark_unchanged_rows(result, nhamay, SHEET_SAN_LUONG)
+
+    def _preview_san_luong(self, nhamay, filter_date=None):
         try:
             sheet = self._open_spreadsheet(nhamay)
             worksheet = sheet.worksheet("Sản lượng")
@@ -729,6 +961,16 @@ class GoogleSheetHydrologyService:
 
     def preview_gio_phat(self, nhamay, filter_date=None):
         nhamay = normalize_plant_code(nhamay)
+        result = self._cached_preview(
+            nhamay,
+            self.spreadsheet_id_getter(nhamay),
+            SHEET_GIO_PHAT,
+            (filter_date,),
+            lambda: self._preview_gio_phat(nhamay, filter_date),
+        )
+        return mark_unchanged_rows(result, nhamay, SHEET_GIO_PHAT)
+
+    def _preview_gio_phat(self, nhamay, filter_date=None):
         try:
             sheet = self._open_spreadsheet(nhamay)
             worksheet = sheet.worksheet("Giờ phát")
@@ -764,6 +1006,16 @@ class GoogleSheetHydrologyService:
 
     def preview_thuc_te(self, nhamay, filter_date=None):
         nhamay = normalize_plant_code(nhamay)
+        result = self._cached_preview(
+            nhamay,
+            get_stats_export_spreadsheet_id(nhamay),
+            SHEET_THUC_TE,
+            (filter_date,),
+            lambda: self._preview_thuc_te(nhamay, filter_date),
+        )
+        return mark_unchanged_rows(result, nhamay, SHEET_THUC_TE)
+
+    def _preview_thuc_te(self, nhamay, filter_date=None):
         config = THUC_TE_SHEET_CONFIG.get(nhamay)
         if not config:
             raise GoogleSheetSyncError("Nhà máy chưa được hỗ trợ đồng bộ thông số thủy văn thực tế.")
@@ -803,6 +1055,16 @@ class GoogleSheetHydrologyService:
 
     def preview_thuc_te_range(self, nhamay, start_date=None, end_date=None):
         nhamay = normalize_plant_code(nhamay)
+        result = self._cached_preview(
+            nhamay,
+            get_stats_export_spreadsheet_id(nhamay),
+            f"{SHEET_THUC_TE}_range",
+            (start_date, end_date),
+            lambda: self._preview_thuc_te_range(nhamay, start_date, end_date),
+        )
+        return mark_unchanged_rows(result, nhamay, SHEET_THUC_TE)
+
+    def _preview_thuc_te_range(self, nhamay, start_date=None, end_date=None):
         config = THUC_TE_SHEET_CONFIG.get(nhamay)
         if not config:
             raise GoogleSheetSyncError("Nhà máy chưa được hỗ trợ đồng bộ thông số thủy văn thực tế.")
@@ -859,123 +1121,60 @@ class GoogleSheetHydrologyService:
 
     def save_san_luong(self, *, data_list, nhamay, user, can_modify):
         nhamay = normalize_plant_code(nhamay)
-        saved_count = 0
-        updated_count = 0
-
-        existing_by_time = {}
-        for item in data_list:
-            thoi_gian = item.get("thoi_gian")
-            if not thoi_gian:
-                continue
-            existing = ThongsoSanxuat.objects.filter(thoi_gian=thoi_gian, nha_may=nhamay).first()
-            if existing and not can_modify(user, existing):
-                raise PermissionError("Ban chi duoc sua du lieu san xuat do chinh ban cap nhat.")
-            existing_by_time[thoi_gian] = existing
-
-        with transaction.atomic():
-            for item in data_list:
-                thoi_gian = item.get("thoi_gian")
-                if not thoi_gian:
-                    continue
-
-                existing = existing_by_time.get(thoi_gian)
-                _, created = ThongsoSanxuat.objects.update_or_create(
-                    thoi_gian=thoi_gian,
-                    nha_may=nhamay,
-                    defaults={
-                        **{field: item.get(field) for field in SAN_LUONG_SYNC_FIELDS},
-                        "updated_by": user,
-                        **({} if existing and existing.created_by_id else {"created_by": user}),
-                    },
-                )
-                if created:
-                    saved_count += 1
-                else:
-                    updated_count += 1
+        rows = sheet_rows(SHEET_SAN_LUONG, data_list)
+        if not rows:
+            return SaveResult()
 
-        return SaveResult(saved_count=saved_count, updated_count=updated_count)
+        existing = existing_sheet_rows(SHEET_SAN_LUONG, nhamay, rows)
+        return bulk_upsert_sheet_rows(
+            ThongsoSanxuat,
+            nhamay=nhamay,
+            rows=rows,
+            existing_queryset=existing,
+            key_fields=("thoi_gian",),
+            value_fields=SAN_LUONG_SYNC_FIELDS,
+            user=user,
+            can_modify=can_modify,
+            permission_message="Ban chi duoc sua du lieu san xuat do chinh ban cap nhat.",
+        )
 
     def save_gio_phat(self, *, data_list, nhamay, user, can_modify):
         nhamay = normalize_plant_code(nhamay)
-        saved_count = 0
-        updated_count = 0
-
-        existing_by_key = {}
-        for item in data_list:
-            ngay = item.get("ngay")
-            to_may = item.get("to_may")
-            if not ngay or to_may is None:
-                continue
-            key = (ngay, to_may)
-            existing = ThongsoGioPhat.objects.filter(ngay=ngay, to_may=to_may, nha_may=nhamay).first()
-            if existing and not can_modify(user, existing):
-                raise PermissionError("Ban chi duoc sua du lieu gio phat do chinh ban cap nhat.")
-            existing_by_key[key] = existing
-
-        with transaction.atomic():
-            for item in data_list:
-                ngay = item.get("ngay")
-                to_may = item.get("to_may")
-
-                if not ngay or to_may is None:
-                    continue
-
-                existing = existing_by_key.get((ngay, to_may))
-                _, created = ThongsoGioPhat.objects.update_or_create(
-                    ngay=ngay,
-                    to_may=to_may,
-                    nha_may=nhamay,
-                    defaults={
-                        "gio_phat_dien": item.get("gio_phat_dien"),
-                        "gio_ngung": item.get("gio_ngung"),
-                        "updated_by": user,
-                        **({} if existing and existing.created_by_id else {"created_by": user}),
-                    },
-                )
-                if created:
-                    saved_count += 1
-                else:
-                    updated_count += 1
+        rows = sheet_rows(SHEET_GIO_PHAT, data_list)
+        if not rows:
+            return SaveResult()
 
-        return SaveResult(saved_count=saved_count, updated_count=updated_count)
+        existing = existing_sheet_rows(SHEET_GIO_PHAT, nhamay, rows)
+        return bulk_upsert_sheet_rows(
+            ThongsoGioPhat,
+            nhamay=nhamay,
+            rows=rows,
+            existing_queryset=existing,
+            key_fields=("ngay", "to_may"),
+            value_fields=GIO_PHAT_SYNC_FIELDS,
+            user=user,
+            can_modify=can_modify,
+            permission_message="Ban chi duoc sua du lieu gio phat do chinh ban cap nhat.",
+        )
 
     def save_thuc_te(self, *, data_list, nhamay, user, can_modify):
         nhamay = normalize_plant_code(nhamay)
-        saved_count = 0
-        updated_count = 0
+        rows = sheet_rows(SHEET_THUC_TE, data_list)
+        if not rows:
+            return SaveResult()
 
-        existing_by_day = {}
-        for item in data_list:
-            ngay = item.get("ngay")
-            if not ngay:
-                continue
-            existing = ThongSoThuyVanThucTe.objects.filter(ngay=ngay, nha_may=nhamay).first()
-            if existing and not can_modify(user, existing):
-                raise PermissionError("Ban chi duoc sua du lieu thuy van thuc te do chinh ban cap nhat.")
-            existing_by_day[ngay] = existing
-
-        with transaction.atomic():
-            for item in data_list:
-                ngay = item.get("ngay")
-                if not ngay:
-                    continue
-
-                existing = existing_by_day.get(ngay)
-                _, created = ThongSoThuyVanThucTe.objects.update_or_create(
-                    ngay=ngay,
-                    nha_may=nhamay,
-                    defaults={
-                        **{field: item.get(field) for field in THUC_TE_SYNC_FIELDS},
-                        "updated_by": user,
-                        **({} if existing and existing.created_by_id else {"created_by": user}),
-                    },
-                )
-                if created:
-                    saved_count += 1
-                else:
-                    updated_count += 1
-
-        return SaveResult(saved_count=saved_count, updated_count=updated_count)
+        existing = existing_sheet_rows(SHEET_THUC_TE, nhamay, rows)
+        return bulk_upsert_sheet_rows(
+            ThongSoThuyVanThucTe,
+            nhamay=nhamay,
+            rows=rows,
+            existing_queryset=existing,
+            key_fields=("ngay",),
+            value_fields=THUC_TE_SYNC_FIELDS,
+            user=user,
+            can_modify=can_modify,
+            permission_message="Ban chi duoc sua du lieu thuy van thuc te do chinh ban cap nhat.",
+        )
 
     def sync_thuc_te_range(self, *, nhamay, start_date=None, end_date=None, user, can_modify):
         preview = self.preview_thuc_te_range(nhamay, start_date, end_date)
@@ -988,6 +1187,7 @@ class GoogleSheetHydrologyService:
         return SyncRangeResult(
             saved_count=save_result.saved_count,
             updated_count=save_result.updated_count,
+            unchanged_count=save_result.unchanged_count,
             parsed_count=len(preview.data),
             skipped_count=len(preview.skipped_rows),
             source_range=preview.source_range,
@@ -1,7 +1,13 @@
-from datetime import timedelta
+import time
+from datetime import date, timedelta
 from decimal import Decimal, InvalidOperation
 from functools import lru_cache
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
 from .models import (
     SonghinhMnh,
     ThuongKonTumMnh,
@@ -12,6 +18,9 @@ from .models import (
 )
 
 FLOAT_ROUND_DIGITS = 10
+SETTINGS_CACHE_PREFIX = "thongsothuyvan:settings"
+SETTINGS_GENERATION_CACHE_KEY = f"{SETTINGS_CACHE_PREFIX}:generation"
+DEFAULT_SETTINGS_CACHE_TIMEOUT = 6 * 3600
 
 
 def _round_float(value):
@@ -201,26 +210,107 @@ def get_operating_capacity_range_for_reservoir(reservoir_key):
     return {"min": 0, "max": round(max(max_capacity - min_capacity, 0), 3)}
 
 
-@lru_cache(maxsize=1)
-def get_all_weekly_settings_cached():
-    from .models import ThongSoThuyVanCaiDat
-    return list(
-        ThongSoThuyVanCaiDat.objects.filter(
+def _settings_generation():
+    return cache.get_or_set(SETTINGS_GENERATION_CACHE_KEY, 1, None)
+
+
+def _settings_cache_key(generation, *parts):
+    return ":".join([SETTINGS_CACHE_PREFIX, str(generation), *(str(part) for part in parts)])
+
+
+def _settings_cache_timeout():
+    return getattr(settings, "HYDROLOGY_SETTINGS_CACHE_TIMEOUT", DEFAULT_SETTINGS_CACHE_TIMEOUT)
+
+
+def invalidate_settings_cache():
+    """Drop every cached settings index by moving to a new cache generation."""
+    cache.set(SETTINGS_GENERATION_CACHE_KEY, time.time_ns(), None)
+
+
+def _setting_record_values(record):
+    return {field.attname: getattr(record, field.attname) for field in ThongSoThuyVanCaiDat._meta.concrete_fields}
+
+
+def load_plant_year_settings(nha_may, nam):
+    """All settings of one plant and year, loaded with one query and shared through the cache.
+
+    ``keyed`` maps ``(loai, thang, tuan)`` to the record values of that year; ``weeks``
+    holds every weekly record whose date interval touches the calendar year, sorted by
+    start date as ``(start, end, order, values)``.
+    """
+    key = _settings_cache_key(_settings_generation(), nha_may, nam)
+    index = cache.get(key)
+    if index is not None:
+        return index
+
+    year_start = date(nam, 1, 1)
+    year_end = date(nam, 12, 31)
+    records = ThongSoThuyVanCaiDat.objects.filter(nha_may=nha_may).filter(
+        Q(nam=nam)
+        | Q(
             loai=ThongSoThuyVanCaiDat.LOAI_MNGH_TUAN,
-            tuan_bat_dau__isnull=False,
-            tuan_ket_thuc__isnull=False,
-        ).only("tuan_bat_dau", "tuan_ket_thuc", "tuan")
+            tuan_bat_dau__lte=year_end,
+            tuan_ket_thuc__gte=year_start,
+        )
     )
+    keyed = {}
+    weeks = []
+    for order, record in enumerate(records):
+        values = _setting_record_values(record)
+        if record.nam == nam:
+            keyed.setdefault((record.loai, record.thang, record.tuan), values)
+        if (
+            record.loai == ThongSoThuyVanCaiDat.LOAI_MNGH_TUAN
+            and record.tuan_bat_dau
+            and record.tuan_ket_thuc
+        ):
+            weeks.append((record.tuan_bat_dau, record.tuan_ket_thuc, order, values))
+    weeks.sort(key=lambda item: item[0])
+    index = {"keyed": keyed, "week_starts": [item[0] for item in weeks], "weeks": weeks}
+    cache.set(key, index, _settings_cache_timeout())
+    return index
+
+
+def _find_week_interval(weeks, week_starts, target_date):
+    """First interval in model order containing ``target_date``, like ``.filter(...).first()``."""
+    matches = [
+        item
+        for item in weeks[:bisect_right(week_starts, target_date)]
+        if item[1] >= target_date
+    ]
+    return min(matches, key=lambda item: item[2]) if matches else None
 
 
-@lru_cache(maxsize=1024)
-def get_settings_week_number(target_date):
+def get_all_weekly_settings_cached():
+    """Week intervals of every plant as ``{"week_starts", "weeks"}``, shared through the cache."""
+    key = _settings_cache_key(_settings_generation(), "weekly")
+    index = cache.get(key)
+    if index is not None:
+        return index
+
+    records = ThongSoThuyVanCaiDat.objects.filter(
+        loai=ThongSoThuyVanCaiDat.LOAI_MNGH_TUAN,
+        tuan_bat_dau__isnull=False,
+        tuan_ket_thuc__isnull=False,
+    ).values_list("tuan_bat_dau", "tuan_ket_thuc", "tuan")
+    weeks = sorted(
+        ((start, end, order, tuan) for order, (start, end, tuan) in enumerate(records)),
+        key=lambda item: item[0],
+    )
+    index = {"week_starts": [item[0] for item in weeks], "weeks": weeks}
+    cache.set(key, index, _settings_cache_timeout())
+    return index
+
+
+def get_settings_week_number(target_date, index=None):
+    """Số tuần cấu hình của ``target_date``; ``index`` là chỉ mục tuần đã đọc sẵn (dùng lại cho nhiều ngày)."""
     if not target_date:
         return None
-    # 1. Tìm trong danh sách weekly settings được cache trong memory
-    for record in get_all_weekly_settings_cached():
-        if record.tuan_bat_dau <= target_date <= record.tuan_ket_thuc:
-            return record.tuan
+    # 1. Tìm trong chỉ mục tuần dùng chung qua cache
+    index = index if index is not None else get_all_weekly_settings_cached()
+    match = _find_week_interval(index["weeks"], index["week_starts"], target_date)
+    if match:
+        return match[3]
 
     # 2. Fallback sang tính theo ISO week calendar
     monday = target_date - timedelta(days=target_date.weekday())
@@ -228,32 +318,17 @@ def get_settings_week_number(target_date):
     return iso_week
 
 
-@lru_cache(maxsize=1024)
 def get_setting_value(nha_may, target_date, loai, field, thang=0, tuan=0):
     nam = target_date.year
     if loai == ThongSoThuyVanCaiDat.LOAI_MNGH_TUAN:
-        record = ThongSoThuyVanCaiDat.objects.filter(
-            nha_may=nha_may,
-            loai=loai,
-            tuan_bat_dau__lte=target_date,
-            tuan_ket_thuc__gte=target_date,
-        ).only(field).first()
-        if record:
-            return getattr(record, field, None)
-        
+        index = load_plant_year_settings(nha_may, nam)
+        match = _find_week_interval(index["weeks"], index["week_starts"], target_date)
+        if match:
+            return match[3].get(field)
+
         # Fallback sang năm ISO của tuần
         monday = target_date - timedelta(days=target_date.weekday())
         nam = monday.isocalendar()[0]
 
-    record = (
-        ThongSoThuyVanCaiDat.objects.filter(
-            nha_may=nha_may,
-            nam=nam,
-            loai=loai,
-            thang=thang,
-            tuan=tuan,
-        )
-        .only(field)
-        .first()
-    )
-    return getattr(record, field, None) if record else None
+    values = load_plant_year_settings(nha_may, nam)["keyed"].get((loai, thang, tuan))
+    return values.get(field) if values else None
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from thongsothuyvan.vrain_services import VrainConfigError, backfill_vrain_rainfall
+
+
+class Command(BaseCommand):
+    help = "Dong bo lai du lieu mua VRAIN (tong ngay va tung gio) cho mot khoang ngay."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="Ngay bat dau (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Ngay ket thuc (YYYY-MM-DD), mac dinh bang ngay bat dau.")
+        parser.add_argument("--workers", type=int, help="So luong goi VRAIN song song.")
+
+    def handle(self, *args, **options):
+        try:
+            result = backfill_vrain_rainfall(options["start"], options["end"], max_workers=options["workers"])
+        except (VrainConfigError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for day, error in result["failed"].items():
+            self.stderr.write(f"{day}: {error}")
+        style = self.style.SUCCESS if result["ok"] else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"{result['message']} ({result['start_date']} -> {result['end_date']}): "
+                f"{result['created']} ngay moi, {result['updated']} ngay cap nhat, {result['hourly_rows']} dong gio."
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from thongsothuyvan.realtime_services import downsample_realtime_snapshots
+
+
+class Command(BaseCommand):
+    help = "Rut gon snapshot realtime cu: moi gio mot ban ghi va bo phan raw_data trung cot."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="So ngay gan nhat giu du moc chup (mac dinh REALTIME_SNAPSHOT_FULL_RESOLUTION_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        result = downsample_realtime_snapshots(full_resolution_days=options["days"])
+        for plant, counts in result.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{plant}: xoa {counts['deleted']} ban ghi, rut gon raw_data {counts['compacted']} ban ghi"
+                )
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from thongsothuyvan.aggregate_services import rebuild_monthly_aggregates
+from thongsothuyvan.plants import normalize_plant_code
+
+
+class Command(BaseCommand):
+    help = "Tinh lai bang tong hop thang tu ThongsoSanxuat va ThongSoThuyVanThucTe."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nha-may", dest="nha_may", help="Chi tinh lai cho mot nha may.")
+        parser.add_argument("--nam", type=int, help="Chi tinh lai cho mot nam.")
+
+    def handle(self, *args, **options):
+        nha_may = normalize_plant_code(options["nha_may"]) if options["nha_may"] else None
+        written = rebuild_monthly_aggregates(nha_may=nha_may, nam=options["nam"])
+        self.stdout.write(self.style.SUCCESS(f"Da ghi {written} dong tong hop thang."))
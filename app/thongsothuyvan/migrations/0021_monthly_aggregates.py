@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thongsothuyvan', '0019_auto_20260718_1625'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThongSoThangTongHop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nha_may', models.CharField(max_length=50)),
+                ('ho_chua', models.CharField(blank=True, choices=[('', 'Toan nha may'), ('a', 'Ho A'), ('b', 'Ho B'), ('c', 'Ho C')], default='', max_length=10)),
+                ('nam', models.PositiveSmallIntegerField()),
+                ('thang', models.PositiveSmallIntegerField()),
+                ('so_ban_ghi', models.PositiveIntegerField(default=0)),
+                ('qve_tb', models.FloatField(blank=True, null=True, verbose_name='Qve trung binh (m3/s)')),
+                ('qcm_tb', models.FloatField(blank=True, null=True, verbose_name='Qcm trung binh (m3/s)')),
+                ('qxl_tb', models.FloatField(blank=True, null=True, verbose_name='Qxl trung binh (m3/s)')),
+                ('muc_nuoc_min', models.FloatField(blank=True, null=True)),
+                ('muc_nuoc_max', models.FloatField(blank=True, null=True)),
+                ('san_luong_qc', models.FloatField(blank=True, null=True, verbose_name='Tong san luong Qc ngay')),
+                ('dau_cuc', models.FloatField(blank=True, null=True, verbose_name='Tong dau cuc ngay')),
+                ('thuong_pham', models.FloatField(blank=True, null=True, verbose_name='Tong thuong pham ngay')),
+                ('tu_dung', models.FloatField(blank=True, null=True, verbose_name='Tong tu dung ngay')),
+                ('so_ngay_thuc_te', models.PositiveIntegerField(default=0)),
+                ('qve_thuc_te_tb', models.FloatField(blank=True, null=True)),
+                ('muc_nuoc_thuc_te_min', models.FloatField(blank=True, null=True)),
+                ('muc_nuoc_thuc_te_max', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ban_ghi_cuoi', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='thongsothuyvan.thongsosanxuat')),
+            ],
+            options={
+                'verbose_name': 'Tong hop thang',
+                'verbose_name_plural': 'Tong hop thang',
+                'ordering': ['nha_may', 'ho_chua', 'nam', 'thang'],
+                'unique_together': {('nha_may', 'ho_chua', 'nam', 'thang')},
+            },
+        ),
+    ]
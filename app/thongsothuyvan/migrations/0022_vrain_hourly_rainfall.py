@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thongsothuyvan', '0021_monthly_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LuongMuaGioVrain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tram', models.CharField(max_length=40)),
+                ('thoi_gian', models.DateTimeField()),
+                ('luong_mua', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Luong mua gio VRAIN',
+                'verbose_name_plural': 'Luong mua gio VRAIN',
+                'ordering': ['thoi_gian', 'tram'],
+                'indexes': [models.Index(fields=['thoi_gian'], name='vrain_gio_thoi_gian_idx')],
+                'unique_together': {('tram', 'thoi_gian')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thongsothuyvan', '0022_vrain_hourly_rainfall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='last_job_duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='last_job_latency_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='last_missed_slot',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='last_vrain_sync_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='missed_slot_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='scheduler_leader',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='realtimeupdatestate',
+            name='scheduler_leader_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
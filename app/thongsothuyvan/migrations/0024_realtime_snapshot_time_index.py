@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thongsothuyvan', '0023_realtime_scheduler_leader'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='songhinhrealtimesnapshot',
+            index=models.Index(fields=['time_stamp'], name='realtime_sh_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vinhsonrealtimesnapshot',
+            index=models.Index(fields=['time_stamp'], name='realtime_vs_time_idx'),
+        ),
+    ]
@@ -49,6 +49,14 @@ class RealtimeUpdateState(models.Model):
     last_manual_run_at = models.DateTimeField(null=True, blank=True)
     last_error = models.TextField(null=True, blank=True)
     last_error_at = models.DateTimeField(null=True, blank=True)
+    # Bo lap lich realtime: tien trinh dang giu quyen chay va so lieu do tre/lo moc.
+    scheduler_leader = models.CharField(max_length=255, blank=True, default="")
+    scheduler_leader_until = models.DateTimeField(null=True, blank=True)
+    last_vrain_sync_at = models.DateTimeField(null=True, blank=True)
+    last_job_latency_seconds = models.FloatField(null=True, blank=True)
+    last_job_duration_seconds = models.FloatField(null=True, blank=True)
+    missed_slot_count = models.PositiveIntegerField(default=0)
+    last_missed_slot = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -78,11 +86,13 @@ class SongHinhRealtimeSnapshot(models.Model):
     qtran = models.FloatField()
     dung_tich_ho = models.FloatField(null=True, blank=True)
     dung_tich_phong_lu = models.FloatField(null=True, blank=True)
+    # Chi giu cac khoa cua payload khong co cot rieng (xem realtime_services.SONGHINH_SNAPSHOT_COLUMNS).
     raw_data = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-time_stamp"]
+        indexes = [models.Index(fields=["time_stamp"], name="realtime_sh_time_idx")]
         verbose_name = "Realtime Song Hinh"
         verbose_name_plural = "Realtime Song Hinh"
 
@@ -101,11 +111,13 @@ class VinhSonRealtimeSnapshot(models.Model):
     dung_tich_ho_a = models.FloatField(null=True, blank=True)
     dung_tich_ho_b = models.FloatField(null=True, blank=True)
     dung_tich_ho_c = models.FloatField(null=True, blank=True)
+    # Chi giu cac khoa cua payload khong co cot rieng (xem realtime_services.VINHSON_SNAPSHOT_COLUMNS).
     raw_data = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-time_stamp"]
+        indexes = [models.Index(fields=["time_stamp"], name="realtime_vs_time_idx")]
         verbose_name = "Realtime Vinh Son"
         verbose_name_plural = "Realtime Vinh Son"
 
@@ -342,6 +354,57 @@ class ThongSoThuyVanThucTe(models.Model):
         return f"{self.nha_may} {self.ngay}"
 
 
+class ThongSoThangTongHop(models.Model):
+    """Tong hop theo thang cua ThongsoSanxuat va ThongSoThuyVanThucTe, cap nhat khi du lieu ngay thay doi."""
+
+    HO_CHUA_NHA_MAY = ""
+    HO_CHUA_CHOICES = (
+        (HO_CHUA_NHA_MAY, "Toan nha may"),
+        ("a", "Ho A"),
+        ("b", "Ho B"),
+        ("c", "Ho C"),
+    )
+
+    nha_may = models.CharField(max_length=50)
+    ho_chua = models.CharField(max_length=10, choices=HO_CHUA_CHOICES, blank=True, default=HO_CHUA_NHA_MAY)
+    nam = models.PositiveSmallIntegerField()
+    thang = models.PositiveSmallIntegerField()
+
+    so_ban_ghi = models.PositiveIntegerField(default=0)
+    qve_tb = models.FloatField(verbose_name="Qve trung binh (m3/s)", null=True, blank=True)
+    qcm_tb = models.FloatField(verbose_name="Qcm trung binh (m3/s)", null=True, blank=True)
+    qxl_tb = models.FloatField(verbose_name="Qxl trung binh (m3/s)", null=True, blank=True)
+    muc_nuoc_min = models.FloatField(null=True, blank=True)
+    muc_nuoc_max = models.FloatField(null=True, blank=True)
+    san_luong_qc = models.FloatField(verbose_name="Tong san luong Qc ngay", null=True, blank=True)
+    dau_cuc = models.FloatField(verbose_name="Tong dau cuc ngay", null=True, blank=True)
+    thuong_pham = models.FloatField(verbose_name="Tong thuong pham ngay", null=True, blank=True)
+    tu_dung = models.FloatField(verbose_name="Tong tu dung ngay", null=True, blank=True)
+    ban_ghi_cuoi = models.ForeignKey(
+        ThongsoSanxuat,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    so_ngay_thuc_te = models.PositiveIntegerField(default=0)
+    qve_thuc_te_tb = models.FloatField(null=True, blank=True)
+    muc_nuoc_thuc_te_min = models.FloatField(null=True, blank=True)
+    muc_nuoc_thuc_te_max = models.FloatField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["nha_may", "ho_chua", "nam", "thang"]
+        unique_together = ("nha_may", "ho_chua", "nam", "thang")
+        verbose_name = "Tong hop thang"
+        verbose_name_plural = "Tong hop thang"
+
+    def __str__(self):
+        return f"{self.nha_may}{self.ho_chua} {self.thang:02d}/{self.nam}"
+
+
 class TramDoMuaVrain(models.Model):
     Thoi_gian = models.DateTimeField(verbose_name="Thời gian")
     Xa_Ea_M_doan = models.FloatField(verbose_name="Xã Ea M'đoan", null=True, blank=True)
@@ -359,3 +422,26 @@ class TramDoMuaVrain(models.Model):
         ordering = ["-Thoi_gian"]
         verbose_name = "Trạm đo mưa Vrain"
         verbose_name_plural = "Trạm đo mưa Vrain"
+
+
+class LuongMuaGioVrain(models.Model):
+    """Luong mua tung gio cua mot tram VRAIN, moi dong mot (tram, gio).
+
+    ``tram`` la ten cot tuong ung tren ``TramDoMuaVrain``; ``thoi_gian`` la dau gio
+    (gio Viet Nam). Gio da dong bo ma tram khong mua duoc luu 0.
+    """
+
+    tram = models.CharField(max_length=40)
+    thoi_gian = models.DateTimeField()
+    luong_mua = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["thoi_gian", "tram"]
+        unique_together = ("tram", "thoi_gian")
+        indexes = [models.Index(fields=["thoi_gian"], name="vrain_gio_thoi_gian_idx")]
+        verbose_name = "Luong mua gio VRAIN"
+        verbose_name_plural = "Luong mua gio VRAIN"
+
+    def __str__(self):
+        return f"{self.tram} {self.thoi_gian:%Y-%m-%d %H:%M}"
@@ -1,11 +1,17 @@
+import atexit
 import logging
 import os
+import socket
 import sys
 import threading
 import time
+from contextlib import contextmanager
+from datetime import timedelta
 
 from django.conf import settings
-from django.db import close_old_connections
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +21,25 @@ _scheduler_lock = threading.Lock()
 DEFAULT_HOURLY_GRACE_MINUTES = 5
 DEFAULT_VRAIN_INTERVAL_SECONDS = 60 * 60
 DEFAULT_POLL_SECONDS = 60
+MIN_SLEEP_SECONDS = 10
+# "cache": khoa Redis (SET NX + TTL), "database": thue ban ghi RealtimeUpdateState,
+# "none": moi tien trinh tu chay nhu truoc day.
+DEFAULT_LEADER_LOCK = "cache"
+DEFAULT_LEADER_TTL_SECONDS = 90
+LEADER_CACHE_KEY = "thongsothuyvan:realtime_scheduler:leader"
+# So khop chu khoa roi gia han/xoa trong mot lenh Redis, tien trinh khac khong chen vao giua duoc.
+RENEW_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
 SKIP_COMMANDS = {
     "collectstatic",
     "check",
@@ -62,58 +87,248 @@ def should_start_realtime_scheduler():
     return True
 
 
-def _scheduler_loop():
-    hourly_grace_minutes = _env_int(
-        "REALTIME_SNAPSHOT_HOURLY_GRACE_MINUTES",
-        getattr(
-            settings,
+def scheduler_identity():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def get_leader_lock_backend():
+    lock_backend = str(getattr(settings, "REALTIME_SCHEDULER_LEADER_LOCK", DEFAULT_LEADER_LOCK)).strip().lower()
+    if lock_backend not in {"cache", "database", "none"}:
+        logger.warning("REALTIME_SCHEDULER_LEADER_LOCK=%s khong hop le, dung %s", lock_backend, DEFAULT_LEADER_LOCK)
+        lock_backend = DEFAULT_LEADER_LOCK
+    return lock_backend
+
+
+def get_scheduler_config():
+    lock_backend = get_leader_lock_backend()
+
+    from .realtime_services import get_snapshot_interval_minutes
+
+    return {
+        "interval_minutes": get_snapshot_interval_minutes(),
+        "hourly_grace_minutes": _env_int(
             "REALTIME_SNAPSHOT_HOURLY_GRACE_MINUTES",
-            DEFAULT_HOURLY_GRACE_MINUTES,
+            getattr(
+                settings,
+                "REALTIME_SNAPSHOT_HOURLY_GRACE_MINUTES",
+                DEFAULT_HOURLY_GRACE_MINUTES,
+            ),
         ),
-    )
-    poll_seconds = _env_int(
-        "REALTIME_SNAPSHOT_POLL_SECONDS",
-        getattr(settings, "REALTIME_SNAPSHOT_POLL_SECONDS", DEFAULT_POLL_SECONDS),
-    )
-    vrain_enabled = _env_bool("VRAIN_DAILY_SYNC_ENABLED", True)
-    vrain_interval_seconds = _env_int(
-        "VRAIN_DAILY_SYNC_INTERVAL_SECONDS",
-        getattr(settings, "VRAIN_DAILY_SYNC_INTERVAL_SECONDS", DEFAULT_VRAIN_INTERVAL_SECONDS),
-    )
-    last_vrain_sync_at = 0
+        "poll_seconds": max(
+            MIN_SLEEP_SECONDS,
+            _env_int(
+                "REALTIME_SNAPSHOT_POLL_SECONDS",
+                getattr(settings, "REALTIME_SNAPSHOT_POLL_SECONDS", DEFAULT_POLL_SECONDS),
+            ),
+        ),
+        "vrain_enabled": _env_bool("VRAIN_DAILY_SYNC_ENABLED", True),
+        "vrain_interval_seconds": _env_int(
+            "VRAIN_DAILY_SYNC_INTERVAL_SECONDS",
+            getattr(settings, "VRAIN_DAILY_SYNC_INTERVAL_SECONDS", DEFAULT_VRAIN_INTERVAL_SECONDS),
+        ),
+        "lock_backend": lock_backend,
+        "leader_ttl_seconds": max(
+            3 * MIN_SLEEP_SECONDS,
+            int(getattr(settings, "REALTIME_SCHEDULER_LEADER_TTL_SECONDS", DEFAULT_LEADER_TTL_SECONDS)),
+        ),
+    }
 
-    logger.info(
-        "Realtime snapshot scheduler started: hourly_grace=%sm poll=%ss vrain_enabled=%s vrain_interval=%ss",
-        hourly_grace_minutes,
-        poll_seconds,
-        vrain_enabled,
-        vrain_interval_seconds,
+
+def acquire_scheduler_leadership(identity, lock_backend, ttl_seconds):
+    """Giu hoac gia han quyen chay; chi mot tien trinh giu duoc trong ``ttl_seconds``."""
+    if lock_backend == "none":
+        return True
+
+    if lock_backend == "database":
+        from .realtime_services import claim_realtime_scheduler_leadership
+
+        return claim_realtime_scheduler_leadership(identity, ttl_seconds)
+
+    if cache.add(LEADER_CACHE_KEY, identity, ttl_seconds):
+        return True
+    return _run_leader_script(RENEW_LEADER_SCRIPT, identity, ttl_seconds)
+
+
+def _run_leader_script(script, identity, *args):
+    """Chay ``script`` tren khoa leader qua ket noi django-redis; gia tri so sanh duoc ma hoa nhu ``cache.add``."""
+    from django_redis import get_redis_connection
+
+    client = cache.client
+    return bool(
+        get_redis_connection("default").eval(
+            script,
+            1,
+            client.make_key(LEADER_CACHE_KEY),
+            client.encode(identity),
+            *args,
+        )
     )
 
-    while True:
+
+def get_scheduler_leader(state):
+    """``(identity, until)`` cua tien trinh dang giu quyen chay, doc tu noi giu khoa dang dung.
+
+    Che do "cache" khong ghi leader vao ``RealtimeUpdateState`` nen doc khoa Redis va TTL cua no.
+    """
+    if get_leader_lock_backend() != "cache":
+        return state.scheduler_leader, state.scheduler_leader_until
+    try:
+        identity = cache.get(LEADER_CACHE_KEY)
+        ttl = cache.ttl(LEADER_CACHE_KEY) if identity else None
+    except Exception:
+        logger.exception("Khong doc duoc khoa leader realtime scheduler")
+        return "", None
+    until = timezone.now() + timedelta(seconds=ttl) if ttl else None
+    return identity or "", until
+
+
+def release_scheduler_leadership(identity, lock_backend):
+    try:
+        if lock_backend == "database":
+            from .realtime_services import release_realtime_scheduler_leadership
+
+            release_realtime_scheduler_leadership(identity)
+        elif lock_backend == "cache":
+            _run_leader_script(RELEASE_LEADER_SCRIPT, identity)
+    except Exception:
+        logger.exception("Khong tra duoc quyen chay realtime scheduler")
+
+
+@contextmanager
+def keep_scheduler_leadership(identity, lock_backend, ttl_seconds):
+    """Gia han quyen chay moi ``ttl/3`` giay trong khi khoi lenh chay (chup snapshot, dong bo VRAIN).
+
+    Viec dai hon TTL khong lam khoa het han giua chung, nen tien trinh khac khong nhan quyen
+    va chay trung.
+    """
+    if lock_backend == "none":
+        yield
+        return
+
+    stop = threading.Event()
+
+    def renew():
         try:
-            close_old_connections()
-            from .realtime_services import (
-                claim_realtime_snapshot_hourly_slot,
-                save_all_realtime_snapshots,
-            )
-
-            if claim_realtime_snapshot_hourly_slot(
-                grace_minutes=hourly_grace_minutes
-            ):
-                save_all_realtime_snapshots(mark_run=False)
-
-            now = time.time()
-            if vrain_enabled and now - last_vrain_sync_at >= vrain_interval_seconds:
-                from .vrain_services import sync_vrain_daily_rainfall
-
-                last_vrain_sync_at = now
-                sync_vrain_daily_rainfall()
+            while not stop.wait(ttl_seconds // 3):
+                if not acquire_scheduler_leadership(identity, lock_backend, ttl_seconds):
+                    logger.warning("Realtime scheduler %s mat quyen chay khi dang chay tac vu", identity)
+                    return
         except Exception:
-            logger.exception("Realtime snapshot scheduler failed")
+            logger.exception("Khong gia han duoc quyen chay realtime scheduler")
         finally:
-            close_old_connections()
-            time.sleep(max(10, poll_seconds))
+            connection.close()
+
+    thread = threading.Thread(target=renew, name="realtime-scheduler-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _seconds_until_next_slot(now, interval_minutes):
+    return interval_minutes * 60 - ((now.minute % interval_minutes) * 60 + now.second)
+
+
+def run_scheduler_tick(identity, config, local_state):
+    """Chay mot vong cua bo lap lich; tra ve so giay nen ngu truoc vong tiep theo.
+
+    Tien trinh khong giu quyen chi thu lai khoa (Redis) moi ``ttl/3`` giay, khong
+    doc DB. Tien trinh giu quyen chi vao DB khi toi moc chup hoac toi luot VRAIN;
+    moc nua dem con rut gon snapshot cu (``downsample_realtime_snapshots``).
+    """
+    renew_seconds = config["leader_ttl_seconds"] // 3
+    now = timezone.localtime(timezone.now())
+
+    try:
+        if not acquire_scheduler_leadership(identity, config["lock_backend"], config["leader_ttl_seconds"]):
+            if local_state.get("leader"):
+                logger.info("Realtime scheduler %s mat quyen chay", identity)
+            local_state["leader"] = False
+            return renew_seconds
+
+        if not local_state.get("leader"):
+            logger.info("Realtime scheduler %s nhan quyen chay (%s)", identity, config["lock_backend"])
+        local_state["leader"] = True
+
+        from .realtime_services import (
+            claim_realtime_snapshot_slot,
+            claim_vrain_sync_run,
+            downsample_realtime_snapshots,
+            record_realtime_job_duration,
+            save_all_realtime_snapshots,
+            snapshot_slot_start,
+        )
+
+        interval = config["interval_minutes"]
+        grace = min(config["hourly_grace_minutes"], interval - 1)
+        current_slot = snapshot_slot_start(now, interval)
+        if now.minute % interval <= grace and local_state.get("last_slot") != current_slot:
+            slot = claim_realtime_snapshot_slot(interval, grace)
+            local_state["last_slot"] = current_slot
+            if slot:
+                started = time.monotonic()
+                with keep_scheduler_leadership(identity, config["lock_backend"], config["leader_ttl_seconds"]):
+                    save_all_realtime_snapshots(mark_run=False)
+                duration = time.monotonic() - started
+                record_realtime_job_duration(duration)
+                logger.info(
+                    "Realtime snapshot %s: tre %.1fs, chay %.1fs",
+                    slot.isoformat(),
+                    (now - slot).total_seconds(),
+                    duration,
+                )
+                if slot.hour == 0 and slot.minute == 0:
+                    with keep_scheduler_leadership(identity, config["lock_backend"], config["leader_ttl_seconds"]):
+                        downsample_realtime_snapshots()
+
+        if config["vrain_enabled"] and time.monotonic() >= local_state.get("next_vrain_check", 0):
+            claimed = claim_vrain_sync_run(config["vrain_interval_seconds"])
+            # Luot vua bi tien trinh khac (leader cu) chay: hoi lai thua hon thay vi moi vong.
+            retry_seconds = config["vrain_interval_seconds"] if claimed else min(config["vrain_interval_seconds"], config["poll_seconds"] * 5)
+            local_state["next_vrain_check"] = time.monotonic() + retry_seconds
+            if claimed:
+                from .vrain_services import sync_vrain_recent_rainfall
+
+                with keep_scheduler_leadership(identity, config["lock_backend"], config["leader_ttl_seconds"]):
+                    sync_vrain_recent_rainfall()
+    except Exception:
+        logger.exception("Realtime snapshot scheduler failed")
+        return config["poll_seconds"]
+
+    wake_after = [
+        renew_seconds,
+        _seconds_until_next_slot(timezone.localtime(timezone.now()), config["interval_minutes"]),
+    ]
+    if config["vrain_enabled"]:
+        wake_after.append(local_state["next_vrain_check"] - time.monotonic())
+    return max(MIN_SLEEP_SECONDS, min(wake_after))
+
+
+def _scheduler_loop():
+    config = get_scheduler_config()
+    identity = scheduler_identity()
+    local_state = {}
+
+    logger.info(
+        "Realtime snapshot scheduler started: id=%s lock=%s ttl=%ss interval=%sm grace=%sm vrain_enabled=%s vrain_interval=%ss",
+        identity,
+        config["lock_backend"],
+        config["leader_ttl_seconds"],
+        config["interval_minutes"],
+        config["hourly_grace_minutes"],
+        config["vrain_enabled"],
+        config["vrain_interval_seconds"],
+    )
+    atexit.register(release_scheduler_leadership, identity, config["lock_backend"])
+
+    while True:
+        sleep_seconds = run_scheduler_tick(identity, config, local_state)
+        # Dong ket noi DB cua thread scheduler giua cac vong (khong dong trong tick de test/caller
+        # dang o trong transaction khong mat ket noi).
+        close_old_connections()
+        time.sleep(sleep_seconds)
 
 
 def start_realtime_scheduler():
@@ -1,14 +1,17 @@
 import base64
 import json
+import logging
 import os
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
 from django.utils import timezone
 
 from .models import (
@@ -20,6 +23,9 @@ from .models import (
     Vinhson_HoB,
     Vinhson_Hoc,
 )
+from .snapshot_schedule import snap_snapshot_interval
+
+logger = logging.getLogger(__name__)
 
 SONG_HINH_FLOOD_CAPACITY = 323.533
 
@@ -53,6 +59,44 @@ VINHSON_REQUIRED_FIELDS = [
 ]
 
 
+# Khoa payload -> cot cua bang snapshot.
+SONGHINH_SNAPSHOT_COLUMNS = {
+    "MNTL": "mntl",
+    "MNHL": "mnhl",
+    "PH1": "ph1",
+    "PH2": "ph2",
+    "PNM": "pnm",
+    "Qcm": "qcm",
+    "DM1": "dm1",
+    "DM2": "dm2",
+    "DM3": "dm3",
+    "DM4": "dm4",
+    "DM5": "dm5",
+    "DM6": "dm6",
+    "Qtran": "qtran",
+    "dung_tich_ho": "dung_tich_ho",
+    "dung_tich_phong_lu": "dung_tich_phong_lu",
+}
+
+VINHSON_SNAPSHOT_COLUMNS = {
+    "MNTLA": "mntla",
+    "MNTLA_td": "mntla_td",
+    "MNTLB": "mntlb",
+    "MNTLC": "mntlc",
+    "MNHL": "mnhl",
+    "PH1": "ph1",
+    "PH2": "ph2",
+    "Qcm": "qcm",
+    "Qtran": "qtran",
+    "dung_tich_ho_a": "dung_tich_ho_a",
+    "dung_tich_ho_b": "dung_tich_ho_b",
+    "dung_tich_ho_c": "dung_tich_ho_c",
+}
+
+DEFAULT_SNAPSHOT_FULL_RESOLUTION_DAYS = 7
+COMPACT_BATCH_SIZE = 500
+
+
 @dataclass
 class RealtimeSaveResult:
     plant: str
@@ -202,51 +246,51 @@ def validate_required_fields(payload_data, required_fields, plant_name):
         )
 
 
+def _snapshot_columns(payload_data, columns):
+    return {
+        column: payload_data.get(key)
+        for key, column in columns.items()
+    }
+
+
+def compact_realtime_payload(payload_data, columns):
+    """Phan payload khong co cot rieng; cac gia tri da luu thanh cot khong lap lai trong JSON."""
+    return {
+        key: value
+        for key, value in payload_data.items()
+        if key != "time_stamp" and key not in columns
+    }
+
+
+def _save_realtime_snapshot(plant, model_class, payload_data, columns):
+    time_stamp = parse_realtime_timestamp(payload_data["time_stamp"])
+    # Chu ky chup ngan hon chu ky cap nhat cua nguon: cung time_stamp thi khong luu lai.
+    existing_id = (
+        model_class.objects.filter(time_stamp=time_stamp)
+        .values_list("id", flat=True)
+        .first()
+    )
+    if existing_id:
+        return RealtimeSaveResult(plant, True, snapshot_id=existing_id, skipped=True)
+
+    snapshot = model_class.objects.create(
+        time_stamp=time_stamp,
+        raw_data=compact_realtime_payload(payload_data, columns),
+        **_snapshot_columns(payload_data, columns),
+    )
+    return RealtimeSaveResult(plant, True, snapshot_id=snapshot.id)
+
+
 def save_songhinh_realtime_snapshot():
     payload_data = enrich_songhinh_payload(fetch_realtime_payload("SONGHINH"))
     validate_required_fields(payload_data, SONGHINH_REQUIRED_FIELDS, "Song Hinh")
-    snapshot = SongHinhRealtimeSnapshot.objects.create(
-        time_stamp=parse_realtime_timestamp(payload_data["time_stamp"]),
-        mntl=payload_data["MNTL"],
-        mnhl=payload_data["MNHL"],
-        ph1=payload_data["PH1"],
-        ph2=payload_data["PH2"],
-        pnm=payload_data["PNM"],
-        qcm=payload_data["Qcm"],
-        dm1=payload_data["DM1"],
-        dm2=payload_data["DM2"],
-        dm3=payload_data["DM3"],
-        dm4=payload_data["DM4"],
-        dm5=payload_data["DM5"],
-        dm6=payload_data["DM6"],
-        qtran=payload_data["Qtran"],
-        dung_tich_ho=payload_data["dung_tich_ho"],
-        dung_tich_phong_lu=payload_data["dung_tich_phong_lu"],
-        raw_data=payload_data,
-    )
-    return RealtimeSaveResult("songhinh", True, snapshot_id=snapshot.id)
+    return _save_realtime_snapshot("songhinh", SongHinhRealtimeSnapshot, payload_data, SONGHINH_SNAPSHOT_COLUMNS)
 
 
 def save_vinhson_realtime_snapshot():
     payload_data = enrich_vinhson_payload(fetch_realtime_payload("VINHSON"))
     validate_required_fields(payload_data, VINHSON_REQUIRED_FIELDS, "Vinh Son")
-    snapshot = VinhSonRealtimeSnapshot.objects.create(
-        time_stamp=parse_realtime_timestamp(payload_data["time_stamp"]),
-        mntla=payload_data["MNTLA"],
-        mntla_td=payload_data.get("MNTLA_td"),
-        mntlb=payload_data["MNTLB"],
-        mntlc=payload_data["MNTLC"],
-        mnhl=payload_data["MNHL"],
-        ph1=payload_data["PH1"],
-        ph2=payload_data["PH2"],
-        qcm=payload_data["Qcm"],
-        qtran=payload_data["Qtran"],
-        dung_tich_ho_a=payload_data["dung_tich_ho_a"],
-        dung_tich_ho_b=payload_data["dung_tich_ho_b"],
-        dung_tich_ho_c=payload_data["dung_tich_ho_c"],
-        raw_data=payload_data,
-    )
-    return RealtimeSaveResult("vinhson", True, snapshot_id=snapshot.id)
+    return _save_realtime_snapshot("vinhson", VinhSonRealtimeSnapshot, payload_data, VINHSON_SNAPSHOT_COLUMNS)
 
 
 def claim_realtime_snapshot_run(interval_seconds=3600):
@@ -265,34 +309,116 @@ def claim_realtime_snapshot_run(interval_seconds=3600):
         return True
 
 
-def claim_realtime_snapshot_hourly_slot(grace_minutes=5):
+def get_snapshot_interval_minutes():
+    """Chu ky chup snapshot (phut); chi nhan uoc cua 60 de moc luon thang hang theo gio."""
+    return snap_snapshot_interval(getattr(settings, "REALTIME_SNAPSHOT_INTERVAL_MINUTES", 60))
+
+
+def snapshot_slot_start(value, interval_minutes):
+    value = timezone.localtime(value)
+    return value.replace(
+        minute=value.minute - value.minute % interval_minutes,
+        second=0,
+        microsecond=0,
+    )
+
+
+def claim_realtime_snapshot_slot(interval_minutes=60, grace_minutes=5):
+    """Nhan moc chup hien tai neu chua ai chay; tra ve moc (aware) hoac None.
+
+    Khi nhan moc, ghi lai do tre so voi dau moc va dem cac moc bi lo ke tu lan
+    chay truoc (vi du tien trinh chet hoac qua thoi gian cho phep).
+    """
     now = timezone.localtime(timezone.now())
-    if now.minute > grace_minutes:
-        return False
+    grace_minutes = min(grace_minutes, interval_minutes - 1)
+    if now.minute % interval_minutes > grace_minutes:
+        return None
 
-    current_slot = now.replace(minute=0, second=0, microsecond=0)
+    current_slot = snapshot_slot_start(now, interval_minutes)
 
     with transaction.atomic():
         state, _ = RealtimeUpdateState.objects.select_for_update().get_or_create(pk=1)
-        last_hourly_slot = (
-            timezone.localtime(state.last_hourly_slot).replace(
-                minute=0,
-                second=0,
-                microsecond=0,
-            )
+        last_slot = (
+            snapshot_slot_start(state.last_hourly_slot, interval_minutes)
             if state.last_hourly_slot
             else None
         )
 
-        if last_hourly_slot == current_slot:
-            return False
+        if last_slot == current_slot:
+            return None
+
+        update_fields = ["last_run_at", "last_hourly_slot", "last_job_latency_seconds", "updated_at"]
+        if last_slot and current_slot > last_slot:
+            missed = int((current_slot - last_slot).total_seconds() // (interval_minutes * 60)) - 1
+            if missed > 0:
+                state.missed_slot_count += missed
+                state.last_missed_slot = current_slot - timedelta(minutes=interval_minutes)
+                update_fields += ["missed_slot_count", "last_missed_slot"]
+                logger.warning(
+                    "Realtime scheduler lo %s moc truoc %s",
+                    missed,
+                    current_slot.isoformat(),
+                )
 
         state.last_run_at = timezone.now()
         state.last_hourly_slot = current_slot
-        state.save(update_fields=["last_run_at", "last_hourly_slot", "updated_at"])
+        state.last_job_latency_seconds = (now - current_slot).total_seconds()
+        state.save(update_fields=update_fields)
+        return current_slot
+
+
+def record_realtime_job_duration(duration_seconds):
+    RealtimeUpdateState.objects.filter(pk=1).update(
+        last_job_duration_seconds=duration_seconds,
+        updated_at=timezone.now(),
+    )
+
+
+def claim_vrain_sync_run(interval_seconds):
+    """Nhan luot dong bo VRAIN chung cho moi tien trinh (mot lan moi ``interval_seconds``)."""
+    now = timezone.now()
+
+    with transaction.atomic():
+        state, _ = RealtimeUpdateState.objects.select_for_update().get_or_create(pk=1)
+        if (
+            state.last_vrain_sync_at
+            and (now - state.last_vrain_sync_at).total_seconds() < interval_seconds
+        ):
+            return False
+
+        state.last_vrain_sync_at = now
+        state.save(update_fields=["last_vrain_sync_at", "updated_at"])
         return True
 
 
+def claim_realtime_scheduler_leadership(identity, ttl_seconds):
+    """Giu hoac gia han quyen chay bo lap lich bang ban ghi trang thai (khoa hang trong DB)."""
+    now = timezone.now()
+
+    with transaction.atomic():
+        state, _ = RealtimeUpdateState.objects.select_for_update().get_or_create(pk=1)
+        if (
+            state.scheduler_leader
+            and state.scheduler_leader != identity
+            and state.scheduler_leader_until
+            and state.scheduler_leader_until > now
+        ):
+            return False
+
+        state.scheduler_leader = identity
+        state.scheduler_leader_until = now + timedelta(seconds=ttl_seconds)
+        state.save(update_fields=["scheduler_leader", "scheduler_leader_until", "updated_at"])
+        return True
+
+
+def release_realtime_scheduler_leadership(identity):
+    RealtimeUpdateState.objects.filter(pk=1, scheduler_leader=identity).update(
+        scheduler_leader="",
+        scheduler_leader_until=None,
+        updated_at=timezone.now(),
+    )
+
+
 def save_all_realtime_snapshots(is_manual=False, mark_run=True, plants=None):
     state = RealtimeUpdateState.get_solo()
     now = timezone.now()
@@ -342,6 +468,80 @@ def save_all_realtime_snapshots(is_manual=False, mark_run=True, plants=None):
     return state, results
 
 
+def _downsample_snapshot_model(model_class, cutoff):
+    old = model_class.objects.filter(time_stamp__lt=cutoff)
+    duplicate_hours = sorted(
+        old.annotate(gio=TruncHour("time_stamp"))
+        .values("gio")
+        .annotate(so_ban_ghi=Count("id"))
+        .filter(so_ban_ghi__gt=1)
+        .values_list("gio", flat=True)
+    )
+
+    deleted = 0
+    for start in range(0, len(duplicate_hours), COMPACT_BATCH_SIZE):
+        hours = set(duplicate_hours[start:start + COMPACT_BATCH_SIZE])
+        rows = (
+            old.filter(time_stamp__gte=min(hours), time_stamp__lt=max(hours) + timedelta(hours=1))
+            .order_by("time_stamp", "id")
+            .values_list("id", "time_stamp")
+        )
+        kept_hours = set()
+        drop_ids = []
+        for snapshot_id, time_stamp in rows.iterator():
+            hour = snapshot_slot_start(time_stamp, 60)
+            if hour not in hours:
+                continue
+            if hour in kept_hours:
+                drop_ids.append(snapshot_id)
+            else:
+                kept_hours.add(hour)
+        for offset in range(0, len(drop_ids), COMPACT_BATCH_SIZE):
+            deleted += model_class.objects.filter(id__in=drop_ids[offset:offset + COMPACT_BATCH_SIZE]).delete()[0]
+    return deleted
+
+
+def _compact_snapshot_payloads(model_class, columns):
+    # Ban ghi dinh dang cu luu nguyen payload, trong do luon co khoa "time_stamp".
+    legacy = model_class.objects.filter(raw_data__has_key="time_stamp").order_by("id")
+    compacted = 0
+    while True:
+        batch = list(legacy.only("id", "raw_data")[:COMPACT_BATCH_SIZE])
+        if not batch:
+            return compacted
+        for snapshot in batch:
+            snapshot.raw_data = compact_realtime_payload(snapshot.raw_data, columns)
+        model_class.objects.bulk_update(batch, ["raw_data"])
+        compacted += len(batch)
+
+
+def downsample_realtime_snapshots(full_resolution_days=None, now=None):
+    """Giu du moc chup trong ``full_resolution_days`` ngay gan nhat, cu hon thi moi gio mot ban ghi.
+
+    Ban ghi giu lai la moc som nhat cua gio, giong du lieu chup theo gio truoc
+    day. Dong thoi rut gon ``raw_data`` cua cac ban ghi dinh dang cu.
+    """
+    if full_resolution_days is None:
+        full_resolution_days = getattr(
+            settings,
+            "REALTIME_SNAPSHOT_FULL_RESOLUTION_DAYS",
+            DEFAULT_SNAPSHOT_FULL_RESOLUTION_DAYS,
+        )
+    cutoff = (now or timezone.now()) - timedelta(days=full_resolution_days)
+
+    result = {}
+    for plant, model_class, columns in (
+        ("songhinh", SongHinhRealtimeSnapshot, SONGHINH_SNAPSHOT_COLUMNS),
+        ("vinhson", VinhSonRealtimeSnapshot, VINHSON_SNAPSHOT_COLUMNS),
+    ):
+        result[plant] = {
+            "deleted": _downsample_snapshot_model(model_class, cutoff),
+            "compacted": _compact_snapshot_payloads(model_class, columns),
+        }
+    logger.info("Rut gon snapshot realtime truoc %s: %s", cutoff.isoformat(), result)
+    return result
+
+
 def normalize_realtime_error(error):
     error = error or ""
     obsolete_errors = [
@@ -362,8 +562,11 @@ def clear_obsolete_realtime_error(state):
 
 
 def serialize_realtime_state(state=None):
+    from .realtime_scheduler import get_scheduler_leader
+
     state = state or RealtimeUpdateState.get_solo()
     clear_obsolete_realtime_error(state)
+    scheduler_leader, scheduler_leader_until = get_scheduler_leader(state)
     return {
         "auto_update_enabled": state.auto_update_enabled,
         "last_run_at": state.last_run_at,
@@ -372,5 +575,12 @@ def serialize_realtime_state(state=None):
         "last_manual_run_at": state.last_manual_run_at,
         "last_error": normalize_realtime_error(state.last_error),
         "last_error_at": state.last_error_at,
+        "scheduler_leader": scheduler_leader,
+        "scheduler_leader_until": scheduler_leader_until,
+        "last_vrain_sync_at": state.last_vrain_sync_at,
+        "last_job_latency_seconds": state.last_job_latency_seconds,
+        "last_job_duration_seconds": state.last_job_duration_seconds,
+        "missed_slot_count": state.missed_slot_count,
+        "last_missed_slot": state.last_missed_slot,
         "updated_at": state.updated_at,
     }
@@ -25,6 +25,7 @@ from .hydrology_services import (
     get_operating_capacity_range,
     get_operating_capacity_by_reservoir_level,
     get_operating_capacity_range_for_reservoir,
+    get_all_weekly_settings_cached,
     get_settings_week_number,
     get_setting_value,
 )
@@ -106,6 +107,12 @@ class ThongsoSanxuatSerializer(serializers.ModelSerializer):
 
         return self._setting_value_cache[cache_key]
 
+    def _get_week_number(self, target_date):
+        # Chỉ mục tuần đọc từ cache một lần cho cả request (serializer con dùng chung khi many=True).
+        if not hasattr(self, "_weekly_index"):
+            self._weekly_index = get_all_weekly_settings_cached()
+        return get_settings_week_number(target_date, self._weekly_index)
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         target_date = instance.thoi_gian.date() if instance.thoi_gian else None
@@ -125,7 +132,7 @@ class ThongsoSanxuatSerializer(serializers.ModelSerializer):
             "sanluong_kehoach_thang",
             thang=target_date.month,
         )
-        week_number = get_settings_week_number(target_date)
+        week_number = self._get_week_number(target_date)
         weekly_value = self._get_setting_value(
             instance.nha_may,
             target_date,
@@ -251,13 +258,23 @@ class ThongSoThuyVanThucTeSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class SongHinhRealtimeSnapshotSerializer(serializers.ModelSerializer):
+class RealtimeSnapshotProjectionMixin:
+    """Chi giu cac truong trong ``fields`` (neu truyen vao) khi serialize."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SongHinhRealtimeSnapshotSerializer(RealtimeSnapshotProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = SongHinhRealtimeSnapshot
         fields = "__all__"
 
 
-class VinhSonRealtimeSnapshotSerializer(serializers.ModelSerializer):
+class VinhSonRealtimeSnapshotSerializer(RealtimeSnapshotProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = VinhSonRealtimeSnapshot
         fields = "__all__"
@@ -0,0 +1,21 @@
+"""Chu ky chup snapshot realtime, dung chung cho lich beat trong settings va realtime_services.
+
+Module nay khong import Django de settings_base dung duoc truoc khi Django san sang.
+"""
+
+from celery.schedules import crontab
+
+
+def snap_snapshot_interval(value):
+    """Lam tron chu ky (phut) xuong uoc gan nhat cua 60 de moc luon thang hang theo gio, vd. 7 -> 6."""
+    interval = max(1, min(int(value or 60), 60))
+    while 60 % interval:
+        interval -= 1
+    return interval
+
+
+def snapshot_crontab(interval_minutes):
+    interval = snap_snapshot_interval(interval_minutes)
+    if interval >= 60:
+        return crontab(minute=5)
+    return crontab(minute=f"*/{interval}")
@@ -81,6 +81,7 @@ def _preview_payload(result, message):
         "skipped_rows": result.skipped_rows,
         "warnings": result.warnings,
         "source_range": result.source_range,
+        "unchanged_count": result.unchanged_count,
         "message": message,
     }
 
@@ -195,7 +196,8 @@ class SaveGoogleSheetDataAPIView(APIView):
                 "success": True,
                 "message": (
                     f"Đã lưu thành công. Tạo mới: {result.saved_count}, "
-                    f"Cập nhật: {result.updated_count}"
+                    f"Cập nhật: {result.updated_count} "
+                    f"(không đổi: {result.unchanged_count})"
                 ),
             }
         )
@@ -284,7 +286,8 @@ class SaveGioPhatAPIView(APIView):
                 "success": True,
                 "message": (
                     f"Đã lưu thành công. Tạo mới: {result.saved_count}, "
-                    f"Cập nhật: {result.updated_count}"
+                    f"Cập nhật: {result.updated_count} "
+                    f"(không đổi: {result.unchanged_count})"
                 ),
             }
         )
@@ -373,7 +376,8 @@ class SaveThuyVanThucTeAPIView(APIView):
                 "success": True,
                 "message": (
                     f"Đã lưu thành công. Tạo mới: {result.saved_count}, "
-                    f"Cập nhật: {result.updated_count}"
+                    f"Cập nhật: {result.updated_count} "
+                    f"(không đổi: {result.unchanged_count})"
                 ),
             }
         )
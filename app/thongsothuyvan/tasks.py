@@ -52,7 +52,7 @@ def get_missing_thuc_te_sync_range(nhamay, end_date):
 @shared_task
 def save_all_realtime_snapshots_task():
     """
-    Celery task to save all realtime snapshots (hourly).
+    Celery task to save all realtime snapshots (every REALTIME_SNAPSHOT_INTERVAL_MINUTES).
     """
     logger.info("Celery Task: save_all_realtime_snapshots_task started.")
     try:
@@ -66,6 +66,22 @@ def save_all_realtime_snapshots_task():
         close_old_connections()
 
 
+@shared_task
+def downsample_realtime_snapshots_task():
+    """
+    Celery task to thin realtime snapshots older than the full-resolution window to one per hour.
+    """
+    logger.info("Celery Task: downsample_realtime_snapshots_task started.")
+    try:
+        from thongsothuyvan.realtime_services import downsample_realtime_snapshots
+        return downsample_realtime_snapshots()
+    except Exception as e:
+        logger.exception("Celery Task: downsample_realtime_snapshots_task failed.")
+        raise
+    finally:
+        close_old_connections()
+
+
 @shared_task
 def sync_vrain_daily_rainfall_task():
     """
@@ -83,6 +99,42 @@ def sync_vrain_daily_rainfall_task():
         close_old_connections()
 
 
+@shared_task
+def sync_vrain_recent_rainfall_task():
+    """
+    Celery task to refresh VRAIN rainfall (daily totals and hourly rows) for yesterday and today.
+    """
+    logger.info("Celery Task: sync_vrain_recent_rainfall_task started.")
+    try:
+        from thongsothuyvan.vrain_services import sync_vrain_recent_rainfall
+        result = sync_vrain_recent_rainfall()
+        logger.info("Celery Task: sync_vrain_recent_rainfall_task completed: %s", result["message"])
+        return result
+    except Exception as e:
+        logger.exception("Celery Task: sync_vrain_recent_rainfall_task failed.")
+        raise
+    finally:
+        close_old_connections()
+
+
+@shared_task
+def backfill_vrain_rainfall_task(start_date, end_date=None):
+    """
+    Celery task to backfill VRAIN rainfall over a date range.
+    """
+    logger.info("Celery Task: backfill_vrain_rainfall_task started: %s -> %s", start_date, end_date)
+    try:
+        from thongsothuyvan.vrain_services import backfill_vrain_rainfall
+        result = backfill_vrain_rainfall(start_date, end_date)
+        logger.info("Celery Task: backfill_vrain_rainfall_task completed: %s", result["message"])
+        return result
+    except Exception as e:
+        logger.exception("Celery Task: backfill_vrain_rainfall_task failed.")
+        raise
+    finally:
+        close_old_connections()
+
+
 @shared_task
 def sync_missing_thuy_van_thuc_te_daily_task():
     """
@@ -115,6 +167,7 @@ def sync_missing_thuy_van_thuc_te_daily_task():
                 "end_date": range_end_date.isoformat(),
                 "saved_count": result.saved_count,
                 "updated_count": result.updated_count,
+                "unchanged_count": result.unchanged_count,
                 "parsed_count": result.parsed_count,
                 "skipped_count": result.skipped_count,
                 "source_range": result.source_range,
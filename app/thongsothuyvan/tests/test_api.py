@@ -363,6 +363,7 @@ class ThongSoThuyVanAPITests(APITestCase):
             skipped_rows=[{"row": 1, "reason": "invalid_date"}],
             warnings=["fallback"],
             source_range="Sản lượng!all_values",
+            unchanged_count=0,
         )
 
         self.client.force_authenticate(user=self.sh_user)
@@ -440,6 +441,7 @@ class ThongSoThuyVanAPITests(APITestCase):
             skipped_rows=[],
             warnings=[],
             source_range="2023!A1246:F1246",
+            unchanged_count=0,
         )
 
         self.client.force_authenticate(user=self.sh_user)
@@ -505,6 +507,7 @@ class ThongSoThuyVanAPITests(APITestCase):
         service_class.return_value.sync_thuc_te_range.return_value = SimpleNamespace(
             saved_count=1,
             updated_count=2,
+            unchanged_count=0,
             parsed_count=3,
             skipped_count=0,
             source_range="2023!A8:F10",
@@ -550,6 +553,7 @@ class ThongSoThuyVanAPITests(APITestCase):
         service_class.return_value.sync_thuc_te_range.return_value = SimpleNamespace(
             saved_count=1,
             updated_count=0,
+            unchanged_count=0,
             parsed_count=1,
             skipped_count=0,
             source_range="2023!A8:F8",
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..dashboard_services import DASHBOARD_PLANTS, fetch_dashboard_records, fetch_operation_hours, invalidate_dashboard_cache
+from ..models import ThongsoGioPhat, ThongsoSanxuat
+
+
+def _aware(day, hour=12):
+    return timezone.make_aware(datetime(day.year, day.month, day.day, hour))
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_dashboard_cache()
+        self.user = get_user_model().objects.create_user(
+            username="dashboard-user",
+            email="dashboard-user@example.com",
+            password="testpass123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.report_date = date(2026, 8, 20)
+        for plant in DASHBOARD_PLANTS:
+            for offset in range(80):
+                ThongsoSanxuat.objects.create(nha_may=plant, thoi_gian=_aware(self.report_date - timedelta(days=offset)), cot_l=float(offset))
+            ThongsoSanxuat.objects.create(nha_may=plant, thoi_gian=_aware(date(2025, 8, 20)), cot_l=99.0)
+            ThongsoSanxuat.objects.create(nha_may=plant, thoi_gian=_aware(date(2025, 3, 1)), cot_l=1.0)
+            ThongsoGioPhat.objects.create(nha_may=plant, ngay=date(2026, 1, 5), to_may=1, gio_phat_dien=10.0)
+            ThongsoGioPhat.objects.create(nha_may=plant, ngay=date(2026, 8, 1), to_may=1, gio_phat_dien=5.0)
+            ThongsoGioPhat.objects.create(nha_may=plant, ngay=date(2025, 12, 31), to_may=2, gio_phat_dien=7.0)
+
+    def test_records_and_hours_for_all_plants_use_constant_queries(self):
+        with self.assertNumQueries(3):
+            records_by_plant = fetch_dashboard_records(DASHBOARD_PLANTS)
+            hours_by_plant = fetch_operation_hours(records_by_plant)
+
+        for plant in DASHBOARD_PLANTS:
+            records = records_by_plant[plant]
+            days = [timezone.localtime(record.thoi_gian).date() for record in records]
+            self.assertEqual(days[0], self.report_date)
+            self.assertEqual(days, sorted(days, reverse=True))
+            # Quy 3 den 20/8 (51 ngay) bao trum 14 ngay gan nhat, cong ngay cung ky nam truoc.
+            self.assertEqual(len(records), 52)
+            self.assertIn(date(2025, 8, 20), days)
+            self.assertNotIn(date(2025, 3, 1), days)
+            self.assertEqual(hours_by_plant[plant], {"h1Year": 15.0, "h2Year": None})
+
+    def test_target_date_limits_latest_record(self):
+        records_by_plant = fetch_dashboard_records(("songhinh",), date(2026, 7, 2))
+
+        days = [timezone.localtime(record.thoi_gian).date() for record in records_by_plant["songhinh"]]
+        self.assertEqual(days[0], date(2026, 7, 2))
+        self.assertEqual(days[-1], date(2026, 6, 19))
+        self.assertNotIn(date(2026, 6, 18), days)
+
+    def test_summary_is_cached_until_production_data_changes(self):
+        first = self.client.get("/api/thongsothuyvan/dashboard-summary/")
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/thongsothuyvan/dashboard-summary/")
+        self.assertEqual(cached.json(), first.json())
+
+        ThongsoSanxuat.objects.filter(nha_may="vinhson", thoi_gian=_aware(self.report_date)).get().save()
+        ThongsoSanxuat.objects.create(nha_may="vinhson", thoi_gian=_aware(self.report_date + timedelta(days=1)), cot_l=5.0)
+
+        refreshed = self.client.get("/api/thongsothuyvan/dashboard-summary/")
+        self.assertEqual(refreshed.json()["data_by_plant"]["vinhson"][0]["cot_l"], 5.0)
+        self.assertEqual(refreshed.json()["data_by_plant"]["songhinh"], first.json()["data_by_plant"]["songhinh"])
@@ -1,20 +1,27 @@
 from django.test import TestCase
-from datetime import date
+from datetime import date, datetime
+from unittest import mock
+
+from django.utils import timezone
+
+from thongsothuyvan import hydrology_services
 from thongsothuyvan.models import (
     SonghinhMnh,
+    ThongsoSanxuat,
     ThongSoThuyVanCaiDat,
 )
+from thongsothuyvan.serializers import ThongsoSanxuatSerializer
 from thongsothuyvan.hydrology_services import (
     get_capacity_by_reservoir_level,
     get_settings_week_number,
-    get_all_weekly_settings_cached,
+    get_setting_value,
+    invalidate_settings_cache,
 )
 
 class HydrologyOptimizationTestCase(TestCase):
     def setUp(self):
         # Clear any cached data to ensure a clean state
-        get_all_weekly_settings_cached.cache_clear()
-        get_settings_week_number.cache_clear()
+        invalidate_settings_cache()
         
         # Populate capacity points for testing
         SonghinhMnh.objects.create(Mucnuoc=196.0, dungtich=0.0)
@@ -68,3 +75,43 @@ class HydrologyOptimizationTestCase(TestCase):
         # Verify the change is reflected (which means cache was cleared and re-evaluated)
         week = get_settings_week_number(date(2026, 3, 18))
         self.assertEqual(week, 15)
+
+    def test_setting_value_loads_plant_year_once_and_is_shared(self):
+        ThongSoThuyVanCaiDat.objects.create(
+            nha_may="songhinh",
+            nam=2026,
+            loai=ThongSoThuyVanCaiDat.LOAI_KE_HOACH_THANG,
+            thang=3,
+            sanluong_kehoach_thang=12.5,
+        )
+
+        with self.assertNumQueries(1):
+            weekly = get_setting_value(
+                "songhinh", date(2026, 3, 18), ThongSoThuyVanCaiDat.LOAI_MNGH_TUAN, "mucnuoc_gioihan_tuan"
+            )
+            monthly = get_setting_value(
+                "songhinh", date(2026, 3, 18), ThongSoThuyVanCaiDat.LOAI_KE_HOACH_THANG, "sanluong_kehoach_thang", thang=3
+            )
+        self.assertEqual(weekly, 201.5)
+        self.assertEqual(monthly, 12.5)
+
+        ThongSoThuyVanCaiDat.objects.filter(loai=ThongSoThuyVanCaiDat.LOAI_KE_HOACH_THANG).delete()
+        self.assertIsNone(
+            get_setting_value(
+                "songhinh", date(2026, 3, 18), ThongSoThuyVanCaiDat.LOAI_KE_HOACH_THANG, "sanluong_kehoach_thang", thang=3
+            )
+        )
+
+    def test_serializer_reads_week_index_once_per_request(self):
+        rows = [
+            ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=timezone.make_aware(datetime(2026, 3, day, 8)))
+            for day in (16, 17, 18, 23)
+        ]
+        with mock.patch(
+            "thongsothuyvan.serializers.get_all_weekly_settings_cached",
+            wraps=hydrology_services.get_all_weekly_settings_cached,
+        ) as weekly:
+            data = ThongsoSanxuatSerializer(rows, many=True).data
+        self.assertEqual(weekly.call_count, 1)
+        self.assertEqual(len(data), 4)
+
@@ -0,0 +1,139 @@
+from datetime import date, datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..aggregate_services import get_monthly_aggregates, rebuild_monthly_aggregates, refresh_monthly_aggregates
+from ..google_sheet_services import GoogleSheetHydrologyService
+from ..models import ThongSoThangTongHop, ThongSoThuyVanThucTe, ThongsoSanxuat
+from ..sync_views import user_can_modify_hydrology_object
+
+
+def _aware(year, month, day, hour=7):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class MonthlyAggregateTests(TestCase):
+    def test_month_rows_hold_flow_averages_output_sums_and_level_extremes(self):
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 1), cot_g=200.0, cot_i=10.0, cot_j=8.0, cot_k=0.0, cot_m=100.0, cot_r=90.0)
+        latest = ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 31), cot_g=204.0, cot_i=20.0, cot_j=12.0, cot_k=4.0, cot_m=50.0, cot_r=140.0)
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 8, 1), cot_g=150.0, cot_m=999.0)
+        ThongSoThuyVanThucTe.objects.create(nha_may="songhinh", ngay=date(2026, 7, 2), muc_nuoc_ho=201.0, qve=11.0)
+        ThongSoThuyVanThucTe.objects.create(nha_may="songhinh", ngay=date(2026, 7, 3), muc_nuoc_ho=203.0, qve=13.0)
+
+        with self.assertNumQueries(5):
+            aggregates = get_monthly_aggregates(["songhinh"], [(2026, 7)])
+        self.assertFalse(ThongSoThangTongHop.objects.exists())
+
+        row = aggregates[("songhinh", 2026, 7)]
+        self.assertEqual(row.so_ban_ghi, 2)
+        self.assertEqual((row.qve_tb, row.qcm_tb, row.qxl_tb), (15.0, 10.0, 2.0))
+        self.assertEqual((row.muc_nuoc_min, row.muc_nuoc_max), (200.0, 204.0))
+        self.assertEqual(row.dau_cuc, 150.0)
+        self.assertEqual(row.ban_ghi_cuoi, latest)
+        self.assertEqual((row.so_ngay_thuc_te, row.qve_thuc_te_tb), (2, 12.0))
+        self.assertEqual((row.muc_nuoc_thuc_te_min, row.muc_nuoc_thuc_te_max), (201.0, 203.0))
+
+        refresh_monthly_aggregates("songhinh", [(2026, 7)])
+        with self.assertNumQueries(1):
+            stored = get_monthly_aggregates(["songhinh"], [(2026, 7)])[("songhinh", 2026, 7)]
+        self.assertEqual((stored.so_ban_ghi, stored.dau_cuc, stored.ban_ghi_cuoi), (2, 150.0, latest))
+
+    def test_vinhson_reservoir_rows_split_inflow_like_leadership_report(self):
+        ThongsoSanxuat.objects.create(
+            nha_may="vinhson",
+            thoi_gian=_aware(2026, 7, 1),
+            cot_g=770.0,
+            cot_i=10.0,
+            luuluong_ve_ho_b=3.0,
+            luuluong_ve_ho_c=2.0,
+            mucnuoc_thuongluu_ho_b=820.0,
+        )
+
+        rows = {
+            reservoir: get_monthly_aggregates(["vinhson"], [(2026, 7)], ho_chua=reservoir)[("vinhson", 2026, 7)]
+            for reservoir in ("", "a", "b", "c")
+        }
+
+        self.assertEqual(rows[""].qve_tb, 10.0)
+        self.assertEqual((rows["a"].qve_tb, rows["b"].qve_tb, rows["c"].qve_tb), (5.0, 3.0, 2.0))
+        self.assertEqual(rows["b"].muc_nuoc_max, 820.0)
+        self.assertIsNone(rows["a"].dau_cuc)
+
+    def test_writes_refresh_only_their_month_after_commit(self):
+        refresh_monthly_aggregates("songhinh", [(2026, 6), (2026, 7)])
+        june = ThongSoThangTongHop.objects.get(nha_may="songhinh", nam=2026, thang=6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record = ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 5), cot_m=40.0)
+        july = ThongSoThangTongHop.objects.get(nha_may="songhinh", nam=2026, thang=7)
+        self.assertEqual((july.so_ban_ghi, july.dau_cuc), (1, 40.0))
+        self.assertEqual(ThongSoThangTongHop.objects.get(pk=june.pk).updated_at, june.updated_at)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        july.refresh_from_db()
+        self.assertEqual((july.so_ban_ghi, july.dau_cuc, july.ban_ghi_cuoi_id), (0, None, None))
+
+    def test_moving_a_record_to_another_month_refreshes_both_months(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 5), cot_m=40.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            actual = ThongSoThuyVanThucTe.objects.create(nha_may="songhinh", ngay=date(2026, 7, 5), qve=10.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record.thoi_gian = _aware(2026, 8, 5)
+            record.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            actual.ngay = date(2026, 8, 5)
+            actual.save()
+
+        rows = ThongSoThangTongHop.objects.filter(nha_may="songhinh").order_by("thang")
+        self.assertEqual(
+            [(row.thang, row.so_ban_ghi, row.dau_cuc, row.so_ngay_thuc_te) for row in rows],
+            [(7, 0, None, 0), (8, 1, 40.0, 1)],
+        )
+
+    def test_sheet_bulk_save_refreshes_touched_months(self):
+        user = get_user_model().objects.create_user(username="aggregate-writer", email="aggregate-writer@example.com", password="testpass123")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GoogleSheetHydrologyService().save_thuc_te(
+                data_list=[
+                    {"ngay": "2026-07-31", "muc_nuoc_ho": 200.0, "qve": 10.0},
+                    {"ngay": "2026-08-01", "muc_nuoc_ho": 201.0, "qve": 20.0},
+                ],
+                nhamay="songhinh",
+                user=user,
+                can_modify=user_can_modify_hydrology_object,
+            )
+
+        rows = ThongSoThangTongHop.objects.filter(nha_may="songhinh").order_by("thang")
+        self.assertEqual([(row.thang, row.qve_thuc_te_tb) for row in rows], [(7, 10.0), (8, 20.0)])
+
+    def test_rebuild_covers_every_month_with_data(self):
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2025, 12, 31), cot_m=1.0)
+        ThongSoThuyVanThucTe.objects.create(nha_may="vinhson", ngay=date(2026, 1, 1), qve_ho_b=4.0)
+
+        self.assertEqual(rebuild_monthly_aggregates(), 5)
+
+        self.assertEqual(ThongSoThangTongHop.objects.get(nha_may="songhinh", nam=2025, thang=12).dau_cuc, 1.0)
+        self.assertEqual(ThongSoThangTongHop.objects.get(nha_may="vinhson", ho_chua="b", nam=2026, thang=1).qve_thuc_te_tb, 4.0)
+
+    def test_rebuild_groups_months_in_the_database_and_rolls_back_on_failure(self):
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 6, 30, hour=23), cot_m=1.0)
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 1, hour=0), cot_m=2.0)
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=_aware(2026, 7, 2), cot_m=3.0)
+
+        # Danh sach nha may (2), savepoint (2), xoa (1) + moi nha may: 2 truy van nhom theo thang, 1 ban ghi cuoi, 1 upsert.
+        with self.assertNumQueries(9):
+            self.assertEqual(rebuild_monthly_aggregates(nha_may="songhinh"), 2)
+        rows = ThongSoThangTongHop.objects.filter(nha_may="songhinh").order_by("thang")
+        self.assertEqual([(row.thang, row.so_ban_ghi, row.dau_cuc) for row in rows], [(6, 1, 1.0), (7, 2, 5.0)])
+
+        with mock.patch("thongsothuyvan.aggregate_services._save_rows", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                rebuild_monthly_aggregates(nha_may="songhinh")
+        self.assertEqual(ThongSoThangTongHop.objects.filter(nha_may="songhinh").count(), 2)
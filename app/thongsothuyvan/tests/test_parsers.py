@@ -2,7 +2,8 @@ from datetime import date
 from unittest.mock import patch
 
 from gspread.exceptions import WorksheetNotFound
-from django.test import SimpleTestCase
+from django.core.cache import cache
+from django.test import TestCase
 
 from ..google_sheet_services import (
     GoogleSheetHydrologyService,
@@ -25,7 +26,7 @@ from ..views.views_sanxuat import (
     parse_production_integer_or_none,
 )
 
-class ThongSoThuyVanParserTests(SimpleTestCase):
+class ThongSoThuyVanParserTests(TestCase):
     def test_manual_production_and_decimal_parsers_are_field_specific(self):
         self.assertEqual(parse_production_integer_or_none("1,234"), 1234.0)
         self.assertEqual(
@@ -298,6 +299,49 @@ class ThongSoThuyVanParserTests(SimpleTestCase):
         self.assertEqual(result.data[0]["muc_nuoc_ho"], 200.5)
         self.assertEqual(result.data[0]["qve"], 123.4)
 
+    @patch("thongsothuyvan.google_sheet_services.get_stats_export_spreadsheet_id", return_value="sheet-id")
+    def test_preview_skips_sheet_fetch_while_modified_time_is_unchanged(self, _sheet_id):
+        class Worksheet:
+            def __init__(self):
+                self.calls = []
+
+            def get(self, range_name):
+                self.calls.append(("get", range_name))
+                return [["01/01/2023", "200,5", "", "", "", "123,4"]]
+
+        class Spreadsheet:
+            def __init__(self, worksheet):
+                self._worksheet = worksheet
+
+            def worksheet(self, name):
+                return self._worksheet
+
+        class Client:
+            modified_time = "2026-10-01T00:00:00.000Z"
+
+            def __init__(self, spreadsheet):
+                self._spreadsheet = spreadsheet
+
+            def open_by_key(self, sheet_id):
+                return self._spreadsheet
+
+            def get_file_drive_metadata(self, sheet_id):
+                return {"modifiedTime": Client.modified_time}
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        worksheet = Worksheet()
+        service = GoogleSheetHydrologyService(client_factory=lambda nhamay: Client(Spreadsheet(worksheet)))
+
+        first = service.preview_thuc_te("songhinh", date(2023, 1, 1))
+        second = service.preview_thuc_te("songhinh", date(2023, 1, 1))
+        self.assertEqual(worksheet.calls, [("get", "A8:F8")])
+        self.assertEqual(second.data, first.data)
+
+        Client.modified_time = "2026-10-02T00:00:00.000Z"
+        service.preview_thuc_te("songhinh", date(2023, 1, 1))
+        self.assertEqual(len(worksheet.calls), 2)
+
     @patch("thongsothuyvan.google_sheet_services.get_stats_export_spreadsheet_id", return_value="sheet-id")
     def test_preview_thuc_te_range_reads_one_google_range(self, _sheet_id):
         class Worksheet:
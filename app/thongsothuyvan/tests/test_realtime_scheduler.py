@@ -0,0 +1,119 @@
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import RealtimeUpdateState
+from ..realtime_scheduler import (
+    LEADER_CACHE_KEY,
+    acquire_scheduler_leadership,
+    get_scheduler_config,
+    keep_scheduler_leadership,
+    release_scheduler_leadership,
+    run_scheduler_tick,
+)
+from ..realtime_services import serialize_realtime_state
+
+
+def _local(hour, minute=0):
+    return timezone.make_aware(datetime(2026, 7, 3, hour, minute))
+
+
+class RealtimeSchedulerLeaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_one_process_holds_the_cache_or_database_lock(self):
+        for backend in ("cache", "database"):
+            with self.subTest(backend=backend):
+                self.assertTrue(acquire_scheduler_leadership("web-1:10", backend, 90))
+                self.assertTrue(acquire_scheduler_leadership("web-1:10", backend, 90))
+                self.assertFalse(acquire_scheduler_leadership("web-2:11", backend, 90))
+
+                release_scheduler_leadership("web-1:10", backend)
+                self.assertTrue(acquire_scheduler_leadership("web-2:11", backend, 90))
+                release_scheduler_leadership("web-2:11", backend)
+
+        # Leader DB het han (tien trinh chet) thi tien trinh khac duoc nhan.
+        RealtimeUpdateState.objects.filter(pk=1).update(
+            scheduler_leader="web-1:10",
+            scheduler_leader_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertTrue(acquire_scheduler_leadership("web-2:11", "database", 90))
+
+    def test_cache_lock_renews_and_releases_only_for_its_holder(self):
+        self.assertTrue(acquire_scheduler_leadership("web-1:10", "cache", 30))
+        self.assertTrue(acquire_scheduler_leadership("web-1:10", "cache", 300))
+        self.assertGreater(cache.ttl(LEADER_CACHE_KEY), 30)
+
+        # Khoa het han va tien trinh khac nhan: leader cu khong gia han hay xoa duoc khoa moi.
+        cache.delete(LEADER_CACHE_KEY)
+        self.assertTrue(acquire_scheduler_leadership("web-2:11", "cache", 90))
+        self.assertFalse(acquire_scheduler_leadership("web-1:10", "cache", 90))
+        release_scheduler_leadership("web-1:10", "cache")
+        self.assertEqual(cache.get(LEADER_CACHE_KEY), "web-2:11")
+
+    def test_state_reports_the_leader_of_the_active_lock(self):
+        RealtimeUpdateState.objects.create(pk=1, scheduler_leader="web-9:99", scheduler_leader_until=_local(10))
+        self.assertTrue(acquire_scheduler_leadership("web-1:10", "cache", 90))
+
+        with override_settings(REALTIME_SCHEDULER_LEADER_LOCK="cache"):
+            state = serialize_realtime_state()
+            self.assertEqual(state["scheduler_leader"], "web-1:10")
+            self.assertGreater(state["scheduler_leader_until"], timezone.now() + timedelta(seconds=60))
+
+            release_scheduler_leadership("web-1:10", "cache")
+            state = serialize_realtime_state()
+            self.assertEqual((state["scheduler_leader"], state["scheduler_leader_until"]), ("", None))
+
+        with override_settings(REALTIME_SCHEDULER_LEADER_LOCK="database"):
+            state = serialize_realtime_state()
+            self.assertEqual((state["scheduler_leader"], state["scheduler_leader_until"]), ("web-9:99", _local(10)))
+
+    def test_lease_is_renewed_while_a_long_job_runs(self):
+        renewed = threading.Event()
+
+        def acquire(identity, lock_backend, ttl_seconds):
+            renewed.set()
+            return True
+
+        with mock.patch("thongsothuyvan.realtime_scheduler.acquire_scheduler_leadership", side_effect=acquire) as renew:
+            with keep_scheduler_leadership("web-1:10", "cache", 3):
+                self.assertTrue(renewed.wait(5))
+        renew.assert_called_with("web-1:10", "cache", 3)
+
+    @override_settings(REALTIME_SCHEDULER_LEADER_LOCK="cache", REALTIME_SCHEDULER_LEADER_TTL_SECONDS=90)
+    @mock.patch("thongsothuyvan.vrain_services.sync_vrain_recent_rainfall")
+    @mock.patch("thongsothuyvan.realtime_services.save_all_realtime_snapshots")
+    def test_leader_runs_each_slot_once_and_reports_latency_and_missed_slots(self, save_snapshots, sync_vrain):
+        RealtimeUpdateState.objects.create(pk=1, last_hourly_slot=_local(7))
+        config = get_scheduler_config()
+        leader_state, follower_state = {}, {}
+
+        with mock.patch("django.utils.timezone.now", return_value=_local(10, 2)):
+            sleep_leader = run_scheduler_tick("web-1:10", config, leader_state)
+            sleep_follower = run_scheduler_tick("web-2:11", config, follower_state)
+            run_scheduler_tick("web-1:10", config, leader_state)
+
+        self.assertEqual(save_snapshots.call_count, 1)
+        self.assertEqual(sync_vrain.call_count, 1)
+        self.assertEqual((leader_state["leader"], follower_state["leader"]), (True, False))
+        self.assertEqual(sleep_follower, 30)
+        self.assertLessEqual(sleep_leader, 30)
+
+        state = serialize_realtime_state()
+        self.assertEqual(state["last_hourly_slot"], _local(10))
+        self.assertEqual(state["last_job_latency_seconds"], 120.0)
+        self.assertIsNotNone(state["last_job_duration_seconds"])
+        # Moc 8h va 9h khong ai chay.
+        self.assertEqual((state["missed_slot_count"], state["last_missed_slot"]), (2, _local(9)))
+
+        # Leader moi sau khi chuyen giao khong chay lai moc da chay.
+        release_scheduler_leadership("web-1:10", "cache")
+        with mock.patch("django.utils.timezone.now", return_value=_local(10, 4)):
+            run_scheduler_tick("web-2:11", config, follower_state)
+        self.assertEqual((save_snapshots.call_count, sync_vrain.call_count), (1, 1))
+        self.assertTrue(follower_state["leader"])
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from celery.schedules import crontab
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..downsampling import lttb_indices, minmax_indices
+from ..models import RealtimeUpdateState, SongHinhRealtimeSnapshot, VinhSonRealtimeSnapshot
+from ..realtime_services import (
+    claim_realtime_snapshot_slot,
+    downsample_realtime_snapshots,
+    get_snapshot_interval_minutes,
+    save_songhinh_realtime_snapshot,
+)
+from ..snapshot_schedule import snapshot_crontab
+
+SONGHINH_PAYLOAD = {
+    "time_stamp": "2026-07-03 10:15:00",
+    "MNTL": 205.1,
+    "MNHL": 100.0,
+    "PH1": 35.0,
+    "PH2": 34.0,
+    "PNM": 69.0,
+    "Qcm": 60.0,
+    "DM1": 0,
+    "DM2": 0,
+    "DM3": 0,
+    "DM4": 0,
+    "DM5": 0,
+    "DM6": 0,
+    "Qtran": 0,
+    "Canh_bao": "binh thuong",
+}
+
+
+def _local(day, hour, minute=0):
+    return timezone.make_aware(datetime(2026, 7, day, hour, minute))
+
+
+def _songhinh_snapshot(time_stamp, raw_data=None, mntl=205.0):
+    return SongHinhRealtimeSnapshot.objects.create(
+        time_stamp=time_stamp,
+        mntl=mntl, mnhl=100.0, ph1=0, ph2=0, pnm=0, qcm=0,
+        dm1=0, dm2=0, dm3=0, dm4=0, dm5=0, dm6=0, qtran=0,
+        raw_data=raw_data or {},
+    )
+
+
+class RealtimeSnapshotStorageTests(TestCase):
+    @mock.patch("thongsothuyvan.realtime_services.fetch_realtime_payload")
+    def test_snapshot_keeps_only_uncolumned_payload_and_skips_repeated_time_stamps(self, fetch_payload):
+        fetch_payload.side_effect = lambda prefix: dict(SONGHINH_PAYLOAD)
+
+        first = save_songhinh_realtime_snapshot()
+        again = save_songhinh_realtime_snapshot()
+
+        snapshot = SongHinhRealtimeSnapshot.objects.get()
+        self.assertEqual((snapshot.mntl, snapshot.pnm), (205.1, 69.0))
+        self.assertEqual(snapshot.raw_data, {"Canh_bao": "binh thuong"})
+        self.assertEqual((again.skipped, again.saved, again.snapshot_id), (True, True, first.snapshot_id))
+
+    def test_downsampling_keeps_first_snapshot_per_hour_outside_full_resolution_window(self):
+        for minute in (2, 17, 32, 47):
+            _songhinh_snapshot(_local(1, 10, minute))
+        _songhinh_snapshot(_local(1, 11, 5))
+        for minute in (0, 1, 2):
+            _songhinh_snapshot(_local(9, 10, minute))
+        legacy = _songhinh_snapshot(_local(1, 12, 5), {"time_stamp": "2026-07-01 12:05:00", "MNTL": 205.0, "Canh_bao": "lu"})
+
+        result = downsample_realtime_snapshots(full_resolution_days=7, now=_local(10, 0))
+
+        self.assertEqual(result["songhinh"], {"deleted": 3, "compacted": 1})
+        self.assertEqual(result["vinhson"], {"deleted": 0, "compacted": 0})
+        self.assertEqual(
+            [timezone.localtime(value).strftime("%d %H:%M") for value in SongHinhRealtimeSnapshot.objects.order_by("time_stamp").values_list("time_stamp", flat=True)],
+            ["01 10:02", "01 11:05", "01 12:05", "09 10:00", "09 10:01", "09 10:02"],
+        )
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.raw_data, {"Canh_bao": "lu"})
+        self.assertEqual(downsample_realtime_snapshots(full_resolution_days=7, now=_local(10, 0))["songhinh"], {"deleted": 0, "compacted": 0})
+        self.assertFalse(VinhSonRealtimeSnapshot.objects.exists())
+
+    def test_sub_hourly_slots_count_missed_captures(self):
+        with override_settings(REALTIME_SNAPSHOT_INTERVAL_MINUTES=14):
+            self.assertEqual(get_snapshot_interval_minutes(), 12)
+        self.assertEqual(snapshot_crontab(7), crontab(minute="*/6"))
+        self.assertEqual(snapshot_crontab(60), crontab(minute=5))
+        self.assertEqual(
+            settings.CELERY_BEAT_SCHEDULE["save-realtime-snapshots-hourly"]["schedule"],
+            snapshot_crontab(settings.REALTIME_SNAPSHOT_INTERVAL_MINUTES),
+        )
+
+        RealtimeUpdateState.objects.create(pk=1, last_hourly_slot=_local(3, 9, 45))
+        with mock.patch("django.utils.timezone.now", return_value=_local(3, 10, 16)):
+            self.assertEqual(claim_realtime_snapshot_slot(15, 5), _local(3, 10, 15))
+            self.assertIsNone(claim_realtime_snapshot_slot(15, 5))
+        with mock.patch("django.utils.timezone.now", return_value=_local(3, 10, 36)):
+            self.assertIsNone(claim_realtime_snapshot_slot(15, 5))
+
+        state = RealtimeUpdateState.get_solo()
+        self.assertEqual((state.missed_slot_count, state.last_missed_slot), (1, _local(3, 10, 0)))
+        self.assertEqual(state.last_job_latency_seconds, 60.0)
+        self.assertEqual(state.last_hourly_slot, _local(3, 10, 15))
+
+
+class RealtimeSnapshotApiTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="realtime-chart", email="realtime-chart@example.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        # 2 ngay x 48 moc 30 phut, dinh lu luc 12h ngay 2.
+        for index in range(96):
+            time_stamp = _local(1, 0) + timedelta(minutes=30 * index)
+            _songhinh_snapshot(time_stamp, {"Canh_bao": "x" * 50}, mntl=210.0 if index == 72 else 200.0 + index / 100)
+
+    def test_list_drops_raw_data_by_default_and_keeps_legacy_shape(self):
+        response = self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"date_from": "2026-07-02", "date_to": "2026-07-02"})
+
+        payload = response.json()
+        self.assertEqual(sorted(payload), ["next", "previous", "results"])
+        rows = payload["results"]
+        self.assertEqual(len(rows), 48)
+        self.assertNotIn("raw_data", rows[0])
+        self.assertEqual(timezone.localtime(datetime.fromisoformat(rows[0]["time_stamp"])).strftime("%d %H:%M"), "02 23:30")
+
+        rows = self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"date_from": "2026-07-02", "legacy": 1}).json()
+        self.assertEqual(len(rows), 48)
+
+        rows = self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"fields": "mntl,raw_data", "limit": 2, "legacy": "true"}).json()
+        self.assertEqual([sorted(row) for row in rows], [["id", "mntl", "raw_data", "time_stamp"]] * 2)
+        self.assertIn("raw_data", self.client.get(f"/api/thongsothuyvan/realtime-songhinh-snapshots/{rows[0]['id']}/").json())
+
+    def test_cursor_pages_walk_the_range_without_overlap(self):
+        seen = []
+        url, params = "/api/thongsothuyvan/realtime-songhinh-snapshots/", {"page_size": 40}
+        while url:
+            payload = self.client.get(url, params).json()
+            seen.extend(row["id"] for row in payload["results"])
+            url, params = payload["next"], None
+        self.assertEqual(len(seen), 96)
+        self.assertEqual(len(set(seen)), 96)
+
+    def test_downsampled_chart_keeps_ends_and_flood_peak(self):
+        for method in ("lttb", "minmax"):
+            with self.subTest(method=method):
+                response = self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"downsample": 10, "method": method})
+                rows = response.json()
+                self.assertLessEqual(len(rows), 10)
+                self.assertIn(210.0, [row["mntl"] for row in rows])
+                self.assertNotIn("raw_data", rows[0])
+
+        rows = self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"downsample": 10}).json()
+        self.assertEqual(len(rows), 10)
+        self.assertEqual((rows[0]["mntl"], rows[-1]["mntl"]), (200.95, 200.0))
+        self.assertEqual(self.client.get("/api/thongsothuyvan/realtime-songhinh-snapshots/", {"downsample": 10, "field": "raw_data"}).status_code, 400)
+
+    def test_downsampling_helpers_select_representative_points(self):
+        y = [0, 1, 0, 1, 9, 1, 0, 1, 0, 1, 0]
+        self.assertEqual(list(lttb_indices(range(len(y)), y, 4))[0], 0)
+        self.assertIn(4, lttb_indices(range(len(y)), y, 4))
+        self.assertEqual(list(lttb_indices(range(3), [1, 2, 3], 5)), [0, 1, 2])
+        self.assertEqual(list(minmax_indices(y, 2)), [0, 4, 5, 6])
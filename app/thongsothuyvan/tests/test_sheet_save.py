@@ -0,0 +1,127 @@
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from ..google_sheet_services import SHEET_THUC_TE, GoogleSheetHydrologyService, ParsedSheetResult, mark_unchanged_rows
+from ..models import ThongSoThuyVanThucTe, ThongsoGioPhat, ThongsoSanxuat
+from ..sync_views import user_can_modify_hydrology_object
+
+
+class GoogleSheetBulkSaveTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="sheet-writer", email="sheet-writer@example.com", password="testpass123")
+        self.other_user = User.objects.create_user(username="sheet-owner", email="sheet-owner@example.com", password="testpass123")
+        self.service = GoogleSheetHydrologyService()
+
+    def test_save_thuc_te_counts_created_and_updated_rows_with_constant_queries(self):
+        ThongSoThuyVanThucTe.objects.create(nha_may="songhinh", ngay=date(2026, 7, 1), muc_nuoc_ho=200.0)
+        data_list = [
+            {"ngay": f"2026-07-{day:02d}", "muc_nuoc_ho": 200.0 + day, "qve": float(day)}
+            for day in range(1, 31)
+        ]
+
+        with self.assertNumQueries(5):
+            result = self.service.save_thuc_te(
+                data_list=data_list,
+                nhamay="songhinh",
+                user=self.user,
+                can_modify=user_can_modify_hydrology_object,
+            )
+
+        self.assertEqual((result.saved_count, result.updated_count), (29, 1))
+        updated = ThongSoThuyVanThucTe.objects.get(nha_may="songhinh", ngay=date(2026, 7, 1))
+        self.assertEqual(updated.muc_nuoc_ho, 201.0)
+        self.assertEqual(updated.created_by, self.user)
+        self.assertEqual(updated.updated_by, self.user)
+        self.assertEqual(ThongSoThuyVanThucTe.objects.filter(created_by=self.user).count(), 30)
+
+    def test_save_san_luong_matches_existing_rows_by_parsed_time(self):
+        thoi_gian = timezone.make_aware(datetime(2026, 7, 10))
+        ThongsoSanxuat.objects.create(nha_may="songhinh", thoi_gian=thoi_gian, cot_l=1.0, created_by=self.user)
+
+        result = self.service.save_san_luong(
+            data_list=[
+                {"thoi_gian": thoi_gian.isoformat(), "cot_l": 5.0},
+                {"thoi_gian": "2026-07-11T00:00:00+07:00", "cot_l": 6.0},
+            ],
+            nhamay="songhinh",
+            user=self.user,
+            can_modify=user_can_modify_hydrology_object,
+        )
+
+        self.assertEqual((result.saved_count, result.updated_count), (1, 1))
+        self.assertEqual(ThongsoSanxuat.objects.get(thoi_gian=thoi_gian).cot_l, 5.0)
+        self.assertEqual(ThongsoSanxuat.objects.count(), 2)
+
+    def test_save_gio_phat_rejects_rows_owned_by_another_user_before_writing(self):
+        ThongsoGioPhat.objects.create(
+            nha_may="songhinh",
+            ngay=date(2026, 7, 2),
+            to_may=1,
+            gio_phat_dien=10.0,
+            created_by=self.other_user,
+        )
+
+        with self.assertRaises(PermissionError):
+            self.service.save_gio_phat(
+                data_list=[
+                    {"ngay": "2026-07-01", "to_may": 1, "gio_phat_dien": 24.0, "gio_ngung": 0.0},
+                    {"ngay": "2026-07-02", "to_may": 1, "gio_phat_dien": 20.0, "gio_ngung": 4.0},
+                ],
+                nhamay="songhinh",
+                user=self.user,
+                can_modify=user_can_modify_hydrology_object,
+            )
+
+        self.assertEqual(ThongsoGioPhat.objects.count(), 1)
+        self.assertEqual(ThongsoGioPhat.objects.get().gio_phat_dien, 10.0)
+
+    def test_duplicate_keys_count_as_create_then_update(self):
+        result = self.service.save_gio_phat(
+            data_list=[
+                {"ngay": "2026-07-01", "to_may": 1, "gio_phat_dien": 20.0, "gio_ngung": 4.0},
+                {"ngay": "2026-07-01", "to_may": 1, "gio_phat_dien": 24.0, "gio_ngung": 0.0},
+            ],
+            nhamay="songhinh",
+            user=self.user,
+            can_modify=user_can_modify_hydrology_object,
+        )
+
+        self.assertEqual((result.saved_count, result.updated_count), (1, 1))
+        self.assertEqual(ThongsoGioPhat.objects.get().gio_phat_dien, 24.0)
+
+    def test_unchanged_rows_are_not_written_or_flagged_in_preview(self):
+        data_list = [
+            {"ngay": "2026-07-01", "muc_nuoc_ho": 201.0, "qve": 10.0},
+            {"ngay": "2026-07-02", "muc_nuoc_ho": 202.0, "qve": 11.0},
+        ]
+        self.service.save_thuc_te(
+            data_list=data_list,
+            nhamay="songhinh",
+            user=self.user,
+            can_modify=user_can_modify_hydrology_object,
+        )
+
+        data_list[1]["qve"] = 12.5
+        result = self.service.save_thuc_te(
+            data_list=data_list,
+            nhamay="songhinh",
+            user=self.user,
+            can_modify=user_can_modify_hydrology_object,
+        )
+
+        self.assertEqual((result.saved_count, result.updated_count, result.unchanged_count), (0, 2, 1))
+        self.assertEqual(ThongSoThuyVanThucTe.objects.get(ngay=date(2026, 7, 2)).qve, 12.5)
+
+        data_list[0]["qve"] = 10.5
+        with self.assertNumQueries(1):
+            preview = mark_unchanged_rows(
+                ParsedSheetResult(data=[dict(item) for item in data_list] + [{"ngay": "2026-07-03", "qve": 1.0}]),
+                "songhinh",
+                SHEET_THUC_TE,
+            )
+        self.assertEqual([item["unchanged"] for item in preview.data], [False, True, False])
+        self.assertEqual(preview.unchanged_count, 1)
@@ -50,6 +50,7 @@ class ThuyVanThucTeTaskTests(TestCase):
         service_class.return_value.sync_thuc_te_range.return_value = SimpleNamespace(
             saved_count=2,
             updated_count=0,
+            unchanged_count=0,
             parsed_count=2,
             skipped_count=0,
             source_range="2023!A1:F2",
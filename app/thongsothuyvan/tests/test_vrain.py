@@ -0,0 +1,204 @@
+import json
+import threading
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import LuongMuaGioVrain, TramDoMuaVrain
+from ..vrain_services import (
+    VN_TZ,
+    backfill_vrain_rainfall,
+    get_vrain_realtime_24h,
+    invalidate_vrain_realtime_cache,
+    sync_vrain_daily_rainfall,
+)
+
+NOW_VN = VN_TZ.localize(datetime(2026, 7, 3, 10, 20))
+
+
+class StandInVrainHandler(BaseHTTPRequestHandler):
+    """Tra ve du lieu kieu VRAIN: mua luc 02h va 05h30, mot tram khong co ``time_point``."""
+
+    failing_dates = set()
+    transient_failures = {}
+    requests = []
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        day = params["start_time"][:10]
+        self.requests.append((params["start_time"], params["end_time"], self.headers.get("x-api-key")))
+
+        if day in self.failing_dates or self.transient_failures.get(day, 0) > 0:
+            if day in self.transient_failures:
+                self.transient_failures[day] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "Data": [
+                {"station_id": "036620", "value": [
+                    {"time_point": f"{day} 02:00:00", "depth": 2.0},
+                    {"time_point": f"{day} 05:30:00", "depth": "1.0"},
+                ]},
+                {"station_id": "957833", "value": [{"time_point": f"{day} 02:00:00", "depth": 1.0}]},
+                {"station_id": "036606", "value": [{"time_point": f"{day} 02:00:00", "depth": 1.5}]},
+                {"station_id": "036616", "value": [{"depth": 3.0}]},
+                {"station_id": "999999", "value": [{"depth": 50.0}]},
+            ]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class VrainIngestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInVrainHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            VRAIN_API_KEY="test-key",
+            VRAIN_STATS_URL=f"http://127.0.0.1:{cls.server.server_port}/v1/stations/stats",
+            VRAIN_MAX_RETRIES=1,
+            VRAIN_BACKFILL_WORKERS=3,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        invalidate_vrain_realtime_cache()
+        StandInVrainHandler.failing_dates = set()
+        StandInVrainHandler.transient_failures = {}
+        StandInVrainHandler.requests = []
+        patcher = mock.patch("thongsothuyvan.vrain_services._vn_now", return_value=NOW_VN)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backfill_fetches_days_concurrently_and_upserts_daily_and_hourly_rows(self):
+        StandInVrainHandler.failing_dates = {"2026-06-30"}
+        StandInVrainHandler.transient_failures = {"2026-07-01": 1}
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs("thongsothuyvan.vrain_services", "WARNING") as logs:
+            result = backfill_vrain_rainfall("2026-06-30", "2026-07-05")
+        self.assertTrue(any("{'Ho_A_TD_Vinh_Son': 1}" in line for line in logs.output))
+
+        self.assertEqual((result["created"], result["updated"], result["end_date"]), (3, 0, "2026-07-03"))
+        self.assertEqual(list(result["failed"]), ["2026-06-30"])
+        self.assertIn(("2026-07-03 00:00:00", "2026-07-03 10:59:59", "test-key"), StandInVrainHandler.requests)
+
+        daily = TramDoMuaVrain.objects.get(Thoi_gian=VN_TZ.localize(datetime(2026, 7, 1)))
+        self.assertEqual((daily.UBND_xa_Song_Hinh, daily.Xa_Ea_M_doan, daily.Ho_A_TD_Vinh_Son, daily.Cu_Kroa), (3.0, 2.5, 3.0, 0.0))
+
+        # 3 cot co du lieu x (24 + 24 + 11 gio), gio khong mua luu 0.
+        self.assertEqual(result["hourly_rows"], 3 * 59)
+        hourly = dict(
+            LuongMuaGioVrain.objects.filter(tram="UBND_xa_Song_Hinh", luong_mua__gt=0, thoi_gian__date=date(2026, 7, 2))
+            .values_list("thoi_gian__hour", "luong_mua")
+        )
+        self.assertEqual(hourly, {2: 2.0, 5: 1.0})
+        # Gia tri khong co time_point chi vao tong ngay, khong bi gan vao 00h.
+        self.assertEqual(
+            LuongMuaGioVrain.objects.filter(tram="Ho_A_TD_Vinh_Son", thoi_gian__date=date(2026, 7, 2), luong_mua__gt=0).count(),
+            0,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            again = backfill_vrain_rainfall(date(2026, 7, 1), date(2026, 7, 3))
+        self.assertEqual((again["created"], again["updated"], again["failed"]), (0, 3, {}))
+        self.assertEqual(TramDoMuaVrain.objects.count(), 3)
+        self.assertEqual(LuongMuaGioVrain.objects.count(), 3 * 59)
+
+    def test_daily_sync_keeps_its_response_and_updates_existing_row(self):
+        TramDoMuaVrain.objects.create(Thoi_gian=VN_TZ.localize(datetime(2026, 7, 2)), Cu_Kroa=9.0)
+
+        result = sync_vrain_daily_rainfall("2026-07-02")
+
+        self.assertEqual((result["ok"], result["date"], result["created"]), (True, "2026-07-02", False))
+        self.assertEqual(result["data"]["UBND_xa_Song_Hinh"], 3.0)
+        self.assertEqual(TramDoMuaVrain.objects.get().Cu_Kroa, 0.0)
+
+    def test_rolling_24h_view_reads_stored_hours_without_calling_upstream(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            backfill_vrain_rainfall("2026-07-02", "2026-07-03")
+        StandInVrainHandler.requests = []
+
+        with self.assertNumQueries(1):
+            payload = get_vrain_realtime_24h()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_vrain_realtime_24h(), payload)
+
+        # 11h 02/07 -> 10h 03/07: chi con mua cua ngay 03/07.
+        self.assertEqual((payload["start_time"], payload["end_time"]), ("2026-07-02 11:00:00", "2026-07-03 10:59:59"))
+        self.assertEqual(payload["synced_until"], "2026-07-03 10:59:59")
+        self.assertEqual((payload["data"]["UBND_xa_Song_Hinh"], payload["data"]["Ho_A_TD_Vinh_Son"]), (3.0, 0.0))
+
+        user = get_user_model().objects.create_user(username="vrain-reader", email="vrain-reader@example.com", password="testpass123")
+        client = APIClient()
+        client.force_authenticate(user)
+        with override_settings(VRAIN_STATS_URL="http://127.0.0.1:9/unreachable"):
+            response = client.get("/api/thongsothuyvan/vrain-realtime/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], payload["data"])
+        self.assertEqual(StandInVrainHandler.requests, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LuongMuaGioVrain.objects.filter(tram="Cu_Kroa").delete()
+            LuongMuaGioVrain.objects.create(tram="Cu_Kroa", thoi_gian=VN_TZ.localize(datetime(2026, 7, 3, 9)), luong_mua=4.0)
+            invalidate_vrain_realtime_cache()
+        self.assertEqual(get_vrain_realtime_24h()["data"]["Cu_Kroa"], 4.0)
+
+    def test_empty_store_falls_back_to_live_fetch_and_range_errors_map_to_client_responses(self):
+        user = get_user_model().objects.create_user(username="vrain-admin", email="vrain-admin@example.com", password="testpass123")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with override_settings(VRAIN_STATS_URL="http://127.0.0.1:9/unreachable"):
+            self.assertEqual(client.get("/api/thongsothuyvan/vrain-realtime/").status_code, 503)
+
+        response = client.get("/api/thongsothuyvan/vrain-realtime/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StandInVrainHandler.requests, [("2026-07-02 11:00:00", "2026-07-03 10:59:59", "test-key")])
+        self.assertEqual((response.json()["synced_until"], response.json()["data"]["Ho_A_TD_Vinh_Son"]), (None, 3.0))
+
+        with override_settings(VRAIN_BACKFILL_MAX_DAYS=2):
+            response = client.post("/api/thongsothuyvan/sync-vrain/", {"start_date": "2026-07-01", "end_date": "2026-07-03"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("2 ngay", response.json()["error"])
+
+        response = client.post("/api/thongsothuyvan/sync-vrain/", {"start_date": "2026-07-02", "end_date": "2026-07-02"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 1)
+
+        # Khoang nhieu ngay khong chay trong request: dua vao Celery va tra 202 kem task_id.
+        with mock.patch("thongsothuyvan.tasks.backfill_vrain_rainfall_task.delay", return_value=mock.Mock(id="task-1")) as delay:
+            response = client.post("/api/thongsothuyvan/sync-vrain/", {"start_date": "2026-07-01", "end_date": "2026-07-05"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()["task_id"], response.json()["end_date"]), ("task-1", "2026-07-03"))
+        delay.assert_called_once_with("2026-07-01", "2026-07-03")
+        self.assertEqual(TramDoMuaVrain.objects.count(), 1)
+
+        result = mock.Mock(status="SUCCESS", result={"created": 2})
+        result.successful.return_value = True
+        with mock.patch("thongsothuyvan.vrain_views.AsyncResult", return_value=result):
+            response = client.get("/api/thongsothuyvan/sync-vrain/", {"task_id": "task-1"})
+        self.assertEqual(response.json(), {"ok": True, "task_id": "task-1", "status": "SUCCESS", "result": {"created": 2}})
@@ -1,8 +1,14 @@
 import base64
 import json
+from datetime import datetime, time, timedelta
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
+
+import numpy as np
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status, viewsets
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -16,6 +22,7 @@ from ..serializers import (
     SongHinhRealtimeSnapshotSerializer,
     VinhSonRealtimeSnapshotSerializer,
 )
+from ..downsampling import DOWNSAMPLE_METHODS, downsample_indices
 from ..plants import normalize_plant_code
 from ..realtime_services import (
     enrich_songhinh_payload,
@@ -30,6 +37,8 @@ from .views_sanxuat import (
     get_env_value,
 )
 
+MAX_CHART_POINTS = 5000
+
 
 def fetch_realtime_payload(prefix):
     realtime_url = get_env_value(f"{prefix}_URL")
@@ -152,6 +161,7 @@ class RealtimeManualSaveAPIView(APIView):
                         "plant": result.plant,
                         "saved": result.saved,
                         "snapshot_id": result.snapshot_id,
+                        "skipped": result.skipped,
                         "error": result.error,
                     }
                     for result in results
@@ -165,40 +175,129 @@ class RealtimeManualSaveAPIView(APIView):
         )
 
 
-class SongHinhRealtimeSnapshotViewSet(viewsets.ModelViewSet):
-    serializer_class = SongHinhRealtimeSnapshotSerializer
-    pagination_class = None
+class RealtimeSnapshotCursorPagination(CursorPagination):
+    """Phan trang keyset theo ``time_stamp`` (tham so ``cursor``/``page_size``).
+
+    Luon phan trang; client cu gui ``legacy=1`` de nhan danh sach phang nhu truoc.
+    """
+
+    ordering = "-time_stamp"
+    page_size = 500
+    page_size_query_param = "page_size"
+    max_page_size = 5000
+    legacy_query_param = "legacy"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if str(request.query_params.get(self.legacy_query_param, "")).lower() in {"1", "true", "yes"}:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class BaseRealtimeSnapshotViewSet(viewsets.ModelViewSet):
+    """Snapshot realtime: loc theo ngay, chon truong, phan trang keyset va rut gon cho bieu do.
+
+    Danh sach mac dinh bo ``raw_data`` (``include_raw=1`` hoac ``fields=...,raw_data``
+    de lay lai) va duoc phan trang; ``legacy=1`` tra ve danh sach phang, gioi han bang ``limit``. ``downsample=N`` tra ve toi da N diem cua truong ``field`` theo
+    ``method=lttb`` (mac dinh) hoac ``minmax``.
+    """
+
+    pagination_class = RealtimeSnapshotCursorPagination
     permission_classes = [IsAuthenticated]
+    filter_backends = []
+    snapshot_model = None
+    default_chart_field = None
+
+    def _date_bound(self, name, end=False):
+        value = parse_date(self.request.query_params.get(name) or "")
+        if not value:
+            return None
+        if end:
+            value += timedelta(days=1)
+        return timezone.make_aware(datetime.combine(value, time.min))
 
     def get_queryset(self):
-        queryset = SongHinhRealtimeSnapshot.objects.all().order_by("-time_stamp")
-        date_from = self.request.query_params.get("date_from")
-        date_to = self.request.query_params.get("date_to")
-        if date_from:
-            queryset = queryset.filter(time_stamp__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(time_stamp__date__lte=date_to)
+        queryset = self.snapshot_model.objects.all().order_by("-time_stamp")
+        start = self._date_bound("date_from")
+        end = self._date_bound("date_to", end=True)
+        # Loc theo khoang thoi gian (khong dung __date) de dung chi muc time_stamp.
+        if start:
+            queryset = queryset.filter(time_stamp__gte=start)
+        if end:
+            queryset = queryset.filter(time_stamp__lt=end)
+        if self.action == "list":
+            queryset = queryset.only(*self.get_projection())
         return queryset
 
+    def get_projection(self):
+        if hasattr(self, "_projection"):
+            return self._projection
+        model_fields = [field.name for field in self.snapshot_model._meta.concrete_fields]
+        requested = self.request.query_params.get("fields")
+        if requested:
+            names = {name.strip() for name in requested.split(",")}
+            fields = [name for name in model_fields if name in names or name in ("id", "time_stamp")]
+        else:
+            fields = [name for name in model_fields if name != "raw_data"]
+            if str(self.request.query_params.get("include_raw", "")).lower() in {"1", "true", "yes"}:
+                fields.append("raw_data")
+        self._projection = fields
+        return fields
 
-class VinhSonRealtimeSnapshotViewSet(viewsets.ModelViewSet):
-    serializer_class = VinhSonRealtimeSnapshotSerializer
-    pagination_class = None
-    permission_classes = [IsAuthenticated]
+    def get_serializer(self, *args, **kwargs):
+        if self.action == "list":
+            kwargs.setdefault("fields", self.get_projection())
+        return super().get_serializer(*args, **kwargs)
 
-    def get_queryset(self):
-        queryset = VinhSonRealtimeSnapshot.objects.all().order_by("-time_stamp")
-        date_from = self.request.query_params.get("date_from")
-        date_to = self.request.query_params.get("date_to")
-        limit = self.request.query_params.get("limit")
-        if date_from:
-            queryset = queryset.filter(time_stamp__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(time_stamp__date__lte=date_to)
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+
+        points = request.query_params.get("downsample")
+        if points:
+            try:
+                points = max(3, min(int(points), MAX_CHART_POINTS))
+            except (TypeError, ValueError):
+                return Response({"error": "downsample phai la so nguyen."}, status=status.HTTP_400_BAD_REQUEST)
+            method = request.query_params.get("method") or "lttb"
+            field = request.query_params.get("field") or self.default_chart_field
+            if method not in DOWNSAMPLE_METHODS:
+                return Response({"error": f"method phai la mot trong: {', '.join(DOWNSAMPLE_METHODS)}."}, status=status.HTTP_400_BAD_REQUEST)
+            if field not in {f.name for f in self.snapshot_model._meta.concrete_fields} or field in ("id", "time_stamp", "raw_data", "created_at"):
+                return Response({"error": f"Truong khong hop le: {field}"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = self._downsample(queryset, field, points, method)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        limit = request.query_params.get("limit")
         if limit:
             try:
-                limit_value = max(1, min(int(limit), 500))
-                queryset = queryset[:limit_value]
+                queryset = queryset[:max(1, min(int(limit), 500))]
             except (TypeError, ValueError):
                 pass
-        return queryset
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def _downsample(self, queryset, field, points, method):
+        rows = list(
+            queryset.filter(**{f"{field}__isnull": False})
+            .order_by("time_stamp", "id")
+            .values_list("id", "time_stamp", field)
+        )
+        if len(rows) > points:
+            x = np.array([row[1].timestamp() for row in rows])
+            y = np.array([row[2] for row in rows], dtype=np.float64)
+            rows = [rows[index] for index in downsample_indices(x, y, points, method)]
+        return queryset.filter(id__in=[row[0] for row in rows])
+
+
+class SongHinhRealtimeSnapshotViewSet(BaseRealtimeSnapshotViewSet):
+    serializer_class = SongHinhRealtimeSnapshotSerializer
+    snapshot_model = SongHinhRealtimeSnapshot
+    default_chart_field = "mntl"
+
+
+class VinhSonRealtimeSnapshotViewSet(BaseRealtimeSnapshotViewSet):
+    serializer_class = VinhSonRealtimeSnapshotSerializer
+    snapshot_model = VinhSonRealtimeSnapshot
+    default_chart_field = "mntla"
@@ -1,5 +1,5 @@
 import os
-from datetime import date, datetime, time, timedelta
+from datetime import date, datetime, time
 from django.conf import settings
 from django.db.models import Sum, Count
 from django.utils import timezone
@@ -42,6 +42,12 @@ from ..serializers import (
     ThongsoGioPhatSerializer,
     ThongSoThuyVanThucTeSerializer,
 )
+from ..dashboard_services import (
+    DASHBOARD_PLANTS,
+    fetch_dashboard_records,
+    fetch_operation_hours,
+    get_cached_dashboard,
+)
 from ..plants import get_hydrology_plants, normalize_plant_code
 from .views_settings import build_hydrology_settings_payload
 
@@ -258,111 +264,54 @@ def parse_production_integer_or_none(value, *, allow_negative=False):
     return -number if is_negative else number
 
 
-def get_year_offset_date(value, offset):
-    if not value:
-        return None
-
-    try:
-        return value.replace(year=value.year - offset)
-    except ValueError:
-        return value.replace(year=value.year - offset, day=28)
-
-
-def get_quarter_bounds(value):
-    if not value:
-        return None, None
-
-    start_month = ((value.month - 1) // 3) * 3 + 1
-    return date(value.year, start_month, 1), value
-
-
-def add_record(record_map, record):
-    if record:
-        record_map[record.id] = record
-
-
-def add_queryset_records(record_map, queryset):
-    for record in queryset:
-        add_record(record_map, record)
+def build_dashboard_records_for_plant(plant, target_date=None):
+    return fetch_dashboard_records([plant], target_date)[plant]
 
 
-def get_latest_record_before(plant, target_date=None):
-    queryset = ThongsoSanxuat.objects.filter(nha_may=plant)
-    if target_date:
-        queryset = queryset.filter(thoi_gian__date__lte=target_date)
-    return queryset.order_by("-thoi_gian").first()
+def build_operation_hours_for_records(plant, records):
+    return fetch_operation_hours({plant: records})[plant]
 
 
-def build_dashboard_records_for_plant(plant, target_date=None):
-    record_map = {}
-    latest_record = get_latest_record_before(plant, target_date)
-    latest_date = latest_record.thoi_gian.date() if latest_record else None
-    report_date = target_date or latest_date
-
-    add_record(record_map, latest_record)
-
-    if not report_date:
-        return []
-
-    recent_end = latest_date or report_date
-    recent_start = recent_end - timedelta(days=13)
-    add_queryset_records(
-        record_map,
-        ThongsoSanxuat.objects.filter(
-            nha_may=plant,
-            thoi_gian__date__gte=recent_start,
-            thoi_gian__date__lte=recent_end,
-        ).order_by("-thoi_gian"),
+def build_dashboard_summary_payload(target_date=None):
+    plants = list(DASHBOARD_PLANTS)
+    report_year = (
+        target_date.year
+        if target_date
+        else timezone.localdate().year
     )
-
-    previous_year_date = get_year_offset_date(report_date, 1)
-    if previous_year_date:
-        add_record(
-            record_map,
-            ThongsoSanxuat.objects.filter(
-                nha_may=plant,
-                thoi_gian__date=previous_year_date,
-            )
-            .order_by("-thoi_gian")
-            .first(),
-        )
-
-    quarter_start, quarter_end = get_quarter_bounds(report_date)
-    if quarter_start and quarter_end:
-        add_queryset_records(
-            record_map,
-            ThongsoSanxuat.objects.filter(
-                nha_may=plant,
-                thoi_gian__date__gte=quarter_start,
-                thoi_gian__date__lte=quarter_end,
-            ).order_by("-thoi_gian"),
+    settings_lookup = {
+        (
+            record.nha_may,
+            record.nam,
+            record.loai,
+            record.thang,
+            record.tuan,
+        ): record
+        for record in ThongSoThuyVanCaiDat.objects.filter(
+            nha_may__in=plants,
+            nam__in=[report_year, report_year - 1],
         )
+    }
 
-    return sorted(record_map.values(), key=lambda record: record.thoi_gian, reverse=True)
-
-
-def build_operation_hours_for_records(plant, records):
-    latest_record = records[0] if records else None
-    if not latest_record or not latest_record.thoi_gian:
-        return {"h1Year": None, "h2Year": None}
-
-    report_date = latest_record.thoi_gian.date()
-    year_start = date(report_date.year, 1, 1)
-    rows = (
-        ThongsoGioPhat.objects.filter(
-            nha_may=plant,
-            ngay__gte=year_start,
-            ngay__lte=report_date,
+    records_by_plant = fetch_dashboard_records(plants, target_date)
+    data_by_plant = {
+        plant: list(
+            ThongsoSanxuatSerializer(
+                records_by_plant[plant],
+                many=True,
+                context={"settings_lookup": settings_lookup},
+            ).data
         )
-        .values("to_may")
-        .annotate(year=Sum("gio_phat_dien"))
-        .order_by()
-    )
-    totals = {str(row["to_may"]): row["year"] or 0 for row in rows}
+        for plant in plants
+    }
 
     return {
-        "h1Year": totals.get("1"),
-        "h2Year": totals.get("2"),
+        "data_by_plant": data_by_plant,
+        "operation_hours_by_plant": fetch_operation_hours(records_by_plant),
+        "hydrology_settings": build_hydrology_settings_payload(
+            report_year,
+            plants,
+        ),
     }
 
 
@@ -591,53 +540,7 @@ class DashboardSummaryAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        data_by_plant = {}
-        operation_hours_by_plant = {}
-        
-        plants = ["songhinh", "vinhson", "thuongkontum"]
-        report_year = (
-            target_date.year
-            if target_date
-            else timezone.localdate().year
-        )
-        settings_lookup = {
-            (
-                record.nha_may,
-                record.nam,
-                record.loai,
-                record.thang,
-                record.tuan,
-            ): record
-            for record in ThongSoThuyVanCaiDat.objects.filter(
-                nha_may__in=plants,
-                nam__in=[report_year, report_year - 1],
-            )
-        }
-
-        for plant in plants:
-            records = build_dashboard_records_for_plant(plant, target_date)
-            data_by_plant[plant] = ThongsoSanxuatSerializer(
-                records,
-                many=True,
-                context={"settings_lookup": settings_lookup},
-            ).data
-            operation_hours_by_plant[plant] = build_operation_hours_for_records(
-                plant,
-                records,
-            )
-
-        hydrology_settings = build_hydrology_settings_payload(
-            report_year,
-            plants,
-        )
-
-        return Response(
-            {
-                "data_by_plant": data_by_plant,
-                "operation_hours_by_plant": operation_hours_by_plant,
-                "hydrology_settings": hydrology_settings,
-            }
-        )
+        return Response(get_cached_dashboard(target_date, build_dashboard_summary_payload))
 
 
 class GioPhatSummaryAPIView(APIView):
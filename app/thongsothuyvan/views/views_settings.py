@@ -379,9 +379,8 @@ class HydrologySettingsAPIView(APIView):
             )
 
         if changed > 0:
-            from ..hydrology_services import get_settings_week_number, get_setting_value
-            get_settings_week_number.cache_clear()
-            get_setting_value.cache_clear()
+            from ..hydrology_services import invalidate_settings_cache
+            invalidate_settings_cache()
 
         return Response(
             {
@@ -1,11 +1,23 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 import pytz
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from .models import TramDoMuaVrain
+from .models import LuongMuaGioVrain, TramDoMuaVrain
+
+logger = logging.getLogger(__name__)
 
 
 STATIONS_MAPPING = {
@@ -22,6 +34,22 @@ STATIONS_MAPPING = {
 }
 
 VRAIN_STATS_URL = "https://kttv-open.vrain.vn/v1/stations/stats"
+VRAIN_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Moi gia tri mua cua /v1/stations/stats co "time_point" (gio VN, cung dinh dang voi
+# start_time/end_time) va "depth" (mm).
+VRAIN_VALUE_TIME_KEY = "time_point"
+VRAIN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+VRAIN_REALTIME_CACHE_PREFIX = "thongsothuyvan:vrain:24h"
+VRAIN_REALTIME_GENERATION_CACHE_KEY = f"{VRAIN_REALTIME_CACHE_PREFIX}:generation"
+DEFAULT_VRAIN_BACKFILL_WORKERS = 4
+DEFAULT_VRAIN_BACKFILL_MAX_DAYS = 366
+DEFAULT_VRAIN_REALTIME_CACHE_TIMEOUT = 600
+
+VN_TZ = pytz.timezone("Asia/Ho_Chi_Minh")
+
+_session = None
+_session_config = None
+_session_lock = threading.Lock()
 
 
 class VrainNoDataError(ValueError):
@@ -32,6 +60,10 @@ class VrainConfigError(RuntimeError):
     pass
 
 
+class VrainRangeError(ValueError):
+    pass
+
+
 def _get_api_key():
     api_key = getattr(settings, "VRAIN_API_KEY", os.environ.get("VRAIN_API_KEY"))
     if not api_key:
@@ -39,15 +71,47 @@ def _get_api_key():
     return api_key
 
 
+def _backfill_workers():
+    return max(1, int(getattr(settings, "VRAIN_BACKFILL_WORKERS", DEFAULT_VRAIN_BACKFILL_WORKERS)))
+
+
+def get_vrain_session():
+    """Session dung chung cho moi lan goi VRAIN: giu ket noi (pool) va tu thu lai loi tam thoi."""
+    global _session, _session_config
+
+    config = (int(getattr(settings, "VRAIN_MAX_RETRIES", 3)), _backfill_workers())
+    with _session_lock:
+        if _session is None or _session_config != config:
+            max_retries, pool_size = config
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=0.5,
+                status_forcelist=VRAIN_RETRY_STATUSES,
+                allowed_methods=frozenset({"GET"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if _session is not None:
+                _session.close()
+            _session, _session_config = session, config
+        return _session
+
+
 def _fetch_station_stats(start_time, end_time):
-    response = requests.get(
-        VRAIN_STATS_URL,
+    response = get_vrain_session().get(
+        getattr(settings, "VRAIN_STATS_URL", VRAIN_STATS_URL),
         params={"start_time": start_time, "end_time": end_time},
         headers={
             "x-api-key": _get_api_key(),
             "Content-Type": "application/json",
         },
-        timeout=30,
+        timeout=(
+            getattr(settings, "VRAIN_CONNECT_TIMEOUT", 5),
+            getattr(settings, "VRAIN_READ_TIMEOUT", 30),
+        ),
     )
     if not response.ok:
         raise requests.HTTPError(
@@ -101,48 +165,252 @@ def _parse_date(date_value):
     return datetime.strptime(str(date_value), "%Y-%m-%d").date()
 
 
-def sync_vrain_daily_rainfall(date_value=None):
-    vn_tz = pytz.timezone("Asia/Ho_Chi_Minh")
-    now_vn = _vn_now()
-    target_date = _parse_date(date_value)
-    start_time = f"{target_date} 00:00:00"
-    end_time = (
-        f"{target_date} {str(now_vn.hour).zfill(2)}:59:59"
-        if target_date == now_vn.date()
-        else f"{target_date} 23:59:59"
-    )
+def _day_window(target_date, now_vn):
+    """Gio dau va gio cuoi (dau gio) can lay cua mot ngay; ngay hien tai chi lay den gio dang chay."""
+    first_hour = VN_TZ.localize(datetime.combine(target_date, datetime.min.time()))
+    last_hour = first_hour.replace(hour=now_vn.hour if target_date == now_vn.date() else 23)
+    return first_hour, last_hour
 
-    station_totals = _sum_station_totals(_fetch_station_stats(start_time, end_time))
-    db_time = vn_tz.localize(datetime.combine(target_date, datetime.min.time()))
 
-    obj = TramDoMuaVrain.objects.filter(Thoi_gian=db_time).order_by("id").first()
-    created = obj is None
-    if created:
-        obj = TramDoMuaVrain.objects.create(Thoi_gian=db_time, **station_totals)
-    else:
+def _window_params(first_hour, last_hour):
+    return first_hour.strftime(VRAIN_TIME_FORMAT), last_hour.strftime("%Y-%m-%d %H:59:59")
+
+
+def _value_hour(value):
+    """Dau gio (gio VN) cua ``time_point``; None neu thieu hoac khong doc duoc."""
+    try:
+        moment = datetime.strptime(str(value.get(VRAIN_VALUE_TIME_KEY) or ""), VRAIN_TIME_FORMAT)
+    except ValueError:
+        return None
+    return VN_TZ.localize(moment.replace(minute=0, second=0))
+
+
+def _hourly_station_rainfall(stats_data, first_hour, last_hour):
+    """Luong mua theo ``(ten cot, dau gio)`` trong cua so ``first_hour``..``last_hour``.
+
+    Moi gio cua tram co tra du lieu deu co dong (0 neu khong mua). Gia tri khong co
+    ``time_point`` hop le hoac nam ngoai cua so bi bo qua (ghi log): chi duoc tinh vao tong
+    ngay, khong gan vao gio nao.
+    """
+    hours = []
+    hour = first_hour
+    while hour <= last_hour:
+        hours.append(hour)
+        hour = VN_TZ.normalize(hour + timedelta(hours=1))
+
+    rainfall = {}
+    rejected = {}
+    for station_data in stats_data.get("Data") or []:
+        field_name = STATIONS_MAPPING.get(str(station_data.get("station_id")))
+        if not field_name:
+            continue
+        for hour in hours:
+            rainfall.setdefault((field_name, hour), 0.0)
+        for value in station_data.get("value") or []:
+            try:
+                depth = float(value.get("depth") or 0)
+            except (ValueError, TypeError):
+                continue
+            hour = _value_hour(value)
+            if hour is None or not first_hour <= hour <= last_hour:
+                rejected[field_name] = rejected.get(field_name, 0) + 1
+                continue
+            rainfall[(field_name, hour)] += depth
+    if rejected:
+        logger.warning(
+            "VRAIN %s..%s: bo qua gia tri mua khong co time_point hop le hoac ngoai cua so: %s",
+            *_window_params(first_hour, last_hour),
+            rejected,
+        )
+    return {key: round(value, 2) for key, value in rainfall.items()}
+
+
+def invalidate_vrain_realtime_cache():
+    cache.set(VRAIN_REALTIME_GENERATION_CACHE_KEY, time.time_ns(), None)
+
+
+def _upsert_daily_totals(totals_by_date):
+    """Ghi tong ngay vao ``TramDoMuaVrain`` bang mot lan doc, mot bulk_update va mot bulk_create."""
+    times = {
+        target_date: VN_TZ.localize(datetime.combine(target_date, datetime.min.time()))
+        for target_date in totals_by_date
+    }
+    existing = {}
+    for obj in TramDoMuaVrain.objects.filter(Thoi_gian__in=times.values()).order_by("-id"):
+        existing[obj.Thoi_gian] = obj
+
+    to_create, to_update, created_dates = [], [], set()
+    for target_date, station_totals in totals_by_date.items():
+        obj = existing.get(times[target_date])
+        if obj is None:
+            to_create.append(TramDoMuaVrain(Thoi_gian=times[target_date], **station_totals))
+            created_dates.add(target_date)
+            continue
         for field_name, value in station_totals.items():
             setattr(obj, field_name, value)
-        obj.save(update_fields=list(station_totals.keys()))
+        to_update.append(obj)
+
+    if to_update:
+        TramDoMuaVrain.objects.bulk_update(to_update, sorted(set(STATIONS_MAPPING.values())))
+    if to_create:
+        TramDoMuaVrain.objects.bulk_create(to_create)
+    return created_dates, len(to_update)
+
+
+def _upsert_hourly_rainfall(rainfall):
+    now = timezone.now()
+    rows = [
+        LuongMuaGioVrain(tram=field_name, thoi_gian=hour, luong_mua=value, updated_at=now)
+        for (field_name, hour), value in rainfall.items()
+    ]
+    if rows:
+        LuongMuaGioVrain.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["tram", "thoi_gian"],
+            update_fields=["luong_mua", "updated_at"],
+        )
+    return len(rows)
+
+
+def _store_rainfall(totals_by_date, rainfall):
+    with transaction.atomic():
+        created_dates, updated = _upsert_daily_totals(totals_by_date)
+        hourly_rows = _upsert_hourly_rainfall(rainfall)
+        transaction.on_commit(invalidate_vrain_realtime_cache)
+    return created_dates, updated, hourly_rows
+
+
+def sync_vrain_daily_rainfall(date_value=None):
+    target_date = _parse_date(date_value)
+    first_hour, last_hour = _day_window(target_date, _vn_now())
+
+    stats_data = _fetch_station_stats(*_window_params(first_hour, last_hour))
+    station_totals = _sum_station_totals(stats_data)
+    created_dates, _, _ = _store_rainfall(
+        {target_date: station_totals},
+        _hourly_station_rainfall(stats_data, first_hour, last_hour),
+    )
 
     return {
         "ok": True,
         "message": "Dong bo thanh cong",
         "date": str(target_date),
-        "created": created,
+        "created": target_date in created_dates,
         "data": station_totals,
     }
 
 
-def get_vrain_realtime_24h():
-    now_vn = _vn_now()
-    past_24h = now_vn - timedelta(hours=23, minutes=59, seconds=59)
-    start_time = past_24h.strftime("%Y-%m-%d %H:%M:%S")
-    end_time = now_vn.strftime("%Y-%m-%d %H:%M:%S")
-    station_totals = _sum_station_totals(_fetch_station_stats(start_time, end_time))
+def resolve_backfill_range(start_date, end_date=None):
+    """Kiem tra khoang ngay bu du lieu, tra ve ``(start_date, end_date)`` (ngay ket thuc cat ve hom nay)."""
+    start_date = _parse_date(start_date)
+    end_date = min(_parse_date(end_date) if end_date else start_date, _vn_now().date())
+    if end_date < start_date:
+        raise VrainRangeError("Ngay bat dau phai truoc hoac bang ngay ket thuc va khong o tuong lai.")
+    max_days = getattr(settings, "VRAIN_BACKFILL_MAX_DAYS", DEFAULT_VRAIN_BACKFILL_MAX_DAYS)
+    if (end_date - start_date).days + 1 > max_days:
+        raise VrainRangeError(f"Chi duoc dong bo toi da {max_days} ngay moi lan.")
+    _get_api_key()
+    return start_date, end_date
 
+
+def backfill_vrain_rainfall(start_date, end_date=None, max_workers=None):
+    """Lay lai du lieu mua VRAIN cho mot khoang ngay va ghi gop mot lan.
+
+    Cac ngay duoc goi song song (toi da ``VRAIN_BACKFILL_WORKERS`` luong, chi lam viec
+    mang); phan tich va ghi CSDL chay tren luong goi. Ngay loi khong lam hong ca dot ma
+    duoc tra ve trong ``failed``.
+    """
+    now_vn = _vn_now()
+    start_date, end_date = resolve_backfill_range(start_date, end_date)
+    day_count = (end_date - start_date).days + 1
+
+    windows = {}
+    for offset in range(day_count):
+        target_date = start_date + timedelta(days=offset)
+        windows[target_date] = _day_window(target_date, now_vn)
+    workers = max(1, min(max_workers or _backfill_workers(), day_count))
+
+    totals_by_date, rainfall, failed = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vrain-backfill") as executor:
+        futures = {
+            executor.submit(_fetch_station_stats, *_window_params(*window)): target_date
+            for target_date, window in windows.items()
+        }
+        for future in as_completed(futures):
+            target_date = futures[future]
+            try:
+                stats_data = future.result()
+                totals_by_date[target_date] = _sum_station_totals(stats_data)
+            except (requests.RequestException, ValueError) as error:
+                logger.warning("Khong lay duoc du lieu VRAIN ngay %s: %s", target_date, error)
+                failed[str(target_date)] = str(error)
+                continue
+            rainfall.update(_hourly_station_rainfall(stats_data, *windows[target_date]))
+
+    created_dates, updated, hourly_rows = _store_rainfall(totals_by_date, rainfall) if totals_by_date else (set(), 0, 0)
     return {
+        "ok": bool(totals_by_date),
+        "message": f"Da dong bo {len(totals_by_date)}/{day_count} ngay",
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "created": len(created_dates),
+        "updated": updated,
+        "hourly_rows": hourly_rows,
+        "failed": dict(sorted(failed.items())),
+    }
+
+
+def sync_vrain_recent_rainfall():
+    """Dong bo hom qua va hom nay, du de phuc vu bang mua 24h tu du lieu da luu."""
+    today = _vn_now().date()
+    return backfill_vrain_rainfall(today - timedelta(days=1), today)
+
+
+def get_vrain_realtime_24h():
+    """Tong mua 24 gio gan nhat cua tung tram, tinh tu bang mua gio da dong bo.
+
+    Khong goi VRAIN khi da co du lieu gio trong cua so; truoc lan dong bo dau tien thi lay
+    truc tiep tu VRAIN nhu truoc. Ket qua duoc cache theo gio hien tai va lam moi moi khi
+    co du lieu moi.
+    """
+    last_hour = _vn_now().replace(minute=0, second=0, microsecond=0)
+    first_hour = VN_TZ.normalize(last_hour - timedelta(hours=23))
+    generation = cache.get_or_set(VRAIN_REALTIME_GENERATION_CACHE_KEY, 1, None)
+    cache_key = f"{VRAIN_REALTIME_CACHE_PREFIX}:{generation}:{last_hour:%Y%m%d%H}"
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    rows = list(
+        LuongMuaGioVrain.objects.filter(thoi_gian__gte=first_hour, thoi_gian__lte=last_hour)
+        .values("tram")
+        .annotate(total=Sum("luong_mua"), last_hour=Max("thoi_gian"))
+        .order_by()
+    )
+    start_time, end_time = _window_params(first_hour, last_hour)
+    if rows:
+        station_totals = {field: 0.0 for field in set(STATIONS_MAPPING.values())}
+        for row in rows:
+            if row["tram"] in station_totals:
+                station_totals[row["tram"]] = round(row["total"] or 0.0, 2)
+        synced_until = timezone.localtime(max(row["last_hour"] for row in rows), VN_TZ).strftime("%Y-%m-%d %H:59:59")
+    else:
+        logger.info("Chua co mua gio VRAIN da dong bo trong %s..%s, lay truc tiep tu VRAIN.", start_time, end_time)
+        station_totals = _sum_station_totals(_fetch_station_stats(start_time, end_time))
+        synced_until = None
+
+    payload = {
         "ok": True,
         "start_time": start_time,
         "end_time": end_time,
+        "synced_until": synced_until,
         "data": station_totals,
     }
+    cache.set(
+        cache_key,
+        payload,
+        getattr(settings, "VRAIN_REALTIME_CACHE_TIMEOUT", DEFAULT_VRAIN_REALTIME_CACHE_TIMEOUT),
+    )
+    return payload
@@ -1,5 +1,7 @@
+import logging
+
 import requests
-from django.core.cache import cache
+from celery.result import AsyncResult
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -8,10 +10,15 @@ from rest_framework.views import APIView
 from .vrain_services import (
     VrainConfigError,
     VrainNoDataError,
+    VrainRangeError,
+    backfill_vrain_rainfall,
     get_vrain_realtime_24h,
+    resolve_backfill_range,
     sync_vrain_daily_rainfall,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def _vrain_error_response(error):
     if isinstance(error, VrainConfigError):
@@ -34,6 +41,11 @@ def _vrain_error_response(error):
             {"ok": False, "error": f"Loi ket noi den VRAIN API: {error}"},
             status=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
+    if isinstance(error, VrainRangeError):
+        return Response(
+            {"ok": False, "error": str(error)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     if isinstance(error, ValueError):
         return Response(
             {"ok": False, "error": "Dinh dang ngay khong hop le. Vui long dung YYYY-MM-DD"},
@@ -45,17 +57,63 @@ def _vrain_error_response(error):
     )
 
 
+def _backfill_task_status(task_id):
+    result = AsyncResult(task_id)
+    payload = {"ok": True, "task_id": task_id, "status": result.status}
+    if result.successful():
+        payload["result"] = result.result
+    elif result.failed():
+        payload.update(ok=False, error=str(result.result))
+    return Response(payload)
+
+
 class SyncVrainRainfallAPIView(APIView):
+    """Dong bo mua VRAIN: mot ngay chay ngay trong request; khoang nhieu ngay (``start_date``)
+    duoc dua vao Celery, tra ve 202 kem ``task_id`` de hoi trang thai qua ``GET ?task_id=``.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def process_sync(self, request):
         date_param = request.GET.get("date") or request.data.get("date")
+        start_param = request.GET.get("start_date") or request.data.get("start_date")
+        end_param = request.GET.get("end_date") or request.data.get("end_date")
         try:
+            if start_param:
+                start_date, end_date = resolve_backfill_range(start_param, end_param)
+                if start_date == end_date:
+                    return Response(backfill_vrain_rainfall(start_date, end_date))
+                return self.enqueue_backfill(start_date, end_date)
             return Response(sync_vrain_daily_rainfall(date_param))
         except Exception as error:
             return _vrain_error_response(error)
 
+    def enqueue_backfill(self, start_date, end_date):
+        from .tasks import backfill_vrain_rainfall_task
+
+        try:
+            task = backfill_vrain_rainfall_task.delay(str(start_date), str(end_date))
+        except Exception as error:
+            logger.exception("Khong dua duoc tac vu bu du lieu VRAIN %s -> %s vao hang doi.", start_date, end_date)
+            return Response(
+                {"ok": False, "error": f"Khong the dua tac vu dong bo vao hang doi: {error}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response(
+            {
+                "ok": True,
+                "message": "Da dua tac vu dong bo vao hang doi",
+                "task_id": task.id,
+                "start_date": str(start_date),
+                "end_date": str(end_date),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     def get(self, request):
+        task_id = request.GET.get("task_id")
+        if task_id:
+            return _backfill_task_status(task_id)
         return self.process_sync(request)
 
     def post(self, request):
@@ -66,15 +124,7 @@ class VrainRealtimeAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        cache_key = "vrain_realtime_24h_data"
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-
         try:
-            response_data = get_vrain_realtime_24h()
+            return Response(get_vrain_realtime_24h())
         except Exception as error:
             return _vrain_error_response(error)
-
-        cache.set(cache_key, response_data, 600)
-        return Response(response_data)